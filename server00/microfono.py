@@ -10,6 +10,8 @@ from dotenv import load_dotenv
 import os
 import asyncio
 
+from audio_resample import Resampler
+
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
@@ -42,6 +44,8 @@ class Microfono:
         self.buffer = []
         self.ultimo_sonido = time.time()
         self.fs = 44100  # Frecuencia de muestreo
+        self.fs_envio = 16000  # lo que usa Whisper; se remuestrea al capturar
+        self._rs = Resampler(self.fs, self.fs_envio)
         self.ia_hablando = False
 
         self.bus.subscribe("ia/hablando", self.recibir_estado_ia)
@@ -68,10 +72,11 @@ class Microfono:
                     self.bus.publish("audio/grabando", True)
                     self.grabando = True
                     self.buffer.clear()
+                    self._rs.reset()
                 self.ultimo_sonido = ahora
 
             if self.grabando:
-                self.buffer.append(indata.copy())
+                self.buffer.append(self._rs.procesar_pcm16(indata[:, 0]).tobytes())
 
                 # si pasó suficiente tiempo en silencio, detener grabación
                 if ahora - self.ultimo_sonido > self.silencio_max:
@@ -88,29 +93,26 @@ class Microfono:
     def guardar_audio(self):
         if not self.buffer:
             return
-        audio = np.concatenate(self.buffer, axis=0)
         nombre_archivo = f"grabacion_{int(time.time())}.wav"
         with wave.open(nombre_archivo, 'wb') as wf:
             wf.setnchannels(1)
             wf.setsampwidth(2)
-            wf.setframerate(self.fs)
-            wf.writeframes((audio * 32767).astype(np.int16).tobytes())
+            wf.setframerate(self.fs_envio)
+            wf.writeframes(b"".join(self.buffer))
         print(f"💾 Audio guardado: {nombre_archivo}")
 
     def transcribir_audio_api_en_memoria(self):
         if not self.buffer:
             return
 
-        # Convertir buffer de NumPy a WAV en memoria
-        audio_np = np.concatenate(self.buffer, axis=0)
-        
+        # Convertir buffer PCM a WAV en memoria
         wav_buffer = BytesIO()
         wav_buffer.name = "grabacion.wav"
         with wave.open(wav_buffer, 'wb') as wf:
             wf.setnchannels(1)
             wf.setsampwidth(2)
-            wf.setframerate(self.fs)
-            wf.writeframes((audio_np * 32767).astype(np.int16).tobytes())
+            wf.setframerate(self.fs_envio)
+            wf.writeframes(b"".join(self.buffer))
 
         wav_buffer.seek(0)  # Rebobinar buffer para leerlo desde el principio
 
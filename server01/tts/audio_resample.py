@@ -0,0 +1,185 @@
+# audio_resample.py
+# Conversión de formato y remuestreo polifásico en streaming (solo numpy),
+# común a captura (micrófono a la tasa nativa -> 16 kHz) y TTS (Piper 22.05 kHz,
+# Kokoro 24 kHz float32).
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+INT16_SCALE = np.float32(1.0 / 32768.0)
+
+
+def a_float32(pcm, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    int16 (bytes o ndarray) o float -> float32 en [-1, 1).
+
+    Con `out` (float32 de al menos len(pcm) muestras) escribe ahí y devuelve
+    `out[:n]`; sin `out`, un float32 que ya lo es se devuelve sin copiar.
+    """
+    if isinstance(pcm, (bytes, bytearray, memoryview)):
+        pcm = np.frombuffer(pcm, dtype=np.int16)
+    n = len(pcm)
+    if out is None:
+        if pcm.dtype == np.float32:
+            return pcm
+        out = np.empty(n, dtype=np.float32)
+    dst = out[:n]
+    if pcm.dtype == np.int16:
+        np.multiply(pcm, INT16_SCALE, out=dst, casting="unsafe")
+    else:
+        dst[:] = pcm
+    return dst
+
+
+def a_pcm16(x: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """float [-1, 1] -> int16 con saturación (en `out` si se pasa)."""
+    n = len(x)
+    if out is None:
+        out = np.empty(n, dtype=np.int16)
+    dst = out[:n]
+    np.multiply(np.clip(x, -1.0, 32767 / 32768), 32768, out=dst, casting="unsafe")
+    return dst
+
+
+class Resampler:
+    """
+    Remuestreo racional sr_in -> sr_out por filtro polifásico (sinc con
+    ventana de Kaiser), con estado entre llamadas: los chunks se pueden
+    cortar en cualquier lado y el resultado es el mismo que procesar todo
+    junto.
+
+    Con L/M = sr_out/sr_in reducido, la salida n cae en la entrada n*M/L;
+    su fase (n*M mod L) elige una de las L filas del banco de `taps`
+    coeficientes. Cada chunk se resuelve con dos `take` y un `einsum` sobre
+    ventanas del historial (sliding_window_view, sin copiar la entrada).
+    Al bajar de tasa el filtro se alarga M/L veces para mantener la banda
+    de transición. La salida sale `retardo` muestras atrasada (entero,
+    el centro del filtro cae en una muestra de salida).
+
+    `procesar(x)` acepta int16 (bytes o ndarray) o float y devuelve una
+    vista float32 de un buffer interno, válida hasta la próxima llamada
+    (`procesar_pcm16` igual, en int16).
+    Los buffers se reservan al construir (`max_bloque` muestras de entrada)
+    y solo crecen si llega un chunk más grande.
+    """
+
+    def __init__(self, sr_in: int, sr_out: int, taps: int = 32, corte: float = 0.95,
+                 beta: float = 8.6, max_bloque: int = 4096):
+        g = gcd(int(sr_in), int(sr_out))
+        self.sr_in, self.sr_out = int(sr_in), int(sr_out)
+        self.L, self.M = self.sr_out // g, self.sr_in // g
+        self.identidad = self.L == self.M
+        escala = min(1.0, self.L / self.M)
+        self.taps = T = 1 if self.identidad else int(np.ceil(taps / escala))
+
+        if self.identidad:
+            self.retardo = 0
+            self._h = np.ones((1, 1), dtype=np.float32)
+        else:
+            # prototipo a tasa L*sr_in, centrado en una muestra de salida (c = retardo*M)
+            n = self.L * T
+            self.retardo = int(round((n - 1) / (2 * self.M)))
+            c = self.retardo * self.M
+            j = np.arange(n)
+            fc = corte * escala
+            h = fc * np.sinc(fc * (j - c) / self.L)
+            medio = max(c, n - 1 - c)
+            h *= np.i0(beta * np.sqrt(np.clip(1 - ((j - c) / medio) ** 2, 0, 1))) / np.i0(beta)
+            h *= self.L / h.sum()
+            # fila p: h[p + k*L] para k = 0..T-1, invertida para multiplicar ventanas ascendentes
+            self._h = np.ascontiguousarray(h.reshape(T, self.L).T[:, ::-1], dtype=np.float32)
+
+        self._reservar(max_bloque)
+        self.reset()
+
+    def _reservar(self, max_bloque: int):
+        self._cap = int(max_bloque)
+        k = self._cap * self.L // self.M + 2
+        self._x = np.zeros(self.taps - 1 + self._cap + self.M, dtype=np.float32)
+        self._y = np.empty(k, dtype=np.float32)
+        self._y16 = np.empty(k, dtype=np.int16)
+        self._ventanas = np.empty((k, self.taps), dtype=np.float32)
+        self._filas = np.empty((k, self.taps), dtype=np.float32)
+        self._ar = np.arange(k, dtype=np.int64)
+        self._idx = np.empty(k, dtype=np.int64)
+        self._fase = np.empty(k, dtype=np.int64)
+
+    def reset(self):
+        """Vacía el historial (empieza una señal nueva)."""
+        self._x[:self.taps - 1] = 0
+        self._len = self.taps - 1       # muestras válidas en _x
+        self._base = -(self.taps - 1)   # índice absoluto de _x[0]
+        self._n = 0                     # próxima salida (índice absoluto)
+
+    def procesar(self, x) -> np.ndarray:
+        if isinstance(x, (bytes, bytearray, memoryview)):
+            x = np.frombuffer(x, dtype=np.int16)
+        m = len(x)
+        if self.identidad:
+            if m > len(self._y):
+                self._reservar(m)
+            return a_float32(x, out=self._y)
+        if self._len + m > len(self._x):
+            self._crecer(m)
+        a_float32(x, out=self._x[self._len:self._len + m])
+        self._len += m
+
+        L, M, T = self.L, self.M, self.taps
+        ultimo = self._base + self._len - 1
+        k = ((ultimo + 1) * L - 1) // M - self._n + 1   # salidas con n*M//L <= ultimo
+        if k <= 0:
+            return self._y[:0]
+
+        idx, fase = self._idx[:k], self._fase[:k]
+        np.add(self._ar[:k], self._n, out=idx)
+        idx *= M
+        np.remainder(idx, L, out=fase)
+        idx //= L
+        idx -= self._base + T - 1  # inicio de la ventana de T muestras que termina en idx
+        ventanas = sliding_window_view(self._x[:self._len], T)
+        np.take(ventanas, idx, axis=0, out=self._ventanas[:k])
+        np.take(self._h, fase, axis=0, out=self._filas[:k])
+        y = self._y[:k]
+        np.einsum("kt,kt->k", self._ventanas[:k], self._filas[:k], out=y)
+        self._n += k
+
+        # conservar solo el historial que necesita la próxima salida
+        desde = min((self._n * M) // L - (T - 1) - self._base, self._len)
+        if desde > 0:
+            resto = self._len - desde
+            self._x[:resto] = self._x[desde:self._len]
+            self._base += desde
+            self._len = resto
+        return y
+
+    def procesar_pcm16(self, x) -> np.ndarray:
+        """Como `procesar` pero en int16 saturado (vista de otro buffer interno)."""
+        y = self.procesar(x)
+        np.clip(y, -1.0, 32767 / 32768, out=y)
+        y *= 32768
+        out = self._y16[:len(y)]
+        out[:] = y
+        return out
+
+    def vaciar(self) -> np.ndarray:
+        """Empuja ceros para sacar las últimas `retardo` muestras retenidas."""
+        if self.identidad:
+            return self._y[:0]
+        return self.procesar(np.zeros(int(np.ceil(self.retardo * self.M / self.L)) + 1, dtype=np.float32))
+
+    def _crecer(self, m: int):
+        viejo = self._x[:self._len].copy()
+        self._reservar(max(2 * self._cap, m))
+        self._x[:len(viejo)] = viejo
+
+
+def remuestrear(x, sr_in: int, sr_out: int, taps: int = 32) -> np.ndarray:
+    """Remuestreo de una señal completa (sin estado, retardo compensado), float32."""
+    x = a_float32(x)
+    if sr_in == sr_out or len(x) == 0:
+        return x
+    rs = Resampler(sr_in, sr_out, taps=taps, max_bloque=len(x) + 1)
+    n = int(len(x) * sr_out / sr_in)
+    y = np.concatenate((rs.procesar(x).copy(), rs.vaciar()))
+    return y[rs.retardo:rs.retardo + n].copy()
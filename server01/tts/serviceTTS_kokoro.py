@@ -2,10 +2,11 @@ import os
 import asyncio
 import threading
 import numpy as np
-import sounddevice as sd
 import paho.mqtt.client as mqtt
 from kokoro_onnx import Kokoro
 
+from audio_salida import SalidaAudio
+
 # MQTT Config
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
@@ -16,6 +17,11 @@ TOPIC_ESTADO = "habla/estado"
 # Cargar modelo Kokoro
 kokoro = Kokoro("tts/kokoro-v1.0.int8.onnx", "tts/voices-v1.0.bin")
 
+# Salida única y persistente: los chunks (float32 a 24 kHz) se encolan uno
+# detrás de otro, sin huecos ni esperas entre ellos
+salida = SalidaAudio()
+salida.abrir()
+
 # Estado de voz
 reproduciendo = False
 parar_evento = threading.Event()
@@ -38,8 +44,9 @@ async def hablar_async(texto, voice_name="af_sarah", emotion="neutral"):
         async for samples, sample_rate in stream:
             if parar_evento.is_set():
                 break
-            sd.play(samples, sample_rate)
-            sd.wait()
+            salida.escribir(samples, sample_rate)
+        salida.terminar()
+        salida.esperar_vacio()
     except Exception as e:
         print("❌ Error en reproducción:", e)
 
@@ -65,14 +72,14 @@ def on_message(client, userdata, msg):
         if reproduciendo:
             print("🔁 Deteniendo reproducción anterior...")
             parar_evento.set()
-            sd.stop()
+            salida.cortar()
         threading.Thread(target=hilo_hablar, args=(texto,), daemon=True).start()
 
     elif msg.topic == TOPIC_PARAR:
         if reproduciendo:
             print("⏹️ Parando voz...")
             parar_evento.set()
-            sd.stop()
+            salida.cortar()
             publicar_estado("parado")
 
 # Iniciar MQTT
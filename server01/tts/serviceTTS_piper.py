@@ -2,11 +2,12 @@ import time
 import os
 import threading
 import numpy as np
-import sounddevice as sd
 import paho.mqtt.client as mqtt
 from piper.voice import PiperVoice
 from queue import Queue, Empty
 
+from audio_salida import SalidaAudio
+
 # MQTT Config
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
@@ -19,6 +20,10 @@ print("🔊 Cargando modelo de voz...")
 voice = PiperVoice.load("tts/es_ES-sharvard-medium.onnx")
 sample_rate = voice.config.sample_rate
 
+# Salida única y persistente: no se reabre el dispositivo por frase
+salida = SalidaAudio()
+salida.abrir()
+
 # Estado de voz
 reproduciendo = False
 parar_evento = threading.Event()
@@ -40,13 +45,13 @@ def procesar_cola():
         publicar_estado("hablando")
 
         try:
-            with sd.OutputStream(samplerate=sample_rate, channels=1, dtype='int16') as stream:
-                for chunk in voice.synthesize_stream_raw(texto):
-                    if parar_evento.is_set():
-                        print("⏹️ Voz interrumpida.")
-                        break
-                    data = np.frombuffer(chunk, dtype=np.int16)
-                    stream.write(data)
+            for chunk in voice.synthesize_stream_raw(texto):
+                if parar_evento.is_set():
+                    print("⏹️ Voz interrumpida.")
+                    break
+                salida.escribir(chunk, sample_rate)
+            salida.terminar()
+            salida.esperar_vacio()
         except Exception as e:
             print(f"❌ Error durante reproducción: {e}")
 
@@ -81,6 +86,7 @@ def on_message(client, userdata, msg):
         if reproduciendo:
             print("🛑 Cancelando voz actual...")
             parar_evento.set()
+            salida.cortar()  # silencio en el próximo bloque de audio
         # También puedes vaciar la cola:
         with cola_texto.mutex:
             cola_texto.queue.clear()
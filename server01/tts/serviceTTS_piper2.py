@@ -2,11 +2,12 @@ import time
 import os
 import threading
 import numpy as np
-import sounddevice as sd
 import paho.mqtt.client as mqtt
 from piper.voice import PiperVoice
 from queue import Queue, Empty
 
+from audio_salida import SalidaAudio
+
 # MQTT Config
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
@@ -19,6 +20,10 @@ print("🔊 Cargando modelo de voz...")
 voice = PiperVoice.load("tts/es_ES-sharvard-medium.onnx")
 sample_rate = voice.config.sample_rate
 
+# Salida única y persistente: las frases suenan una detrás de otra sin reabrir el dispositivo
+salida = SalidaAudio()
+salida.abrir()
+
 # Estado y colas
 reproduciendo = False
 parar_evento = threading.Event()
@@ -63,20 +68,22 @@ def reproductor():
             continue
 
         reproducido = False
-        reproduciendo = True
-        publicar_estado("hablando")
+        if not reproduciendo:
+            reproduciendo = True
+            publicar_estado("hablando")
 
         try:
-            with sd.OutputStream(samplerate=sample_rate, channels=1, dtype='int16') as stream:
-                data = np.frombuffer(audio_buffer, dtype=np.int16)
-                stream.write(data)
-                reproducido = True
+            reproducido = salida.escribir(audio_buffer, sample_rate)
+            salida.terminar()
         except Exception as e:
             print(f"❌ Error durante reproducción: {e}")
 
-        reproduciendo = False
-        if reproducido:
-            publicar_estado("parado")
+        # "parado" recién cuando no queda nada por decir y terminó de sonar
+        if cola_audio.empty():
+            reproducido = salida.esperar_vacio() and reproducido
+            reproduciendo = False
+            if reproducido:
+                publicar_estado("parado")
         cola_audio.task_done()
 
 # MQTT Callbacks
@@ -102,6 +109,7 @@ def on_message(client, userdata, msg):
     elif msg.topic == TOPIC_PARAR:
         print("🛑 Recibido comando de stop.")
         parar_evento.set()
+        salida.cortar()  # silencio en el próximo bloque de audio
         with cola_texto.mutex:
             cola_texto.queue.clear()
         with cola_audio.mutex:
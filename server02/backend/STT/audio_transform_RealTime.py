@@ -1,25 +1,48 @@
 import asyncio
+import itertools
 import websockets
-import io
 import time
 from faster_whisper import WhisperModel
 import logging
-import tempfile, os
-import soundfile as sf
 import numpy as np
 import json
 
+from stt_audio import AudioRing
+from stt_frames import FrameDecoder, es_frame
+from stt_models import TierConfig, ModelTiers
+from stt_streaming import StreamingTranscriber, PartialGate, Calidad
+from stt_worker import InferenceScheduler, whisper_batch
+from stt_metrics import metricas, ResumenPeriodico, LIMITES_RTF
+
 INIT_MODEL_TRANSCRIPTION = "tiny"
 INIT_MODEL_DEVICE = "cpu"
 INIT_MODEL_COMPUTE_TYPE = "int8"
 INIT_LANGUAGE = "es"
 INIT_SERVER_PORT = 55000
+INIT_FINAL_MODEL = None            # None = mismo modelo para parciales y finales; opt-in: "base"
+INIT_PARTIAL_BEAM = 1              # los parciales solo alimentan backchannels
+INIT_FINAL_BEAM = 5
+FINAL_TIER_LAZY = False            # True: carga el modelo de finales en el primer final
+FINAL_FULL_PASS = False            # con modelo de finales distinto, redecodifica toda la locución
+                                   # (opt-in: la latencia del final vuelve a crecer con la locución)
+FINAL_MIN_FREE_MB = 512            # RAM que debe quedar libre tras cargar el modelo de finales
 
 INACTIVITY_TIMEOUT     = 0.5   # segundos de silencio para flush
 PARTIAL_EVAL_INTERVAL  = 0.3   # cada cuántos seg hacemos un parcial
 WINDOW_SEC             = 1.2   # cuántos seg de contexto en cada parcial
 SAMPLERATE             = 16000 # 16 kHz fija
 CHANNELS               = 1     # mono
+MAX_UTTERANCE_SEC      = 30    # capacidad del ring por locución
+STREAMING_MODE         = True  # confirma palabras estables; el final solo decodifica la cola
+STREAM_MAX_TAIL_SEC    = 8     # cola sin confirmar máxima antes de forzar confirmación
+BATCH_PARTIALS         = True  # agrupa parciales de varias sesiones en un lote; solo con
+                               # STREAMING_MODE=False (el lote no da los tiempos por palabra
+                               # que necesita la confirmación del streaming)
+MAX_BATCH              = 4     # máximo de sesiones por lote
+PARTIAL_GATE           = True  # solo envía parciales con palabras nuevas estables
+PARTIAL_MIN_NUEVAS     = 2     # palabras estables nuevas necesarias para enviar
+METRICS_RESUMEN_SEC    = 30    # cada cuánto se loguea el resumen de métricas (0 = nunca)
+LOG_CHUNK_CADA         = 0     # >0: loguea en DEBUG 1 de cada N chunks entrantes
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,174 +51,315 @@ logging.basicConfig(
 logger = logging.getLogger("AudioServer")
 
 
-class AudioTransform:
-    def __init__(
-        self,
-        model_transcription=INIT_MODEL_TRANSCRIPTION,
-        device=INIT_MODEL_DEVICE,
-        compute_type=INIT_MODEL_COMPUTE_TYPE,
-        language=INIT_LANGUAGE,
-        port=INIT_SERVER_PORT
-    ):
-        self.port = port
-        self.language = language
+class SttSession:
+    """
+    Estado STT de UNA conexión: ring, streaming, temporizadores y flags.
+    Cada cliente tiene la suya; el modelo y el hilo de inferencia los pone
+    AudioTransform y se comparten entre todas.
+    """
+    _ids = itertools.count(1)
 
-        # Estado de streaming
-        self.audio_buffer = io.BytesIO()
+    def __init__(self, server: "AudioTransform", send):
+        self.id = next(self._ids)
+        self.server = server
+        self.send = send  # corutina send(str) hacia el cliente
+
+        self.audio_buffer = AudioRing(SAMPLERATE * CHANNELS * MAX_UTTERANCE_SEC)
+        self.stream = StreamingTranscriber(
+            self.audio_buffer, server.language, SAMPLERATE, max_tail_sec=STREAM_MAX_TAIL_SEC
+        )
         self.last_packet_time = None
-        self.partial_running = False
         self.ending = False
+        self.gate = PartialGate(min_nuevas=PARTIAL_MIN_NUEVAS) if PARTIAL_GATE else None
+        self.decoder = FrameDecoder(SAMPLERATE)  # chunks con cabecera (seq/ts/codec)
+        self.m = server.metrics
 
         # Temporizador para parciales
         self.last_partial_time = time.time()
 
-        # Carga modelo
-        logger.info(f"Cargando modelo '{model_transcription}'")
-        self.model = WhisperModel(
-            model_transcription,
-            device=device,
-            compute_type=compute_type
-        )
-        logger.info("Modelo cargado y listo")
+        # Latencias (ms) para diagnóstico / pruebas de carga
+        self.stats = {"partial_ms": [], "final_ms": []}
 
     def reset_buffer(self):
         """Resetea buffer y estados."""
-        self.audio_buffer = io.BytesIO()
+        self.audio_buffer.reset()
+        self.stream.reset()
+        if self.gate is not None:
+            self.gate.reset()
         self.last_packet_time = None
-        self.partial_running = False
         self.ending = False
         self.last_partial_time = time.time()
-        logger.info("🔄 Buffer reiniciado y estados restablecidos")
+        logger.info(f"[s{self.id}] 🔄 Buffer reiniciado y estados restablecidos")
 
-    def _pcm_to_text(self, raw_data: bytes) -> str:
-        """Convierte PCM int16 mono a WAV temporal y transcribe."""
-        if not raw_data:
+    def _pcm_to_text(self, pcm: np.ndarray, model, beam_size: int, calidad: list | None = None) -> str:
+        """Convierte una vista int16 del ring a float32 en memoria y transcribe."""
+        if len(pcm) == 0:
             return ""
-        audio_np = np.frombuffer(raw_data, dtype=np.int16)
-        wav_path = None
         try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                wav_path = tmp.name
-                sf.write(wav_path, audio_np, SAMPLERATE, format="WAV")
-            segments, _ = self.model.transcribe(wav_path, language=self.language, vad_filter=False)
+            audio = self.audio_buffer.to_float32(pcm)
+            segments, _ = model.transcribe(
+                audio, language=self.server.language, vad_filter=False, beam_size=beam_size
+            )
+            segments = list(segments)
+            if calidad is not None:
+                calidad.extend((seg.no_speech_prob, seg.avg_logprob) for seg in segments)
             return " ".join(seg.text for seg in segments)
         except Exception as e:
-            logger.info(f"❌ Error en _pcm_to_text: {e}")
+            logger.info(f"[s{self.id}] ❌ Error en _pcm_to_text: {e}")
             return ""
-        finally:
-            if wav_path and os.path.exists(wav_path):
-                os.unlink(wav_path)
-
-    def transcribe_partial(self, audio_buffer: io.BytesIO) -> str:
-        """Transcribe solo los últimos WINDOW_SEC segundos."""
-        data = audio_buffer.getvalue()
-        window_bytes = int(SAMPLERATE * CHANNELS * 2 * WINDOW_SEC)
-        tail = data[-window_bytes:]
-        return self._pcm_to_text(tail)
 
-    def transcribe_final(self, audio_buffer: io.BytesIO) -> str:
-        """Transcribe TODO el buffer."""
-        return self._pcm_to_text(audio_buffer.getvalue())
+    def _window(self) -> np.ndarray:
+        return self.audio_buffer.tail(int(SAMPLERATE * CHANNELS * WINDOW_SEC))
+
+    def _window_f32(self) -> np.ndarray:
+        """Audio del parcial de ventana, para decodificarlo en lote con otras sesiones."""
+        return self.audio_buffer.to_float32(self._window())
+
+    def transcribe_partial(self) -> tuple[str, Calidad]:
+        """Transcribe solo los últimos WINDOW_SEC segundos (vista, sin copia)."""
+        tiers = self.server.tiers
+        model, beam = tiers.partial(), tiers.partial_cfg.beam_size
+        pares: list = []
+        t0 = time.perf_counter()
+        if STREAMING_MODE:
+            audio = self.audio_buffer.total - self.stream.agreement.commit_sample
+            text = self._decode_stream(self.stream.partial, model, beam_size=beam, calidad=pares)
+        else:
+            audio = min(len(self.audio_buffer), int(SAMPLERATE * CHANNELS * WINDOW_SEC))
+            text = self._pcm_to_text(self._window(), model, beam, pares)
+        self._observar("parcial", time.perf_counter() - t0, audio)
+        return text, Calidad.de(pares)
+
+    def transcribe_final(self, end: int | None = None) -> str:
+        """Transcribe TODO el buffer (vista, sin copia); en streaming solo la cola sin confirmar."""
+        tiers = self.server.tiers
+        model, beam = tiers.final(), tiers.final_cfg.beam_size
+        t0 = time.perf_counter()
+        if STREAMING_MODE:
+            completo = FINAL_FULL_PASS and tiers.separados and tiers.final_cargado()
+            text = self._decode_stream(self.stream.final, model, end, beam_size=beam, completo=completo)
+        else:
+            text = self._pcm_to_text(self.audio_buffer.since(0, end), model, beam)
+        self._observar("final", time.perf_counter() - t0, self.audio_buffer.total if end is None else end)
+        return text
+
+    def _observar(self, tipo: str, dt: float, muestras: int):
+        """Tiempo de decode (ms) y RTF respecto del audio de la locución."""
+        self.m.observe(f"{tipo}_ms", dt * 1000)
+        if muestras > 0:
+            self.m.observe(f"rtf_{tipo}", dt / (muestras / SAMPLERATE), LIMITES_RTF)
+
+    def _decode_stream(self, fn, model, *args, **kwargs) -> str:
+        try:
+            return fn(model, *args, **kwargs)
+        except Exception as e:
+            logger.info(f"[s{self.id}] ❌ Error en streaming: {e}")
+            return ""
 
-    async def flush_if_needed(self, websocket):
+    async def flush_if_needed(self):
         """
         Si pasó demasiado tiempo sin recibir audio, transcribe lo acumulado.
         Solo si:
           - NO estamos en END
-          - NO hay un parcial en curso
           - Llevamos al menos PARTIAL_EVAL_INTERVAL seg de audio acumulado
         """
-        if self.ending or self.partial_running:
+        if self.ending:
             return
 
         if self.last_packet_time and (time.time() - self.last_packet_time) > INACTIVITY_TIMEOUT:
             # Calcula duración actual del buffer
-            buf_bytes = self.audio_buffer.getbuffer().nbytes
-            duration = buf_bytes / (SAMPLERATE * CHANNELS * 2)
+            duration = len(self.audio_buffer) / (SAMPLERATE * CHANNELS)
 
             # Sólo flush si hay suficiente audio (> PARTIAL_EVAL_INTERVAL)
             if duration >= PARTIAL_EVAL_INTERVAL:
-                logger.info("⏳ Timeout de inactividad y suficiente audio, flush final")
-                await self.flush_buffer(websocket)
+                logger.info(f"[s{self.id}] ⏳ Timeout de inactividad y suficiente audio, flush final")
+                await self.flush_buffer()
             else:
-                logger.info(f"⚠️ Inactividad detectada pero solo {duration:.2f}s de audio (<{PARTIAL_EVAL_INTERVAL}s), no hago flush")
+                logger.info(f"[s{self.id}] ⚠️ Inactividad detectada pero solo {duration:.2f}s de audio (<{PARTIAL_EVAL_INTERVAL}s), no hago flush")
 
-
-    async def flush_buffer(self, websocket):
+    async def flush_buffer(self):
         """Envía transcripción FINAL y resetea todo."""
-        if self.audio_buffer.getbuffer().nbytes > 0:
-            text = self.transcribe_final(self.audio_buffer)
-            logger.info(f"✅ Transcripción FINAL: {text}")
+        self.ending = True
+        if len(self.audio_buffer) > 0:
+            end = self.audio_buffer.total
+            t0 = time.perf_counter()
+            text = await asyncio.wrap_future(
+                self.server.infer.submit_final(lambda: self.transcribe_final(end), key=self.id)
+            )
+            dt = (time.perf_counter() - t0) * 1000
+            self.stats["final_ms"].append(dt)
+            logger.info(f"[s{self.id}] ✅ Transcripción FINAL ({dt:.0f} ms, {end / SAMPLERATE:.1f}s de audio): {text}")
+            logger.info(
+                f"[s{self.id}] Ring: reservado={self.audio_buffer.nbytes / 1024:.0f}KB "
+                f"pico={self.audio_buffer.peak_bytes / 1024:.0f}KB "
+                f"descartado={self.audio_buffer.dropped_samples}"
+            )
+            if self.decoder.stats["chunks"]:
+                logger.info(f"[s{self.id}] Transporte: {self.decoder.stats}")
+            if self.gate is not None:
+                logger.info(f"[s{self.id}] Parciales: {self.gate.resumen()}")
+            self.m.inc("finales")
             payload = json.dumps({"type": "final", "text": text})
-            await websocket.send(payload)
+            await self.send(payload)
         self.reset_buffer()
 
-    async def _run_partial(self, websocket):
-        """Worker que genera un parcial de los últimos WINDOW_SEC segundos."""
+    async def _run_partial(self):
+        """Pide un parcial al scheduler; si llega otro antes de que empiece, este se descarta."""
+        self.m.inc("parciales_pedidos")
+        t0 = time.perf_counter()
         try:
-            text = self.transcribe_partial(self.audio_buffer)
-            if text.strip():
-                logger.info(f"📝 Parcial: {text}")
-                payload = json.dumps({"type": "partial", "text": text})
-                await websocket.send(payload)
-        finally:
-            self.partial_running = False
+            text, calidad = await asyncio.wrap_future(self.server.infer.submit_partial(
+                self.transcribe_partial,
+                key=self.id,
+                audio_fn=None if STREAMING_MODE else self._window_f32,
+            ))
+        except asyncio.CancelledError:
+            return
+        self.stats["partial_ms"].append((time.perf_counter() - t0) * 1000)
+        if self.gate is not None and text.strip():
+            text = self.gate.filtrar(text, calidad) or ""
+        if text.strip():
+            logger.info(f"[s{self.id}] 📝 Parcial: {text}")
+            self.m.inc("parciales_emitidos")
+            payload = json.dumps({"type": "partial", "text": text})
+            await self.send(payload)
+
+    async def on_message(self, message):
+        """Procesa un mensaje del cliente: __START__, __END__ o chunk PCM."""
+        # START
+        if isinstance(message, str) and message == "__START__":
+            logger.info(f"[s{self.id}] ⚡ START")
+            self.decoder.reset()
+            self.reset_buffer()
+            return
+
+        # END
+        if isinstance(message, str) and message == "__END__":
+            logger.info(f"[s{self.id}] 🏁 END")
+            # El scheduler corre el final antes que cualquier parcial
+            await self.flush_buffer()
+            return
+
+        self.m.inc("chunks")
+        self.m.inc("bytes", len(message))
+
+        # Audio chunk: con cabecera se decodifica directo al ring; sin ella es PCM crudo
+        if es_frame(message):
+            self.decoder.write_to(self.audio_buffer, message)
+        else:
+            self.audio_buffer.write(message)
+        self.last_packet_time = time.time()
+
+        # Logging por chunk solo si se pide (muestreado)
+        if LOG_CHUNK_CADA and self.m.contadores["chunks"] % LOG_CHUNK_CADA == 0:
+            duration = len(self.audio_buffer) / (SAMPLERATE * CHANNELS)
+            logger.debug(f"[s{self.id}] 📥 Chunk {len(message)} B → Buffer ~{duration:.2f}s")
+
+        # Parcial cada PARTIAL_EVAL_INTERVAL (sin bloquear la recepción)
+        if (
+            not self.ending and
+            time.time() - self.last_partial_time >= PARTIAL_EVAL_INTERVAL
+        ):
             self.last_partial_time = time.time()
+            asyncio.create_task(self._run_partial())
+
+    def close(self):
+        self.server.infer.drop_session(self.id)
+
+
+class AudioTransform:
+    def __init__(
+        self,
+        model_transcription=INIT_MODEL_TRANSCRIPTION,
+        device=INIT_MODEL_DEVICE,
+        compute_type=INIT_MODEL_COMPUTE_TYPE,
+        language=INIT_LANGUAGE,
+        port=INIT_SERVER_PORT,
+        final_model=INIT_FINAL_MODEL,
+    ):
+        self.port = port
+        self.language = language
+        self.sessions: dict[int, SttSession] = {}
+
+        # Métricas de todas las sesiones (consulta: metricas("stt-server").snapshot())
+        self.metrics = metricas("stt-server")
+        self.metrics.fuente(lambda: {
+            "sesiones": len(self.sessions),
+            "parciales_descartados": self.infer.dropped_partials,
+            "lotes": self.infer.batches,
+            "cola_inferencia": self.infer.pendientes(),
+        })
+        self._resumen = ResumenPeriodico(self.metrics, METRICS_RESUMEN_SEC, logger.info)
+
+        # Carga modelos (parciales baratos; finales con uno mejor si hay RAM)
+        partial_cfg = TierConfig(model_transcription, device, compute_type, beam_size=INIT_PARTIAL_BEAM)
+        final_cfg = TierConfig(
+            final_model or model_transcription, device, compute_type, beam_size=INIT_FINAL_BEAM
+        )
+        self.tiers = ModelTiers(
+            partial_cfg, final_cfg,
+            loader=lambda cfg: WhisperModel(cfg.model, device=cfg.device, compute_type=cfg.compute_type),
+            margen_mb=FINAL_MIN_FREE_MB, log=logger.info,
+        )
+        logger.info(f"Cargando modelo '{model_transcription}'")
+        self.model = self.tiers.load_partial()
+        if self.tiers.separados and not FINAL_TIER_LAZY:
+            logger.info(f"Cargando modelo de finales '{final_cfg.model}'")
+            self.tiers.final()
+        logger.info("Modelo cargado y listo")
+
+        # Un solo hilo de inferencia para todas las sesiones (round-robin,
+        # finales primero, parciales en lote cuando coinciden)
+        lotes = BATCH_PARTIALS and not STREAMING_MODE
+        if BATCH_PARTIALS and STREAMING_MODE:
+            logger.warning("BATCH_PARTIALS requiere STREAMING_MODE=False: parciales sin lotes")
+        self.infer = InferenceScheduler(
+            "stt-server",
+            batch_fn=self._batch_partials if lotes else None,
+            max_batch=MAX_BATCH,
+        )
+
+    def _batch_partials(self, audios: list[np.ndarray]) -> list[tuple[str, Calidad]]:
+        t0 = time.perf_counter()
+        res = [
+            (texto, Calidad(no_speech, logprob))
+            for texto, no_speech, logprob in whisper_batch(self.model, audios, self.language, detalles=True)
+        ]
+        self.metrics.observe("lote_ms", (time.perf_counter() - t0) * 1000)
+        return res
+
+    def new_session(self, send) -> SttSession:
+        session = SttSession(self, send)
+        self.sessions[session.id] = session
+        return session
+
+    def close_session(self, session: SttSession):
+        session.close()
+        self.sessions.pop(session.id, None)
 
     async def handle_audio(self, websocket):
-        logger.info("Cliente conectado")
-        self.reset_buffer()
+        session = self.new_session(websocket.send)
+        logger.info(f"[s{session.id}] Cliente conectado (sesiones={len(self.sessions)})")
+        session.reset_buffer()
 
-        while True:
-            try:
-                # Espera con timeout para inactividad
-                message = await asyncio.wait_for(websocket.recv(), timeout=0.1)
-
-                # START
-                if isinstance(message, str) and message == "__START__":
-                    logger.info("⚡ START")
-                    self.reset_buffer()
-                    continue
-
-                # END
-                if isinstance(message, str) and message == "__END__":
-                    logger.info("🏁 END")
-                    self.ending = True
-
-                    # Espera parcial en curso
-                    while self.partial_running:
-                        await asyncio.sleep(0.05)
-
-                    await self.flush_buffer(websocket)
-                    continue
-
-                # Audio chunk
-                self.audio_buffer.write(message)
-                self.last_packet_time = time.time()
-
-                # Logging del buffer
-                buf_bytes = self.audio_buffer.getbuffer().nbytes
-                duration = buf_bytes / (SAMPLERATE * CHANNELS * 2)
-                logger.info(f"📥 Chunk {len(message)} B → Buffer ~{duration:.2f}s")
-
-                # Parcial cada PARTIAL_EVAL_INTERVAL
-                if (
-                    not self.ending and
-                    not self.partial_running and
-                    time.time() - self.last_partial_time >= PARTIAL_EVAL_INTERVAL
-                ):
-                    self.partial_running = True
-                    asyncio.create_task(self._run_partial(websocket))
-
-            except asyncio.TimeoutError:
-                # Flush por inactividad
-                #await self.flush_if_needed(websocket)
-                pass
-            except websockets.ConnectionClosed:
-                logger.info("🔌 Conexión cerrada")
-                break
+        try:
+            while True:
+                try:
+                    # Espera con timeout para inactividad
+                    message = await asyncio.wait_for(websocket.recv(), timeout=0.1)
+                    await session.on_message(message)
+                except asyncio.TimeoutError:
+                    # Flush por inactividad
+                    #await session.flush_if_needed()
+                    pass
+                except websockets.ConnectionClosed:
+                    logger.info(f"[s{session.id}] 🔌 Conexión cerrada")
+                    break
+        finally:
+            self.close_session(session)
 
     async def start_server(self):
+        self._resumen.start()
         async with websockets.serve(self.handle_audio, "0.0.0.0", self.port, max_size=50*1024*1024):
             logger.info(f"🚀 Servidor WS en ws://0.0.0.0:{self.port}")
             await asyncio.Future()
@@ -0,0 +1,132 @@
+"""
+Prueba de carga del servidor STT: N clientes simultáneos en tiempo real.
+
+Uso (con audio_transform_RealTime.py corriendo):
+    python carga_sesiones.py [--clientes 4] [--wav audio.wav] [--uri ws://localhost:55000]
+                             [--codec pcm16|mulaw|opus|crudo]
+
+Cada cliente envía el mismo audio en chunks de 100 ms al ritmo real,
+manda __END__ y espera el final. Se reporta por sesión:
+  - parcial: tiempo entre el último chunk enviado y la llegada del parcial
+  - final:   tiempo entre __END__ y la llegada del final
+Sin --wav se usa ruido (sirve para medir latencias, no el texto).
+--codec crudo envía PCM sin cabecera (protocolo anterior).
+"""
+import argparse, asyncio, json, time, statistics
+
+import numpy as np
+import websockets
+
+from audio_resample import a_pcm16, remuestrear
+from stt_frames import FrameEncoder
+
+SERVER_URI = "ws://localhost:55000"
+SAMPLERATE = 16000
+CHUNK_SEC = 0.1
+
+
+def _cargar_audio(path: str | None, segundos: float) -> np.ndarray:
+    if path is None:
+        rng = np.random.default_rng(0)
+        return (rng.standard_normal(int(SAMPLERATE * segundos)) * 3000).astype(np.int16)
+    import soundfile as sf
+    data, sr = sf.read(path, dtype="float32")
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    return a_pcm16(remuestrear(data, sr, SAMPLERATE))
+
+
+async def _cliente(uri: str, pcm: np.ndarray, inicio_ms: float, codec: str) -> dict:
+    await asyncio.sleep(inicio_ms / 1000)
+    paso = int(SAMPLERATE * CHUNK_SEC)
+    parciales, final_ms, texto = [], None, ""
+    ultimo_envio = time.perf_counter()
+    t_end = None
+    recibido = asyncio.Event()
+    encoder = None if codec == "crudo" else FrameEncoder(codec, SAMPLERATE)
+    enviados = 0
+
+    async with websockets.connect(uri, max_size=50 * 1024 * 1024) as ws:
+        async def receptor():
+            nonlocal final_ms, texto
+            async for msg in ws:
+                ahora = time.perf_counter()
+                data = json.loads(msg)
+                if data.get("type") == "partial":
+                    parciales.append((ahora - ultimo_envio) * 1000)
+                elif data.get("type") == "final":
+                    final_ms = (ahora - t_end) * 1000 if t_end else None
+                    texto = data.get("text", "")
+                    recibido.set()
+                    return
+
+        rx = asyncio.create_task(receptor())
+        await ws.send("__START__")
+        t0 = time.perf_counter()
+        for i in range(0, len(pcm), paso):
+            objetivo = t0 + (i // paso) * CHUNK_SEC
+            espera = objetivo - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            chunk = pcm[i:i + paso]
+            msg = chunk.tobytes() if encoder is None else encoder.encode(chunk)
+            if msg is not None:
+                await ws.send(msg)
+                enviados += len(msg)
+            ultimo_envio = time.perf_counter()
+        t_end = time.perf_counter()
+        await ws.send("__END__")
+        try:
+            await asyncio.wait_for(recibido.wait(), timeout=60)
+        except asyncio.TimeoutError:
+            pass
+        rx.cancel()
+
+    return {"parciales": parciales, "final_ms": final_ms, "texto": texto, "bytes": enviados}
+
+
+def _p(ms: list[float], q: float) -> float:
+    if not ms:
+        return float("nan")
+    ms = sorted(ms)
+    return ms[int(q * (len(ms) - 1))]
+
+
+async def _main(args):
+    pcm = _cargar_audio(args.wav, args.segundos)
+    print(f"{args.clientes} clientes, {len(pcm) / SAMPLERATE:.1f}s de audio cada uno → {args.uri}\n")
+    t0 = time.perf_counter()
+    res = await asyncio.gather(*[
+        _cliente(args.uri, pcm, i * args.escalonado_ms, args.codec) for i in range(args.clientes)
+    ])
+    total = time.perf_counter() - t0
+
+    print(f"{'sesión':<7} {'parciales':>9} {'parc p50':>9} {'parc p95':>9} {'final':>9}  texto")
+    todos_p, todos_f = [], []
+    for i, r in enumerate(res, 1):
+        todos_p += r["parciales"]
+        if r["final_ms"] is not None:
+            todos_f.append(r["final_ms"])
+        final = f"{r['final_ms']:7.0f}ms" if r["final_ms"] is not None else "  timeout"
+        print(f"{i:<7} {len(r['parciales']):>9} {_p(r['parciales'], 0.5):7.0f}ms "
+              f"{_p(r['parciales'], 0.95):7.0f}ms {final:>9}  {r['texto'][:40]}")
+    print(f"\nglobal: parcial p50={_p(todos_p, 0.5):.0f}ms p95={_p(todos_p, 0.95):.0f}ms | "
+          f"final p50={_p(todos_f, 0.5):.0f}ms p95={_p(todos_f, 0.95):.0f}ms "
+          f"max={max(todos_f, default=float('nan')):.0f}ms | {total:.1f}s de pared")
+    kbps = res[0]["bytes"] / (len(pcm) / SAMPLERATE) / 1024
+    print(f"transporte: {args.codec}, {kbps:.1f} kB/s por cliente")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uri", default=SERVER_URI)
+    ap.add_argument("--clientes", type=int, default=4)
+    ap.add_argument("--wav", default=None)
+    ap.add_argument("--codec", default="mulaw", choices=["crudo", "pcm16", "mulaw", "opus"])
+    ap.add_argument("--segundos", type=float, default=6, help="duración del ruido si no hay --wav")
+    ap.add_argument("--escalonado-ms", type=float, default=50, help="desfase entre clientes")
+    asyncio.run(_main(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# stt_audio.py
+# Utilidades de audio para el STT (sin disco, sin dependencias del proyecto).
+import numpy as np
+
+INT16_SCALE = np.float32(1.0 / 32768.0)
+
+
+def pcm16_to_float32(pcm, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Convierte PCM int16 (bytes o ndarray) a float32 normalizado en [-1, 1).
+
+    Si se pasa `out` (float32 con al menos len(pcm) muestras) se escribe ahí
+    y se devuelve la vista `out[:n]`, sin reservar memoria nueva.
+    El resultado va directo a `WhisperModel.transcribe` (16 kHz mono).
+    """
+    if isinstance(pcm, (bytes, bytearray, memoryview)):
+        pcm = np.frombuffer(pcm, dtype=np.int16)
+    n = len(pcm)
+    if out is None:
+        out = np.empty(n, dtype=np.float32)
+    dst = out[:n]
+    np.multiply(pcm, INT16_SCALE, out=dst, casting="unsafe")
+    return dst
+
+
+class AudioRing:
+    """
+    Buffer circular int16 de capacidad fija para el audio de una locución.
+
+    Cada muestra se escribe dos veces (posición i e i + capacidad), así que
+    cualquier ventana de hasta `capacity` muestras es una vista contigua del
+    arreglo: ni los parciales ni el final copian el audio acumulado.
+    Si la locución supera la capacidad se conservan las últimas muestras.
+    """
+
+    def __init__(self, capacity_samples: int):
+        self.capacity = int(capacity_samples)
+        self._buf = np.zeros(2 * self.capacity, dtype=np.int16)
+        self._scratch = np.empty(self.capacity, dtype=np.float32)
+        self._written = 0      # total absoluto de muestras escritas
+        self._start = 0        # índice absoluto donde empieza la locución actual
+        self.peak_samples = 0  # máximo de muestras retenidas desde la creación
+        self.dropped_samples = 0
+
+    # ---------- escritura ----------
+    def write(self, pcm) -> None:
+        if isinstance(pcm, (bytes, bytearray, memoryview)):
+            pcm = np.frombuffer(pcm, dtype=np.int16)
+        n = len(pcm)
+        if n == 0:
+            return
+        if n > self.capacity:
+            pcm = pcm[-self.capacity:]
+        cap = self.capacity
+        m = len(pcm)
+        i = (self._written + n - m) % cap
+        first = min(m, cap - i)
+        self._buf[i:i + first] = pcm[:first]
+        self._buf[i + cap:i + cap + first] = pcm[:first]
+        rest = m - first
+        if rest:
+            self._buf[:rest] = pcm[first:]
+            self._buf[cap:cap + rest] = pcm[first:]
+        self._written += n
+
+        held = self._written - self._start
+        if held > cap:
+            self.dropped_samples += min(n, held - cap)
+        self.peak_samples = max(self.peak_samples, min(held, cap))
+
+    def reset(self, at: int | None = None) -> None:
+        """
+        Empieza una locución nueva (no libera ni limpia memoria).
+        Con `at` la nueva locución arranca en esa muestra de la actual, así
+        no se pierde el audio que llegó mientras se decodificaba el final.
+        """
+        if at is None:
+            self._start = self._written
+        else:
+            self._start = min(self._start + int(at), self._written)
+
+    # ---------- lectura (vistas, sin copia) ----------
+    def __len__(self) -> int:
+        return min(self._written - self._start, self.capacity)
+
+    def tail(self, n: int) -> np.ndarray:
+        """Vista de las últimas `n` muestras (o menos si no hay tantas)."""
+        n = min(int(n), len(self))
+        s = (self._written - n) % self.capacity
+        return self._buf[s:s + n]
+
+    def view(self) -> np.ndarray:
+        """Vista de toda la locución retenida."""
+        return self.tail(len(self))
+
+    @property
+    def total(self) -> int:
+        """Muestras escritas desde el inicio de la locución (incluye descartadas)."""
+        return self._written - self._start
+
+    def since(self, offset: int, end: int | None = None) -> np.ndarray:
+        """Vista de las muestras [offset, end) de la locución (end=None: hasta el final)."""
+        v = self.tail(max(0, self.total - int(offset)))
+        if end is not None and end < self.total:
+            v = v[:max(0, len(v) - (self.total - int(end)))]
+        return v
+
+    def to_float32(self, pcm: np.ndarray) -> np.ndarray:
+        """Convierte una vista del ring a float32 sobre el scratch interno."""
+        return pcm16_to_float32(pcm, out=self._scratch)
+
+    # ---------- memoria ----------
+    @property
+    def nbytes(self) -> int:
+        """Memoria reservada (fija) por el ring + scratch float32."""
+        return self._buf.nbytes + self._scratch.nbytes
+
+    @property
+    def peak_bytes(self) -> int:
+        """Marca máxima de audio int16 retenido, en bytes."""
+        return self.peak_samples * 2
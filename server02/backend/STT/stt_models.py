@@ -0,0 +1,123 @@
+# stt_models.py
+# Dos niveles de Whisper: modelo barato para parciales y uno más fuerte para finales.
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except Exception:
+    HAS_PSUTIL = False
+
+
+@dataclass
+class TierConfig:
+    """Modelo y parámetros de decode de un nivel (parcial o final)."""
+    model: str
+    device: str = "cpu"
+    compute_type: str = "int8"
+    beam_size: int = 5
+
+
+# Tamaño aproximado en RAM (MB) de cada modelo en float16; int8 ~ la mitad.
+_MB_FLOAT16 = {
+    "tiny": 75, "base": 145, "small": 485, "medium": 1530,
+    "large-v2": 3090, "large-v3": 3090, "large-v3-turbo": 1620, "turbo": 1620,
+    "distil-small.en": 340, "distil-medium.en": 790, "distil-large-v3": 1510,
+}
+
+
+def estimar_mb(cfg: TierConfig) -> int:
+    """Memoria que ocupará el modelo una vez cargado (estimación conservadora)."""
+    base = next((mb for k, mb in _MB_FLOAT16.items() if cfg.model.endswith(k)), 1500)
+    if cfg.compute_type.startswith("int8"):
+        return int(base * 0.55)
+    if cfg.compute_type == "float32":
+        return base * 2
+    return base
+
+
+def memoria_libre_mb() -> Optional[int]:
+    """RAM disponible (MemAvailable). None si no se puede medir."""
+    if HAS_PSUTIL:
+        return int(psutil.virtual_memory().available / (1024 * 1024))
+    try:
+        with open("/proc/meminfo") as f:
+            for linea in f:
+                if linea.startswith("MemAvailable:"):
+                    return int(linea.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+class ModelTiers:
+    """
+    Mantiene el modelo de parciales y, si hay RAM, uno distinto para finales.
+
+    `loader(cfg)` construye el modelo (p.ej. WhisperModel). El de parciales se
+    carga con `load_partial()`; el de finales se carga perezosamente la primera
+    vez que se pide con `final()` (desde el hilo de inferencia), y solo si la
+    RAM libre supera su tamaño estimado + `margen_mb`. Si no, los finales usan
+    el modelo de parciales con la config de decode del nivel final.
+    """
+
+    def __init__(self, partial: TierConfig, final: Optional[TierConfig], loader: Callable,
+                 margen_mb: int = 512, log: Callable[[str], None] = print):
+        self.partial_cfg = partial
+        self.final_cfg = final or partial
+        self._loader = loader
+        self.margen_mb = margen_mb
+        self._log = log
+        self._partial = None
+        self._final = None
+        self._final_intentado = False
+        self._lock = threading.Lock()
+
+    @property
+    def separados(self) -> bool:
+        """True si finales y parciales usan modelos distintos."""
+        c, p = self.final_cfg, self.partial_cfg
+        return (c.model, c.device, c.compute_type) != (p.model, p.device, p.compute_type)
+
+    @property
+    def listo(self) -> bool:
+        return self._partial is not None
+
+    def load_partial(self):
+        self._partial = self._loader(self.partial_cfg)
+        return self._partial
+
+    def partial(self):
+        return self._partial
+
+    def final(self):
+        """Modelo para finales; lo carga la primera vez si hay memoria."""
+        if not self.separados:
+            return self._partial
+        with self._lock:
+            if not self._final_intentado:
+                self._final_intentado = True
+                self._final = self._cargar_final()
+        return self._final if self._final is not None else self._partial
+
+    def final_cargado(self) -> bool:
+        return self._final is not None or not self.separados
+
+    def _cargar_final(self):
+        necesita = estimar_mb(self.final_cfg) + self.margen_mb
+        libre = memoria_libre_mb()
+        if libre is not None and libre < necesita:
+            self._log(
+                f"RAM libre {libre}MB < {necesita}MB: finales con '{self.partial_cfg.model}' "
+                f"en vez de '{self.final_cfg.model}'"
+            )
+            return None
+        try:
+            modelo = self._loader(self.final_cfg)
+            self._log(f"Modelo de finales '{self.final_cfg.model}' cargado")
+            return modelo
+        except Exception as e:
+            self._log(f"No se pudo cargar '{self.final_cfg.model}' para finales: {e}")
+            return None
@@ -0,0 +1,268 @@
+# stt_streaming.py
+# Transcripción incremental con prefijo confirmado (LocalAgreement-2).
+import re, time, unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class Palabra:
+    texto: str
+    inicio: float  # segundos desde el inicio de la locución
+    fin: float
+
+
+@dataclass
+class Calidad:
+    """Confianza de un decode: peor no_speech_prob y avg_logprob medio de sus segmentos."""
+    no_speech_prob: float = 0.0
+    avg_logprob: float = 0.0
+
+    @classmethod
+    def de(cls, pares: List[tuple]) -> "Calidad":
+        if not pares:
+            return cls()
+        return cls(max(p[0] for p in pares), sum(p[1] for p in pares) / len(pares))
+
+
+def _norm(texto: str) -> str:
+    """Minúsculas, sin tildes ni puntuación: 'Cómo,' == 'como'."""
+    texto = unicodedata.normalize("NFD", texto.lower())
+    return re.sub(r"[^\w]|[\u0300-\u036f]", "", texto)
+
+
+def whisper_palabras(model, audio, language: str, prompt: str = "", offset: float = 0.0,
+                     beam_size: int = 5, calidad: Optional[list] = None) -> List[Palabra]:
+    """
+    Transcribe `audio` (float32 16 kHz) y devuelve palabras con tiempos absolutos.
+    Si se pasa `calidad`, agrega (no_speech_prob, avg_logprob) de cada segmento.
+    """
+    segments, _ = model.transcribe(
+        audio,
+        language=language,
+        beam_size=beam_size,
+        vad_filter=False,
+        word_timestamps=True,
+        condition_on_previous_text=False,
+        initial_prompt=prompt or None,
+    )
+    palabras = []
+    for seg in segments:
+        if calidad is not None:
+            calidad.append((seg.no_speech_prob, seg.avg_logprob))
+        for w in seg.words or []:
+            t = w.word.strip()
+            if t:
+                palabras.append(Palabra(t, offset + w.start, offset + w.end))
+    return palabras
+
+
+class LocalAgreement:
+    """
+    Confirma las palabras en las que coinciden dos hipótesis consecutivas.
+
+    `commit_sample` marca hasta dónde el audio ya está confirmado; los
+    parciales y el final solo decodifican desde ahí. Si la cola sin confirmar
+    supera `max_tail_sec` se fuerza la confirmación salvo las últimas
+    `keep_words` palabras, para que el decode nunca crezca sin límite.
+    """
+
+    def __init__(self, sample_rate: int = 16000, max_tail_sec: float = 8.0, keep_words: int = 2):
+        self.sample_rate = sample_rate
+        self.max_tail_sec = max_tail_sec
+        self.keep_words = keep_words
+        self.committed: List[Palabra] = []
+        self.commit_sample = 0
+        self._prev: List[Palabra] = []
+
+    def reset(self):
+        self.committed.clear()
+        self._prev = []
+        self.commit_sample = 0
+
+    @property
+    def texto_confirmado(self) -> str:
+        return " ".join(w.texto for w in self.committed)
+
+    def prompt(self, max_chars: int = 200) -> str:
+        return self.texto_confirmado[-max_chars:]
+
+    def _sin_solape(self, hyp: List[Palabra]) -> List[Palabra]:
+        """Quita palabras ya confirmadas que Whisper repite en el borde."""
+        commit_sec = self.commit_sample / self.sample_rate
+        hyp = [w for w in hyp if w.fin > commit_sec + 0.05]
+        if not self.committed or not hyp:
+            return hyp
+        for n in range(min(3, len(self.committed), len(hyp)), 0, -1):
+            cola = [_norm(w.texto) for w in self.committed[-n:]]
+            cabeza = [_norm(w.texto) for w in hyp[:n]]
+            if cola == cabeza:
+                return hyp[n:]
+        return hyp
+
+    def _confirmar(self, palabras: List[Palabra]):
+        if palabras:
+            self.committed.extend(palabras)
+            self.commit_sample = max(self.commit_sample, int(palabras[-1].fin * self.sample_rate))
+
+    def update(self, hyp: List[Palabra], tail_samples: int) -> List[Palabra]:
+        """Integra una hipótesis nueva; devuelve las palabras recién confirmadas."""
+        hyp = self._sin_solape(hyp)
+        k = 0
+        while k < min(len(hyp), len(self._prev)) and _norm(hyp[k].texto) == _norm(self._prev[k].texto):
+            k += 1
+        nuevas = hyp[:k]
+        resto = hyp[k:]
+        if tail_samples > self.max_tail_sec * self.sample_rate and len(resto) > self.keep_words:
+            corte = len(resto) - self.keep_words
+            nuevas, resto = nuevas + resto[:corte], resto[corte:]
+        self._confirmar(nuevas)
+        self._prev = resto
+        return nuevas
+
+    def finish(self, hyp: List[Palabra]) -> str:
+        """Texto final: confirmado + decode de la cola pendiente."""
+        self._confirmar(self._sin_solape(hyp))
+        self._prev = []
+        return self.texto_confirmado
+
+
+class StreamingTranscriber:
+    """
+    Une AudioRing + LocalAgreement + Whisper para Microfono y AudioTransform.
+    El final solo decodifica la cola sin confirmar, así que su latencia no
+    depende de cuánto habló el usuario.
+    """
+
+    def __init__(self, ring: "AudioRing", language: str, sample_rate: int = 16000,
+                 min_tail_sec: float = 0.3, max_tail_sec: float = 8.0):
+        self.ring = ring
+        self.language = language
+        self.sample_rate = sample_rate
+        self.min_tail = int(min_tail_sec * sample_rate)
+        self.agreement = LocalAgreement(sample_rate=sample_rate, max_tail_sec=max_tail_sec)
+
+    def reset(self):
+        self.agreement.reset()
+
+    def _decode_cola(self, model, end: int | None = None, beam_size: int = 5,
+                     desde: int | None = None, calidad: Optional[list] = None) -> List[Palabra]:
+        a = self.agreement
+        cola = self.ring.since(a.commit_sample if desde is None else desde, end)
+        if len(cola) == 0:
+            return []
+        fin = self.ring.total if end is None else min(end, self.ring.total)
+        offset = (fin - len(cola)) / self.sample_rate
+        audio = self.ring.to_float32(cola)
+        prompt = a.prompt() if desde is None else ""
+        return whisper_palabras(model, audio, self.language, prompt, offset, beam_size, calidad)
+
+    def partial(self, model, beam_size: int = 5, calidad: Optional[list] = None) -> str:
+        """Decodifica la cola, confirma lo estable y devuelve la hipótesis de la cola."""
+        tail = self.ring.total - self.agreement.commit_sample
+        if tail < self.min_tail:
+            return ""
+        hyp = self._decode_cola(model, beam_size=beam_size, calidad=calidad)
+        self.agreement.update(hyp, tail)
+        return " ".join(w.texto for w in hyp)
+
+    def final(self, model, end: int | None = None, beam_size: int = 5, completo: bool = False) -> str:
+        """
+        `end`: muestra de la locución donde se cerró (lo posterior no se incluye).
+        `completo`: ignora lo confirmado y redecodifica toda la locución (para
+        cuando el final usa un modelo mejor que el de los parciales).
+        """
+        if completo:
+            self.agreement.reset()
+            hyp = self._decode_cola(model, end, beam_size, desde=0)
+        else:
+            hyp = self._decode_cola(model, end, beam_size)
+        return self.agreement.finish(hyp)
+
+
+# Frases que Whisper inventa sobre silencio/ruido en español (normalizadas).
+ALUCINACIONES = {
+    "subtitulos realizados por la comunidad de amaraorg",
+    "gracias por ver el video",
+    "gracias por ver",
+    "suscribete",
+    "suscribete al canal",
+}
+
+
+class PartialGate:
+    """
+    Filtro de parciales antes de publicarlos: cada stt.partial relanza el LLM
+    preliminar de Nucleo, así que solo pasan los que traen información nueva.
+
+      - descarta alucinaciones probables (no_speech_prob alto con avg_logprob
+        bajo, la regla de Whisper, o frases típicas de ALUCINACIONES)
+      - descarta el parcial si, normalizado, es igual al último emitido
+      - una palabra es estable si también estaba en la hipótesis anterior;
+        emite solo si hay >= `min_nuevas` palabras estables aún no emitidas
+        en esta locución
+
+    Sirve para parciales de ventana deslizante y de cola (streaming): compara
+    conjuntos de palabras, no posiciones.
+    """
+
+    def __init__(self, min_nuevas: int = 2, no_speech_max: float = 0.6, logprob_min: float = -1.0):
+        self.min_nuevas = min_nuevas
+        self.no_speech_max = no_speech_max
+        self.logprob_min = logprob_min
+        self.recibidos = 0
+        self.emitidos = 0
+        self.suprimidos: Dict[str, int] = {"igual": 0, "alucinacion": 0, "inestable": 0}
+        self._t0: Optional[float] = None
+        self.reset()
+
+    def reset(self):
+        """Nueva locución: olvida lo emitido (los contadores se conservan)."""
+        self._prev: set = set()
+        self._emitidas: set = set()
+        self._ultimo: List[str] = []
+
+    def filtrar(self, texto: str, calidad: Optional[Calidad] = None) -> Optional[str]:
+        """Devuelve el texto a publicar, o None si el parcial no aporta."""
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+        self.recibidos += 1
+        palabras = [p for p in (_norm(w) for w in texto.split()) if p]
+        if not palabras:
+            return self._suprimir("igual")
+
+        if " ".join(palabras) in ALUCINACIONES or (
+            calidad is not None
+            and calidad.no_speech_prob > self.no_speech_max
+            and calidad.avg_logprob < self.logprob_min
+        ):
+            return self._suprimir("alucinacion")
+
+        prev, self._prev = self._prev, set(palabras)
+        if palabras == self._ultimo:
+            return self._suprimir("igual")
+
+        nuevas = {p for p in palabras if p in prev and p not in self._emitidas}
+        if len(nuevas) < self.min_nuevas:
+            return self._suprimir("inestable")
+
+        self._emitidas |= nuevas
+        self._ultimo = palabras
+        self.emitidos += 1
+        return texto
+
+    def _suprimir(self, motivo: str) -> None:
+        self.suprimidos[motivo] += 1
+        return None
+
+    def resumen(self) -> Dict[str, float]:
+        """Parciales recibidos/emitidos y llamadas al LLM ahorradas por minuto de conversación."""
+        minutos = (time.monotonic() - self._t0) / 60 if self._t0 is not None else 0.0
+        ahorradas = self.recibidos - self.emitidos
+        return {
+            "recibidos": self.recibidos,
+            "emitidos": self.emitidos,
+            **{f"suprimidos_{k}": v for k, v in self.suprimidos.items()},
+            "minutos": round(minutos, 2),
+            "llm_ahorradas_por_min": round(ahorradas / minutos, 1) if minutos > 0 else 0.0,
+        }
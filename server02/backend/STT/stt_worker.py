@@ -0,0 +1,217 @@
+# stt_worker.py
+# Inferencia Whisper fuera del event loop del STT, compartida entre sesiones.
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class _Job:
+    __slots__ = ("fn", "future", "audio_fn")
+
+    def __init__(self, fn: Callable, audio_fn: Optional[Callable] = None):
+        self.fn = fn
+        self.future: Future = Future()
+        self.audio_fn = audio_fn
+
+
+class _Session:
+    __slots__ = ("partial", "finals")
+
+    def __init__(self):
+        self.partial: Optional[_Job] = None
+        self.finals: "deque[_Job]" = deque()
+
+
+class InferenceScheduler:
+    """
+    Hilo dedicado que ejecuta los decodes de todas las sesiones con un solo
+    modelo (CTranslate2 libera el GIL, el loop sigue libre).
+
+    - Parciales: un buzón de un lugar por sesión; uno nuevo cancela al que
+      aún no empezó ("gana la ventana más reciente").
+    - Finales: cola FIFO por sesión, con prioridad sobre cualquier parcial.
+    - Reparto round-robin entre sesiones.
+    - Si varias sesiones tienen un parcial listo con `audio_fn` y hay
+      `batch_fn`, se decodifican juntos en un solo lote.
+
+    `submit_*` devuelve un concurrent.futures.Future; desde asyncio se espera
+    con `await asyncio.wrap_future(fut)`, que publica el resultado en el loop.
+    """
+
+    def __init__(self, name: str = "stt-infer",
+                 batch_fn: Optional[Callable[[List[np.ndarray]], List[str]]] = None,
+                 max_batch: int = 4):
+        self._cv = threading.Condition()
+        self._sessions: Dict[Hashable, _Session] = {}
+        self._rr: "deque[Hashable]" = deque()
+        self._running = True
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.dropped_partials = 0
+        self.batches = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    # ---------- API ----------
+    def submit_partial(self, fn: Callable, key: Hashable = None,
+                       audio_fn: Optional[Callable[[], np.ndarray]] = None) -> Future:
+        """
+        `fn()` produce el texto. `audio_fn()` (opcional) devuelve el audio
+        float32 del parcial para poder agruparlo en lote con otras sesiones.
+        """
+        job = _Job(fn, audio_fn)
+        with self._cv:
+            s = self._session(key)
+            self._drop_partial(s)
+            s.partial = job
+            self._cv.notify()
+        return job.future
+
+    def submit_final(self, fn: Callable, key: Hashable = None) -> Future:
+        """Encola un final y descarta el parcial pendiente de esa sesión."""
+        job = _Job(fn)
+        with self._cv:
+            s = self._session(key)
+            self._drop_partial(s)
+            s.finals.append(job)
+            self._cv.notify()
+        return job.future
+
+    def cancel_partial(self, key: Hashable = None):
+        with self._cv:
+            if key in self._sessions:
+                self._drop_partial(self._sessions[key])
+
+    def drop_session(self, key: Hashable):
+        """Olvida una sesión (p.ej. cliente desconectado); cancela lo pendiente."""
+        with self._cv:
+            s = self._sessions.pop(key, None)
+            if s is None:
+                return
+            self._drop_partial(s)
+            for job in s.finals:
+                job.future.cancel()
+            try:
+                self._rr.remove(key)
+            except ValueError:
+                pass
+
+    def pendientes(self) -> int:
+        """Trabajos en cola (parciales + finales) de todas las sesiones."""
+        with self._cv:
+            return sum((s.partial is not None) + len(s.finals) for s in self._sessions.values())
+
+    def close(self):
+        with self._cv:
+            self._running = False
+            for s in self._sessions.values():
+                self._drop_partial(s)
+            self._cv.notify()
+
+    # ---------- interno ----------
+    def _session(self, key: Hashable) -> _Session:
+        s = self._sessions.get(key)
+        if s is None:
+            s = self._sessions[key] = _Session()
+            self._rr.append(key)
+        return s
+
+    def _drop_partial(self, s: _Session):
+        if s.partial is not None:
+            s.partial.future.cancel()
+            self.dropped_partials += 1
+            s.partial = None
+
+    def _pendiente(self) -> bool:
+        return any(s.partial is not None or s.finals for s in self._sessions.values())
+
+    def _next_jobs(self) -> Optional[List[_Job]]:
+        """Elige el próximo trabajo (o lote) respetando prioridad y round-robin."""
+        with self._cv:
+            while self._running and not self._pendiente():
+                self._cv.wait()
+            if not self._running:
+                return None
+
+            # 1) finales primero
+            for _ in range(len(self._rr)):
+                key = self._rr[0]
+                self._rr.rotate(-1)
+                s = self._sessions[key]
+                if s.finals:
+                    return [s.finals.popleft()]
+
+            # 2) parciales: primero en turno, o lote si hay varios agrupables
+            listos = [k for k in self._rr if self._sessions[k].partial is not None]
+            primero = self._sessions[listos[0]].partial
+            if self.batch_fn is not None and primero.audio_fn is not None:
+                lote_keys = [k for k in listos if self._sessions[k].partial.audio_fn is not None]
+                lote_keys = lote_keys[:self.max_batch]
+            else:
+                lote_keys = listos[:1]
+            jobs = []
+            for k in lote_keys:
+                s = self._sessions[k]
+                jobs.append(s.partial)
+                s.partial = None
+            # las sesiones atendidas pasan al final del turno
+            for k in lote_keys:
+                self._rr.remove(k)
+                self._rr.append(k)
+            return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._next_jobs()
+            if jobs is None:
+                return
+            jobs = [j for j in jobs if j.future.set_running_or_notify_cancel()]
+            if len(jobs) > 1:
+                try:
+                    textos = self.batch_fn([j.audio_fn() for j in jobs])
+                    self.batches += 1
+                    for j, t in zip(jobs, textos):
+                        j.future.set_result(t)
+                    continue
+                except Exception:
+                    pass  # si el lote falla, se decodifica uno por uno
+            for j in jobs:
+                try:
+                    j.future.set_result(j.fn())
+                except BaseException as e:
+                    j.future.set_exception(e)
+
+
+def whisper_batch(model, audios: List[np.ndarray], language: str, detalles: bool = False) -> list:
+    """
+    Decodifica varios audios cortos (<= 30 s) en un solo encode + generate
+    de CTranslate2, como hace BatchedInferencePipeline pero entre sesiones.
+    Sin timestamps ni VAD: pensado para parciales de ventana.
+    Con `detalles` devuelve (texto, no_speech_prob, logprob medio) por audio.
+    """
+    from faster_whisper.audio import pad_or_trim
+    from faster_whisper.tokenizer import Tokenizer
+
+    feats = np.stack([pad_or_trim(model.feature_extractor(a)) for a in audios])
+    encoder_output = model.encode(feats)
+    tokenizer = Tokenizer(
+        model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=language
+    )
+    prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+    results = model.model.generate(
+        encoder_output,
+        [prompt] * len(audios),
+        beam_size=1,
+        max_length=model.max_length,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+        return_scores=detalles,
+        return_no_speech_prob=detalles,
+    )
+    textos = [tokenizer.decode(r.sequences_ids[0]).strip() for r in results]
+    if not detalles:
+        return textos
+    return [(t, r.no_speech_prob, r.scores[0]) for t, r in zip(textos, results)]
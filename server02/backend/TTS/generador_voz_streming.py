@@ -2,13 +2,15 @@ import asyncio
 import json
 import threading
 import numpy as np
-import sounddevice as sd
 from kokoro_onnx import Kokoro
 from queue import Queue, Empty
 import re
 import websockets
 import time
 
+from audio_resample import a_pcm16, remuestrear
+from audio_salida import SalidaAudio
+
 # ======================
 # Configuración
 # ======================
@@ -36,6 +38,7 @@ voice1.create("Hola", voice="af_bella", speed=1.0, lang="es")
 voice2.create("Hola", voice="af_bella", speed=1.0, lang="es")
 
 sample_rate = 24000  # Frecuencia estándar de Kokoro
+salida = SalidaAudio()  # stream único y persistente; convierte a la tasa del dispositivo
 
 # ======================
 # Estado global y colas
@@ -175,7 +178,7 @@ def sintetizador(instancia_id):
             if parar_evento.is_set():
                 print(f"⛔ Hilo {instancia_id}: interrupción durante síntesis.")
             else:
-                audio_int16 = (samples * 32767).astype(np.int16).tobytes()
+                audio_int16 = a_pcm16(remuestrear(samples, sr, sample_rate)).tobytes()
                 cola_audio.put((orden, audio_int16, texto))
 
         except Exception as e:
@@ -191,49 +194,51 @@ def reproductor():
     en_lote = False
     buffer_ordenado = {}
 
-    with sd.OutputStream(samplerate=sample_rate, channels=1, dtype='int16') as stream:
-        while True:
-            try:
-                orden, audio_buffer, texto_actual = cola_audio.get(timeout=1)
-            except Empty:
-                threading.Event().wait(0.05)
-                continue
+    salida.abrir()
+
+    while True:
+        try:
+            orden, audio_buffer, texto_actual = cola_audio.get(timeout=1)
+        except Empty:
+            threading.Event().wait(0.05)
+            continue
 
-            buffer_ordenado[orden] = (audio_buffer, texto_actual)
+        buffer_ordenado[orden] = (audio_buffer, texto_actual)
 
-            # procesar en orden secuencial
-            while esperado in buffer_ordenado:
-                audio_buffer, texto_actual = buffer_ordenado.pop(esperado)
+        # procesar en orden secuencial
+        while esperado in buffer_ordenado:
+            audio_buffer, texto_actual = buffer_ordenado.pop(esperado)
 
-                # FIN_DE_LOTE → termina lote
-                if texto_actual == FIN_DE_LOTE:
-                    main_loop.call_soon_threadsafe(
-                        asyncio.create_task,
-                        broadcast_estado("parado", {})
-                    )
-                    print("✅ Lote finalizado correctamente")
-                    en_lote = False
-                    esperado = 1          # <-- vuelve a 1
-                    buffer_ordenado.clear()
-                    ultimo_fragmento = time.time()
+            # FIN_DE_LOTE → termina lote (cuando terminó de sonar)
+            if texto_actual == FIN_DE_LOTE:
+                salida.terminar()
+                salida.esperar_vacio()
+                main_loop.call_soon_threadsafe(
+                    asyncio.create_task,
+                    broadcast_estado("parado", {})
+                )
+                print("✅ Lote finalizado correctamente")
+                en_lote = False
+                esperado = 1          # <-- vuelve a 1
+                buffer_ordenado.clear()
+                ultimo_fragmento = time.time()
 
-                    break  # salir del while interno
+                break  # salir del while interno
 
-                # Primer bloque del lote → mandar "hablando"
-                if not en_lote:
-                    main_loop.call_soon_threadsafe(
-                        asyncio.create_task,
-                        broadcast_estado("hablando", {}),
-                    )
-                    en_lote = True
+            # Primer bloque del lote → mandar "hablando"
+            if not en_lote:
+                main_loop.call_soon_threadsafe(
+                    asyncio.create_task,
+                    broadcast_estado("hablando", {}),
+                )
+                en_lote = True
 
-                # reproducir audio
-                data = np.frombuffer(audio_buffer, dtype=np.int16)
-                stream.write(data)
+            # reproducir audio (sin huecos: se encola detrás de lo que está sonando)
+            salida.escribir(audio_buffer, sample_rate)
 
-                esperado += 1
+            esperado += 1
 
-            cola_audio.task_done()
+        cola_audio.task_done()
 
 # ======================
 # Handler WebSocket
@@ -275,6 +280,7 @@ async def handler(websocket):
             elif cmd == "stop":
                 print("🛑 Recibido comando STOP")
                 parar_evento.set()
+                salida.cortar()  # silencio en el próximo bloque de audio
                 with cola_texto.mutex:
                     cola_texto.queue.clear()
                 with cola_audio.mutex:
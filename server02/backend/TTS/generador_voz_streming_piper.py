@@ -2,13 +2,14 @@ import asyncio
 import json
 import threading
 import numpy as np
-import sounddevice as sd
 from queue import Queue, Empty
 import re
 import websockets
 import time
 from piper.voice import PiperVoice
 
+from audio_salida import SalidaAudio
+
 # === Configuración ===
 WS_HOST = "0.0.0.0"
 WS_PORT = 8765
@@ -25,6 +26,7 @@ EMOCIONES = {
 print("🔊 Cargando modelo Piper...")
 voice = PiperVoice.load(MODEL_PATH)
 sample_rate = voice.config.sample_rate
+salida = SalidaAudio()  # stream único y persistente; convierte a la tasa del dispositivo
 print("✅ Piper listo.")
 
 # === Variables globales ===
@@ -50,29 +52,31 @@ async def broadcast_estado(estado):
 
 # === Pipeline: síntesis + reproducción en vivo ===
 def pipeline_sintetizador_reproductor():
-    with sd.OutputStream(samplerate=sample_rate, channels=1, dtype='int16') as stream:
-        while True:
-            try:
-                texto, emocion, orden = cola_texto.get(timeout=1)
-            except Empty:
-                continue
-
-            if texto == FIN_DE_LOTE:
-                asyncio.run_coroutine_threadsafe(broadcast_estado("parado"), main_loop)
-                cola_texto.task_done()
-                continue
-
-            print(f"🎙️ [{orden}] Sintetizando + reproduciendo → {texto}")
-            asyncio.run_coroutine_threadsafe(broadcast_estado("hablando"), main_loop)
-
-            for chunk in voice.synthesize(texto):
-                if parar_evento.is_set():
-                    break
-                data = np.frombuffer(chunk.audio_int16_bytes, dtype=np.int16)
-                stream.write(data)
+    salida.abrir()
+
+    while True:
+        try:
+            texto, emocion, orden = cola_texto.get(timeout=1)
+        except Empty:
+            continue
 
+        if texto == FIN_DE_LOTE:
+            salida.esperar_vacio()  # "parado" cuando terminó de sonar
             asyncio.run_coroutine_threadsafe(broadcast_estado("parado"), main_loop)
             cola_texto.task_done()
+            continue
+
+        print(f"🎙️ [{orden}] Sintetizando + reproduciendo → {texto}")
+        asyncio.run_coroutine_threadsafe(broadcast_estado("hablando"), main_loop)
+
+        for chunk in voice.synthesize(texto):
+            if parar_evento.is_set():
+                break
+            salida.escribir(chunk.audio_int16_bytes, sample_rate)
+        salida.terminar()
+
+        asyncio.run_coroutine_threadsafe(broadcast_estado("parado"), main_loop)
+        cola_texto.task_done()
 
 # === WebSocket handler ===
 async def handler(websocket):
@@ -99,6 +103,7 @@ async def handler(websocket):
 
             elif cmd == "stop":
                 parar_evento.set()
+                salida.cortar()  # silencio en el próximo bloque de audio
                 with cola_texto.mutex:
                     cola_texto.queue.clear()
                 await websocket.send(json.dumps({"estado": "parado"}))
@@ -1,7 +1,7 @@
 import json, re, csv, threading
 from pathlib import Path
 from time import perf_counter
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional
 from queue import SimpleQueue, Empty
 
 from langchain_openai import ChatOpenAI
@@ -13,6 +13,9 @@ from event_bus import event_bus
 from logger import logger
 
 
+EXPRESION_PRIMERA = "normal"   # primera oración de un turno en streaming: sale sin pasar por el selector
+
+
 def split_text(texto: str):
     partes = re.split(r'(?<=[.!?,;:])\s+', texto)
     return [p.strip() for p in partes if p.strip()]
@@ -39,8 +42,12 @@ class Answer:
         self.buffer = ""
         self.scan_pos = 0
         self._resultados: List[Dict] = []
-        self._oraciones_queue: "SimpleQueue[Tuple[str, Tuple[str, float]]]" = SimpleQueue()
+        self._oraciones_queue: "SimpleQueue[Tuple[str, Tuple[str, float], Optional[int], Optional[int]]]" = SimpleQueue()
+        self._pendiente = None     # ítem de otro turno sacado al juntar fragmentos
+        self._turno_visto = 0      # último turno de Nucleo recibido
+        self._turno_cortado = 0    # answer.stop descarta los fragmentos hasta este turno
         self._running = False
+        self._generando = False
         self._cancel_stream = threading.Event()
         
         if not API_KEY_OPENAI:
@@ -84,8 +91,17 @@ class Answer:
         event_bus.emit("voice.speak", texto=texto, expresion=expresion, modo=modo)
 
     # ----------------- Entrada pública -----------------
-    def speak_calback(self,emocion: Tuple[str, float], texto: str):
-        self._oraciones_queue.put((texto,emocion))
+    def speak_calback(self, emocion: Tuple[str, float], texto: str,
+                      turno: Optional[int] = None, seq: Optional[int] = None):
+        """
+        Encola texto para Answer. Nucleo manda la final oración por oración con
+        `turno` y `seq` (0 = primera); lo que llega de un turno ya cortado se descarta.
+        """
+        if turno is not None:
+            if turno <= self._turno_cortado:
+                return
+            self._turno_visto = max(self._turno_visto, turno)
+        self._oraciones_queue.put((texto, emocion, turno, seq))
 
     def speak(self, emocion: Tuple[str, float], texto: str, use_split: bool = True) -> List[Dict]:
         """
@@ -144,6 +160,7 @@ class Answer:
             return None
         '''
 
+        self._generando = True
         try:
             for chunk in self.llm.stream([sys_prompt, hum_prompt]):
                 token = getattr(chunk, "content", "") or ""
@@ -152,6 +169,8 @@ class Answer:
             self._stop_worker()
             logger.info("Streaming cortado intencionalmente (StopStreaming).")
             return None
+        finally:
+            self._generando = False
             
         t1 = perf_counter()
         logger.info(f"Tiempo total request: {t1 - t0:.2f}s")
@@ -193,10 +212,22 @@ class Answer:
             
             while self._running:
 
-                try:
-                    texto,emocion = self._oraciones_queue.get(timeout=0.1)
-                except Empty:
+                item, self._pendiente = self._pendiente, None
+                if item is None:
+                    try:
+                        item = self._oraciones_queue.get(timeout=0.1)
+                    except Empty:
+                        continue
+
+                texto, emocion, turno, seq = item
+                if turno is not None and turno <= self._turno_cortado:
+                    continue
+                if seq == 0:
+                    # la primera oración no espera al selector: es la que fija el TTFA
+                    self._speak(texto=texto, expresion=EXPRESION_PRIMERA, modo="loop")
                     continue
+                if turno is not None:
+                    texto = self._juntar_turno(texto, turno)
 
                 self.speak(emocion,texto)
                     
@@ -205,24 +236,43 @@ class Answer:
         finally:
             logger.info("AnswerPlayer finalizado.")
 
+    def _juntar_turno(self, texto: str, turno: int) -> str:
+        """Suma las oraciones del mismo turno que ya esperan: un solo pedido al selector."""
+        while True:
+            try:
+                sig = self._oraciones_queue.get_nowait()
+            except Empty:
+                return texto
+            if sig[2] != turno:
+                self._pendiente = sig
+                return texto
+            texto += " " + sig[0]
+
     def close(self):
         self._running = False
 
     def _stop_now(self):
-        self._running = False
-        self._cancel_stream.set()
+        """
+        Corta el stream en curso y descarta lo encolado; el worker sigue vivo.
+        Sin stream activo no se marca la cancelación (cortaría la próxima respuesta).
+        """
+        self._turno_cortado = self._turno_visto
+        self._vaciar_cola()
+        if self._generando:
+            self._cancel_stream.set()
 
-    def _stop_worker(self):
-        logger.info("AnswerPlayer detenido")
+    def _vaciar_cola(self):
+        self._pendiente = None
         try:
             while True:
                 self._oraciones_queue.get_nowait()
         except Empty:
             pass
-        
-        self._cancel_stream.clear()
 
-        self._running = True
+    def _stop_worker(self):
+        logger.info("AnswerPlayer detenido")
+        self._vaciar_cola()
+        self._cancel_stream.clear()
 
 AP = Answer()
 
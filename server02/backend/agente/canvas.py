@@ -1,6 +1,7 @@
 # sprite_player.py
 import csv
 import sys
+import time
 import pygame
 import cv2            # === VISTA: OpenCV para homografía
 import numpy as np    # === VISTA: NumPy para arrays
@@ -12,6 +13,7 @@ from typing import List, Tuple, Optional, Dict, Callable
 from config import *
 from event_bus import event_bus
 from logger import logger
+from presupuesto_cpu import presupuesto
 
 
 # -----------------------------------------------------------
@@ -42,6 +44,11 @@ class SpritePlayer:
       - "sprite.default"
       - "sprite.get"
       - Opcionales: "sprite.pause", "sprite.resume", "sprite.toggle_loop"
+      - "governor.nivel", ajustes:dict (usa "render_fps" como tope del bucle)
+      - "sprite.labios", tramo:dict | None (voice.py: {"t", "fps", "boca", ...}
+        de un chunk de voz, con el time.monotonic() en que suena; None = corte).
+        Mientras suena, en las animaciones de `anims_labios` el frame sale de
+        la apertura de boca (frames ordenados de cerrada a abierta)
 
     Emite:
       - "sprite.state", dict(name, loop, playing, frame_idx)
@@ -72,6 +79,8 @@ class SpritePlayer:
         fullscreen: bool = True,
         vsync: bool = True,
         default_anim: Optional[str] = None,
+        render_fps: int = 120,
+        anims_labios: Tuple[str, ...] = ANIMS_LABIOS_DEFAULT,
     ):
         self.base_dir = base_dir or Path(__file__).resolve().parent
         self.assets_dir = assets_dir
@@ -84,6 +93,9 @@ class SpritePlayer:
         self.window_scale = window_scale
         self.fullscreen = fullscreen
         self.vsync = vsync
+        self.render_fps = render_fps  # tope del bucle; el gobernador de CPU lo baja
+        self.anims_labios = set(anims_labios)
+        self._labios: List[Tuple[float, float, float, List[int]]] = []  # (t0, t1, fps, boca) por chunk
 
         self.animations: List[Animation] = []
         self.anim_lookup: Dict[str, int] = {}
@@ -104,6 +116,8 @@ class SpritePlayer:
         event_bus.subscribe("sprite.pause", self._on_pause)
         event_bus.subscribe("sprite.resume", self._on_resume)
         event_bus.subscribe("sprite.toggle_loop", self._on_toggle_loop)
+        event_bus.subscribe("governor.nivel", self._on_governor)
+        event_bus.subscribe("sprite.labios", self._on_labios)
 
         # === VISTA: estado del editor/warp
         self.view_on: bool = False
@@ -133,10 +147,18 @@ class SpritePlayer:
     def _on_toggle_loop(self):
         self._cmd_queue.put(("toggle_loop", (), {}))
 
+    def _on_governor(self, ajustes: dict):
+        self._cmd_queue.put(("fps", (ajustes.get("render_fps", 120),), {}))
+
+    def _on_labios(self, tramo: Optional[dict]):
+        self._cmd_queue.put(("labios", (tramo,), {}))
+
     # ---------- API pública ----------
     def run(self):
         """Inicializa Pygame, carga recursos y entra al bucle principal (bloqueante)."""
         sheet_path, csv_path = self._resolve_assets()
+        presupuesto.fijar_hilo("render")  # último núcleo, con nice: no le quita CPU al STT/TTS
+        cv2.setNumThreads(presupuesto.hilos("render"))
         pygame.init()
 
         flags = pygame.DOUBLEBUF
@@ -192,7 +214,7 @@ class SpritePlayer:
 
         running = True
         while running:
-            dt = clock.tick(120) / 1000.0
+            dt = clock.tick(self.render_fps) / 1000.0
 
             # Eventos de ventana
             for e in pygame.event.get():
@@ -281,6 +303,12 @@ class SpritePlayer:
                         if self.frame_idx + 1 < anim.count:
                             self.frame_idx += 1
 
+            # Boca según la voz que está sonando (pisa el reloj de animación)
+            if anim.name in self.anims_labios and anim.count > 1:
+                apertura = self._apertura(time.monotonic())
+                if apertura is not None:
+                    self.frame_idx = int(round(apertura * (anim.count - 1)))
+
             # Render
             screen.fill(self.bg_color)
             frame = anim.frames[self.frame_idx] if anim.count > 0 else None
@@ -428,6 +456,16 @@ class SpritePlayer:
             animations.append(Animation(name, frames))
         return animations
 
+    def _apertura(self, ahora: float) -> Optional[float]:
+        """Apertura 0..1 del chunk de voz que suena ahora, o None si no suena ninguno."""
+        while self._labios and self._labios[0][1] <= ahora:
+            self._labios.pop(0)
+        if not self._labios or self._labios[0][0] > ahora:
+            return None
+        t0, _, fps, boca = self._labios[0]
+        i = min(len(boca) - 1, int((ahora - t0) * fps))
+        return boca[i] / 100.0
+
     def _first_with_frames(self, i: int) -> int:
         if not self.animations:
             return 0
@@ -492,3 +530,15 @@ class SpritePlayer:
             elif cmd == "toggle_loop":
                 self.loop_mode = not self.loop_mode
                 self._emit_state()
+
+            elif cmd == "labios":
+                tramo = args[0]
+                if tramo is None:
+                    self._labios.clear()
+                elif tramo["boca"]:
+                    t1 = tramo["t"] + len(tramo["boca"]) / tramo["fps"]
+                    self._labios.append((tramo["t"], t1, tramo["fps"], tramo["boca"]))
+
+            elif cmd == "fps":
+                self.render_fps = max(1, int(args[0]))
+                logger.info(f"SpritePlayer: render a {self.render_fps} FPS")
@@ -9,6 +9,9 @@ BG_COLOR_DEFAULT = (20, 20, 20)
 ASSETS_DIR_DEFAULT = "assets"
 SHEET_NAME_DEFAULT = "spritesheet.png"
 CSV_NAME_DEFAULT = "anims.csv"
+# Animaciones cuyos frames van de boca cerrada a abierta: mientras suena la
+# voz, el frame sale de la pista de labios en vez del reloj de animación
+ANIMS_LABIOS_DEFAULT = ("hablar",)
 
 API_KEY_OPENAI = os.getenv("OPENAI_API_KEY")
 
@@ -1,3 +1,6 @@
+from presupuesto_cpu import presupuesto  # primero: fija OMP_WAIT_POLICY antes de cargar modelos
+from logger import logger
+presupuesto.log = logger.info
 from canvas import SpritePlayer
 from event_bus import event_bus
 from voice import _voice_worker
@@ -5,6 +8,7 @@ import threading, time, asyncio
 from answer import _answer_worker
 from microfono import _microfono_worker
 from nucleo import Nucleo
+from governor import Governor
 
 """
 Correcciones principales:
@@ -18,10 +22,17 @@ Correcciones principales:
 """
 
 
+def _presupuesto_por_microfono(abierto: bool):
+    # micrófono cerrado: el TTS se queda con todos los núcleos
+    presupuesto.modo("mic_abierto" if abierto else "mic_cerrado")
+
+
 def _start_workers():
     threading.Thread(target=_answer_worker, daemon=True).start()
     threading.Thread(target=_voice_worker, daemon=True).start()
     threading.Thread(target=_microfono_worker, daemon=True).start()
+    # STT remoto: el gobernador solo ve la CPU local (preliminares y FPS)
+    threading.Thread(target=Governor(event_bus.emit, log=logger.info).run, daemon=True).start()
 
 
 def controller():
@@ -67,6 +78,8 @@ if __name__ == "__main__":
 
     nucleo = Nucleo()
 
+    event_bus.subscribe("microfono.estado", _presupuesto_por_microfono)
+
     # Lanzar workers de respuesta y voz
     _start_workers()
 
@@ -2,17 +2,26 @@
 from serviceController import ServiceController
 from config import *
 # ----
-import asyncio, json, threading
+import asyncio, json, threading, time
+from math import gcd
 import numpy as np
 import sounddevice as sd
 
 from event_bus import event_bus
 from logger import logger
+from stt_frames import FrameEncoder
+from stt_aec import EchoCanceller
+from stt_echo import EchoGate, referencia
+from audio_resample import Resampler
 
 SAMPLERATE = 16000
 CHANNELS = 1
 DTYPE = "int16"
 BLOCKSIZE = 1600  # 100 ms a 16 kHz -> 1600 frames -> 3200 bytes
+CAPTURE_SR = None  # None = tasa nativa del dispositivo, remuestreada a SAMPLERATE aquí
+STT_CODEC = "mulaw"  # "pcm16" | "mulaw" | "opus" (si opuslib está instalado)
+ECHO_GATE = True     # no envía al STT los bloques que son la voz de VoicePlater
+ECHO_AEC = True      # además cancela el eco bajo la voz del usuario (doble habla)
 
 class Microfono(ServiceController):
     def __init__(self):
@@ -20,9 +29,14 @@ class Microfono(ServiceController):
         self.status_microfono = False
 
         # ---- Infra de streaming ----
-        self._queue: asyncio.Queue[bytes] = asyncio.Queue()
+        self._queue: asyncio.Queue[tuple[bytes, float]] = asyncio.Queue()  # (pcm, t captura)
         self._pump_task: asyncio.Task | None = None
         self._sd_stream: sd.InputStream | None = None
+        self._rs: Resampler | None = None  # tasa nativa -> SAMPLERATE (None si coinciden)
+        self._encoder = FrameEncoder(STT_CODEC, SAMPLERATE)
+        self._eco = EchoGate(
+            referencia, aec=EchoCanceller(SAMPLERATE) if ECHO_AEC else None
+        ) if ECHO_GATE else None
 
         # ---- Event loop propio (hilo dedicado) ----
         self._loop = asyncio.new_event_loop()
@@ -75,6 +89,7 @@ class Microfono(ServiceController):
         else:
             print('Microfono apagado')
             self._submit(self.stop_stream())
+        event_bus.emit("microfono.estado", self.status_microfono)
 
     # ---- manejo del audio ----
     def _on_audio(self, indata, frames, time_info, status):
@@ -82,10 +97,13 @@ class Microfono(ServiceController):
         if status:
             logger.warning(f"[Microfono] status stream: {status}")
         # Garantiza int16 mono
-        pcm = (indata.astype(np.int16) if indata.dtype != np.int16 else indata).tobytes()
+        if self._rs is not None:
+            pcm = self._rs.procesar_pcm16(indata[:, 0]).tobytes()
+        else:
+            pcm = (indata.astype(np.int16) if indata.dtype != np.int16 else indata).tobytes()
         # IMPORTANTE: asyncio.Queue NO es thread-safe → usar call_soon_threadsafe
         try:
-            self._loop.call_soon_threadsafe(self._queue.put_nowait, pcm)
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (pcm, time.monotonic()))
         except Exception:
             # si el loop ya se cerró, ignoramos silenciosamente
             pass
@@ -95,25 +113,51 @@ class Microfono(ServiceController):
         try:
             while self.status_microfono:
                 try:
-                    chunk = await asyncio.wait_for(self._queue.get(), timeout=0.2)
+                    chunk, t_captura = await asyncio.wait_for(self._queue.get(), timeout=0.2)
                 except asyncio.TimeoutError:
                     continue
                 if not self.ws:
                     continue
-                await self.ws.send(chunk)  # binario directo
+                if self._eco is not None:
+                    # voz propia: no se envía (el servidor la ve como pausa); doble habla: residuo
+                    estado, chunk = self._eco.procesar(chunk, t_captura)
+                    if estado == "eco":
+                        continue
+                msg = self._encoder.encode(chunk)  # cabecera seq/ts/codec + payload
+                if msg is not None:
+                    await self.ws.send(msg)
         except asyncio.CancelledError:
             pass
         except Exception as ex:
             logger.exception(f"[Microfono] error en _audio_pump: {ex}")
 
+    def _tasa_captura(self) -> int:
+        """
+        CAPTURE_SR o la tasa nativa del dispositivo, si con ella cada bloque
+        remuestreado sale de BLOCKSIZE muestras exactas (el AEC trabaja en
+        múltiplos fijos): 48/44.1/32 kHz sí, 22.05 kHz no. Si no, SAMPLERATE
+        y remuestrea PortAudio.
+        """
+        try:
+            sr = int(CAPTURE_SR or sd.query_devices(kind="input")["default_samplerate"])
+        except Exception as e:
+            logger.warning(f"[Microfono] no se pudo consultar la tasa nativa: {e}")
+            return SAMPLERATE
+        if BLOCKSIZE % (SAMPLERATE // gcd(sr, SAMPLERATE)):
+            logger.info(f"[Microfono] {sr} Hz no da bloques exactos de {BLOCKSIZE}; capturo a {SAMPLERATE} Hz")
+            return SAMPLERATE
+        return sr
+
     def _start_recording(self):
         if self._sd_stream is not None:
             return
+        sr = self._tasa_captura()
+        self._rs = Resampler(sr, SAMPLERATE) if sr != SAMPLERATE else None
         self._sd_stream = sd.InputStream(
-            samplerate=SAMPLERATE,
+            samplerate=sr,
             channels=CHANNELS,
             dtype=DTYPE,
-            blocksize=BLOCKSIZE,
+            blocksize=BLOCKSIZE * sr // SAMPLERATE,
             callback=self._on_audio,
         )
         self._sd_stream.start()
@@ -128,6 +172,7 @@ class Microfono(ServiceController):
 
     # ---- integración con STT ----
     async def start_stream(self):
+        self._encoder.reset()
         await self.send("__START__")
         # self.reset_memoria()  # si aplica
         self._start_recording()
@@ -136,6 +181,8 @@ class Microfono(ServiceController):
 
     async def stop_stream(self):
         self._stop_recording()
+        if self._eco is not None:
+            logger.info(f"[Microfono] eco: {self._eco.estados} lag={self._eco.lag_ms}ms")
         if self._pump_task is not None:
             try:
                 await asyncio.wait_for(self._pump_task, timeout=0.5)
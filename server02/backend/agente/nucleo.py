@@ -1,7 +1,7 @@
 import json, re, csv, threading, random
 from pathlib import Path
 from time import perf_counter
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional
 from queue import SimpleQueue, Empty
 
 from langchain_openai import ChatOpenAI
@@ -12,6 +12,7 @@ import emociones
 from config import *
 from event_bus import event_bus
 from logger import logger
+from segmentador import Segmentador
 
 class StopStreaming(Exception):
     """Corte intencional del streaming (stop cooperativo)."""
@@ -45,52 +46,120 @@ class Nucleo:
         self.base = emociones.Baseline(P0=0.1, A0=-0.05, D0=0.0, gain_P=1.0, gain_A=0.9, gain_D=0.8)
 
         # === Estado de generación ===
-        self._cancel_stream = threading.Event()
+        # Cortes por época: stop_current_generation() la sube y el stream que
+        # arrancó con una anterior se corta en el próximo token. Así un corte
+        # que llega antes de que el hilo arranque el stream no se pierde.
+        self._epoca = 0
+        self._epoca_preliminar = 0  # ídem, solo para la preliminar (la corta un parcial nuevo)
+        self._epoca_lock = threading.Lock()
+        self._stream: Optional[Tuple[int, int, bool]] = None  # (época, época preliminar, preliminar)
         self._stream_lock = threading.Lock()  # evita streams simultáneos
 
         self.buffer = ""
         self.respuesta_parcial = ""
         self.respuesta_final = ""
 
+        # Respuesta final en streaming: cada oración sale a Answer al cerrarse
+        self._segmentador: Optional[Segmentador] = None
+        self.turno = 0          # sube con cada stt.final
+        self._seq = 0           # fragmentos emitidos en el turno
+        self._t_final = 0.0
+
         self.preliminar_historial: List[str] = []
+        self.preliminares = True  # el gobernador de CPU las apaga bajo carga
+        self.parciales_salteados = 0  # preliminares no generadas: llegó otro parcial antes
         self.historial: List[Dict[str, str]] = []  # {"tipo": "usuario"|"asistente", "texto": str}
 
+        # stt.* llegan en el loop del micrófono (emit es síncrono): ahí solo se
+        # corta y se encola; los streams del LLM corren en este hilo, así la
+        # ingesta, el filtro de eco y el barge-in nunca esperan al LLM
+        self._eventos: "SimpleQueue[tuple]" = SimpleQueue()
+        self._hilo = threading.Thread(target=self._run, name="nucleo", daemon=True)
+        self._hilo.start()
+
         # Suscripción a eventos STT
         event_bus.subscribe("stt.partial", self._handle_partial)
         event_bus.subscribe("stt.final", self._handle_final)
+        event_bus.subscribe("governor.nivel", self._handle_governor)
 
     # ===================== Event Handlers =====================
 
     def _handle_partial(self, texto: str):
         """
-        Recibe fragmentos mientras el usuario habla.
-        Genera una reacción breve preliminar (escucha activa).
+        Recibe fragmentos mientras el usuario habla (en el hilo que emite):
+        corta la preliminar en curso, no una final, y encola el fragmento.
         """
-        # Cancelar cualquier stream preliminar anterior para no superponer
+        with self._epoca_lock:
+            self._epoca_preliminar += 1
+        self._eventos.put(("parcial", texto, self._epocas()))
+
+    def _handle_final(self, texto: str):
+        """Fin de la frase del usuario (en el hilo que emite): corta lo que se genera y encola."""
         self.stop_current_generation()
+        self._eventos.put(("final", texto, self._epocas()))
+
+    def _run(self):
+        """Hilo del Nucleo: atiende stt.partial / stt.final en orden."""
+        while True:
+            tipo, texto, epocas = self._eventos.get()
+            try:
+                if tipo == "parcial":
+                    self._procesar_parcial(texto, epocas)
+                else:
+                    self._procesar_final(texto, epocas)
+            except Exception as ex:
+                logger.exception(f"[Nucleo] error procesando {tipo}: {ex}")
+
+    def _epocas(self) -> Tuple[int, int]:
+        with self._epoca_lock:
+            return self._epoca, self._epoca_preliminar
+
+    def _procesar_parcial(self, texto: str, epocas: Tuple[int, int]):
+        """
+        Genera una reacción breve preliminar (escucha activa). Si mientras
+        esperaba en la cola llegó otro parcial (o la final), esta ya quedó
+        vieja: solo se guarda el fragmento.
+        """
         self.preliminar_historial.append(texto)
-        self.generar_respuesta(texto, preliminar=True)
+        if not self.preliminares:
+            return
+        if epocas != self._epocas():
+            self.parciales_salteados += 1
+            return
+        self.generar_respuesta(texto, preliminar=True, epocas=epocas)
 
-    def _handle_final(self, texto: str):
+    def _handle_governor(self, ajustes: dict):
+        """Bajo carga se omiten las respuestas preliminares (solo se guarda el fragmento)."""
+        activas = ajustes.get("preliminares", True)
+        if activas != self.preliminares:
+            logger.info(f"Respuestas preliminares {'activadas' if activas else 'desactivadas'} por el gobernador")
+        self.preliminares = activas
+
+    def _procesar_final(self, texto: str, epocas: Tuple[int, int]):
         """
         Al finalizar la frase del usuario:
-          - Cancela generación en curso y emite la preliminar (si existe).
-          - Genera respuesta final coherente con el contexto.
-          - Publica la final para síntesis/reproducción.
+          - Emite la preliminar (si existe); la generación en curso ya se
+            cortó en _handle_final.
+          - Genera respuesta final coherente con el contexto; cada oración
+            sale a Answer apenas se cierra en el stream (turno, seq).
           - Actualiza histórico y limpia parciales.
         """
-        # 1) Corta el stream actual y emite la parcial acumulada (si hay)
-        self.stop_current_generation()
+        # 1) Emite la parcial acumulada (si hay)
         if self.respuesta_parcial.strip():
             event_bus.emit("answer.generate", ("feliz", 1), self.respuesta_parcial)
 
-        # 2) Genera respuesta final
-        self.generar_respuesta(texto, preliminar=False)
+        # 2) Genera respuesta final; las oraciones ya salen durante el stream
+        #    (si se corta, no debe quedar la del turno anterior)
+        self.respuesta_final = ""
+        self.turno += 1
+        self._seq = 0
+        self._t_final = perf_counter()
+        self.generar_respuesta(texto, preliminar=False, epocas=epocas)
 
-        # 3) Publica final
+        # 3) Registro de la final
         if self.respuesta_final.strip():
-            logger.info(f"Generacion de respuesta final: {self.respuesta_final}")
-            event_bus.emit("answer.generate", ("feliz", 1), self.respuesta_final)
+            logger.info(f"Generacion de respuesta final (turno {self.turno}, {self._seq} fragmentos): "
+                        f"{self.respuesta_final}")
 
         # 4) Actualiza historial (usuario + asistente)
         if texto.strip():
@@ -105,16 +174,17 @@ class Nucleo:
 
     # ===================== Core LLM =====================
 
-    def generar_respuesta(self, texto: str, preliminar: bool = False):
+    def generar_respuesta(self, texto: str, preliminar: bool = False,
+                          epocas: Optional[Tuple[int, int]] = None):
         """
         Lanza un stream de LLM. Si 'preliminar' es True, produce una respuesta
         corta de escucha activa. Si es False, produce la respuesta final.
+        `epocas`: las del pedido (al encolarlo); un corte posterior lo corta
+        aunque todavía no haya arrancado.
         """
-        # Garantiza exclusión mutua: un stream a la vez
-        if not self._stream_lock.acquire(blocking=False):
-            # Ya hay un stream corriendo: lo cancelamos y seguimos
-            self.stop_current_generation()
-            self._stream_lock.acquire()
+        # Garantiza exclusión mutua: un stream a la vez (los cortes van por época)
+        epocas = epocas or self._epocas()
+        self._stream_lock.acquire()
 
         try:
             # Prepara prompts
@@ -151,9 +221,10 @@ class Nucleo:
                     f"Contexto reciente de la conversación:\n{contexto_hist}\n"
                     "No repitas la preliminar; si es útil, retómala implícitamente y avanza."
                 )
-            # Resetea estado de cancelación y buffer
-            self._cancel_stream.clear()
+            # Resetea buffer; se corta si sube la época con la que se pidió
+            self._stream = (*epocas, preliminar)
             self.buffer = ""
+            self._segmentador = None if preliminar else Segmentador()
 
             # Inicia streaming con mensajes tipados
             messages = [
@@ -166,10 +237,12 @@ class Nucleo:
                 token = getattr(chunk, "content", "") or ""
                 self.on_llm_new_token(token)
 
-            # Cierre: transfiere buffer a parcial/final
+            # Cierre: transfiere buffer a parcial/final (y lo que quedó sin cerrar)
             if preliminar:
                 self.respuesta_parcial = self.buffer.strip()
             else:
+                for fragmento in self._segmentador.cerrar():
+                    self._emitir_fragmento(fragmento)
                 self.respuesta_final = self.buffer.strip()
 
         except StopStreaming:
@@ -178,22 +251,42 @@ class Nucleo:
         except Exception as ex:
             logger.exception(f"Error en generar_respuesta (preliminar={preliminar}): {ex}")
         finally:
+            self._stream = None
+            self._segmentador = None
             self._stream_lock.release()
 
     def on_llm_new_token(self, token: str, **kwargs):
         """
         Callback por token. Si se solicitó cancelación, aborta cooperativamente.
         """
-        if self._cancel_stream.is_set():
+        if self._cortado():
             # Señal a lazo superior de cortar
             raise StopStreaming
         self.buffer += token
+        if self._segmentador is not None:
+            for fragmento in self._segmentador.agregar(token):
+                self._emitir_fragmento(fragmento)
+
+    def _cortado(self) -> bool:
+        s = self._stream
+        return s is not None and (s[0] != self._epoca or (s[2] and s[1] != self._epoca_preliminar))
+
+    def _emitir_fragmento(self, fragmento: str):
+        """Publica una oración de la final con su turno y número de secuencia."""
+        if self._cortado():
+            raise StopStreaming  # un corte entre el último token y el cierre del segmentador
+        if self._seq == 0:
+            logger.info(f"[Nucleo] turno {self.turno}: primera oración a "
+                        f"{(perf_counter() - self._t_final) * 1000:.0f} ms del final")
+        event_bus.emit("answer.generate", ("feliz", 1), fragmento, turno=self.turno, seq=self._seq)
+        self._seq += 1
 
     # ===================== Control Público =====================
 
     def stop_current_generation(self):
         """
-        Señala que cualquier stream activo debe detenerse ASAP.
-        No bloquea; el corte es cooperativo.
+        Señala que cualquier stream activo (o ya pedido y aún sin arrancar)
+        debe detenerse ASAP. No bloquea; el corte es cooperativo.
         """
-        self._cancel_stream.set()
+        with self._epoca_lock:
+            self._epoca += 1
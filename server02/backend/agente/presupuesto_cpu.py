@@ -0,0 +1,176 @@
+# presupuesto_cpu.py
+# Reparto de núcleos entre los componentes pesados del proceso: STT
+# (CTranslate2), TTS (ONNX Runtime) y render. Hilos por componente,
+# afinidad y nice por hilo, y traspaso de núcleos según el modo.
+import os, threading
+from typing import Callable, Dict, List, Optional, Set
+
+# Los pools de OpenMP (CTranslate2) ociosos duermen en vez de girar esperando
+# trabajo; tiene que estar antes de importar ctranslate2 / faster_whisper.
+os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
+
+COMPONENTES = ("stt", "tts", "render")
+MODOS = ("mic_abierto", "mic_cerrado")
+HILOS_MAX = 4                                  # más hilos por modelo no rinden en CPU
+NICE: Dict[str, int] = {"stt": 0, "tts": 0, "render": 5}
+
+HAS_AFINIDAD = hasattr(os, "sched_setaffinity")
+
+
+def _hilos_proceso() -> Set[int]:
+    try:
+        return {int(t) for t in os.listdir("/proc/self/task")}
+    except OSError:
+        return set()
+
+
+def reparto(nucleos: List[int], modo: str) -> Dict[str, List[int]]:
+    """
+    Núcleos de cada componente en `modo`:
+      "mic_abierto": STT la primera mitad (al menos uno), TTS el resto;
+                     el render comparte el último con el TTS
+      "mic_cerrado": TTS todos; STT (ocioso) y render el último
+    Con un solo núcleo todos lo comparten.
+    """
+    n = len(nucleos)
+    if n == 1:
+        return {c: list(nucleos) for c in COMPONENTES}
+    if modo == "mic_abierto":
+        k = max(1, n // 2)
+        return {"stt": nucleos[:k], "tts": nucleos[k:], "render": nucleos[-1:]}
+    return {"stt": nucleos[-1:], "tts": list(nucleos), "render": nucleos[-1:]}
+
+
+class PresupuestoCpu:
+    """
+    Presupuesto de CPU del proceso, sobre los núcleos de su afinidad.
+
+    `hilos(c)` es lo que se le pide a la librería al construir el modelo
+    (`cpu_threads` de CTranslate2, `intra_op_num_threads` de ONNX Runtime):
+    los núcleos del modo en que más tiene, hasta HILOS_MAX. Eso no cambia
+    después; los núcleos se traspasan moviendo la afinidad de los hilos.
+
+    Para saber qué hilos son de quién:
+      - `registrar(c, crear)` corre `crear()` (carga y calentamiento del
+        modelo) con el hilo actual en los núcleos del componente, así los
+        pools de la librería nacen ahí, y los anota como los hilos nativos
+        que aparecieron en el proceso; el hilo actual vuelve a su afinidad.
+        Todo bajo el lock: dos registros no se pisan la afinidad ni se
+        reparten los hilos del otro, y un fijar_hilo() concurrente espera
+        a que termine la carga. Los threading.Thread que nazcan mientras
+        tanto (de otro componente) no se anotan: se fijan solos
+      - `fijar_hilo(c)` anota el hilo actual (bucle de render, worker que
+        llama al modelo) y le aplica afinidad y nice
+    Donde la librería deja fijar su pool al crearlo (ONNX Runtime:
+    `session.intra_op_thread_affinities`), opciones_onnx() lo hace;
+    CTranslate2 no expone un inicializador de hilos.
+    `modo(m)` reaplica la afinidad de todos los anotados; el nice se fija
+    una sola vez (bajarlo requiere privilegios). Sin sched_setaffinity
+    (fuera de Linux) solo reparte la cantidad de hilos.
+    """
+
+    def __init__(self, nucleos: Optional[List[int]] = None, modo: str = "mic_cerrado",
+                 log: Callable[[str], None] = print):
+        if nucleos is None:
+            nucleos = sorted(os.sched_getaffinity(0)) if HAS_AFINIDAD else list(range(os.cpu_count() or 1))
+        self.nucleos = list(nucleos)
+        self.log = log
+        self.modo_actual = modo
+        self._hilos: Dict[str, Set[int]] = {c: set() for c in COMPONENTES}
+        self._lock = threading.RLock()  # crear() puede llamar a fijar_hilo() en el mismo hilo
+
+    # ---------- tamaños ----------
+    def hilos(self, componente: str) -> int:
+        n = max(len(reparto(self.nucleos, m)[componente]) for m in MODOS)
+        return max(1, min(HILOS_MAX, n))
+
+    def nucleos_de(self, componente: str) -> List[int]:
+        return reparto(self.nucleos, self.modo_actual)[componente]
+
+    def opciones_onnx(self, componente: str, hilos: Optional[int] = None):
+        """
+        SessionOptions de ONNX Runtime con los hilos del componente (o `hilos`,
+        p. ej. repartidos entre varias llamadas concurrentes), sin spinning y
+        con los hilos del pool fijados a los núcleos del componente al nacer.
+        """
+        import onnxruntime as ort
+        n = hilos or self.hilos(componente)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = n
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        if HAS_AFINIDAD and n > 1:
+            # uno por hilo del pool (el que llama no cuenta), núcleos 1-based
+            nucleos = ",".join(str(c + 1) for c in self.nucleos_de(componente))
+            opts.add_session_config_entry("session.intra_op_thread_affinities", ";".join([nucleos] * (n - 1)))
+        return opts
+
+    # ---------- hilos ----------
+    def fijar_hilo(self, componente: str):
+        """Anota el hilo actual como del componente y le aplica afinidad y nice."""
+        tid = threading.get_native_id()
+        with self._lock:
+            self._hilos[componente].add(tid)
+            self._aplicar(componente, {tid}, nice=True)
+
+    def registrar(self, componente: str, crear: Callable):
+        """Corre `crear()` en los núcleos del componente y anota los hilos que creó."""
+        with self._lock:
+            previa = os.sched_getaffinity(0) if HAS_AFINIDAD else None
+            if previa is not None:
+                os.sched_setaffinity(0, set(self.nucleos_de(componente)))
+            antes = _hilos_proceso()
+            try:
+                res = crear()
+            finally:
+                if previa is not None:
+                    os.sched_setaffinity(0, previa)
+            nuevos = _hilos_proceso() - antes - {t.native_id for t in threading.enumerate()}
+            self._hilos[componente] |= nuevos
+            self._aplicar(componente, nuevos, nice=True)
+        self.log(f"[PresupuestoCpu] {componente}: {self.hilos(componente)} hilos pedidos, "
+                 f"{len(nuevos)} creados, núcleos {self.nucleos_de(componente)}")
+        return res
+
+    def modo(self, modo: str):
+        """Traspasa núcleos: reaplica la afinidad de todos los hilos anotados."""
+        if modo not in MODOS:
+            raise ValueError(f"modo desconocido: {modo}")
+        with self._lock:
+            if modo == self.modo_actual:
+                return
+            self.modo_actual = modo
+            for c in COMPONENTES:
+                self._aplicar(c, self._hilos[c], nice=False)
+        self.log(f"[PresupuestoCpu] modo {modo}: " +
+                 ", ".join(f"{c}={self.nucleos_de(c)}" for c in COMPONENTES))
+
+    def _aplicar(self, componente: str, tids: Set[int], nice: bool):
+        if not HAS_AFINIDAD:
+            return
+        nucleos = set(self.nucleos_de(componente))
+        for tid in list(tids):
+            try:
+                os.sched_setaffinity(tid, nucleos)
+                if nice and NICE[componente]:
+                    os.setpriority(os.PRIO_PROCESS, tid, NICE[componente])
+            except ProcessLookupError:
+                self._hilos[componente].discard(tid)  # el hilo ya terminó
+            except OSError as e:
+                self.log(f"[PresupuestoCpu] no se pudo fijar el hilo {tid} ({componente}): {e}")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "nucleos": list(self.nucleos),
+                "modo": self.modo_actual,
+                "componentes": {
+                    c: {"hilos": self.hilos(c), "nucleos": self.nucleos_de(c), "anotados": len(self._hilos[c])}
+                    for c in COMPONENTES
+                },
+            }
+
+
+# Presupuesto del proceso; main.py cambia el modo según el micrófono.
+presupuesto = PresupuestoCpu()
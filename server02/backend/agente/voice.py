@@ -1,92 +1,97 @@
 from queue import SimpleQueue, Empty
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Tuple, Optional
+import inspect
+import itertools
 import time
 import threading
 
-try:
-    import sounddevice as sd
-    HAS_SD = True
-except Exception:
-    HAS_SD = False
-
 from piper.voice import PiperVoice
 
 from config import *
 from event_bus import event_bus
 from logger import logger
+from audio_salida import SalidaAudio
+from stt_echo import referencia
+from presupuesto_cpu import presupuesto
+from tts_cache import TtsCache, id_modelo, parametros_piper
+from labios import Labios, alineaciones
 
 MODEL_PATH = "TTS/es_MX-claude-14947-epoch-high.onnx"
+LOOKAHEAD = 2  # oraciones que se sintetizan por delante de la que suena (0 = una a la vez)
+
+
+def _cargar_piper() -> PiperVoice:
+    """Piper con la sesión de ONNX Runtime del presupuesto de CPU, ya calentada."""
+    voz = PiperVoice.load(MODEL_PATH)
+    try:
+        import onnxruntime as ort
+        voz.session = ort.InferenceSession(
+            MODEL_PATH, sess_options=presupuesto.opciones_onnx("tts"), providers=["CPUExecutionProvider"]
+        )
+    except Exception as e:
+        logger.warning(f"Piper sigue con la sesión por defecto: {e}")
+    for _ in voz.synthesize("Hola."):
+        pass
+    return voz
 
 @dataclass
 class Oracione:
     texto: str
     expresion: str
     modo: str
+    gen: int = 0            # generación de voice.stop en que se encoló
+    clave: str = ""         # clave de caché
+    completa: bool = False  # Piper terminó sin corte
+    labios: Optional[Labios] = None  # pista de boca, un tramo por chunk (antes de encolarlo)
+    # chunks int16 a medida que salen de Piper; None = no hay más
+    chunks: "SimpleQueue[Optional[bytes]]" = field(default_factory=SimpleQueue)
 
 @dataclass
 class VoiceState:
     speak: bool
 
 class VoicePlater:
-    def __init__(self):
+    """
+    Pipeline de dos etapas:
+      - sintetizador (hilo propio): texto -> chunks de Piper (o de la caché),
+        hasta `lookahead` oraciones por delante de la que está sonando
+      - run (reproducción): saca las oraciones en orden y escribe sus chunks
+        en la salida a medida que llegan, así la oración N+1 ya está lista
+        cuando termina la N
+    voice.stop sube la generación: lo sintetizado por adelantado se descarta
+    y el sintetizador corta la oración en curso en el próximo chunk.
+    Cada chunk sale con su tramo de la pista de labios ('sprite.labios',
+    con el instante en que va a sonar) para que el SpritePlayer mueva la boca.
+    """
+
+    def __init__(self, lookahead: int = LOOKAHEAD):
         self._oraciones_queue: "SimpleQueue[Tuple[str, str, str]]" = SimpleQueue()
         event_bus.subscribe("voice.speak", self._speak)
         event_bus.subscribe("voice.stop", self._stop_now)
 
-        self.voice = PiperVoice.load(MODEL_PATH)
+        self.voice = presupuesto.registrar("tts", _cargar_piper)
         self.sr = self.voice.config.sample_rate
 
-        self.stream: Optional["sd.RawOutputStream"] = None
-        self._stream_lock = threading.Lock()      # protege start/abort/close
-        self._abort_current = False               # bandera de cancelación cooperativa
-        self._need_reopen = False                 # pedir reapertura tras abort/fallo
-        self._running = False
+        # Caché de audio: mismo texto, modelo y parámetros -> no se vuelve a correr Piper
+        self._cache = TtsCache(log=logger.info)
+        self._modelo_id = id_modelo(MODEL_PATH)
+        self._params = parametros_piper(self.voice)
+        # Alineaciones de fonemas para los tiempos de palabras (piper-tts >= 1.3 y si el modelo las exporta)
+        self._kw_piper = ({"include_alignments": True}
+                          if "include_alignments" in inspect.signature(self.voice.synthesize).parameters else {})
 
-        if HAS_SD:
-            self._ensure_stream_open()
-        else:
-            logger.info("sounddevice no disponible; se continuará sin audio.")
-
-    # ---------- utilidades de audio ----------
-    def _ensure_stream_open(self):
-        """Asegura que exista un stream arrancado y listo para escribir."""
-        if not HAS_SD:
-            return
-        with self._stream_lock:
-            if self.stream is not None:
-                # Si ya está activo, no hagas nada
-                try:
-                    # .active existe en sounddevice.Stream; si falla, intentar escribir lo detectará
-                    if getattr(self.stream, "active", False):
-                        return
-                except Exception:
-                    pass
-                # si no está activo, intentar start; si falla, recrear
-                try:
-                    self.stream.start()
-                    logger.info("Stream reanudado.")
-                    return
-                except Exception:
-                    try:
-                        self.stream.close()
-                    except Exception:
-                        pass
-                    self.stream = None
+        # Pipeline síntesis -> reproducción
+        self.lookahead = lookahead
+        self._audio_queue: "SimpleQueue[Oracione]" = SimpleQueue()
+        self._cupos = threading.Semaphore(lookahead + 1)  # en vuelo: la que suena + lookahead
+        self._gen = 0                             # generación: voice.stop la sube
 
-            # Crear uno nuevo
-            try:
-                self.stream = sd.RawOutputStream(
-                    samplerate=self.sr,
-                    channels=1,
-                    dtype="int16",
-                    blocksize=0,
-                )
-                self.stream.start()
-                logger.info("Salida de audio abierta.")
-            except Exception as e:
-                logger.warning(f"No se pudo abrir salida de audio: {e}. Continuando sin audio.")
-                self.stream = None
+        # Salida: un solo stream persistente con callback; voice.stop lo
+        # silencia en un bloque sin cerrarlo
+        self.salida = SalidaAudio(log=logger.info)
+        self.salida.abrir()
+        self._running = False
 
     # ---------- eventos ----------
     def _speak(self, texto: str = "", expresion: str = "", modo: str = ""):
@@ -99,116 +104,157 @@ class VoicePlater:
         except Empty:
             pass
 
+    def _vaciar_audio(self):
+        """Descarta las oraciones ya sintetizadas que no empezaron a sonar."""
+        try:
+            while True:
+                self._audio_queue.get_nowait()
+                self._cupos.release()
+        except Empty:
+            pass
+
     def _stop_now(self, clear_queue: bool = True):
         """Corta YA la reproducción sin cerrar el stream, y descarta la cola si se pide."""
         logger.info("⏹️ Corte inmediato de reproducción (manteniendo stream abierto).")
-        # Señal cooperativa para que synthesize() salga de su bucle
-        self._abort_current = True
-        self._need_reopen = True  # pediremos reapertura limpia antes del próximo write
+        # Señal cooperativa: el sintetizador y la reproducción ven la generación vieja y salen
+        self._gen += 1
+        self.salida.cortar()       # el callback descarta lo encolado en el próximo bloque
+        referencia.cortar()        # lo ya publicado como referencia de eco no va a sonar
+        event_bus.emit("sprite.labios", None)  # la boca deja de seguir lo que no va a sonar
 
         if clear_queue:
             self._clear_queue()
-
-        # Abort rápido del stream (descarta buffers). Lo protegemos con lock.
-        if self.stream is not None:
-            with self._stream_lock:
-                try:
-                    self.stream.abort()
-                except Exception as e:
-                    logger.info(f"No se pudo abortar el stream: {e}")
+        self._vaciar_audio()       # lo sintetizado por adelantado ya no va
 
     def close(self):
-        # no limpies _abort_current aquí; sólo cierra recursos
+        # sólo cierra recursos (y frena el sintetizador)
         try:
-            with self._stream_lock:
-                if self.stream is not None:
-                    try:
-                        self.stream.stop()
-                    except Exception:
-                        pass
-                    try:
-                        self.stream.close()
-                    except Exception:
-                        pass
-                    self.stream = None
+            self.salida.cerrar()
         finally:
             self._running = False
 
-    # ---------- síntesis ----------
-    def synthesize(self, texto: str):
+    # ---------- etapa 1: síntesis ----------
+    def _sintetizador(self):
+        presupuesto.fijar_hilo("tts")  # ONNX Runtime usa también el hilo que llama
+        while self._running:
+            try:
+                texto, expresion, modo = self._oraciones_queue.get(timeout=0.1)
+            except Empty:
+                continue
+            o = Oracione(texto, expresion, modo, gen=self._gen,
+                         clave=self._cache.clave(texto, self._modelo_id, self._params))
+            if not self._esperar_cupo(o):
+                continue
+            self._audio_queue.put(o)  # la reproducción ya puede ir tomando sus chunks
+            self.synthesize(o)
+
+    def _esperar_cupo(self, o: Oracione) -> bool:
+        """Espera a estar a menos de `lookahead` oraciones de la que suena."""
+        while not self._cupos.acquire(timeout=0.1):
+            if not self._running or o.gen != self._gen:
+                return False
+        if o.gen != self._gen:
+            self._cupos.release()
+            return False
+        return True
+
+    def synthesize(self, o: Oracione):
         """
-        Sintetiza 'texto' con Piper. Respeta cancelación cooperativa.
+        Sintetiza `o.texto` con Piper y deja los chunks en `o.chunks` (None al final),
+        cada uno con su tramo de la pista de labios ya calculado.
+        Si está en la caché no corre Piper: el audio sale entero de una vez.
+        Respeta cancelación cooperativa; lo cortado no va a la caché.
         """
-        # Asegura que el stream esté listo (o deshabilitado si no hay audio)
-        if self._need_reopen:
-            self._ensure_stream_open()
-            self._need_reopen = False
-
+        o.labios = Labios(self.sr, o.texto)
         try:
-            for chunk in self.voice.synthesize(texto):
-                # ¿Nos pidieron abortar?
-                if self._abort_current:
-                    # limpiar la bandera y salir
-                    self._abort_current = False
-                    break
-
-                if self.stream is not None:
-                    try:
-                        with self._stream_lock:
-                            # Es posible que alguien haya abortado justo antes
-                            if self._need_reopen:
-                                # reapertura perezosa
-                                self._ensure_stream_open()
-                                self._need_reopen = False
-                            if self.stream is not None:
-                                self.stream.write(chunk.audio_int16_bytes)
-                    except Exception as e:
-                        # Cualquier error al escribir: marca para reabrir en la próxima utterance
-                        logger.warning(f"Fallo al escribir en stream: {e}. Reabriremos el stream.")
-                        try:
-                            if self.stream is not None:
-                                self.stream.close()
-                        except Exception:
-                            pass
-                        self.stream = None
-                        self._need_reopen = True
-                        # No interrumpimos Piper; simplemente dejamos de intentar escribir
-                        # para esta utterance.
-                else:
-                    # Sin audio: sólo consumimos los chunks
-                    pass
+            hit = self._cache.get(o.clave)
+            if hit is not None:
+                logger.info(f"TTS desde caché: {o.texto[:40]!r}")
+                o.labios.agregar(hit[0])
+                o.chunks.put(hit[0])
+                o.completa = True
+                return
 
+            pcm = []
+            t_sintesis = 0.0
+            t0 = time.perf_counter()
+            for chunk in self.voice.synthesize(o.texto, **self._kw_piper):
+                t_sintesis += time.perf_counter() - t0
+                # ¿Nos pidieron abortar?
+                if o.gen != self._gen:
+                    return
+                pcm.append(chunk.audio_int16_bytes)
+                o.labios.agregar(chunk.audio_int16_bytes, alineaciones(chunk))
+                o.chunks.put(chunk.audio_int16_bytes)
+                t0 = time.perf_counter()
+            o.completa = True
+            self._cache.put(o.clave, b"".join(pcm), self.sr, t_sintesis)
         except Exception as e:
             logger.info(f"Error en síntesis TTS: {e}")
+        finally:
+            o.chunks.put(None)
+
+    # ---------- etapa 2: reproducción ----------
+    def _consumir(self, o: Oracione):
+        """Escribe los chunks de `o` en la salida a medida que llegan, hasta el final o un corte."""
+        try:
+            for seq in itertools.count():
+                pcm = o.chunks.get()
+                if pcm is None or o.gen != self._gen:
+                    return
+                self._salida(pcm, o.labios.tramos[seq])
+        finally:
+            self.salida.terminar()  # vaciarse acá no es un underrun
+
+    def _salida(self, pcm: bytes, tramo: dict):
+        """Escribe un bloque de audio (int16) en la salida, si hay, con su tramo de labios."""
+        if self.salida.stream is not None:
+            # referencia de eco y boca: suena cuando se vacíe lo que ya está en el anillo y en el dispositivo
+            t = time.monotonic() + self.salida.retardo()
+            referencia.publicar(pcm, self.sr, t)
+            event_bus.emit("sprite.labios", {"t": t, **tramo})
+            self.salida.escribir(pcm, self.sr)
+        # Sin audio: sólo consumimos los chunks
 
     # ---------- bucle principal ----------
     def run(self):
-        logger.info("VoicePlater iniciado.")
+        logger.info(f"VoicePlater iniciado (lookahead {self.lookahead}).")
         self._running = True
+        threading.Thread(target=self._sintetizador, daemon=True).start()
 
         try:
             while self._running:
                 try:
-                    texto, expresion, modo = self._oraciones_queue.get(timeout=0.1)
+                    o = self._audio_queue.get(timeout=0.1)
                 except Empty:
                     continue
 
-                # Reset de cancelación para esta utterance
-                self._abort_current = False
-
-                # Dispara animación primero
                 try:
-                    event_bus.emit("sprite.play", expresion, modo)
-                except Exception as e:
-                    logger.warning(f"No se pudo emitir 'sprite.play': {e}")
+                    # Oración de antes de un voice.stop: se descarta
+                    if o.gen != self._gen:
+                        continue
+
+                    # Dispara animación primero
+                    try:
+                        event_bus.emit("sprite.play", o.expresion, o.modo)
+                    except Exception as e:
+                        logger.warning(f"No se pudo emitir 'sprite.play': {e}")
+
+                    # Reproduce a medida que el sintetizador entrega (respeta cancelación)
+                    self._consumir(o)
+                finally:
+                    self._cupos.release()
 
-                # Sintetiza (respeta cancelación)
-                self.synthesize(texto)
+                if self._cache.stats()["consultas"] % 50 == 0:
+                    logger.info(self._cache.resumen())
+                    logger.info(self.salida.resumen())
 
         except KeyboardInterrupt:
             logger.info("Interrumpido por teclado.")
         finally:
             self.close()
+            logger.info(self._cache.resumen())
+            logger.info(self.salida.resumen())
             logger.info("VoicePlater finalizado.")
 
 vp = VoicePlater()
@@ -11,6 +11,7 @@ from langchain_openai import ChatOpenAI
 from langchain_community.chat_models import ChatOllama
 
 from services.serviceController import ServiceController
+from services.stt_frames import FrameEncoder
 from utils.const import SERVICE_NAME_STT, SERVICE_URI_STT
 
 # Soporta ambos layouts de event_bus
@@ -29,9 +30,12 @@ class ServiceSTT(ServiceController):
     - En FINAL, además de STT_FINAL, emite ai.heard(text=...).
     """
 
-    def __init__(self, max_parciales: int = 10):
+    def __init__(self, max_parciales: int = 10, codec: str = "mulaw"):
         super().__init__(SERVICE_URI_STT, SERVICE_NAME_STT)
 
+        # Audio con cabecera seq/ts/codec (μ-law: mitad de ancho de banda que PCM)
+        self.encoder = FrameEncoder(codec)
+
         # Memoria de parciales para consolidación
         self.queue: deque[str] = deque(maxlen=max_parciales)
         self.last_partial: str | None = None
@@ -157,6 +161,7 @@ class ServiceSTT(ServiceController):
     async def start_stream(self):
         """Inicia una sesión de audio dentro de la conexión viva."""
         await self.start()
+        self.encoder.reset()
         await self._send_q.put("__START__")
         self.reset_memoria()
 
@@ -164,7 +169,9 @@ class ServiceSTT(ServiceController):
         """Encola un chunk PCM int16 mono 16kHz."""
         if not audio_bytes:
             return
-        await self._send_q.put(audio_bytes)
+        msg = self.encoder.encode(audio_bytes)
+        if msg is not None:
+            await self._send_q.put(msg)
 
     async def stop_stream(self):
         """Finaliza la sesión de audio (la conexión sigue viva)."""
@@ -0,0 +1,215 @@
+# stt_frames.py
+# Framing binario versionado para el audio del protocolo STT por WebSocket.
+#
+# Cada mensaje binario de audio lleva una cabecera de 16 bytes (little-endian):
+#   magic   2s  b"AF"
+#   version u8  PROTO_VERSION
+#   codec   u8  CODEC_PCM16 | CODEC_MULAW | CODEC_OPUS
+#   seq     u32 número de chunk dentro de la sesión (desde 0)
+#   ts      u32 posición de la primera muestra, en muestras (reloj tipo RTP)
+#   n       u16 muestras que contiene el payload
+#   (2 bytes reservados)
+# Los mensajes de texto (__START__/__END__) no cambian; un binario sin la
+# cabecera se sigue aceptando como PCM int16 crudo (clientes viejos).
+import struct
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    import opuslib
+    HAS_OPUS = True
+except Exception:
+    HAS_OPUS = False
+
+PROTO_VERSION = 1
+MAGIC = b"AF"
+HEADER = struct.Struct("<2sBBIIHxx")
+
+CODEC_PCM16 = 0   # 32 kB/s a 16 kHz
+CODEC_MULAW = 1   # G.711 μ-law, 8 bits: 16 kB/s
+CODEC_OPUS = 2    # ~2 kB/s a 16 kbit/s (si opuslib está instalado)
+
+CODECS = {"pcm16": CODEC_PCM16, "mulaw": CODEC_MULAW, "opus": CODEC_OPUS}
+
+OPUS_FRAME_MS = 20
+OPUS_BITRATE = 16000
+
+
+# ---------- μ-law (tablas: codificar y decodificar es un solo take) ----------
+def _mulaw_tablas():
+    bias, clip = 0x84, 32635
+    x = np.arange(-32768, 32768, dtype=np.int32)
+    signo = (x < 0).astype(np.int32)
+    mag = np.minimum(np.abs(x), clip) + bias
+    exp = np.clip(np.floor(np.log2(mag)).astype(np.int32) - 7, 0, 7)
+    mant = (mag >> (exp + 3)) & 0x0F
+    enc = (~((signo << 7) | (exp << 4) | mant) & 0xFF).astype(np.uint8)
+    # indexada por el int16 visto como uint16
+    enc = np.concatenate([enc[32768:], enc[:32768]])
+
+    b = ~np.arange(256, dtype=np.int32) & 0xFF
+    e, m = (b >> 4) & 0x07, b & 0x0F
+    dec = (((m << 3) + bias) << e) - bias
+    dec = np.where(b & 0x80, -dec, dec).astype(np.int16)
+    return enc, dec
+
+
+_MULAW_ENC, _MULAW_DEC = _mulaw_tablas()
+
+
+def mulaw_encode(pcm: np.ndarray) -> bytes:
+    return _MULAW_ENC[pcm.view(np.uint16)].tobytes()
+
+
+def mulaw_decode(data, out: Optional[np.ndarray] = None) -> np.ndarray:
+    idx = np.frombuffer(data, dtype=np.uint8)
+    if out is None:
+        return _MULAW_DEC[idx]
+    return np.take(_MULAW_DEC, idx, out=out[:len(idx)])
+
+
+def codec_disponible(nombre: str) -> int:
+    """Código del codec pedido; si es opus y no hay opuslib, cae a μ-law."""
+    codec = CODECS[nombre]
+    if codec == CODEC_OPUS and not HAS_OPUS:
+        return CODEC_MULAW
+    return codec
+
+
+def es_frame(msg) -> bool:
+    """True si un mensaje binario trae la cabecera de este protocolo."""
+    return (
+        isinstance(msg, (bytes, bytearray, memoryview))
+        and len(msg) >= HEADER.size
+        and bytes(msg[:2]) == MAGIC
+        and msg[2] == PROTO_VERSION
+    )
+
+
+class FrameEncoder:
+    """Lado cliente: PCM int16 -> mensajes binarios con cabecera."""
+
+    def __init__(self, codec: str = "mulaw", sample_rate: int = 16000):
+        self.codec = codec_disponible(codec)
+        self.sample_rate = sample_rate
+        self._opus = None
+        self._opus_frame = sample_rate * OPUS_FRAME_MS // 1000
+        if self.codec == CODEC_OPUS:
+            self._opus = opuslib.Encoder(sample_rate, 1, opuslib.APPLICATION_VOIP)
+            self._opus.bitrate = OPUS_BITRATE
+        self.reset()
+
+    def reset(self):
+        """Nueva sesión (__START__): seq y reloj a cero."""
+        self.seq = 0
+        self.ts = 0
+        self.bytes_enviados = 0
+        self._pend = np.zeros(0, dtype=np.int16)
+
+    def encode(self, pcm) -> Optional[bytes]:
+        """Devuelve el mensaje a enviar (None si Opus aún no junta un frame)."""
+        if isinstance(pcm, (bytes, bytearray, memoryview)):
+            pcm = np.frombuffer(pcm, dtype=np.int16)
+        if self.codec == CODEC_OPUS:
+            payload, n = self._encode_opus(pcm)
+            if n == 0:
+                return None
+        elif self.codec == CODEC_MULAW:
+            payload, n = mulaw_encode(pcm), len(pcm)
+        else:
+            payload, n = pcm.tobytes(), len(pcm)
+        msg = HEADER.pack(MAGIC, PROTO_VERSION, self.codec, self.seq & 0xFFFFFFFF,
+                          self.ts & 0xFFFFFFFF, n) + payload
+        self.seq += 1
+        self.ts += n
+        self.bytes_enviados += len(msg)
+        return msg
+
+    def _encode_opus(self, pcm: np.ndarray):
+        """Opus solo acepta frames de 2.5-60 ms: se parte en frames de 20 ms."""
+        if len(self._pend):
+            pcm = np.concatenate([self._pend, pcm])
+        f = self._opus_frame
+        n = len(pcm) - len(pcm) % f
+        self._pend = pcm[n:].copy()
+        partes = []
+        for i in range(0, n, f):
+            pkt = self._opus.encode(pcm[i:i + f].tobytes(), f)
+            partes.append(struct.pack("<H", len(pkt)) + pkt)
+        return b"".join(partes), n
+
+
+class FrameDecoder:
+    """
+    Lado servidor: decodifica cada mensaje directo al ring de la sesión y
+    detecta chunks perdidos (hueco en seq; se rellena con silencio según ts)
+    o desordenados (seq ya pasado; se descartan).
+    """
+
+    def __init__(self, sample_rate: int = 16000, max_hueco_sec: float = 1.0):
+        self.sample_rate = sample_rate
+        self.max_hueco = int(max_hueco_sec * sample_rate)
+        self._scratch = np.zeros(sample_rate, dtype=np.int16)
+        self._opus = None
+        self._opus_frame = sample_rate * OPUS_FRAME_MS // 1000
+        self.reset()
+
+    def reset(self):
+        self._seq: Optional[int] = None
+        self._ts = 0
+        self.stats: Dict[str, int] = {"chunks": 0, "bytes": 0, "perdidos": 0, "desordenados": 0}
+
+    def write_to(self, ring, msg) -> int:
+        """Decodifica `msg` y lo escribe en `ring`; devuelve muestras escritas."""
+        _, _, codec, seq, ts, n = HEADER.unpack_from(msg)
+        payload = memoryview(msg)[HEADER.size:]
+        self.stats["chunks"] += 1
+        self.stats["bytes"] += len(msg)
+
+        escritas = 0
+        if self._seq is not None and seq != self._seq:
+            if seq < self._seq:
+                self.stats["desordenados"] += 1
+                return 0
+            self.stats["perdidos"] += seq - self._seq
+            hueco = min(ts - self._ts, self.max_hueco)
+            if hueco > 0:
+                ring.write(np.zeros(hueco, dtype=np.int16))
+                escritas += hueco
+        self._seq = seq + 1
+        self._ts = ts + n
+
+        pcm = self._decode(codec, payload, n)
+        ring.write(pcm)
+        return escritas + len(pcm)
+
+    def _buffer(self, n: int) -> np.ndarray:
+        if n > len(self._scratch):
+            self._scratch = np.zeros(n, dtype=np.int16)
+        return self._scratch[:n]
+
+    def _decode(self, codec: int, payload: memoryview, n: int) -> np.ndarray:
+        if codec == CODEC_PCM16:
+            return np.frombuffer(payload, dtype=np.int16)
+        if codec == CODEC_MULAW:
+            return mulaw_decode(payload, out=self._buffer(len(payload)))
+        if codec == CODEC_OPUS:
+            return self._decode_opus(payload, n)
+        raise ValueError(f"codec desconocido: {codec}")
+
+    def _decode_opus(self, payload: memoryview, n: int) -> np.ndarray:
+        if not HAS_OPUS:
+            raise ValueError("frame Opus recibido pero opuslib no está instalado")
+        if self._opus is None:
+            self._opus = opuslib.Decoder(self.sample_rate, 1)
+        out = self._buffer(n)
+        i = j = 0
+        while i < len(payload) and j < n:
+            (largo,) = struct.unpack_from("<H", payload, i)
+            pcm = self._opus.decode(bytes(payload[i + 2:i + 2 + largo]), self._opus_frame)
+            k = min(len(pcm) // 2, n - j)
+            out[j:j + k] = np.frombuffer(pcm, dtype=np.int16)[:k]
+            i += 2 + largo
+            j += k
+        return out[:j]
@@ -4,15 +4,16 @@ from services.service_stt import ServiceSTT  # usa el service_stt.py que ya tien
 
 class STTRuntime:
     """Levanta un loop asyncio en un hilo separado y expone helpers thread-safe."""
-    def __init__(self, max_parciales: int = 10):
+    def __init__(self, max_parciales: int = 10, codec: str = "mulaw"):
         self.loop = asyncio.new_event_loop()
         self.thread = threading.Thread(target=self._run, daemon=True)
         self.stt: ServiceSTT | None = None
         self.max_parciales = max_parciales
+        self.codec = codec  # "pcm16" | "mulaw" | "opus"
 
     def _run(self):
         asyncio.set_event_loop(self.loop)
-        self.stt = ServiceSTT(max_parciales=self.max_parciales)
+        self.stt = ServiceSTT(max_parciales=self.max_parciales, codec=self.codec)
         # inicia la conexión persistente y deja el loop vivo
         self.loop.run_until_complete(self.stt.start())
         self.loop.run_forever()
@@ -0,0 +1,318 @@
+# audio_salida.py
+# Motor de salida de audio persistente para los TTS (Piper, Kokoro): un solo
+# stream de sounddevice abierto todo el tiempo, con callback que lee de un
+# anillo PCM; cortar() silencia en el próximo bloque sin cerrar el dispositivo.
+import threading, time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+try:
+    from agente.audio_resample import Resampler, a_pcm16
+except ImportError:  # server01/tts y server02/backend usan imports planos
+    from audio_resample import Resampler, a_pcm16
+
+try:
+    import sounddevice as sd
+    HAS_SD = True
+except Exception:
+    HAS_SD = False
+
+BLOQUE_S = 0.01      # duración de un callback: un corte se oye a lo sumo un bloque después
+JITTER_S = 0.06      # colchón antes de arrancar una locución (o de retomar tras un underrun)
+CAPACIDAD_S = 8.0    # segundos en el anillo; escribir() espera si se llena
+
+
+class AnilloPCM:
+    """
+    Anillo int16 de un productor y un consumidor, sin locks: `escrito` y
+    `leido` son contadores absolutos y cada lado mueve solo el suyo (con el
+    GIL, asignar un int es atómico). El productor copia antes de avanzar
+    `escrito` y el consumidor copia antes de avanzar `leido`, así ninguno ve
+    muestras a medio escribir.
+    """
+
+    def __init__(self, capacidad: int):
+        self.capacidad = int(capacidad)
+        self._buf = np.zeros(self.capacidad, dtype=np.int16)
+        self.escrito = 0
+        self.leido = 0
+
+    def ocupado(self) -> int:
+        return self.escrito - self.leido
+
+    def escribir(self, x: np.ndarray) -> int:
+        """Copia lo que entre de `x`; devuelve cuántas muestras escribió."""
+        n = min(len(x), self.capacidad - self.ocupado())
+        j = self.escrito % self.capacidad
+        k = min(n, self.capacidad - j)
+        self._buf[j:j + k] = x[:k]
+        self._buf[:n - k] = x[k:n]
+        self.escrito += n
+        return n
+
+    def leer(self, out: np.ndarray) -> int:
+        """Llena `out` con lo disponible; devuelve cuántas muestras leyó."""
+        n = min(len(out), self.ocupado())
+        j = self.leido % self.capacidad
+        k = min(n, self.capacidad - j)
+        out[:k] = self._buf[j:j + k]
+        out[k:n] = self._buf[:n - k]
+        self.leido += n
+        return n
+
+
+class SalidaAudio:
+    """
+    Salida de audio única y persistente, alimentada por un solo productor
+    (el hilo que reproduce el TTS).
+
+      - escribir(pcm, sr): int16 (bytes o ndarray) o float a cualquier tasa;
+        se convierte a `sr` del motor con un Resampler por tasa de entrada
+        (con estado entre chunks de la misma locución) y se copia al anillo.
+        Si el anillo está lleno espera a que el callback libere lugar.
+        Devuelve False si un cortar() la alcanzó a mitad de camino.
+      - terminar(): fin de locución; drena la cola del resampler y avisa al
+        callback que vaciarse ahí no es un underrun.
+      - cortar(): desde cualquier hilo. El callback descarta todo lo escrito
+        hasta ese momento en el próximo bloque (<= BLOQUE_S + latencia del
+        dispositivo); el stream sigue abierto. esperar_corte() devuelve
+        cuándo se oye ese silencio (`t_silencio`).
+
+    El callback no bloquea ni reserva memoria: lee del anillo o completa
+    con silencio, y avisa por `_avance` (lugar libre, corte aplicado) solo
+    si el lock está libre; quien espera usa timeout, así un aviso perdido
+    cuesta a lo sumo un bloque. Arranca a sonar cuando hay `jitter_s`
+    acumulado (o la locución ya terminó); si se queda sin datos a mitad de locución cuenta
+    un underrun y vuelve a esperar el colchón.
+
+    Sin sounddevice (o sin abrir()) nadie consume: `llenar(out)` es el mismo
+    paso del callback, para manejarlo a mano (benchmarks).
+    Métricas: stats() / resumen(); con `metrics` (SttMetrics) se registran
+    como fuente de gauges, sin costo en el callback.
+    """
+
+    def __init__(self, sr: Optional[int] = None, bloque_s: float = BLOQUE_S, jitter_s: float = JITTER_S,
+                 capacidad_s: float = CAPACIDAD_S, dispositivo=None, metrics=None,
+                 log: Callable[[str], None] = print):
+        self.dispositivo = dispositivo
+        self.sr = int(sr or self._sr_dispositivo(dispositivo))
+        self.bloque = max(1, int(bloque_s * self.sr))
+        self.jitter = int(jitter_s * self.sr)
+        self.anillo = AnilloPCM(int(capacidad_s * self.sr))
+        self.log = log
+        self.stream = None
+        self.latencia = 0.0
+
+        self._rs: Dict[int, Resampler] = {}
+        self._escritura = threading.Lock()  # productor vs cortar(); el callback no la toma
+        self._fin = 0             # índice absoluto hasta donde la locución está completa
+        self._sonando = False     # pasó el colchón de jitter
+        self._corte_pedido = 0
+        self._corte_hecho = 0
+        self._corte_hasta = 0     # lo escrito antes de este índice se descarta
+        self._t_corte = 0.0
+        self._avance = threading.Condition()  # el callback avisa: corte aplicado / lugar en el anillo
+        self.t_silencio = 0.0     # monotonic en que se oye el último corte (bloque + latencia)
+
+        # contadores (los escribe solo el callback); bloques = bloques sonando
+        self.bloques = 0
+        self.underruns = 0
+        self.muestras_underrun = 0
+        self.cortes = 0
+        self.corte_ms_max = 0.0
+        self._ocupacion_suma = 0
+        self._ocupacion_min: Optional[int] = None
+
+        if metrics is not None:
+            metrics.fuente(self.stats)
+
+    @staticmethod
+    def _sr_dispositivo(dispositivo) -> int:
+        """Tasa nativa del dispositivo de salida (evita el remuestreo del driver)."""
+        if HAS_SD:
+            try:
+                return int(sd.query_devices(dispositivo, kind="output")["default_samplerate"])
+            except Exception:
+                pass
+        return 48000
+
+    # ---------- dispositivo ----------
+    def abrir(self) -> bool:
+        """Abre y arranca el stream (una vez); False si no hay salida de audio."""
+        if self.stream is not None:
+            return True
+        if not HAS_SD:
+            self.log("sounddevice no disponible; salida de audio deshabilitada.")
+            return False
+        try:
+            self.stream = sd.OutputStream(
+                samplerate=self.sr, channels=1, dtype="int16", blocksize=self.bloque,
+                latency="low", device=self.dispositivo, callback=self._callback,
+            )
+            self.stream.start()
+            self.latencia = float(self.stream.latency)
+            self.log(f"Salida de audio abierta: {self.sr} Hz, bloque {self.bloque}, "
+                     f"latencia {self.latencia * 1000:.0f} ms.")
+            return True
+        except Exception as e:
+            self.log(f"No se pudo abrir salida de audio: {e}. Continuando sin audio.")
+            self.stream = None
+            return False
+
+    def cerrar(self):
+        s, self.stream = self.stream, None
+        if s is not None:
+            try: s.stop()
+            except Exception: pass
+            try: s.close()
+            except Exception: pass
+
+    # ---------- productor ----------
+    def escribir(self, pcm, sr: int) -> bool:
+        gen = self._corte_pedido
+        x = self._convertir(pcm, int(sr))
+        i = 0
+        while i < len(x):
+            with self._escritura:
+                if self._corte_pedido != gen:
+                    return False
+                i += self.anillo.escribir(x[i:])
+            if i < len(x):
+                with self._avance:
+                    if self.anillo.ocupado() >= self.anillo.capacidad and self._corte_pedido == gen:
+                        self._avance.wait(2 * self.bloque / self.sr)
+        return self._corte_pedido == gen
+
+    def terminar(self):
+        """Fin de la locución en curso."""
+        for sr, rs in self._rs.items():
+            cola = rs.vaciar()
+            if len(cola):
+                self.escribir(a_pcm16(cola), self.sr)
+            rs.reset()
+        self._fin = self.anillo.escrito
+
+    def cortar(self):
+        """Descarta lo escrito y silencia en el próximo bloque."""
+        with self._escritura:
+            self._t_corte = time.monotonic()
+            self._corte_hasta = self.anillo.escrito
+            self._fin = self._corte_hasta
+            self._corte_pedido += 1
+            for rs in self._rs.values():
+                rs.reset()
+        with self._avance:
+            self._avance.notify_all()  # un escribir() esperando lugar vuelve ya
+
+    def esperar_corte(self, timeout: float = 0.5) -> Optional[float]:
+        """
+        Tras cortar(): espera a que el callback aplique el corte y devuelve
+        `t_silencio`; None si nadie consume a tiempo (sin dispositivo).
+        """
+        pedido = self._corte_pedido
+        limite = time.monotonic() + timeout
+        with self._avance:
+            while self._corte_hecho < pedido:
+                resto = limite - time.monotonic()
+                if resto <= 0:
+                    return None
+                self._avance.wait(min(resto, 2 * self.bloque / self.sr))
+        return self.t_silencio
+
+    def retardo(self) -> float:
+        """Segundos hasta que suene lo próximo que se escriba."""
+        return self.anillo.ocupado() / self.sr + self.latencia
+
+    def activo(self) -> bool:
+        return self._sonando or self.anillo.ocupado() > 0
+
+    def esperar_vacio(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que suene todo lo escrito (True) o a `timeout` (False)."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while self.anillo.ocupado() > 0:
+            if self.stream is None or (limite is not None and time.monotonic() > limite):
+                return False
+            with self._avance:
+                self._avance.wait(2 * self.bloque / self.sr)
+        time.sleep(self.latencia)
+        return True
+
+    def _convertir(self, pcm, sr: int) -> np.ndarray:
+        if isinstance(pcm, (bytes, bytearray, memoryview)):
+            pcm = np.frombuffer(pcm, dtype=np.int16)
+        if sr == self.sr:
+            return pcm if pcm.dtype == np.int16 else a_pcm16(pcm)
+        rs = self._rs.get(sr)
+        if rs is None:
+            rs = self._rs[sr] = Resampler(sr, self.sr)
+        return rs.procesar_pcm16(pcm)
+
+    # ---------- consumidor (callback de audio) ----------
+    def _callback(self, outdata, frames, time_info, status):
+        self.llenar(outdata[:, 0])
+
+    def llenar(self, out: np.ndarray) -> int:
+        """Un bloque de salida: lee del anillo y completa con silencio. Devuelve muestras de audio."""
+        a = self.anillo
+        if self._corte_pedido != self._corte_hecho:
+            self._corte_hecho = self._corte_pedido
+            a.leido = max(a.leido, self._corte_hasta)
+            self._sonando = False
+            self.cortes += 1
+            ahora = time.monotonic()
+            self.corte_ms_max = max(self.corte_ms_max, (ahora - self._t_corte) * 1000)
+            self.t_silencio = ahora + self.latencia
+            self._avisar()
+
+        ocupado = a.ocupado()
+        if not self._sonando:
+            if ocupado >= self.jitter or (ocupado and self._fin >= a.escrito):
+                self._sonando = True
+            else:
+                out[:] = 0
+                return 0
+
+        self.bloques += 1
+        self._ocupacion_suma += ocupado
+        if self._ocupacion_min is None or ocupado < self._ocupacion_min:
+            self._ocupacion_min = ocupado
+        n = a.leer(out)
+        if n < len(out):
+            out[n:] = 0
+            self._sonando = False
+            if self._fin < a.leido:  # la locución sigue y no llegó audio a tiempo
+                self.underruns += 1
+                self.muestras_underrun += len(out) - n
+        if n:
+            self._avisar()
+        return n
+
+    def _avisar(self):
+        """Despierta a quien espera, sin bloquear el callback si el lock está tomado."""
+        if self._avance.acquire(blocking=False):
+            try:
+                self._avance.notify_all()
+            finally:
+                self._avance.release()
+
+    # ---------- métricas ----------
+    def stats(self) -> Dict[str, float]:
+        ms = 1000 / self.sr
+        b = self.bloques
+        return {
+            "salida_bloques": self.bloques,
+            "salida_underruns": self.underruns,
+            "salida_underrun_ms": round(self.muestras_underrun * ms, 1),
+            "salida_cortes": self.cortes,
+            "salida_corte_ms_max": round(self.corte_ms_max, 1),
+            "salida_ocupacion_ms": round(self.anillo.ocupado() * ms, 1),
+            "salida_ocupacion_media_ms": round(self._ocupacion_suma / b * ms, 1) if b else 0.0,
+            "salida_ocupacion_min_ms": round((self._ocupacion_min or 0) * ms, 1),
+        }
+
+    def resumen(self) -> str:
+        s = self.stats()
+        return (f"[salida] {self.sr} Hz: {s['salida_bloques']} bloques, {s['salida_underruns']} underruns "
+                f"({s['salida_underrun_ms']} ms), {s['salida_cortes']} cortes (máx {s['salida_corte_ms_max']} ms), "
+                f"ocupación media {s['salida_ocupacion_media_ms']} ms / mín {s['salida_ocupacion_min_ms']} ms")
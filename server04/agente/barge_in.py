@@ -0,0 +1,89 @@
+# barge_in.py
+# Interrupción por voz: si el usuario habla mientras Luci habla, se corta
+# audio, cola de voz, cola de Answer y stream del LLM en un solo paso.
+import time
+
+from agente.event_bus import event_bus
+from agente.logger import logger
+from agente.stt_echo import referencia
+from agente.stt_metrics import metricas
+
+BARGE_IN_MARGEN_S      = 0.3   # la reproducción cuenta como activa hasta este margen tras lo publicado
+BARGE_IN_REFRACTARIO_S = 1.0   # disparos repetidos dentro de este lapso se ignoran
+BARGE_IN_OBJETIVO_MS   = 150   # inicio de voz -> silencio audible (p95)
+# buckets finos alrededor del objetivo: con los de stt_metrics el p95 saltaría de 100 a 200
+LIMITES_BARGE_MS = (25, 50, 75, 100, 125, 150, 175, 200, 250, 300, 500, 1000, 2000)
+
+
+class BargeIn:
+    """
+    Escucha "stt.voz_usuario" (t_inicio, origen), que Microfono emite cuando
+    ve voz real del usuario (VAD tras el filtro de eco). Si la referencia
+    de eco dice que Luci está sonando, interrumpe en este orden:
+
+      1. "voice.stop" + "ui.stop": corta el audio local y el del navegador
+         y descarta la cola de VoicePlater
+      2. "answer.stop": corta el stream de Answer y vacía su cola
+      3. "barge_in": Nucleo cancela la generación en curso
+
+    El silencio se mide cuando la salida lo reporta con "voice.silencio"
+    (salida, t): el parlante cuando su callback aplicó el corte, el
+    navegador con el ack de 'stopAll'; t ya incluye la latencia del
+    dispositivo. Se toma el primer reporte de cada salida por disparo.
+
+    Métricas en metricas("barge_in"): disparos por origen, sobre_objetivo y
+    los histogramas deteccion_ms (inicio de voz -> disparo), inicio_a_stop_ms
+    (-> eventos emitidos), inicio_a_silencio_ms (todas las salidas) e
+    inicio_a_silencio_<salida>_ms; el log compara su p95 con el objetivo.
+    """
+
+    def __init__(self):
+        self._m = metricas("barge_in")
+        self._ultimo = 0.0
+        self._t_inicio: float | None = None  # del último disparo, hasta que vence el refractario
+        self._reportadas: set = set()
+        event_bus.subscribe("stt.voz_usuario", self._on_voz)
+        event_bus.subscribe("voice.silencio", self._on_silencio)
+
+    def hablando(self, ahora: float | None = None) -> bool:
+        ahora = time.monotonic() if ahora is None else ahora
+        return referencia.sonando_hasta() + BARGE_IN_MARGEN_S > ahora
+
+    def _on_voz(self, t_inicio: float, origen: str = "vad"):
+        ahora = time.monotonic()
+        if not self.hablando(ahora) or ahora - self._ultimo < BARGE_IN_REFRACTARIO_S:
+            return
+        self._ultimo = ahora
+        self._t_inicio, self._reportadas = t_inicio, set()
+
+        event_bus.emit("voice.stop")
+        event_bus.emit("ui.stop")
+        t_stop = time.monotonic()
+        event_bus.emit("answer.stop")
+        event_bus.emit("barge_in", t_inicio)
+
+        deteccion = (ahora - t_inicio) * 1000
+        self._m.inc(f"disparos_{origen}")
+        self._m.observe("deteccion_ms", deteccion, LIMITES_BARGE_MS)
+        self._m.observe("inicio_a_stop_ms", (t_stop - t_inicio) * 1000, LIMITES_BARGE_MS)
+        logger.info(f"[BargeIn] interrupción ({origen}): detección {deteccion:.0f} ms, "
+                    f"inicio de voz -> stop {(t_stop - t_inicio) * 1000:.0f} ms")
+
+    def _on_silencio(self, salida: str, t_silencio: float):
+        t_inicio = self._t_inicio
+        if (t_inicio is None or salida in self._reportadas
+                or t_silencio - t_inicio > BARGE_IN_REFRACTARIO_S + 1.0):
+            return  # un stop que no vino de un barge-in, o ya contado
+        self._reportadas.add(salida)
+
+        total = (t_silencio - t_inicio) * 1000
+        self._m.observe("inicio_a_silencio_ms", total, LIMITES_BARGE_MS)
+        self._m.observe(f"inicio_a_silencio_{salida}_ms", total, LIMITES_BARGE_MS)
+        if total > BARGE_IN_OBJETIVO_MS:
+            self._m.inc("sobre_objetivo")
+        p95 = self._m.histos[f"inicio_a_silencio_{salida}_ms"].percentil(0.95)
+        logger.info(f"[BargeIn] inicio de voz -> silencio ({salida}) {total:.0f} ms; "
+                    f"p95 {p95:.0f} ms (objetivo {BARGE_IN_OBJETIVO_MS} ms)")
+
+
+barge = BargeIn()
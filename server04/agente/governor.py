@@ -0,0 +1,137 @@
+# governor.py
+# Gobernador de CPU: baja la carga (parciales, preliminares, FPS) cuando el
+# pipeline se atrasa y la restaura cuando hay margen.
+import os, threading, time
+from typing import Callable, Dict, List, Optional
+
+# Cada nivel es un juego completo de perillas; 0 = configuración normal.
+#   partial_interval_x: multiplica PARTIAL_EVAL_INTERVAL del STT
+#   window_x:           multiplica WINDOW_SEC (parciales de ventana)
+#   preliminares:       Nucleo genera respuestas de escucha activa
+#   render_fps:         tope del bucle de render (SpritePlayer)
+NIVELES: List[Dict] = [
+    {"partial_interval_x": 1.0, "window_x": 1.0, "preliminares": True, "render_fps": 120},
+    {"partial_interval_x": 2.0, "window_x": 1.0, "preliminares": True, "render_fps": 60},
+    {"partial_interval_x": 3.0, "window_x": 0.75, "preliminares": False, "render_fps": 30},
+    {"partial_interval_x": 5.0, "window_x": 0.75, "preliminares": False, "render_fps": 15},
+]
+
+
+def _leer_proc_stat():
+    with open("/proc/stat") as f:
+        v = [int(x) for x in f.readline().split()[1:]]
+    idle = v[3] + (v[4] if len(v) > 4 else 0)  # idle + iowait
+    return sum(v), idle
+
+
+class CpuMeter:
+    """Uso de CPU de toda la máquina (0..1) entre dos lecturas de /proc/stat."""
+
+    def __init__(self):
+        self._prev = None
+        try:
+            self._prev = _leer_proc_stat()
+        except OSError:
+            pass
+
+    def leer(self) -> float:
+        if self._prev is None:
+            # sin /proc: carga media normalizada por núcleos
+            return min(1.0, os.getloadavg()[0] / (os.cpu_count() or 1))
+        total, idle = _leer_proc_stat()
+        dt, di = total - self._prev[0], idle - self._prev[1]
+        self._prev = (total, idle)
+        return 0.0 if dt <= 0 else max(0.0, min(1.0, 1 - di / dt))
+
+
+class Governor:
+    """
+    Cada `intervalo` s mide CPU y RTF del STT (`rtf_fn`, opcional) y decide
+    el nivel. Sube un nivel tras `subir_tras` muestras seguidas sobre los
+    umbrales altos; baja uno tras `bajar_tras` muestras bajo los umbrales
+    bajos (restaurar es más lento que recortar, para no oscilar).
+
+    Cada cambio se publica con `emit("governor.nivel", ajustes)`, donde
+    `ajustes` es el dict del nivel más "nivel", "motivo", "cpu" y "rtf".
+    Los componentes se suscriben y aplican solo las perillas que conocen.
+    `snapshot()` expone el estado y el historial de decisiones.
+    """
+
+    def __init__(self, emit: Callable, rtf_fn: Optional[Callable[[], Optional[float]]] = None,
+                 intervalo: float = 1.0, cpu_alto: float = 0.85, cpu_bajo: float = 0.55,
+                 rtf_alto: float = 0.8, rtf_bajo: float = 0.4, subir_tras: int = 2, bajar_tras: int = 5,
+                 log: Callable[[str], None] = print, metrics=None):
+        self.emit = emit
+        self.rtf_fn = rtf_fn
+        self.intervalo = intervalo
+        self.cpu_alto, self.cpu_bajo = cpu_alto, cpu_bajo
+        self.rtf_alto, self.rtf_bajo = rtf_alto, rtf_bajo
+        self.subir_tras, self.bajar_tras = subir_tras, bajar_tras
+        self.log = log
+        self.metrics = metrics  # SttMetrics opcional
+
+        self.nivel = 0
+        self.cpu = 0.0
+        self.rtf: Optional[float] = None
+        self.historial: List[Dict] = []
+        self._sobre = 0
+        self._bajo = 0
+        self._cpu = CpuMeter()
+        self._stop = threading.Event()
+
+    def ajustes(self) -> Dict:
+        return dict(NIVELES[self.nivel], nivel=self.nivel)
+
+    # ---------- decisión ----------
+    def muestrear(self) -> Optional[Dict]:
+        """Toma una muestra; devuelve los ajustes nuevos si cambió el nivel."""
+        self.cpu = self._cpu.leer()
+        self.rtf = self.rtf_fn() if self.rtf_fn else None
+        rtf = self.rtf or 0.0
+        if self.metrics is not None:
+            self.metrics.gauge("cpu", round(self.cpu, 3))
+            self.metrics.gauge("rtf", round(rtf, 3))
+
+        if self.cpu > self.cpu_alto or rtf > self.rtf_alto:
+            self._sobre, self._bajo = self._sobre + 1, 0
+        elif self.cpu < self.cpu_bajo and rtf < self.rtf_bajo:
+            self._sobre, self._bajo = 0, self._bajo + 1
+        else:
+            self._sobre = self._bajo = 0
+
+        if self._sobre >= self.subir_tras and self.nivel < len(NIVELES) - 1:
+            motivo = "rtf" if rtf > self.rtf_alto else "cpu"
+            return self._cambiar(self.nivel + 1, motivo)
+        if self._bajo >= self.bajar_tras and self.nivel > 0:
+            return self._cambiar(self.nivel - 1, "holgura")
+        return None
+
+    def _cambiar(self, nivel: int, motivo: str) -> Dict:
+        anterior, self.nivel = self.nivel, nivel
+        self._sobre = self._bajo = 0
+        ajustes = dict(self.ajustes(), motivo=motivo, cpu=round(self.cpu, 2),
+                       rtf=None if self.rtf is None else round(self.rtf, 2))
+        self.historial.append(dict(ajustes, t=time.time()))
+        del self.historial[:-50]
+        if self.metrics is not None:
+            self.metrics.inc("subidas" if nivel > anterior else "bajadas")
+            self.metrics.gauge("nivel", nivel)
+        self.log(f"[Governor] nivel {anterior} -> {nivel} ({motivo}, cpu={self.cpu:.0%}, rtf={self.rtf}): "
+                 f"{NIVELES[nivel]}")
+        self.emit("governor.nivel", ajustes)
+        return ajustes
+
+    def snapshot(self) -> Dict:
+        return {"nivel": self.nivel, "cpu": round(self.cpu, 3), "rtf": self.rtf,
+                "ajustes": self.ajustes(), "historial": list(self.historial)}
+
+    # ---------- hilo ----------
+    def run(self):
+        while not self._stop.wait(self.intervalo):
+            try:
+                self.muestrear()
+            except Exception as e:
+                self.log(f"[Governor] error: {e}")
+
+    def stop(self):
+        self._stop.set()
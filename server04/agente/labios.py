@@ -0,0 +1,125 @@
+# labios.py
+# Pista de labios calculada junto con el audio del TTS, a medida que sale:
+# apertura de boca (RMS) y forma (centroide espectral) a ~FPS valores por
+# segundo, más tiempos aproximados de palabras si Piper da alineaciones de
+# fonemas. El front (Live2D) y el SpritePlayer mueven la boca sin DSP propio.
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+FPS = 60
+PISO_DB = -50.0             # dBFS de RMS con la boca cerrada
+TECHO_DB = -18.0            # dBFS de RMS con la boca abierta del todo
+FORMA_HZ = (500.0, 2500.0)  # centroide de o/u (forma -100) a i/e (forma +100)
+# fonemas de Piper que no son parte de una palabra (pausas, puntuación, BOS/EOS).
+# El pad "_" no: Piper (1.8) suma cada pad al fonema anterior, y si llegara
+# suelto (intercalado entre fonemas) alarga la palabra en vez de cortarla.
+_SEPARADORES = set(" ^$.,;:!?¡¿—…\"'()«»")
+_PAD = "_"
+_PALABRA = re.compile(r"\w+")
+
+
+class Labios:
+    """
+    Se alimenta con los chunks int16 de una locución en orden:
+    agregar(pcm, alineaciones) calcula los frames completos que trae (lo que
+    sobra pasa al próximo) y devuelve el tramo de ese chunk, que también
+    queda en `tramos`:
+        {"fps", "desde", "boca", "forma", "palabras"}
+      - boca: 0..100 (apertura); forma: -100..100 (redonda .. estirada);
+        ints para que el JSON quede chico
+      - desde: índice del primer frame del tramo en la locución
+      - palabras: [{"texto", "inicio", "fin"}] en ms desde el inicio de la
+        locución; solo si Piper dio alineaciones (PhonemeAlignment con
+        `phoneme` y `num_samples`), rotuladas con las palabras de `texto`
+        en orden (aproximado si la fonemización expande números o siglas)
+    pista() es la locución entera (para 'ui.speak'). El resto final de
+    menos de un frame no se manda: la boca ya está cerrándose.
+    """
+
+    def __init__(self, sr: int, texto: str = "", fps: int = FPS):
+        self.sr = sr
+        self.paso = max(1, int(round(sr / fps)))  # muestras por frame
+        self.fps = sr / self.paso
+        self.muestras = 0                          # muestras recibidas
+        self.boca: List[int] = []
+        self.forma: List[int] = []
+        self.palabras: List[Dict] = []
+        self.tramos: List[Dict] = []
+        self._resto = np.zeros(0, dtype=np.int16)
+        self._textos = _PALABRA.findall(texto)
+        self._cursor = 0
+        self._ventana = np.hanning(self.paso).astype(np.float32)
+        self._hz = np.fft.rfftfreq(self.paso, 1.0 / sr).astype(np.float32)
+
+    def agregar(self, pcm, alineaciones=None) -> Dict:
+        if isinstance(pcm, (bytes, bytearray, memoryview)):
+            pcm = np.frombuffer(pcm, dtype=np.int16)
+        inicio = self.muestras
+        self.muestras += len(pcm)
+        x = np.concatenate([self._resto, pcm]) if len(self._resto) else pcm
+        n = len(x) // self.paso
+        self._resto = x[n * self.paso:].copy()
+
+        boca, forma = self._frames(x[:n * self.paso].reshape(n, self.paso)) if n else ([], [])
+        palabras = self._palabras(alineaciones, inicio) if alineaciones else []
+        tramo = {"fps": round(self.fps, 3), "desde": len(self.boca),
+                 "boca": boca, "forma": forma, "palabras": palabras}
+        self.boca += boca
+        self.forma += forma
+        self.palabras += palabras
+        self.tramos.append(tramo)
+        return tramo
+
+    def pista(self) -> Dict:
+        return {"fps": round(self.fps, 3), "boca": self.boca, "forma": self.forma, "palabras": self.palabras}
+
+    # ----------------- Internos -----------------
+    def _frames(self, f: np.ndarray):
+        f = f.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(f * f, axis=1)) + 1e-9
+        db = 20.0 * np.log10(rms)
+        boca = np.clip((db - PISO_DB) / (TECHO_DB - PISO_DB), 0.0, 1.0)
+
+        p = np.abs(np.fft.rfft(f * self._ventana, axis=1)) ** 2
+        centro = (p @ self._hz) / (p.sum(axis=1) + 1e-12)
+        lo, hi = np.log(FORMA_HZ[0]), np.log(FORMA_HZ[1])
+        forma = np.clip((np.log(centro + 1.0) - lo) / (hi - lo), 0.0, 1.0) * 2.0 - 1.0
+        forma = forma * (boca > 0)  # en silencio la forma es neutra
+        return (np.rint(boca * 100).astype(int).tolist(),
+                np.rint(forma * 100).astype(int).tolist())
+
+    def _palabras(self, alineaciones, inicio: int) -> List[Dict]:
+        """Agrupa fonemas entre separadores en palabras con su intervalo en muestras."""
+        grupos, actual, t = [], None, inicio
+        for a in alineaciones:
+            fon = getattr(a, "phoneme", "")
+            fin = t + int(getattr(a, "num_samples", 0))
+            if fon == _PAD:
+                if actual is not None:
+                    actual[1] = fin
+            elif not fon or fon in _SEPARADORES or fon.isspace():
+                actual = None
+            elif actual is None:
+                actual = [t, fin, fon]
+                grupos.append(actual)
+            else:
+                actual[1], actual[2] = fin, actual[2] + fon
+            t = fin
+
+        ms = 1000.0 / self.sr
+        palabras = []
+        for t0, t1, fonemas in grupos:
+            if self._cursor < len(self._textos):
+                texto = self._textos[self._cursor]
+                self._cursor += 1
+            else:
+                texto = fonemas
+            palabras.append({"texto": texto, "inicio": int(t0 * ms), "fin": int(t1 * ms)})
+        return palabras
+
+
+def alineaciones(chunk) -> Optional[list]:
+    """Alineaciones de fonemas de un AudioChunk de Piper, si el modelo las da."""
+    return getattr(chunk, "phoneme_alignments", None) or None
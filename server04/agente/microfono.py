@@ -2,17 +2,28 @@
 from agente.config import *
 from agente.event_bus import event_bus
 from agente.logger import logger
-
-import asyncio, threading, io, time, json, tempfile, os
+from agente.audio_resample import Resampler
+from agente.presupuesto_cpu import presupuesto
+from agente.stt_audio import AudioRing
+from agente.stt_aec import EchoCanceller
+from agente.stt_echo import EchoGate, referencia
+from agente.stt_models import TierConfig, ModelTiers
+from agente.stt_streaming import StreamingTranscriber, PartialGate, Calidad
+from agente.stt_vad import crear_vad, Endpointer
+from agente.stt_worker import InferenceScheduler
+from agente.stt_metrics import metricas, ResumenPeriodico, LIMITES_RTF
+
+import asyncio, threading, time, json
+from math import gcd
 import numpy as np
 import sounddevice as sd
-import soundfile as sf
 from faster_whisper import WhisperModel
 
 SAMPLERATE = 16000
 CHANNELS = 1
 DTYPE = "int16"
-BLOCKSIZE = 1600  # 100 ms a 16 kHz -> 1600 frames -> 3200 bytes
+BLOCKSIZE = 800   # 50 ms a 16 kHz -> 800 frames -> 1600 bytes (acota la latencia del barge-in)
+CAPTURE_SR = None  # None = tasa nativa del dispositivo, remuestreada a SAMPLERATE aquí
 
 # Parámetros de transcripción (los mismos que tu servidor)
 INIT_MODEL_TRANSCRIPTION = "tiny"   # cámbialo a "base" / "small" si necesitas mejor calidad
@@ -20,34 +31,121 @@ INIT_MODEL_DEVICE = "cpu"           # "cuda" si tienes GPU
 INIT_MODEL_COMPUTE_TYPE = "int8"    # "float16"/"int8_float16" en GPU
 INIT_LANGUAGE = "es"
 
+# Niveles: los parciales solo alimentan backchannels, el final dispara la respuesta.
+# Por defecto un solo modelo (parciales greedy, final con beam sobre la cola sin
+# confirmar: latencia constante). Opt-in con RAM de sobra: un modelo de finales
+# distinto, p.ej. TierConfig("base", ..., beam_size=5), y con él FINAL_FULL_PASS
+# (mejor WER, pero el final vuelve a crecer con la locución; medir con
+# benchmarks/bench_niveles_stt.py antes de activarlo).
+PARTIAL_TIER = TierConfig(INIT_MODEL_TRANSCRIPTION, INIT_MODEL_DEVICE, INIT_MODEL_COMPUTE_TYPE, beam_size=1)
+FINAL_TIER   = TierConfig(INIT_MODEL_TRANSCRIPTION, INIT_MODEL_DEVICE, INIT_MODEL_COMPUTE_TYPE, beam_size=5)
+FINAL_TIER_LAZY = False  # True: carga el modelo de finales en el primer final
+FINAL_FULL_PASS = False  # con modelo de finales distinto, redecodifica toda la locución
+FINAL_MIN_FREE_MB = 512  # RAM que debe quedar libre tras cargar el modelo de finales
+
 INACTIVITY_TIMEOUT     = 0.5   # s sin audio => flush final
 PARTIAL_EVAL_INTERVAL  = 0.2   # cada cuánto sacamos parcial
 WINDOW_SEC             = 1   # ventana de contexto para parciales
+MAX_UTTERANCE_SEC      = 30  # capacidad del ring (Whisper no ve más de 30 s)
+STREAMING_MODE         = True  # confirma palabras estables; el final solo decodifica la cola
+STREAM_MAX_TAIL_SEC    = 8   # cola sin confirmar máxima antes de forzar confirmación
+PARTIAL_GATE           = True  # solo publica parciales con palabras nuevas estables
+PARTIAL_MIN_NUEVAS     = 2   # palabras estables nuevas necesarias para publicar
+METRICS_RESUMEN_SEC    = 30  # cada cuánto se loguea el resumen de métricas (0 = nunca)
+LOG_CHUNK_CADA         = 0   # >0: loguea en DEBUG 1 de cada N chunks entrantes
+
+# Endpointing por VAD (None = solo INACTIVITY_TIMEOUT, como antes)
+VAD_BACKEND            = "webrtc"  # "webrtc" | "silero" | None
+VAD_PREROLL_MS         = 300       # audio previo al inicio de voz que se conserva
+VAD_HANGOVER_MS        = 600       # silencio tras la voz que cierra la locución
+
+# Supresión de eco contra lo que reproduce VoicePlater (None/False = desactivada)
+ECHO_GATE              = True
+ECHO_LAG_MAX_MS        = 500       # retardo parlante→micrófono máximo que se busca
+ECHO_UMBRAL            = 0.7       # correlación desde la que el bloque es voz propia
+ECHO_UMBRAL_DOBLE      = 0.3       # desde aquí se resta la referencia (doble habla)
+ECHO_AEC               = True      # cancelador adaptativo (GCC-PHAT + NLMS) para la voz del usuario
+
+# Barge-in: voz del usuario con Luci sonando => "stt.voz_usuario" (requiere ECHO_GATE y VAD)
+BARGE_IN               = True
+BARGE_IN_MIN_VOZ_MS    = 60        # voz seguida necesaria para disparar
 
 class Microfono:
     def __init__(self):
         self.status_microfono = False
 
         # Infra de audio/async
-        self._queue: asyncio.Queue[bytes] = asyncio.Queue()
+        self._queue: asyncio.Queue[tuple[bytes, float]] = asyncio.Queue()  # (pcm, t captura)
         self._sd_stream: sd.InputStream | None = None
+        self._rs: Resampler | None = None  # tasa nativa -> SAMPLERATE (None si coinciden)
 
         # Loop dedicado
         self._loop = asyncio.new_event_loop()
         self._workers: list[asyncio.Task] = []
 
         # Buffer y estado STT
-        self._audio_buffer = io.BytesIO()
+        self._ring = AudioRing(SAMPLERATE * CHANNELS * MAX_UTTERANCE_SEC)
+        self._stream = StreamingTranscriber(
+            self._ring, INIT_LANGUAGE, SAMPLERATE, max_tail_sec=STREAM_MAX_TAIL_SEC
+        )
         self._last_packet_ts: float | None = None
         self._last_partial_ts: float = time.time()
-        self._partial_running = False
         self._ending = False
+        self._fin_pendiente: int | None = None  # cierre de locución llegado con un final en curso
+
+        # Perillas que ajusta el gobernador de CPU ("governor.nivel")
+        self._partial_interval = PARTIAL_EVAL_INTERVAL
+        self._window_sec = WINDOW_SEC
+        self._gate = PartialGate(min_nuevas=PARTIAL_MIN_NUEVAS) if PARTIAL_GATE else None
+
+        # Whisper corre en su propio hilo; el loop solo ingiere audio y publica
+        self._infer = InferenceScheduler("microfono-stt")
+
+        # Métricas (consulta: metricas("microfono").snapshot())
+        self._m = metricas("microfono")
+        self._m.fuente(lambda: {
+            "parciales_descartados": self._infer.dropped_partials,
+            "cola_inferencia": self._infer.pendientes(),
+        })
+        if self._gate is not None:
+            self._m.fuente(lambda: {f"gate_{k}": v for k, v in self._gate.suprimidos.items()})
+        self._resumen = ResumenPeriodico(self._m, METRICS_RESUMEN_SEC, logger.info)
+
+        # VAD: solo la voz entra al ring; el silencio nunca se decodifica
+        vad = crear_vad(VAD_BACKEND, SAMPLERATE)
+        self._endpointer: Endpointer | None = None
+        if vad is not None:
+            self._endpointer = Endpointer(
+                vad, SAMPLERATE, preroll_ms=VAD_PREROLL_MS, hangover_ms=VAD_HANGOVER_MS
+            )
+        elif VAD_BACKEND:
+            logger.warning(f"[Microfono] VAD '{VAD_BACKEND}' no disponible; uso INACTIVITY_TIMEOUT.")
+
+        # Eco: los bloques que son la voz de Luci no llegan al VAD ni al decoder
+        self._eco = EchoGate(
+            referencia, lag_max_ms=ECHO_LAG_MAX_MS,
+            umbral_eco=ECHO_UMBRAL, umbral_doble=ECHO_UMBRAL_DOBLE,
+            aec=EchoCanceller(SAMPLERATE, lag_max_ms=ECHO_LAG_MAX_MS) if ECHO_AEC else None,
+        ) if ECHO_GATE else None
+
+        # Barge-in: VAD propio sobre los bloques que el filtro de eco deja pasar
+        # mientras suena la referencia (no espera el inicio de locución del Endpointer)
+        self._barge: Endpointer | None = None
+        if BARGE_IN and self._eco is not None and vad is not None:
+            self._barge = Endpointer(
+                crear_vad(VAD_BACKEND, SAMPLERATE), SAMPLERATE,
+                preroll_ms=0, hangover_ms=VAD_HANGOVER_MS, start_ms=BARGE_IN_MIN_VOZ_MS,
+            )
 
-        # Modelo
-        self._model: WhisperModel | None = None
+        # Modelos (parciales / finales)
+        self._tiers = ModelTiers(
+            PARTIAL_TIER, FINAL_TIER, loader=_cargar_whisper,
+            margen_mb=FINAL_MIN_FREE_MB, log=lambda m: logger.info(f"[Microfono] {m}"),
+        )
 
         # Suscripciones
         event_bus.subscribe("speak.flag", self._toggle_microfono)
+        event_bus.subscribe("governor.nivel", self._on_governor)
 
         logger.info("[Microfono] listo (modo STT local)")
 
@@ -55,6 +153,7 @@ class Microfono:
     def start(self):
         """Inicializa el loop y carga el modelo en un hilo aparte."""
         threading.Thread(target=self._run_loop, daemon=True).start()
+        self._resumen.start()
         self._submit(self._load_model())
 
     def shutdown(self):
@@ -80,13 +179,12 @@ class Microfono:
 
     async def _load_model(self):
         try:
-            logger.info(f"[Microfono] Cargando modelo Whisper '{INIT_MODEL_TRANSCRIPTION}'...")
-            self._model = WhisperModel(
-                INIT_MODEL_TRANSCRIPTION,
-                device=INIT_MODEL_DEVICE,
-                compute_type=INIT_MODEL_COMPUTE_TYPE
-            )
+            logger.info(f"[Microfono] Cargando modelo Whisper '{PARTIAL_TIER.model}'...")
+            await asyncio.wrap_future(self._infer.submit_final(self._tiers.load_partial))
             logger.info("[Microfono] Modelo cargado.")
+            if self._tiers.separados and not FINAL_TIER_LAZY:
+                logger.info(f"[Microfono] Cargando modelo de finales '{FINAL_TIER.model}'...")
+                await asyncio.wrap_future(self._infer.submit_final(self._tiers.final))
         except Exception as e:
             logger.exception(f"[Microfono] Error cargando modelo: {e}")
 
@@ -99,6 +197,8 @@ class Microfono:
         for t in self._workers:
             t.cancel()
         self._workers.clear()
+        self._infer.close()
+        self._resumen.stop()
         # parar stream sd
         try:
             if self._sd_stream is not None:
@@ -106,6 +206,13 @@ class Microfono:
         finally:
             self._sd_stream = None
 
+    def _on_governor(self, ajustes: dict):
+        self._partial_interval = PARTIAL_EVAL_INTERVAL * ajustes.get("partial_interval_x", 1.0)
+        self._window_sec = WINDOW_SEC * ajustes.get("window_x", 1.0)
+        self._m.gauge("partial_interval", round(self._partial_interval, 3))
+        logger.info(f"[Microfono] governor: parcial cada {self._partial_interval:.2f}s, "
+                    f"ventana {self._window_sec:.2f}s")
+
     # ---------- toggles ----------
     def _toggle_microfono(self):
         self.status_microfono = not self.status_microfono
@@ -115,25 +222,48 @@ class Microfono:
         else:
             print('Microfono apagado')
             self._submit(self.stop_stream())
+        event_bus.emit("microfono.estado", self.status_microfono)
 
     # ---------- sounddevice ----------
     def _on_audio(self, indata, frames, time_info, status):
         if status:
             logger.warning(f"[Microfono] status stream: {status}")
-        pcm = (indata.astype(np.int16) if indata.dtype != np.int16 else indata).tobytes()
+        if self._rs is not None:
+            pcm = self._rs.procesar_pcm16(indata[:, 0]).tobytes()
+        else:
+            pcm = (indata.astype(np.int16) if indata.dtype != np.int16 else indata).tobytes()
         try:
-            self._loop.call_soon_threadsafe(self._queue.put_nowait, pcm)
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (pcm, time.monotonic()))
         except Exception:
             pass
 
+    def _tasa_captura(self) -> int:
+        """
+        CAPTURE_SR o la tasa nativa del dispositivo, si con ella cada bloque
+        remuestreado sale de BLOCKSIZE muestras exactas (el AEC trabaja en
+        múltiplos fijos): 48/44.1/32 kHz sí, 22.05 kHz no. Si no, SAMPLERATE
+        y remuestrea PortAudio.
+        """
+        try:
+            sr = int(CAPTURE_SR or sd.query_devices(kind="input")["default_samplerate"])
+        except Exception as e:
+            logger.warning(f"[Microfono] no se pudo consultar la tasa nativa: {e}")
+            return SAMPLERATE
+        if BLOCKSIZE % (SAMPLERATE // gcd(sr, SAMPLERATE)):
+            logger.info(f"[Microfono] {sr} Hz no da bloques exactos de {BLOCKSIZE}; capturo a {SAMPLERATE} Hz")
+            return SAMPLERATE
+        return sr
+
     def _start_recording(self):
         if self._sd_stream is not None:
             return
+        sr = self._tasa_captura()
+        self._rs = Resampler(sr, SAMPLERATE) if sr != SAMPLERATE else None
         self._sd_stream = sd.InputStream(
-            samplerate=SAMPLERATE,
+            samplerate=sr,
             channels=CHANNELS,
             dtype=DTYPE,
-            blocksize=BLOCKSIZE,
+            blocksize=BLOCKSIZE * sr // SAMPLERATE,
             callback=self._on_audio,
         )
         self._sd_stream.start()
@@ -147,67 +277,111 @@ class Microfono:
             self._sd_stream = None
 
     # ---------- helpers STT ----------
-    def _reset_buffer(self):
-        self._audio_buffer = io.BytesIO()
+    def _reset_buffer(self, at: int | None = None):
+        """`at`: muestra donde cerró la locución; lo que llegó después se conserva."""
+        self._ring.reset(at)
+        self._stream.reset()
+        if self._gate is not None:
+            self._gate.reset()
         self._last_packet_ts = None
         self._last_partial_ts = time.time()
-        self._partial_running = False
         self._ending = False
+        self._fin_pendiente = None
         logger.info("[Microfono] 🔄 buffer STT reseteado")
 
-    def _pcm_to_text(self, raw_data: bytes) -> str:
-        if not raw_data or self._model is None:
+    def _pcm_to_text(self, pcm: np.ndarray, model, beam_size: int, calidad: list | None = None) -> str:
+        """Decodifica una vista int16 del ring en memoria (float32 normalizado, sin WAV temporal)."""
+        if len(pcm) == 0 or model is None:
             return ""
-        audio_np = np.frombuffer(raw_data, dtype=np.int16)
-        wav_path = None
         try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                wav_path = tmp.name
-                sf.write(wav_path, audio_np, SAMPLERATE, format="WAV")
-            segments, _ = self._model.transcribe(
-                wav_path, language=INIT_LANGUAGE, vad_filter=False
+            audio = self._ring.to_float32(pcm)
+            segments, _ = model.transcribe(
+                audio, language=INIT_LANGUAGE, vad_filter=False, beam_size=beam_size
             )
+            segments = list(segments)
+            if calidad is not None:
+                calidad.extend((seg.no_speech_prob, seg.avg_logprob) for seg in segments)
             return " ".join(seg.text for seg in segments)
         except Exception as e:
             logger.info(f"[Microfono] ❌ _pcm_to_text: {e}")
             return ""
-        finally:
-            if wav_path and os.path.exists(wav_path):
-                try: os.unlink(wav_path)
-                except Exception: pass
 
-    def _transcribe_partial(self) -> str:
-        data = self._audio_buffer.getvalue()
-        window_bytes = int(SAMPLERATE * CHANNELS * 2 * WINDOW_SEC)
-        tail = data[-window_bytes:]
-        return self._pcm_to_text(tail)
-
-    def _transcribe_final(self) -> str:
-        return self._pcm_to_text(self._audio_buffer.getvalue())
+    def _transcribe_partial(self) -> tuple[str, Calidad]:
+        model, beam = self._tiers.partial(), PARTIAL_TIER.beam_size
+        pares: list = []
+        t0 = time.perf_counter()
+        if STREAMING_MODE:
+            audio = self._ring.total - self._stream.agreement.commit_sample
+            text = self._decode_stream(self._stream.partial, model, beam_size=beam, calidad=pares)
+        else:
+            ventana = int(SAMPLERATE * CHANNELS * self._window_sec)
+            audio = min(len(self._ring), ventana)
+            text = self._pcm_to_text(self._ring.tail(ventana), model, beam, pares)
+        self._observar("parcial", time.perf_counter() - t0, audio)
+        return text, Calidad.de(pares)
+
+    def _transcribe_final(self, end: int | None = None) -> str:
+        model, beam = self._tiers.final(), self._tiers.final_cfg.beam_size
+        t0 = time.perf_counter()
+        if STREAMING_MODE:
+            completo = FINAL_FULL_PASS and self._tiers.separados and self._tiers.final_cargado()
+            text = self._decode_stream(self._stream.final, model, end, beam_size=beam, completo=completo)
+        else:
+            text = self._pcm_to_text(self._ring.since(0, end), model, beam)
+        self._observar("final", time.perf_counter() - t0, self._ring.total if end is None else end)
+        return text
+
+    def _observar(self, tipo: str, dt: float, muestras: int):
+        """Tiempo de decode (ms) y RTF respecto del audio de la locución."""
+        self._m.observe(f"{tipo}_ms", dt * 1000)
+        if muestras > 0:
+            rtf = dt / (muestras / SAMPLERATE)
+            self._m.observe(f"rtf_{tipo}", rtf, LIMITES_RTF)
+            self._m.gauge(f"rtf_{tipo}_ultimo", round(rtf, 3))
+
+    def _decode_stream(self, fn, model, *args, **kwargs) -> str:
+        if model is None:
+            return ""
+        try:
+            return fn(model, *args, **kwargs)
+        except Exception as e:
+            logger.info(f"[Microfono] ❌ streaming: {e}")
+            return ""
 
     # ---------- workers ----------
     async def _stt_worker(self):
         """Consume chunks, genera parciales y finales, emite por event_bus."""
         self._reset_buffer()
+        if self._endpointer is not None:
+            self._endpointer.reset()
         while self.status_microfono:
             try:
                 # intenta leer chunk; si no llega nada, revisa inactividad
-                chunk = await asyncio.wait_for(self._queue.get(), timeout=0.1)
-                self._audio_buffer.write(chunk)
-                self._last_packet_ts = time.time()
-
-                # logging simple
-                buf_bytes = self._audio_buffer.getbuffer().nbytes
-                duration = buf_bytes / (SAMPLERATE * CHANNELS * 2)
-                logger.info(f"[Microfono] 📥 +{len(chunk)}B  buffer≈{duration:.2f}s")
-
-                # ¿lanzamos parcial?
+                chunk, t_captura = await asyncio.wait_for(self._queue.get(), timeout=0.1)
+                self._m.inc("chunks")
+                self._m.inc("bytes", len(chunk))
+                self._m.gauge("cola_audio", self._queue.qsize())
+                chunk = self._filtrar_eco(chunk, t_captura)
+                if chunk is None:
+                    continue
+                if self._endpointer is None:
+                    self._ring.write(chunk)
+                    self._last_packet_ts = time.time()
+                elif not await self._feed_vad(chunk, t_captura):
+                    continue
+
+                # logging por chunk solo si se pide (muestreado)
+                if LOG_CHUNK_CADA and self._m.contadores["chunks"] % LOG_CHUNK_CADA == 0:
+                    duration = len(self._ring) / (SAMPLERATE * CHANNELS)
+                    logger.debug(f"[Microfono] 📥 +{len(chunk)}B  buffer≈{duration:.2f}s")
+
+                # ¿lanzamos parcial? (si el anterior sigue en cola, el worker lo descarta)
                 if (
                     not self._ending and
-                    not self._partial_running and
-                    (time.time() - self._last_partial_ts) >= PARTIAL_EVAL_INTERVAL
+                    self._tiers.listo and
+                    (time.time() - self._last_partial_ts) >= self._partial_interval
                 ):
-                    self._partial_running = True
+                    self._last_partial_ts = time.time()
                     asyncio.create_task(self._run_partial())
 
             except asyncio.TimeoutError:
@@ -217,33 +391,122 @@ class Microfono:
                     self._last_packet_ts and
                     (time.time() - self._last_packet_ts) > INACTIVITY_TIMEOUT
                 ):
-                    # evitar parciales concurrentes
-                    while self._partial_running:
-                        await asyncio.sleep(0.02)
-                    await self._flush_final()
+                    self._schedule_final()
             except asyncio.CancelledError:
                 break
             except Exception as ex:
                 logger.exception(f"[Microfono] error _stt_worker: {ex}")
 
+    def _filtrar_eco(self, chunk: bytes, t_captura: float) -> bytes | None:
+        """
+        Compara el bloque con la referencia de VoicePlater. La voz propia se
+        cambia por silencio para el VAD (así la locución en curso cierra por
+        hangover) y nunca entra al ring; en doble habla pasa el residuo.
+        """
+        if self._eco is None:
+            return chunk
+        estado, pcm = self._eco.procesar(chunk, t_captura)
+        self._detectar_barge_in(estado, pcm, t_captura)
+        if estado == "limpio":
+            return pcm
+        self._m.inc(f"eco_{estado}")
+        self._m.gauge("eco_corr", round(self._eco.corr, 2))
+        self._m.gauge("eco_lag_ms", self._eco.lag_ms)
+        if self._eco.aec is not None:
+            self._m.gauge("aec_erle_db", round(self._eco.aec.erle_db, 1))
+            self._m.gauge("aec_retardo_ms", self._eco.aec.retardo_ms)
+        if estado != "eco":
+            return pcm
+        if self._endpointer is None:
+            return None
+        return bytes(len(chunk))
+
+    def _eco_fiable(self) -> bool:
+        """Sin AEC convergido el eco residual puede parecer voz del usuario."""
+        return self._eco is not None and (self._eco.aec is None or self._eco.aec.nlms.convergido)
+
+    def _detectar_barge_in(self, estado: str, pcm: bytes, t_captura: float):
+        """Con la referencia sonando, voz en lo que deja pasar el filtro => "stt.voz_usuario"."""
+        if self._barge is None:
+            return
+        if estado in ("limpio", "eco") or not self._eco_fiable():
+            self._barge.reset()
+            return
+        for tipo, _ in self._barge.feed(pcm):
+            if tipo == "inicio":
+                event_bus.emit("stt.voz_usuario", t_captura - BARGE_IN_MIN_VOZ_MS / 1000, "eco")
+
+    async def _feed_vad(self, chunk: bytes, t_captura: float | None = None) -> bool:
+        """Pasa el chunk por el VAD. Devuelve True si hay locución en curso."""
+        for tipo, pcm in self._endpointer.feed(chunk):
+            if tipo == "inicio":
+                logger.info("[Microfono] 🟢 inicio de voz")
+                event_bus.emit("stt.speech_start")
+                if self._barge is not None and t_captura is not None and self._eco_fiable():
+                    event_bus.emit("stt.voz_usuario", t_captura - self._endpointer.start_frames
+                                   * self._endpointer.frame / SAMPLERATE, "vad")
+            elif tipo == "voz":
+                self._ring.write(pcm)
+                self._last_packet_ts = time.time()
+            elif tipo == "fin":
+                logger.info("[Microfono] 🔴 fin de voz")
+                event_bus.emit("stt.speech_end")
+                self._schedule_final()
+        return self._endpointer.in_speech
+
     async def _run_partial(self):
+        self._m.inc("parciales_pedidos")
         try:
-            text = self._transcribe_partial()
-            if text.strip():
-                logger.info(f"[Microfono] 📝 Parcial: {text}")
-                # emite igual que antes:
-                event_bus.emit("stt.partial", text)
+            text, calidad = await asyncio.wrap_future(self._infer.submit_partial(self._transcribe_partial))
+        except asyncio.CancelledError:
+            return  # descartado: llegó una ventana más reciente o un final
+        if self._gate is not None and text.strip():
+            text = self._gate.filtrar(text, calidad) or ""
+        if text.strip():
+            logger.info(f"[Microfono] 📝 Parcial: {text}")
+            self._m.inc("parciales_emitidos")
+            # emite igual que antes:
+            event_bus.emit("stt.partial", text)
+
+    def _schedule_final(self):
+        """
+        Lanza el final sin bloquear la ingesta (el audio nuevo sigue entrando al ring).
+        Si aún se decodifica el anterior, anota dónde cerró esta locución y
+        _flush_final la lanza al terminar.
+        """
+        if self._ending:
+            self._fin_pendiente = self._ring.total
+            return
+        self._ending = True
+        asyncio.create_task(self._flush_final())
+
+    async def _flush_final(self, end: int | None = None):
+        """Saca transcripción final de [0, end), emite evento y resetea."""
+        self._ending = True
+        end = self._ring.total if end is None else end
+        try:
+            if len(self._ring) > 0:
+                t0 = time.perf_counter()
+                text = await asyncio.wrap_future(
+                    self._infer.submit_final(lambda: self._transcribe_final(end))
+                )
+                dt = (time.perf_counter() - t0) * 1000
+                logger.info(f"[Microfono] ✅ FINAL ({dt:.0f} ms, {end / SAMPLERATE:.1f}s de audio): {text}")
+                logger.info(
+                    f"[Microfono] ring: reservado={self._ring.nbytes / 1024:.0f}KB "
+                    f"pico={self._ring.peak_bytes / 1024:.0f}KB descartado={self._ring.dropped_samples}"
+                )
+                if self._gate is not None:
+                    logger.info(f"[Microfono] parciales: {self._gate.resumen()}")
+                self._m.inc("finales")
+                event_bus.emit("stt.final", text)
         finally:
-            self._partial_running = False
-            self._last_partial_ts = time.time()
-
-    async def _flush_final(self):
-        """Saca transcripción final, emite evento y resetea."""
-        if self._audio_buffer.getbuffer().nbytes > 0:
-            text = self._transcribe_final()
-            logger.info(f"[Microfono] ✅ FINAL: {text}")
-            event_bus.emit("stt.final", text)
-        self._reset_buffer()
+            # una locución que cerró durante este final: su audio ya está en el ring
+            pendiente = self._fin_pendiente
+            self._reset_buffer(at=end)
+            if pendiente is not None and pendiente > end:
+                self._ending = True
+                asyncio.create_task(self._flush_final(pendiente - end))
 
     # ---------- API pública (igual que tenías) ----------
     async def start_stream(self):
@@ -256,17 +519,35 @@ class Microfono:
     async def stop_stream(self):
         # detiene grabación
         self._stop_recording()
-        # marca fin y espera parcial si corre
-        self._ending = True
-        while self._partial_running:
-            await asyncio.sleep(0.02)
-        # hace flush final
-        await self._flush_final()
+        # hace flush final (o espera el que ya está en curso)
+        if self._ending:
+            while self._ending:
+                await asyncio.sleep(0.02)
+        else:
+            await self._flush_final()
         # cancela worker
         for t in self._workers:
             t.cancel()
         self._workers.clear()
 
+def _cargar_whisper(cfg: TierConfig) -> WhisperModel:
+    """Corre en el hilo de inferencia: ese hilo y los pools de CTranslate2 van a los núcleos del STT."""
+    if cfg.device != "cpu":
+        return WhisperModel(cfg.model, device=cfg.device, compute_type=cfg.compute_type)
+    presupuesto.fijar_hilo("stt")
+
+    def crear():
+        modelo = WhisperModel(cfg.model, device=cfg.device, compute_type=cfg.compute_type,
+                              cpu_threads=presupuesto.hilos("stt"))
+        # los hilos de OpenMP nacen en la primera inferencia
+        segmentos, _ = modelo.transcribe(np.zeros(SAMPLERATE // 2, dtype=np.float32),
+                                         language=INIT_LANGUAGE, beam_size=1, vad_filter=False)
+        list(segmentos)
+        return modelo
+
+    return presupuesto.registrar("stt", crear)
+
+
 # instancia y worker del hilo (igual que antes)
 micro = Microfono()
 
@@ -0,0 +1,164 @@
+# segmentador.py
+# Segmentador incremental de oraciones en español para el stream del LLM:
+# recibe tokens y devuelve cada oración (o cláusula larga) apenas se cierra,
+# así Answer/Voice arrancan con la primera sin esperar la respuesta entera.
+import re
+from typing import List, Optional
+
+MIN_PRIMERA = 20    # caracteres para cortar la primera cláusula en , ; : (TTFA)
+MIN_CLAUSULA = 80   # ídem para las siguientes: el lookahead de voz ya las cubre
+
+# Abreviaturas (en minúscula, sin el punto) tras las que un ". " no cierra oración
+ABREVIATURAS = {
+    "sr", "sra", "srta", "sres", "dr", "dra", "lic", "ing", "prof", "arq", "ud", "uds",
+    "vd", "vds", "d", "dña", "sto", "sta", "gral", "cnel", "cap", "mons",
+    "ej", "p", "pág", "págs", "núm", "nro", "art", "vol", "ed", "fig",
+    "aprox", "av", "avda", "c", "tel", "cía", "s.a", "s.l", "vs", "cf", "ee", "uu",
+    "a.c", "d.c", "a.m", "p.m", "min", "seg", "máx", "mín", "dpto", "depto", "admón",
+}
+# Pueden cerrar oración si lo que sigue empieza en mayúscula
+ABREVIATURAS_FINALES = {"etc", "a.c", "d.c", "a.m", "p.m"}
+
+_CIERRES = "\"'»”’)]"
+_APERTURAS = "¿¡\"'«“‘([-*"
+_PALABRA = re.compile(r"(\S+)$")
+
+_ESPERAR = -1   # falta texto para decidir
+_NO = 0         # no es corte
+
+
+class Segmentador:
+    """
+    Alimentado token a token con agregar(); devuelve la lista (casi siempre
+    vacía o de uno) de fragmentos que quedaron cerrados. cerrar() entrega el
+    resto al final del stream.
+
+    Cortes:
+      - oración: ". ", "? ", "! ", "…"/"..." seguidos de mayúscula o apertura,
+        y saltos de línea. No corta en números (3.5, 1.000), abreviaturas
+        (Sr., p. ej., EE. UU.) ni iniciales (J. R.); "¿Sí?," sigue de largo.
+      - cláusula: ", ", "; ", ": " o "... "/"! " seguido de minúscula, solo fuera
+        de un ¿…?/¡…! abierto y con al menos `min_primera` caracteres
+        acumulados (`min_clausula` después del primer fragmento).
+    Cuando un corte depende del texto que sigue (". " al final del buffer),
+    espera al próximo token.
+    """
+
+    def __init__(self, min_primera: int = MIN_PRIMERA, min_clausula: int = MIN_CLAUSULA):
+        self.min_primera = min_primera
+        self.min_clausula = min_clausula
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._buf = ""
+        self._pos = 0           # desde dónde seguir buscando cortes en _buf
+        self.emitidos = 0
+
+    def agregar(self, token: str) -> List[str]:
+        self._buf += token
+        salida = []
+        i = self._pos
+        while i < len(self._buf):
+            fin = self._corte(i)
+            if fin == _ESPERAR:
+                break
+            if fin == _NO:
+                i += 1
+                continue
+            self._emitir(self._buf[:fin], salida)
+            self._buf = self._buf[fin:]
+            i = 0
+        self._pos = i
+        return salida
+
+    def cerrar(self) -> List[str]:
+        salida = []
+        self._emitir(self._buf, salida)
+        self._buf, self._pos = "", 0
+        return salida
+
+    # ----------------- Internos -----------------
+    def _emitir(self, texto: str, salida: List[str]):
+        texto = texto.strip()
+        if re.search(r"\w", texto):
+            salida.append(texto)
+            self.emitidos += 1
+
+    def _corte(self, i: int) -> int:
+        """Índice de fin del fragmento si hay corte en i, _NO o _ESPERAR."""
+        b, c = self._buf, self._buf[i]
+        if c == "\n":
+            return i + 1 if b[:i].strip() else _NO
+        if c in "?!":
+            j = self._saltar(i, "?!" + _CIERRES)
+            if j == len(b):
+                return _ESPERAR
+            if not b[j].isspace():
+                return _NO   # "¿Sí?," sigue de largo
+            inicio = self._inicio(j)
+            if inicio is None:
+                return _ESPERAR
+            # "¡Vamos! dijo": en minúscula sigue la misma oración
+            return j if inicio else self._clausula(j)
+        if c == "…" or c == ".":
+            return self._punto(i)
+        if c in ",;:":
+            if i + 1 == len(b):
+                return _ESPERAR
+            if not b[i + 1].isspace():
+                return _NO   # 1,5 / 10:30
+            return self._clausula(i + 1)
+        return _NO
+
+    def _punto(self, i: int) -> int:
+        b = self._buf
+        j = self._saltar(i, ".…")
+        puntos = b[i:j]
+        j = self._saltar(j, _CIERRES)
+        if j == len(b):
+            return _ESPERAR
+        if not b[j].isspace():
+            return _NO       # 3.5, 1.000, p.ej, www.algo
+        inicio = self._inicio(j)
+        if inicio is None:
+            return _ESPERAR
+
+        if puntos == "…" or len(puntos) > 1:
+            # puntos suspensivos: oración si sigue mayúscula; si no, pausa
+            return j if inicio else self._clausula(j)
+
+        m = _PALABRA.search(b, 0, i)
+        palabra = m.group(1).lstrip(_APERTURAS).lower() if m else ""
+        if palabra in ABREVIATURAS_FINALES:
+            return j if inicio else _NO
+        if palabra in ABREVIATURAS or (len(palabra) == 1 and palabra.isalpha()):
+            return _NO
+        if palabra.isdigit() and b[:i].strip() == palabra:
+            return _NO       # "1. " al inicio: ítem de lista
+        return j if inicio else _NO
+
+    def _clausula(self, fin: int) -> int:
+        b = self._buf[:fin]
+        if b.count("¿") + b.count("¡") > b.count("?") + b.count("!"):
+            return _NO   # dentro de una pregunta/exclamación: se corta entera
+        minimo = self.min_primera if self.emitidos == 0 else self.min_clausula
+        return fin if len(b.strip()) >= minimo else _NO
+
+    def _inicio(self, j: int) -> Optional[bool]:
+        """¿Lo que sigue a los espacios desde j abre oración? None si aún no llegó."""
+        k = self._saltar(j, " \t\r\n")
+        if k == len(self._buf):
+            return None
+        c = self._buf[k]
+        return c.isupper() or c.isdigit() or c in _APERTURAS
+
+    def _saltar(self, i: int, chars: str) -> int:
+        while i < len(self._buf) and self._buf[i] in chars:
+            i += 1
+        return i
+
+
+def segmentar(texto: str, **kw) -> List[str]:
+    """Segmenta un texto completo como si llegara en un solo token."""
+    seg = Segmentador(**kw)
+    return seg.agregar(texto) + seg.cerrar()
@@ -0,0 +1,266 @@
+# stt_aec.py
+# Cancelación de eco acústico: retardo por GCC-PHAT y filtro NLMS por bloques
+# en frecuencia (particionado). Solo numpy (>= 2.0: FFT con `out=`); el estado
+# y los buffers de trabajo se reservan al construir, ningún bloque reserva memoria.
+from typing import Optional, Tuple
+
+import numpy as np
+
+SR_AEC = 16000
+
+
+class GccPhat:
+    """
+    Retardo micrófono respecto de la referencia por GCC-PHAT: correlación
+    cruzada con el espectro blanqueado (solo fase), robusta a la coloración
+    del parlante y la sala. `estimar(mic, ref)` compara las últimas `n`
+    muestras del micrófono con las últimas `n + lag_max` de la referencia
+    (la misma ventana más el pasado que pudo haber sonado antes), así la
+    superposición es completa para cualquier retardo. Devuelve
+    `(retardo, pico)`: retardo en [0, lag_max] muestras y pico (0..1) como
+    confianza.
+    """
+
+    def __init__(self, n: int, lag_max: int):
+        self.n = int(n)
+        self.lag_max = int(lag_max)
+        self.tam = 1 << int(np.ceil(np.log2(self.n + self.lag_max)))
+        k = self.tam // 2 + 1
+        self._ventana = np.hanning(self.n)
+        self._a = np.zeros(self.tam)
+        self._b = np.zeros(self.tam)
+        self._r = np.empty(k, dtype=np.complex128)
+        self._rb = np.empty(k, dtype=np.complex128)
+        self._mag = np.empty(k)
+        self._cc = np.empty(self.tam)
+
+    def estimar(self, mic: np.ndarray, ref: np.ndarray) -> Tuple[int, float]:
+        n = self.n
+        m = n + self.lag_max
+        np.multiply(mic[-n:], self._ventana, out=self._a[:n])
+        self._b[:m] = ref[-m:]
+        # cc[j] = sum_t mic[t] ref[t + j]; el retardo es lag_max - j
+        np.fft.rfft(self._a, out=self._r)
+        np.conjugate(self._r, out=self._r)
+        self._r *= np.fft.rfft(self._b, out=self._rb)
+        np.abs(self._r, out=self._mag)
+        self._mag += 1e-12
+        self._r /= self._mag
+        cc = np.fft.irfft(self._r, self.tam, out=self._cc)[:self.lag_max + 1]
+        j = int(np.argmax(cc))
+        return self.lag_max - j, float(cc[j])
+
+
+class BlockNlms:
+    """
+    Filtro adaptativo NLMS en frecuencia por bloques, particionado (MDF):
+    `taps` coeficientes repartidos en P particiones de `bloque` muestras,
+    FFT de 2*bloque, paso normalizado por la potencia de la referencia en
+    cada bin y restricción de gradiente (convolución lineal, no circular).
+
+    `procesar(mic, ref, out)` recibe bloques alineados en tiempo (la
+    referencia ya compensada del retardo grueso) de largo múltiplo de
+    `bloque` y escribe en `out` el micrófono sin eco.
+
+    En doble habla se congela la adaptación (adaptar con la voz del usuario
+    en el error desajusta el filtro): con el filtro ya convergido, un bloque
+    cuyo residuo supera `dtd` veces la energía del eco estimado es doble
+    habla. Para no
+    quedar congelado si cambia el camino de eco, tras `max_congelados`
+    bloques seguidos vuelve a adaptar. `geigel` agrega el detector clásico
+    (|mic| > geigel * max|ref|), que depende de la ganancia
+    parlante→micrófono y por eso va apagado salvo que se calibre.
+    `erle_db` es la atenuación del eco estimada (suavizada).
+    """
+
+    def __init__(self, bloque: int = 160, taps: int = 2048, mu: float = 0.5,
+                 dtd: Optional[float] = 1.0, max_congelados: int = 50,
+                 geigel: Optional[float] = None, suavizado: float = 0.9):
+        self.bloque = n = int(bloque)
+        self.particiones = p = max(1, -(-int(taps) // n))
+        self.mu = mu
+        self.dtd = dtd
+        self.max_congelados = max_congelados
+        self.geigel = geigel
+        self.beta = suavizado
+        k = n + 1
+        self._x = np.zeros(2 * n)                   # últimos dos bloques de referencia
+        self._e = np.zeros(2 * n)                   # [ceros | error] para el gradiente
+        self._X = np.zeros((p, k), dtype=np.complex128)  # espectros de referencia (circular)
+        self._W = np.zeros((p, k), dtype=np.complex128)  # filtro por partición
+        self._prod = np.empty((p, k), dtype=np.complex128)
+        self._Y = np.empty(k, dtype=np.complex128)
+        self._E = np.empty(k, dtype=np.complex128)  # espectro del error
+        self._y = np.empty(2 * n)                   # irfft de Y (la salida es la mitad final)
+        self._g = np.empty((p, 2 * n))              # gradiente por partición
+        self._pot = np.full(k, 1e-6)
+        self._paso = np.empty(k)
+        self._xmax = np.zeros(p)                    # máximo |ref| por bloque (Geigel)
+        self._i = 0
+        self._pd = 1e-10
+        self._pe = 1e-10
+        self.erle_db = 0.0
+        self.congelados = 0
+        self.convergido = False  # ERLE > 6 dB alguna vez desde el último reset
+        self._seguidos = 0
+
+    def reset(self):
+        for a in (self._x, self._e, self._X, self._W, self._xmax):
+            a.fill(0)
+        self._pot.fill(1e-6)
+        self._i = 0
+        self._pd = self._pe = 1e-10
+        self.erle_db = 0.0
+        self.convergido = False
+        self._seguidos = 0
+
+    def _ordenado(self, a, out: np.ndarray, conj: bool = False):
+        """out[j] = a[j] * X retrasado j bloques (o su conjugado), sin copiar el historial."""
+        i, p = self._i, self.particiones
+        if conj:
+            np.conjugate(self._X[i:], out=out[:p - i])
+            np.conjugate(self._X[:i], out=out[p - i:])
+            out *= a
+        else:
+            np.multiply(a[:p - i], self._X[i:], out=out[:p - i])
+            np.multiply(a[p - i:], self._X[:i], out=out[p - i:])
+
+    def procesar(self, mic: np.ndarray, ref: np.ndarray, out: np.ndarray) -> np.ndarray:
+        n = self.bloque
+        for j in range(0, len(mic), n):
+            self._bloque(mic[j:j + n], ref[j:j + n], out[j:j + n])
+        return out
+
+    def _bloque(self, d: np.ndarray, x: np.ndarray, out: np.ndarray):
+        n, p = self.bloque, self.particiones
+        self._x[:n] = self._x[n:]
+        self._x[n:] = x
+        self._i = (self._i - 1) % p
+        np.fft.rfft(self._x, out=self._X[self._i])
+        self._xmax[self._i] = max(x.max(), -x.min())
+
+        # salida: e = d - y, con y = últimas n muestras de irfft(sum W_j X_j)
+        self._ordenado(self._W, self._prod)
+        np.sum(self._prod, axis=0, out=self._Y)
+        y = np.fft.irfft(self._Y, 2 * n, out=self._y)[n:]
+        np.subtract(d, y, out=out)
+
+        pd, pe = float(np.dot(d, d)), float(np.dot(out, out))
+        self._pd = self.beta * self._pd + (1 - self.beta) * pd
+        self._pe = self.beta * self._pe + (1 - self.beta) * pe
+        self.erle_db = 10 * np.log10(self._pd / max(self._pe, 1e-12))
+
+        xmax = self._xmax.max()
+        if xmax <= 1e-6:
+            return
+        # detectores solo con el filtro ya convergido; antes todo el eco "parece" doble habla
+        # (no se usa erle_db: en doble habla cae por la voz del usuario)
+        self.convergido = self.convergido or self.erle_db > 6
+        if self.convergido and self._seguidos < self.max_congelados and (
+            (self.dtd is not None and pe > self.dtd * float(np.dot(y, y))) or
+            (self.geigel is not None and max(d.max(), -d.min()) > self.geigel * xmax)
+        ):
+            self.congelados += 1
+            self._seguidos += 1
+            return
+        self._seguidos = 0
+
+        # paso normalizado por bin: mu * E / (P * potencia suavizada de X)
+        X0 = self._X[self._i]
+        np.abs(X0, out=self._paso)
+        self._paso **= 2
+        self._pot *= self.beta
+        self._paso *= 1 - self.beta
+        self._pot += self._paso
+        np.multiply(self._pot, p, out=self._paso)
+        self._paso += 1e-6
+        np.divide(self.mu, self._paso, out=self._paso)
+        self._e[n:] = out
+        np.fft.rfft(self._e, out=self._E)
+        self._E *= self._paso
+
+        # gradiente por partición con restricción (anula la mitad circular)
+        self._ordenado(self._E, self._prod, conj=True)
+        np.fft.irfft(self._prod, 2 * n, axis=1, out=self._g)
+        self._g[:, n:] = 0
+        self._W += np.fft.rfft(self._g, axis=1, out=self._prod)
+
+
+class EchoCanceller:
+    """
+    GCC-PHAT + BlockNlms para bloques contemporáneos de micrófono y
+    referencia (la referencia sin alinear, tal como sonó).
+
+    Guarda `lag_max_ms` de referencia y `ventana_s` de ambos; cada `cada_s`
+    reestima el retardo y, si cambia más de un bloque, reinicia el filtro.
+    El filtro arranca `bloque` muestras antes del retardo estimado para
+    tolerar error de estimación. `procesar(mic, ref)` acepta float32 en
+    [-1, 1] de largo múltiplo de `bloque` y devuelve una vista de un buffer
+    interno con el micrófono sin eco (válida hasta la próxima llamada).
+    """
+
+    def __init__(self, sr: int = SR_AEC, bloque: int = 160, filtro_ms: float = 128,
+                 lag_max_ms: float = 500, ventana_s: float = 1.0, cada_s: float = 0.5,
+                 confianza: float = 0.08, mu: float = 0.5, dtd: Optional[float] = 1.0,
+                 geigel: Optional[float] = None, max_bloque: int = 4096):
+        self.sr = sr
+        self.bloque = bloque
+        self.nlms = BlockNlms(bloque, int(sr * filtro_ms / 1000), mu=mu, dtd=dtd, geigel=geigel)
+        self.lag_max = int(sr * lag_max_ms / 1000)
+        self.ventana = int(sr * ventana_s)
+        self.gcc = GccPhat(self.ventana, self.lag_max)
+        self.cada = int(sr * cada_s)
+        self.confianza = confianza
+        self._ref = np.zeros(self.lag_max + self.ventana + max_bloque)
+        self._mic = np.zeros(self.ventana)
+        self._out = np.zeros(max_bloque)
+        self._hasta_estimar = self.cada
+        self._llenas = 0
+        self.retardo = 0          # muestras
+        self.pico = 0.0
+        self.reinicios = 0
+
+    @property
+    def retardo_ms(self) -> float:
+        return 1000 * self.retardo / self.sr
+
+    @property
+    def erle_db(self) -> float:
+        return self.nlms.erle_db
+
+    def reset(self):
+        self.nlms.reset()
+        self._ref.fill(0)
+        self._mic.fill(0)
+        self._llenas = 0
+        self._hasta_estimar = self.cada
+
+    def procesar(self, mic: np.ndarray, ref: np.ndarray) -> np.ndarray:
+        n = len(mic)
+        self._ref[:-n] = self._ref[n:]
+        self._ref[-n:] = ref
+        self._mic[:-n] = self._mic[n:]
+        self._mic[-n:] = mic
+        self._llenas = min(self._llenas + n, self.ventana)
+
+        self._hasta_estimar -= n
+        if self._hasta_estimar <= 0 and self._llenas >= self.ventana:
+            self._hasta_estimar = self.cada
+            self._estimar()
+
+        d = max(0, self.retardo - self.bloque)
+        fin = len(self._ref) - d
+        return self.nlms.procesar(mic, self._ref[fin - n:fin], self._out[:n])
+
+    def _estimar(self):
+        ref = self._ref[-(self.ventana + self.lag_max):]
+        if float(np.dot(ref, ref)) < 1e-6 * len(ref):
+            return  # sin referencia no hay retardo que medir
+        lag, pico = self.gcc.estimar(self._mic, ref)
+        if pico < self.confianza:
+            return
+        self.pico = pico
+        if abs(lag - self.retardo) > self.bloque:
+            self.retardo = lag
+            self.nlms.reset()
+            self.reinicios += 1
@@ -0,0 +1,262 @@
+# stt_echo.py
+# Supresión de eco por señal de referencia: lo que suena por el parlante
+# (VoicePlater) contra lo que entra por el micrófono.
+import threading, time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    from agente.audio_resample import Resampler, a_float32
+except ImportError:  # server02/backend/agente usa imports planos
+    from audio_resample import Resampler, a_float32
+
+SR_REF = 16000
+
+
+class ReferenceRing:
+    """
+    Línea de tiempo de lo que suena por el parlante, a 16 kHz sobre el reloj
+    `time.monotonic()`.
+
+    `publicar(pcm, sr, t)` ubica el bloque en el instante en que empieza a
+    sonar: `t` (o ahora) más `latencia`, pero nunca antes del final de lo ya
+    publicado, igual que una cola de reproducción. Lo que no se publicó es
+    silencio. `leer(t0, t1)` devuelve la referencia de ese intervalo.
+
+    El audio se lleva a 16 kHz con un `Resampler` por tasa de entrada, con
+    estado entre chunks contiguos (Piper publica a 22.05 kHz por chunk);
+    tras un corte o un hueco se reinicia.
+    """
+
+    def __init__(self, segundos: float = 20.0, sr: int = SR_REF, latencia: float = 0.0):
+        self.sr = sr
+        self.capacity = int(segundos * sr)
+        self.latencia = latencia
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self._t0 = time.monotonic()
+        self._fin = 0  # índice absoluto donde termina lo publicado
+        self._rs: Dict[int, Resampler] = {}
+        self._lock = threading.Lock()
+
+    def _idx(self, t: float) -> int:
+        return int(round((t - self._t0) * self.sr))
+
+    def _escribir(self, i: int, x: np.ndarray):
+        if len(x) > self.capacity:
+            i, x = i + len(x) - self.capacity, x[-self.capacity:]
+        j = i % self.capacity
+        k = min(len(x), self.capacity - j)
+        self._buf[j:j + k] = x[:k]
+        self._buf[:len(x) - k] = x[k:]
+
+    def publicar(self, pcm, sr: int, t: Optional[float] = None) -> float:
+        """Agrega audio de salida (int16 o float32). Devuelve cuándo empieza a sonar."""
+        with self._lock:
+            rs = self._rs.get(sr)
+            if rs is None:
+                rs = self._rs[sr] = Resampler(sr, self.sr)
+            inicio = self._idx((time.monotonic() if t is None else t) + self.latencia)
+            if inicio > self._fin:
+                hueco = min(inicio - self._fin, self.capacity)
+                self._escribir(inicio - hueco, np.zeros(hueco, dtype=np.float32))
+                rs.reset()  # no es continuación de lo anterior
+            inicio = max(inicio, self._fin)
+            x = rs.procesar(pcm)
+            self._escribir(inicio, x)
+            self._fin = inicio + len(x)
+        return self._t0 + inicio / self.sr
+
+    def cortar(self, t: Optional[float] = None):
+        """Corte de reproducción: lo publicado a futuro ya no va a sonar."""
+        with self._lock:
+            i = self._idx(time.monotonic() if t is None else t)
+            if self._fin > i:
+                self._escribir(i, np.zeros(min(self._fin - i, self.capacity), dtype=np.float32))
+                self._fin = i
+            for rs in self._rs.values():
+                rs.reset()
+
+    def sonando_hasta(self) -> float:
+        """Instante (monotonic) en que termina lo publicado."""
+        return self._t0 + self._fin / self.sr
+
+    def leer(self, t0: float, t1: float) -> Optional[np.ndarray]:
+        """Copia de la referencia en [t0, t1); None si en ese intervalo no sonaba nada."""
+        return self._copiar(self._idx(t0), self._idx(t1))
+
+    def leer_bloque(self, t_fin: float, n: int, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Las `n` muestras que terminan en `t_fin` (largo exacto, para el AEC).
+        Con `out` (float32 de `n` muestras) escribe ahí en vez de reservar.
+        """
+        i1 = self._idx(t_fin)
+        return self._copiar(i1 - n, i1, out)
+
+    def _copiar(self, i0: int, i1: int, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        with self._lock:
+            hasta = min(i1, self._fin)
+            if hasta <= i0 or self._fin - i0 > self.capacity:
+                return None
+            if out is None:
+                out = np.zeros(i1 - i0, dtype=np.float32)
+            j = i0 % self.capacity
+            n = hasta - i0
+            k = min(n, self.capacity - j)
+            out[:k] = self._buf[j:j + k]
+            out[k:n] = self._buf[:n - k]
+            out[n:] = 0
+            return out
+
+
+class _Espacio:
+    """Buffers de EchoGate.procesar para un largo de bloque (se reservan una vez)."""
+
+    def __init__(self, n: int, lag_max: int):
+        self.n = n
+        largo = n + lag_max                                  # referencia que se compara
+        lags = largo - n + 1
+        self.tam = tam = 1 << int(np.ceil(np.log2(largo + n)))
+        k = tam // 2 + 1
+        self.m = np.empty(n, dtype=np.float32)                # micrófono
+        self.r = np.empty(largo, dtype=np.float32)            # referencia
+        self.x = np.empty(n, dtype=np.float32)                # referencia alineada (AEC)
+        self.mc = np.zeros(tam)                               # micrófono centrado + ceros
+        self.rc = np.zeros(tam)                               # referencia + ceros
+        self.M = np.empty(k, dtype=np.complex128)
+        self.R = np.empty(k, dtype=np.complex128)
+        self.c = np.empty(tam)                                # correlación cruzada
+        self.r2 = np.empty(largo)
+        self.acum = np.zeros(largo + 1)                       # energía acumulada de r
+        self.er = np.empty(lags)                              # energía de r por retardo
+        self.ncc = np.empty(lags)
+        self.den = np.empty(lags)
+        self.res = np.empty(n)                                # residuo de la resta
+        self.esc = np.empty(n)                                # float -> int16
+        self.i16 = np.empty(n, dtype=np.int16)
+
+
+class EchoGate:
+    """
+    Clasifica cada bloque del micrófono contra la referencia, buscando el
+    retardo parlante→micrófono en [0, `lag_max_ms`] por correlación cruzada
+    normalizada (FFT):
+
+      "limpio": no sonaba nada; el bloque pasa tal cual
+      "eco":    correlación >= `umbral_eco`: es la voz propia y no debe
+                llegar al decoder
+      "doble":  correlación >= `umbral_doble`: se resta la referencia
+                alineada (ganancia por mínimos cuadrados) y pasa el residuo
+      "voz":    sonaba algo pero el micrófono no se le parece; pasa tal cual
+
+    `procesar(pcm, t_fin)` recibe el bloque int16 y el instante monotonic en
+    que terminó de capturarse, y devuelve `(estado, pcm)` del mismo tipo.
+
+    Con `aec` (un `stt_aec.EchoCanceller`) todo bloque con referencia pasa
+    por el cancelador adaptativo, y en "doble" y "voz" se devuelve su salida
+    en lugar de la resta de una sola ganancia; además, con el filtro
+    convergido, un bloque que el AEC atenúa `erle_eco_db` o más es "eco"
+    aunque la reverberación baje la correlación directa. Como el AEC necesita la
+    referencia continua, los bloques se ubican con el reloj de muestras del
+    micrófono, re-anclado a `t_fin` solo si se desvía más de 50 ms.
+    Los buffers de trabajo se reservan por largo de bloque (una vez, el
+    micrófono manda bloques fijos); solo el bloque devuelto es nuevo.
+    """
+
+    def __init__(self, ref: ReferenceRing, lag_max_ms: float = 500, umbral_eco: float = 0.7,
+                 umbral_doble: float = 0.3, energia_min: float = 1e-6, aec=None,
+                 erle_eco_db: float = 12.0):
+        self.ref = ref
+        self.aec = aec
+        self.erle_eco = 10 ** (erle_eco_db / 10)
+        self._t_mic: Optional[float] = None
+        self.sr = ref.sr
+        self.lag_max = int(self.sr * lag_max_ms / 1000)
+        self.umbral_eco = umbral_eco
+        self.umbral_doble = umbral_doble
+        self.energia_min = energia_min
+        self.lag_ms: Optional[float] = None  # último retardo estimado
+        self.corr = 0.0
+        self.estados: Dict[str, int] = {"limpio": 0, "eco": 0, "doble": 0, "voz": 0}
+        self._e: Optional[_Espacio] = None
+
+    def procesar(self, pcm, t_fin: float) -> Tuple[str, object]:
+        n = len(pcm) // 2 if isinstance(pcm, (bytes, bytearray, memoryview)) else len(pcm)
+        if n == 0:
+            return self._fin("limpio", pcm)
+        e = self._e
+        if e is None or e.n != n:
+            e = self._e = _Espacio(n, self.lag_max)
+        m = a_float32(pcm, out=e.m)
+        t_fin = self._reloj(t_fin, n)
+        r = self.ref.leer_bloque(t_fin, n + self.lag_max, out=e.r)
+        if r is None or float(np.dot(r, r)) < self.energia_min * len(r):
+            return self._fin("limpio", pcm)
+
+        y = None  # salida del AEC
+        if self.aec is not None:
+            x = self.ref.leer_bloque(t_fin, n, out=e.x)
+            if x is None:
+                e.x.fill(0)
+            y = self.aec.procesar(m, e.x)
+            if self.aec.nlms.convergido and float(np.dot(m, m)) > self.erle_eco * float(np.dot(y, y)):
+                return self._fin("eco", pcm)
+
+        mc = e.mc[:n]
+        np.subtract(m, m.mean(), out=mc)
+        em = float(np.dot(mc, mc))
+        if em < self.energia_min * n:
+            return self._fin("eco", pcm)  # el micrófono no capta nada y el parlante suena
+
+        # c[k] = <m, r[k:k+n]>; el retardo es (len(r) - n) - k
+        lags = len(r) - n + 1
+        e.rc[:len(r)] = r
+        np.fft.rfft(e.rc, out=e.R)
+        np.fft.rfft(e.mc, out=e.M)
+        np.conjugate(e.M, out=e.M)
+        e.R *= e.M
+        c = np.fft.irfft(e.R, e.tam, out=e.c)[:lags]
+        np.square(e.rc[:len(r)], out=e.r2)
+        np.cumsum(e.r2, out=e.acum[1:])
+        er = np.subtract(e.acum[n:], e.acum[:-n], out=e.er)
+        np.maximum(er, 1e-12, out=e.den)
+        e.den *= em
+        np.sqrt(e.den, out=e.den)
+        np.abs(c, out=e.ncc)
+        ncc = np.divide(e.ncc, e.den, out=e.ncc)
+        k = int(np.argmax(ncc))
+        self.corr = float(ncc[k])
+        self.lag_ms = round(1000 * (lags - 1 - k) / self.sr, 1)
+
+        if self.corr >= self.umbral_eco:
+            return self._fin("eco", pcm)
+        if self.corr >= self.umbral_doble:
+            if y is None:
+                g = c[k] / max(er[k], 1e-12)
+                np.multiply(r[k:k + n], g, out=e.res)
+                y = np.subtract(m, e.res, out=e.res)
+            return self._fin("doble", self._como(pcm, y))
+        return self._fin("voz", pcm if y is None else self._como(pcm, y))
+
+    def _reloj(self, t_fin: float, n: int) -> float:
+        if self._t_mic is None or abs(self._t_mic + n / self.sr - t_fin) > 0.05:
+            self._t_mic = t_fin
+        else:
+            self._t_mic += n / self.sr
+        return self._t_mic
+
+    def _como(self, pcm, x: np.ndarray):
+        """float [-1, 1] -> int16 (bytes si la entrada era bytes); una copia nueva."""
+        e = self._e
+        np.multiply(x, 32767, out=e.esc)
+        np.clip(e.esc, -32768, 32767, out=e.esc)
+        e.i16[:] = e.esc
+        return e.i16.tobytes() if isinstance(pcm, (bytes, bytearray, memoryview)) else e.i16.copy()
+
+    def _fin(self, estado: str, pcm):
+        self.estados[estado] += 1
+        return estado, pcm
+
+
+# Referencia del proceso: VoicePlater publica, Microfono la consulta.
+referencia = ReferenceRing()
@@ -0,0 +1,160 @@
+# stt_metrics.py
+# Métricas en proceso de la capa STT: contadores, gauges e histogramas baratos.
+import threading, time
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional
+
+# Límites (ms) de los histogramas de tiempos; el último bucket es "más que eso".
+LIMITES_MS = (5, 10, 20, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+LIMITES_RTF = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+
+class Histograma:
+    """Buckets fijos: observar es un bisect sobre ~15 límites y tres sumas."""
+    __slots__ = ("limites", "cuentas", "n", "suma", "maximo")
+
+    def __init__(self, limites=LIMITES_MS):
+        self.limites = tuple(limites)
+        self.cuentas = [0] * (len(self.limites) + 1)
+        self.n = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def observe(self, v: float):
+        self.cuentas[bisect_right(self.limites, v)] += 1
+        self.n += 1
+        self.suma += v
+        if v > self.maximo:
+            self.maximo = v
+
+    def percentil(self, q: float) -> float:
+        """Cota superior del bucket que contiene el percentil q (0..1)."""
+        if self.n == 0:
+            return 0.0
+        objetivo = q * self.n
+        acum = 0
+        for i, c in enumerate(self.cuentas):
+            acum += c
+            if acum >= objetivo:
+                return min(self.limites[i], self.maximo) if i < len(self.limites) else self.maximo
+        return self.maximo
+
+    def snapshot(self) -> Dict[str, float]:
+        if self.n == 0:
+            return {"n": 0}
+        return {
+            "n": self.n,
+            "media": round(self.suma / self.n, 2),
+            "p50": self.percentil(0.5),
+            "p95": self.percentil(0.95),
+            "max": round(self.maximo, 2),
+        }
+
+
+class SttMetrics:
+    """
+    Métricas de un componente STT (Microfono, servidor WS).
+
+    `inc`/`gauge`/`observe` se llaman en el camino caliente y solo tocan un
+    dict o un histograma; no formatean nada ni toman locks (con el GIL, en
+    el peor caso se pierde algún incremento concurrente). `snapshot()` es la
+    API de consulta y `resumen()` la línea para el log periódico.
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.contadores: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histos: Dict[str, Histograma] = {}
+        self._fuentes: List[Callable[[], Dict[str, float]]] = []
+        self._t0 = time.monotonic()
+
+    # ---------- camino caliente ----------
+    def inc(self, nombre: str, n: int = 1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def gauge(self, nombre: str, valor: float):
+        self.gauges[nombre] = valor
+
+    def observe(self, nombre: str, valor: float, limites=LIMITES_MS):
+        h = self.histos.get(nombre)
+        if h is None:
+            h = self.histos[nombre] = Histograma(limites)
+        h.observe(valor)
+
+    # ---------- consulta ----------
+    def fuente(self, fn: Callable[[], Dict[str, float]]):
+        """Registra gauges que se leen al consultar (p.ej. contadores del scheduler)."""
+        self._fuentes.append(fn)
+
+    def snapshot(self) -> Dict:
+        gauges = dict(self.gauges)
+        for fn in self._fuentes:
+            try:
+                gauges.update(fn())
+            except Exception:
+                pass
+        return {
+            "nombre": self.nombre,
+            "uptime_s": round(time.monotonic() - self._t0, 1),
+            "contadores": dict(self.contadores),
+            "gauges": gauges,
+            "histogramas": {k: h.snapshot() for k, h in self.histos.items()},
+        }
+
+    def resumen(self) -> str:
+        s = self.snapshot()
+        partes = [f"{k}={v}" for k, v in s["contadores"].items()]
+        partes += [f"{k}={v}" for k, v in s["gauges"].items()]
+        for k, h in s["histogramas"].items():
+            if h["n"]:
+                partes.append(f"{k}[n={h['n']} p50={h['p50']} p95={h['p95']} max={h['max']}]")
+        return f"[{self.nombre}] " + " ".join(partes)
+
+    def reset(self):
+        self.contadores.clear()
+        self.gauges.clear()
+        self.histos.clear()
+        self._t0 = time.monotonic()
+
+
+_registro: Dict[str, SttMetrics] = {}
+
+
+def metricas(nombre: str) -> SttMetrics:
+    """Devuelve (creando si hace falta) las métricas de `nombre`."""
+    m = _registro.get(nombre)
+    if m is None:
+        m = _registro[nombre] = SttMetrics(nombre)
+    return m
+
+
+def snapshot_todas() -> Dict[str, Dict]:
+    return {k: m.snapshot() for k, m in _registro.items()}
+
+
+class ResumenPeriodico:
+    """Hilo daemon que cada `intervalo` s escribe `m.resumen()` si hubo actividad."""
+
+    def __init__(self, m: SttMetrics, intervalo: float, log: Callable[[str], None]):
+        self.m = m
+        self.intervalo = intervalo
+        self.log = log
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ultimo: Dict[str, int] = {}
+
+    def start(self):
+        if self.intervalo <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"metricas-{self.m.nombre}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.intervalo):
+            if self.m.contadores != self._ultimo:
+                self._ultimo = dict(self.m.contadores)
+                self.log(self.m.resumen())
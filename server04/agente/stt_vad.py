@@ -0,0 +1,142 @@
+# stt_vad.py
+# Detección de voz y endpointing para el micrófono local.
+# Backends: WebRTC VAD (ligero) y Silero (más preciso), como en
+# server02/backend/STT/old/VAD_detectarActividadVoz.py.
+from collections import deque
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from agente.stt_audio import pcm16_to_float32
+
+try:
+    import webrtcvad
+    HAS_WEBRTC = True
+except Exception:
+    HAS_WEBRTC = False
+
+try:
+    import torch
+    from silero_vad import load_silero_vad
+    HAS_SILERO = True
+except Exception:
+    HAS_SILERO = False
+
+
+class WebRtcVad:
+    """WebRTC VAD: frames de 10/20/30 ms en int16."""
+
+    def __init__(self, sample_rate: int = 16000, aggressiveness: int = 2, frame_ms: int = 30):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        return self._vad.is_speech(frame.tobytes(), sample_rate=self.sample_rate)
+
+
+class SileroVad:
+    """Silero VAD: frames de 512 muestras a 16 kHz, probabilidad >= threshold."""
+
+    def __init__(self, sample_rate: int = 16000, threshold: float = 0.5):
+        self.sample_rate = sample_rate
+        self.frame_samples = 512
+        self.threshold = threshold
+        self._model = load_silero_vad(onnx=True)
+        self._f32 = np.empty(self.frame_samples, dtype=np.float32)
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        audio = torch.from_numpy(pcm16_to_float32(frame, out=self._f32))
+        return self._model(audio, self.sample_rate).item() >= self.threshold
+
+    def reset(self):
+        self._model.reset_states()
+
+
+def crear_vad(backend: Optional[str], sample_rate: int = 16000):
+    """'webrtc' | 'silero' | None. Devuelve None si la librería no está instalada."""
+    if backend == "webrtc" and HAS_WEBRTC:
+        return WebRtcVad(sample_rate)
+    if backend == "silero" and HAS_SILERO:
+        return SileroVad(sample_rate)
+    return None
+
+
+class Endpointer:
+    """
+    Segmenta el audio en locuciones a partir de un VAD por frames.
+
+    `feed(pcm)` devuelve eventos en orden:
+      ("inicio", None)  -> empieza una locución (tras `start_ms` de voz seguida)
+      ("voz", pcm)      -> audio que pertenece a la locución (incluye pre-roll
+                           y el silencio de hangover); el resto se descarta
+      ("fin", None)     -> `hangover_ms` de silencio tras la voz
+    """
+
+    def __init__(self, vad, sample_rate: int = 16000, preroll_ms: int = 300,
+                 hangover_ms: int = 600, start_ms: int = 90):
+        self.vad = vad
+        self.frame = vad.frame_samples
+        ms_por_frame = 1000 * self.frame / sample_rate
+        self.start_frames = max(1, int(round(start_ms / ms_por_frame)))
+        self.hangover_frames = max(1, int(round(hangover_ms / ms_por_frame)))
+        self._preroll: deque = deque(maxlen=max(1, int(round(preroll_ms / ms_por_frame))))
+        self._pend = np.zeros(self.frame, dtype=np.int16)
+        self._npend = 0
+        self.in_speech = False
+        self._voiced = 0
+        self._silence = 0
+
+    def reset(self):
+        if hasattr(self.vad, "reset"):
+            self.vad.reset()
+        self._preroll.clear()
+        self._npend = 0
+        self.in_speech = False
+        self._voiced = 0
+        self._silence = 0
+
+    def _frames(self, pcm: np.ndarray):
+        """Parte el chunk en frames del VAD, guardando el resto para el próximo."""
+        i = 0
+        if self._npend:
+            k = min(self.frame - self._npend, len(pcm))
+            self._pend[self._npend:self._npend + k] = pcm[:k]
+            self._npend += k
+            i = k
+            if self._npend < self.frame:
+                return
+            yield self._pend.copy()
+            self._npend = 0
+        while i + self.frame <= len(pcm):
+            yield pcm[i:i + self.frame]
+            i += self.frame
+        resto = len(pcm) - i
+        if resto:
+            self._pend[:resto] = pcm[i:]
+            self._npend = resto
+
+    def feed(self, pcm) -> List[Tuple[str, Optional[np.ndarray]]]:
+        if isinstance(pcm, (bytes, bytearray, memoryview)):
+            pcm = np.frombuffer(pcm, dtype=np.int16)
+        eventos: List[Tuple[str, Optional[np.ndarray]]] = []
+        for frame in self._frames(pcm):
+            voz = self.vad.is_speech(frame)
+            if not self.in_speech:
+                self._preroll.append(frame)
+                self._voiced = self._voiced + 1 if voz else 0
+                if self._voiced >= self.start_frames:
+                    self.in_speech = True
+                    self._silence = 0
+                    eventos.append(("inicio", None))
+                    eventos.extend(("voz", f) for f in self._preroll)
+                    self._preroll.clear()
+                continue
+
+            eventos.append(("voz", frame))
+            self._silence = 0 if voz else self._silence + 1
+            if self._silence >= self.hangover_frames:
+                self.in_speech = False
+                self._voiced = 0
+                eventos.append(("fin", None))
+        return eventos
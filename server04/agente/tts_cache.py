@@ -0,0 +1,223 @@
+# tts_cache.py
+# Caché de audio TTS direccionada por contenido: la clave es el hash del
+# texto normalizado, el modelo de voz y los parámetros de síntesis. Dos
+# niveles: memoria (LRU chico con las frases calientes) y disco (LRU acotado
+# en bytes, un blob PCM int16 por clave).
+import hashlib, json, os, re, struct, threading, unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache", "tts")
+MAX_DISCO = 256 * 1024 * 1024       # bytes en disco
+MAX_MEMORIA = 16 * 1024 * 1024      # bytes en memoria
+MAX_BLOB_MEMORIA = MAX_MEMORIA // 8  # los blobs más grandes solo van a disco
+
+EXT = ".pcm"
+# cabecera del blob: magia, tasa de muestreo, segundos que costó sintetizarlo
+_CABECERA = struct.Struct("<4sIf")
+_MAGIA = b"TTS1"
+
+
+def normalizar(texto: str) -> str:
+    """NFC, espacios colapsados y sin bordes: variantes que Piper pronuncia igual."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", texto)).strip()
+
+
+def id_modelo(path: str) -> str:
+    """Identidad barata del modelo: nombre, tamaño y mtime del .onnx."""
+    st = os.stat(path)
+    return f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def parametros_piper(voz) -> Dict:
+    """Parámetros de síntesis de una PiperVoice que cambian el audio."""
+    cfg = voz.config
+    return {k: getattr(cfg, k, None) for k in
+            ("sample_rate", "length_scale", "noise_scale", "noise_w_scale", "espeak_voice")}
+
+
+class TtsCache:
+    """
+    `get(clave)` devuelve (pcm int16 bytes, sr) o None; `put(clave, pcm, sr, s)`
+    guarda lo sintetizado (s = segundos que costó, para contar lo ahorrado).
+
+    El LRU de disco se ordena por mtime (se toca en cada acierto), así
+    sobrevive a reinicios; al pasar `max_disco` se borran los menos usados.
+    La escritura es atómica (archivo temporal + os.replace). Thread-safe.
+    """
+
+    def __init__(self, directorio: str = CACHE_DIR, max_disco: int = MAX_DISCO,
+                 max_memoria: int = MAX_MEMORIA, log: Callable[[str], None] = print):
+        self.dir = os.path.abspath(directorio)
+        os.makedirs(self.dir, exist_ok=True)
+        self.max_disco = max_disco
+        self.max_memoria = max_memoria
+        self.log = log
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, Tuple[bytes, int, float]]" = OrderedDict()
+        self._bytes_mem = 0
+        self._disco: "OrderedDict[str, int]" = OrderedDict()  # clave -> bytes, del menos al más usado
+        self._bytes_disco = 0
+
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.bytes_ahorrados = 0        # PCM servido sin sintetizar
+        self.segundos_ahorrados = 0.0   # síntesis evitada
+        self._indexar()
+
+    def _indexar(self):
+        archivos = []
+        for nombre in os.listdir(self.dir):
+            if not nombre.endswith(EXT):
+                continue
+            try:
+                st = os.stat(os.path.join(self.dir, nombre))
+            except OSError:
+                continue
+            archivos.append((st.st_mtime, nombre[:-len(EXT)], st.st_size))
+        for _, clave, n in sorted(archivos):
+            self._disco[clave] = n
+            self._bytes_disco += n
+        with self._lock:
+            self._evictar_disco()
+
+    # ---------- claves ----------
+    @staticmethod
+    def clave(texto: str, modelo: str, params: Dict) -> str:
+        datos = json.dumps({"texto": normalizar(texto), "modelo": modelo, "params": params},
+                           sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.dir, clave + EXT)
+
+    # ---------- consulta ----------
+    def get(self, clave: str) -> Optional[Tuple[bytes, int]]:
+        with self._lock:
+            ent = self._mem.get(clave)
+            en_disco = clave in self._disco
+            if ent is not None:
+                self._mem.move_to_end(clave)
+                if en_disco:
+                    self._disco.move_to_end(clave)
+                self.aciertos_memoria += 1
+                res = self._servir(ent)
+        if ent is not None:
+            if en_disco:
+                try:
+                    os.utime(self._ruta(clave))  # el orden de disco sobrevive a reinicios
+                except OSError:
+                    pass
+            return res
+
+        if en_disco:
+            ruta = self._ruta(clave)
+            try:
+                with open(ruta, "rb") as f:
+                    blob = f.read()
+                magia, sr, seg = _CABECERA.unpack_from(blob)
+                if magia != _MAGIA:
+                    raise ValueError("cabecera inválida")
+                os.utime(ruta)
+            except (OSError, ValueError, struct.error) as e:
+                self.log(f"[TtsCache] blob ilegible {clave[:12]}: {e}")
+                with self._lock:
+                    self._borrar(clave)
+            else:
+                ent = (blob[_CABECERA.size:], sr, seg)
+                with self._lock:
+                    if clave in self._disco:
+                        self._disco.move_to_end(clave)
+                    self.aciertos_disco += 1
+                    self._a_memoria(clave, ent)
+                    return self._servir(ent)
+
+        with self._lock:
+            self.fallos += 1
+        return None
+
+    def _servir(self, ent: Tuple[bytes, int, float]) -> Tuple[bytes, int]:
+        pcm, sr, seg = ent
+        self.bytes_ahorrados += len(pcm)
+        self.segundos_ahorrados += seg
+        return pcm, sr
+
+    # ---------- alta ----------
+    def put(self, clave: str, pcm: bytes, sr: int, segundos: float = 0.0):
+        if not pcm:
+            return
+        ruta = self._ruta(clave)
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_CABECERA.pack(_MAGIA, int(sr), float(segundos)))
+                f.write(pcm)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            self.log(f"[TtsCache] no se pudo guardar {clave[:12]}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            n = _CABECERA.size + len(pcm)
+            self._bytes_disco += n - self._disco.pop(clave, 0)
+            self._disco[clave] = n
+            self._a_memoria(clave, (bytes(pcm), int(sr), float(segundos)))
+            self._evictar_disco()
+
+    # ---------- LRU ----------
+    def _a_memoria(self, clave: str, ent: Tuple[bytes, int, float]):
+        if len(ent[0]) > MAX_BLOB_MEMORIA:
+            return
+        viejo = self._mem.pop(clave, None)
+        if viejo is not None:
+            self._bytes_mem -= len(viejo[0])
+        self._mem[clave] = ent
+        self._bytes_mem += len(ent[0])
+        while self._bytes_mem > self.max_memoria and self._mem:
+            _, (pcm, _, _) = self._mem.popitem(last=False)
+            self._bytes_mem -= len(pcm)
+
+    def _evictar_disco(self):
+        while self._bytes_disco > self.max_disco and self._disco:
+            clave = next(iter(self._disco))
+            self._borrar(clave)
+
+    def _borrar(self, clave: str):
+        self._bytes_disco -= self._disco.pop(clave, 0)
+        ent = self._mem.pop(clave, None)
+        if ent is not None:
+            self._bytes_mem -= len(ent[0])
+        try:
+            os.remove(self._ruta(clave))
+        except OSError:
+            pass
+
+    # ---------- métricas ----------
+    def stats(self) -> Dict:
+        with self._lock:
+            aciertos = self.aciertos_memoria + self.aciertos_disco
+            consultas = aciertos + self.fallos
+            return {
+                "consultas": consultas,
+                "aciertos_memoria": self.aciertos_memoria,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "tasa_acierto": round(aciertos / consultas, 3) if consultas else 0.0,
+                "bytes_ahorrados": self.bytes_ahorrados,
+                "segundos_ahorrados": round(self.segundos_ahorrados, 2),
+                "entradas_disco": len(self._disco),
+                "bytes_disco": self._bytes_disco,
+                "entradas_memoria": len(self._mem),
+                "bytes_memoria": self._bytes_mem,
+            }
+
+    def resumen(self) -> str:
+        s = self.stats()
+        return (f"[TtsCache] aciertos {100 * s['tasa_acierto']:.0f}% de {s['consultas']} "
+                f"(memoria {s['aciertos_memoria']}, disco {s['aciertos_disco']}), "
+                f"{s['bytes_ahorrados'] / 1e6:.1f} MB y {s['segundos_ahorrados']:.1f} s de síntesis ahorrados, "
+                f"disco {s['bytes_disco'] / 1e6:.1f} MB en {s['entradas_disco']} blobs")
@@ -0,0 +1,333 @@
+# tts_sinks.py
+# Destinos del audio de VoicePlater: cada chunk de Piper se produce una sola
+# vez y se reparte a todos los sinks registrados (parlante, WAV, WebSocket,
+# caché). Cada sink tiene su cola acotada y su hilo: uno lento (disco,
+# cliente) pierde su locución en vez de frenar la síntesis o a los demás.
+import os, threading, time, wave
+from queue import SimpleQueue
+from typing import Dict, Optional
+
+from agente.event_bus import event_bus
+from agente.logger import logger
+from agente.stt_echo import referencia
+
+CAPACIDAD = 32     # chunks sin consumir por sink antes de perder la locución
+CAPACIDAD_RITMO = 4  # ídem para el sink que marca el ritmo (espera en vez de perder)
+OUT_WAV_MAX = 100  # archivos en out_wav (sink 'wav'); se borran los más viejos
+
+_INICIO, _CHUNK, _FIN, _CERRAR = range(4)
+
+
+class Sink:
+    """
+    Destino de audio con cola acotada y hilo propio.
+
+    Lado del distribuidor (VoicePlater.run), no bloquea:
+      inicio(o) / chunk(o, pcm) / fin(o, completo)
+    Si el sink tiene `capacidad` chunks sin consumir, pierde el resto de esa
+    locución: le llega fin(o, False), como a una cortada. Salvo con `ritmo`
+    (el parlante): ahí el reparto espera, como antes esperaba al dispositivo,
+    y con él el lookahead de síntesis. Un sink agregado a mitad de locución
+    empieza con la siguiente.
+    Lado del hilo, lo que implementa cada sink:
+      _al_inicio(o) / _al_chunk(o, pcm) / _al_fin(o, completo) / _al_cerrar()
+    cortar(gen) (voice.stop) corre en el hilo que llama: lo encolado de
+    generaciones anteriores se salta y _al_cortar() actúa de inmediato.
+    `eco`: este sink publica la referencia de eco (VoicePlater elige uno).
+    """
+
+    nombre = "sink"
+    ritmo = False
+
+    def __init__(self, sr: int, capacidad: int = CAPACIDAD):
+        self.sr = sr
+        self.capacidad = capacidad
+        self.eco = False
+        self._cola: "SimpleQueue[tuple]" = SimpleQueue()
+        self._gen = 0
+        self._en_curso: Optional[int] = None  # locución abierta (lado distribuidor)
+        self._abierta = None                  # ídem, lado del hilo
+        self._hilo: Optional[threading.Thread] = None
+        self._avance = threading.Condition()  # el hilo saca un chunk / cortar / cerrar
+        # contadores: cada uno lo escribe un solo hilo
+        self.encolados = 0
+        self.procesados = 0
+        self.perdidas = 0
+        self.cola_max = 0
+
+    # ---------- ciclo de vida ----------
+    def iniciar(self, gen: int = 0):
+        self._gen = gen
+        self._hilo = threading.Thread(target=self._run, name=f"sink-{self.nombre}", daemon=True)
+        self._hilo.start()
+
+    def cerrar(self):
+        """Termina el hilo; una locución abierta se cierra como incompleta."""
+        self._en_curso = None
+        self._cola.put((_CERRAR, None, None))
+        self._avisar()
+
+    # ---------- distribuidor ----------
+    def inicio(self, o):
+        self._en_curso = o.id
+        self._cola.put((_INICIO, o, None))
+
+    def chunk(self, o, pcm: bytes):
+        if self._en_curso != o.id:
+            return
+        pendientes = self.encolados - self.procesados
+        if pendientes >= self.capacidad and self.ritmo:
+            with self._avance:
+                # el hilo avisa al sacar cada chunk; al cortar salta lo viejo, al cerrar se sale
+                while self.encolados - self.procesados >= self.capacidad and self._en_curso == o.id:
+                    self._avance.wait(0.1)
+            if self._en_curso != o.id:
+                return
+            pendientes = self.encolados - self.procesados
+        if pendientes >= self.capacidad:
+            self._en_curso = None
+            self.perdidas += 1
+            self._cola.put((_FIN, o, False))
+            logger.warning(f"[sink {self.nombre}] cola llena ({pendientes} chunks): pierde {o.texto[:40]!r}")
+            return
+        self.encolados += 1
+        self.cola_max = max(self.cola_max, pendientes + 1)
+        self._cola.put((_CHUNK, o, pcm))
+
+    def fin(self, o, completo: bool):
+        if self._en_curso != o.id:
+            return
+        self._en_curso = None
+        self._cola.put((_FIN, o, completo))
+
+    def cortar(self, gen: int):
+        self._gen = gen
+        self._al_cortar()
+        self._avisar()
+
+    def _avisar(self):
+        with self._avance:
+            self._avance.notify_all()
+
+    # ---------- hilo ----------
+    def _run(self):
+        while True:
+            tipo, o, dato = self._cola.get()
+            try:
+                if tipo == _CHUNK:
+                    self.procesados += 1
+                    if self.ritmo:
+                        self._avisar()
+                    if o is self._abierta and o.gen == self._gen:
+                        self._al_chunk(o, dato)
+                elif tipo == _INICIO:
+                    self._abierta = o
+                    self._al_inicio(o)
+                elif tipo == _FIN:
+                    if o is self._abierta:
+                        self._abierta = None
+                        self._al_fin(o, dato and o.gen == self._gen)
+                else:
+                    if self._abierta is not None:
+                        o, self._abierta = self._abierta, None
+                        self._al_fin(o, False)
+                    self._al_cerrar()
+                    return
+            except Exception as e:
+                logger.warning(f"[sink {self.nombre}] error: {e}")
+
+    def _al_inicio(self, o): pass
+    def _al_chunk(self, o, pcm: bytes): pass
+    def _al_fin(self, o, completo: bool): pass
+    def _al_cortar(self): pass
+    def _al_cerrar(self): pass
+
+    # ---------- métricas ----------
+    def stats(self) -> Dict[str, float]:
+        p = f"sink_{self.nombre}_"
+        return {
+            p + "chunks": self.procesados,
+            p + "cola": self.encolados - self.procesados,
+            p + "cola_max": self.cola_max,
+            p + "perdidas": self.perdidas,
+        }
+
+
+class ParlanteSink(Sink):
+    """Reproduce por la SalidaAudio persistente; voice.stop la silencia en un bloque."""
+
+    nombre = "parlante"
+    ritmo = True
+
+    def __init__(self, sr: int, salida, capacidad: int = CAPACIDAD_RITMO):
+        super().__init__(sr, capacidad)
+        self.salida = salida
+
+    def iniciar(self, gen: int = 0):
+        self.salida.abrir()
+        super().iniciar(gen)
+
+    def _al_chunk(self, o, pcm):
+        if self.salida.stream is None:
+            return  # sin dispositivo nadie vacía el anillo
+        if self.eco:
+            # suena cuando se vacíe lo que ya está en el anillo y en el dispositivo
+            referencia.publicar(pcm, self.sr, time.monotonic() + self.salida.retardo())
+        self.salida.escribir(pcm, self.sr)
+
+    def _al_fin(self, o, completo):
+        self.salida.terminar()  # vaciarse acá no es un underrun
+
+    def _al_cortar(self):
+        self.salida.cortar()
+        # el callback aplica el corte en el próximo bloque; no se espera en el hilo de voice.stop
+        threading.Thread(target=self._avisar_silencio, name="parlante-silencio", daemon=True).start()
+
+    def _avisar_silencio(self):
+        """'voice.silencio' con el instante en que el parlante deja de sonar (barge-in lo mide)."""
+        t = self.salida.esperar_corte()
+        if t is not None:
+            event_bus.emit("voice.silencio", "parlante", t)
+
+    def _al_cerrar(self):
+        self.salida.cortar()
+
+
+class WsSink(Sink):
+    """
+    Manda cada chunk al navegador apenas sale de Piper ('ui.audio.*'),
+    precedido por su tramo de la pista de labios ('ui.audio.labios').
+    """
+
+    nombre = "ws"
+
+    def _al_inicio(self, o):
+        self._seq = 0
+        event_bus.emit("ui.audio.inicio", {"id": o.id, "sampleRate": self.sr, "expression": o.expresion})
+
+    def _al_chunk(self, o, pcm):
+        if self.eco:
+            # suena a continuación de lo ya enviado (jitter buffer del front)
+            referencia.publicar(pcm, self.sr)
+        if o.labios is not None and self._seq < len(o.labios.tramos):
+            event_bus.emit("ui.audio.labios", {"id": o.id, "seq": self._seq, **o.labios.tramos[self._seq]})
+        event_bus.emit("ui.audio.chunk", o.id, self._seq, pcm)
+        self._seq += 1
+
+    def _al_fin(self, o, completo):
+        # cortada: el front descarta lo que le quede de esta oración
+        event_bus.emit("ui.audio.fin", {"id": o.id, "chunks": self._seq, "completo": completo})
+
+
+class WavSink(Sink):
+    """
+    Graba un WAV por oración en `carpeta` y manda la ruta con 'ui.speak' al
+    terminar, junto con la pista de labios entera.
+
+    El archivo se llama como la clave de caché: misma clave, mismo audio.
+    Si ya existe no se reescribe (el navegador puede estar leyéndolo); si
+    no, se graba en un temporal que os.replace() publica entero al terminar
+    la oración, y una cortada borra su temporal.
+    """
+
+    nombre = "wav"
+
+    def __init__(self, sr: int, carpeta: str, capacidad: int = CAPACIDAD):
+        super().__init__(sr, capacidad)
+        self.carpeta = carpeta
+        os.makedirs(carpeta, exist_ok=True)
+        self._wav: Optional[wave.Wave_write] = None
+        self._path: Optional[str] = None  # WAV de la oración en curso, si existe o se está grabando
+        self._pcm: list = []  # PCM de la oración en curso; se publica como referencia de eco al emitir ui.speak
+
+    def _al_inicio(self, o):
+        self._pcm = []
+        self._wav, self._path = None, None
+        path = os.path.join(self.carpeta, o.clave + ".wav")
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # reciente para _podar
+            except OSError:
+                pass
+            self._path = path
+            return
+        try:
+            wf = wave.open(path + ".tmp", "wb")
+            wf.setnchannels(1)
+            wf.setsampwidth(2)  # int16
+            wf.setframerate(self.sr)
+            self._wav, self._path = wf, path
+            logger.info(f"Grabando WAV: {path}")
+        except Exception as e:
+            logger.warning(f"No se pudo abrir WAV: {e}")
+
+    def _al_chunk(self, o, pcm):
+        if self._path is None:
+            return
+        if self._wav is not None:
+            self._wav.writeframes(pcm)
+        if self.eco:
+            self._pcm.append(pcm)
+
+    def _al_fin(self, o, completo):
+        path, self._path = self._path, None
+        if path is None:
+            return
+        if self._wav is not None:
+            try:
+                self._wav.close()
+                if completo:
+                    os.replace(path + ".tmp", path)
+                else:
+                    os.remove(path + ".tmp")
+            except Exception as e:
+                logger.warning(f"Al cerrar WAV: {e}")
+                completo = False
+            self._wav = None
+            self._podar()
+
+        # cortado (voice.stop / barge-in): el WAV a medias no se manda
+        if completo:
+            # el navegador empieza a reproducir al recibir ui.speak
+            if self._pcm:
+                referencia.publicar(b"".join(self._pcm), self.sr)
+            event_bus.emit("ui.speak", {
+                "path": o.clave + ".wav",   # ruta local → web_actions la convertirá a URL
+                "expression": o.expresion,
+                "waitEnd": True,            # el front esperará a que termine
+                "labios": o.labios.pista() if o.labios is not None else None,
+            })
+        self._pcm = []
+
+    def _podar(self):
+        """Deja en la carpeta solo los OUT_WAV_MAX archivos más recientes."""
+        try:
+            wavs = [e for e in os.scandir(self.carpeta) if e.name.endswith(".wav")]
+            wavs.sort(key=lambda e: e.stat().st_mtime)
+            for e in wavs[:-OUT_WAV_MAX]:
+                os.remove(e.path)
+        except OSError as e:
+            logger.warning(f"No se pudo podar {self.carpeta}: {e}")
+
+
+class CacheSink(Sink):
+    """Guarda en la TtsCache cada oración sintetizada completa (no las que salieron de la caché)."""
+
+    nombre = "cache"
+
+    def __init__(self, sr: int, cache, capacidad: int = CAPACIDAD):
+        super().__init__(sr, capacidad)
+        self.cache = cache
+        self._pcm: list = []
+
+    def _al_inicio(self, o):
+        self._pcm = []
+
+    def _al_chunk(self, o, pcm):
+        if not o.desde_cache:
+            self._pcm.append(pcm)
+
+    def _al_fin(self, o, completo):
+        if completo and self._pcm:
+            self.cache.put(o.clave, b"".join(self._pcm), self.sr, o.t_sintesis)
+        self._pcm = []
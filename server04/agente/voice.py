@@ -1,11 +1,10 @@
 from queue import SimpleQueue, Empty
-from dataclasses import dataclass
-from typing import Tuple, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Tuple, Optional, Union
+import inspect
 import time
 import threading
 import os
-import wave
-from datetime import datetime
 
 
 FRONTEND_PUBLIC = os.path.join(
@@ -17,92 +16,142 @@ FRONTEND_PUBLIC = os.path.abspath(FRONTEND_PUBLIC)
 
 os.makedirs(FRONTEND_PUBLIC, exist_ok=True)
 
-try:
-    import sounddevice as sd
-    HAS_SD = True
-except Exception:
-    HAS_SD = False
-
 from piper.voice import PiperVoice
 
 from config import *
 from agente.event_bus import event_bus
 from agente.logger import logger
+from agente.audio_salida import SalidaAudio
+from agente.stt_metrics import metricas
+from agente.stt_echo import referencia
+from agente.presupuesto_cpu import presupuesto
+from agente.tts_cache import TtsCache, id_modelo, parametros_piper
+from agente.labios import Labios, alineaciones
+from agente.tts_sinks import Sink, ParlanteSink, WavSink, WsSink, CacheSink
 
 MODEL_PATH = "assets/es_MX-claude-14947-epoch-high.onnx"
+LOOKAHEAD = 2      # oraciones que se sintetizan por delante de la que suena (0 = una a la vez)
+# Workers de síntesis en paralelo sobre la misma sesión de Piper (0 = según núcleos del TTS)
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "0")) or min(2, presupuesto.hilos("tts"))
+# Destinos del audio al arrancar ('parlante', 'wav', 'ws', 'cache'); se cambian en vivo
+# con 'voice.sink.agregar' / 'voice.sink.quitar'
+TTS_SINKS = [s.strip() for s in os.getenv("TTS_SINKS", "ws,cache").split(",") if s.strip()]
+# Quién publica la referencia de eco si hay varios: lo que suena antes en la sala
+_ECO = ("parlante", "ws", "wav")
+
+
+def _cargar_piper(workers: int = 1) -> PiperVoice:
+    """
+    Piper con la sesión de ONNX Runtime del presupuesto de CPU, ya calentada.
+
+    Con varios workers la sesión se comparte (InferenceSession.run es
+    thread-safe y suelta el GIL): los hilos intra-op del TTS se reparten
+    entre las llamadas concurrentes. La fonemización (espeak-ng, estado
+    global, sin lock en piper-tts 1.3) va de a una.
+    """
+    voz = PiperVoice.load(MODEL_PATH)
+    try:
+        import onnxruntime as ort
+        hilos = max(1, presupuesto.hilos("tts") // workers)
+        voz.session = ort.InferenceSession(
+            MODEL_PATH, sess_options=presupuesto.opciones_onnx("tts", hilos), providers=["CPUExecutionProvider"]
+        )
+    except Exception as e:
+        logger.warning(f"Piper sigue con la sesión por defecto: {e}")
+    if workers > 1:
+        fonemizar, lock = voz.phonemize, threading.Lock()
+
+        def _fonemizar_de_a_uno(*args, **kwargs):
+            with lock:
+                return fonemizar(*args, **kwargs)
+        voz.phonemize = _fonemizar_de_a_uno
+    for _ in voz.synthesize("Hola."):
+        pass
+    return voz
 
 @dataclass
 class Oracione:
     texto: str
     expresion: str
     modo: str
+    gen: int = 0            # generación de voice.stop en que se encoló
+    clave: str = ""         # clave de caché (y nombre del WAV)
+    id: int = 0             # número de locución, asignado al repartirla a los sinks
+    completa: bool = False  # Piper terminó sin corte
+    desde_cache: bool = False
+    t_sintesis: float = 0.0  # segundos de Piper (para la caché)
+    labios: Optional[Labios] = None  # pista de boca, un tramo por chunk (antes de encolarlo)
+    # chunks int16 a medida que salen de Piper; None = no hay más
+    chunks: "SimpleQueue[Optional[bytes]]" = field(default_factory=SimpleQueue)
 
 @dataclass
 class VoiceState:
     speak: bool
 
 class VoicePlater:
-    def __init__(self):
+    """
+    Pipeline de dos etapas:
+      - sintetizadores (`workers` hilos sobre la misma PiperVoice): texto ->
+        chunks de Piper (o de la caché), hasta `lookahead` oraciones por
+        delante de la que está sonando. Cada worker toma la siguiente oración
+        y la encola para reproducir en el mismo paso (bajo `_despacho`), así
+        el orden de salida es el de llegada aunque terminen desordenadas
+      - run (reparto): saca las oraciones en orden y entrega cada chunk, a
+        medida que llega, a todos los sinks registrados (tts_sinks.py): cada
+        uno con su cola acotada y su hilo, así un disco o cliente lento no
+        frena la síntesis ni a los demás. La oración N+1 ya está lista
+        cuando termina la N
+    voice.stop sube la generación: lo sintetizado por adelantado se descarta,
+    el sintetizador corta la oración en curso en el próximo chunk y cada sink
+    salta lo que tenga encolado.
+    Sinks en vivo: 'voice.sink.agregar' (nombre o Sink) / 'voice.sink.quitar' (nombre).
+    """
+
+    def __init__(self, lookahead: int = LOOKAHEAD, workers: int = TTS_WORKERS, sinks=TTS_SINKS):
         self._oraciones_queue: "SimpleQueue[Tuple[str, str, str]]" = SimpleQueue()
         event_bus.subscribe("voice.speak", self._speak)
         event_bus.subscribe("voice.stop", self._stop_now)
+        event_bus.subscribe("voice.sink.agregar", self.agregar_sink)
+        event_bus.subscribe("voice.sink.quitar", self.quitar_sink)
+        self._utt = 0  # id de la última locución repartida
 
-        # --- MODO DE SALIDA: 'wav' para guardar archivos, 'play' para reproducir por parlantes
-        self.output_mode = "wav"  # cambia a "play" si quieres reproducir
-
-        self.voice = PiperVoice.load(MODEL_PATH)
+        self.workers = max(1, workers)
+        self.voice = presupuesto.registrar("tts", lambda: _cargar_piper(self.workers))
         self.sr = self.voice.config.sample_rate
 
-        # --- Inicializaciones faltantes ---
-        self._wav_dir = FRONTEND_PUBLIC
-        os.makedirs(self._wav_dir, exist_ok=True)
-        self._current_wav: Optional[wave.Wave_write] = None
-
-        self.stream: Optional["sd.RawOutputStream"] = None
-        self._stream_lock = threading.Lock()
-        self._abort_current = False
-        self._need_reopen = False
+        # Caché de audio: mismo texto, modelo y parámetros -> no se vuelve a correr Piper
+        self._cache = TtsCache(log=logger.info)
+        self._modelo_id = id_modelo(MODEL_PATH)
+        self._params = parametros_piper(self.voice)
+        # Alineaciones de fonemas para los tiempos de palabras (piper-tts >= 1.3 y si el modelo las exporta)
+        self._kw_piper = ({"include_alignments": True}
+                          if "include_alignments" in inspect.signature(self.voice.synthesize).parameters else {})
+
+        # --- Pipeline síntesis -> reproducción ---
+        self.lookahead = lookahead
+        self._audio_queue: "SimpleQueue[Oracione]" = SimpleQueue()
+        self._cupos = threading.Semaphore(lookahead + 1)  # en vuelo: la que suena + lookahead
+        self._despacho = threading.Lock()  # tomar oración + encolarla, atómico entre workers
+        self._gen = 0
+
+        # Salida local (sink 'parlante'): un solo stream persistente con callback,
+        # abierto al agregar el sink; voice.stop lo silencia en un bloque sin cerrarlo
+        self.salida = SalidaAudio(metrics=metricas("tts_salida"), log=logger.info)
         self._running = False
 
-
-        if HAS_SD and self.output_mode == "play":
-            self._ensure_stream_open()
-        else:
-            logger.info("sounddevice no disponible o modo 'wav'; se continuará sin reproducción en vivo.")
-
-    # ---------- utilidades de audio ----------
-    def _ensure_stream_open(self):
-        if not HAS_SD:
-            return
-        with self._stream_lock:
-            if self.stream is not None:
-                try:
-                    if getattr(self.stream, "active", False):
-                        return
-                except Exception:
-                    pass
-                try:
-                    self.stream.start()
-                    logger.info("Stream reanudado.")
-                    return
-                except Exception:
-                    try:
-                        self.stream.close()
-                    except Exception:
-                        pass
-                    self.stream = None
-            try:
-                self.stream = sd.RawOutputStream(
-                    samplerate=self.sr,
-                    channels=1,
-                    dtype="int16",
-                    blocksize=0,
-                )
-                self.stream.start()
-                logger.info("Salida de audio abierta.")
-            except Exception as e:
-                logger.warning(f"No se pudo abrir salida de audio: {e}. Continuando sin audio.")
-                self.stream = None
+        # Destinos del audio; el dict se reemplaza entero al cambiar (el reparto lo lee sin lock)
+        self.sinks: Dict[str, Sink] = {}
+        self._fabricas = {
+            "parlante": lambda: ParlanteSink(self.sr, self.salida),
+            "wav": lambda: WavSink(self.sr, FRONTEND_PUBLIC),
+            "ws": lambda: WsSink(self.sr),
+            "cache": lambda: CacheSink(self.sr, self._cache),
+        }
+        metricas("tts_sinks").fuente(self._stats_sinks)
+        for nombre in sinks:
+            self.agregar_sink(nombre)
+        if "parlante" not in self.sinks:
+            logger.info(f"Sinks {list(self.sinks)}; se continuará sin reproducción en vivo.")
 
     # ---------- eventos ----------
     def _speak(self, texto: str = "", expresion: str = "", modo: str = ""):
@@ -115,135 +164,204 @@ class VoicePlater:
         except Empty:
             pass
 
+    def _vaciar_audio(self):
+        """Descarta las oraciones ya sintetizadas que no empezaron a sonar."""
+        try:
+            while True:
+                self._audio_queue.get_nowait()
+                self._cupos.release()
+        except Empty:
+            pass
+
     def _stop_now(self, clear_queue: bool = True):
         logger.info("⏹️ Corte inmediato de reproducción (manteniendo stream abierto).")
-        self._abort_current = True
-        self._need_reopen = True
+        self._gen += 1  # lo sintetizado por adelantado queda viejo
+        for s in self.sinks.values():
+            s.cortar(self._gen)
+        referencia.cortar()
         if clear_queue:
             self._clear_queue()
-        if self.stream is not None:
-            with self._stream_lock:
-                try:
-                    self.stream.abort()
-                except Exception as e:
-                    logger.info(f"No se pudo abortar el stream: {e}")
+        self._vaciar_audio()
 
     def close(self):
         try:
-            with self._stream_lock:
-                if self.stream is not None:
-                    try: self.stream.stop()
-                    except Exception: pass
-                    try: self.stream.close()
-                    except Exception: pass
-                    self.stream = None
+            for s in self.sinks.values():
+                s.cerrar()
+            self.salida.cerrar()
         finally:
             self._running = False
 
-    # ---------- síntesis ----------
-    def synthesize(self, texto: str):
-        if self._need_reopen and self.output_mode == "play":
-            self._ensure_stream_open()
-            self._need_reopen = False
-
+    # ---------- sinks ----------
+    def agregar_sink(self, sink: Union[str, Sink]):
+        """Registra un sink por nombre (ver _fabricas) o ya construido; reemplaza al homónimo."""
+        if isinstance(sink, str):
+            fabrica = self._fabricas.get(sink)
+            if fabrica is None:
+                logger.warning(f"Sink desconocido: {sink!r} (hay {list(self._fabricas)})")
+                return
+            sink = fabrica()
+        anterior = self.sinks.get(sink.nombre)
+        sink.iniciar(self._gen)
+        self.sinks = {**self.sinks, sink.nombre: sink}
+        if anterior is not None:
+            anterior.cerrar()
+        self._elegir_eco()
+        logger.info(f"Sink '{sink.nombre}' agregado: {list(self.sinks)}")
+
+    def quitar_sink(self, nombre: str):
+        sink = self.sinks.get(nombre)
+        if sink is None:
+            return
+        self.sinks = {k: s for k, s in self.sinks.items() if k != nombre}
+        sink.cerrar()
+        self._elegir_eco()
+        logger.info(f"Sink '{nombre}' quitado: {list(self.sinks)}")
+
+    def _elegir_eco(self):
+        """Un solo sink publica la referencia de eco, si no se duplicaría."""
+        eco = next((n for n in _ECO if n in self.sinks), None)
+        for nombre, s in self.sinks.items():
+            s.eco = nombre == eco
+
+    def _stats_sinks(self) -> Dict[str, float]:
+        stats = {}
+        for s in self.sinks.values():
+            stats.update(s.stats())
+        return stats
+
+    # ---------- etapa 1: síntesis ----------
+    def _sintetizador(self):
+        presupuesto.fijar_hilo("tts")  # ONNX Runtime usa también el hilo que llama
+        while self._running:
+            with self._despacho:
+                o = self._despachar()
+            if o is not None:
+                self.synthesize(o)
+
+    def _despachar(self) -> Optional[Oracione]:
+        """Toma la próxima oración, espera cupo y la encola para reproducir."""
         try:
-            for chunk in self.voice.synthesize(texto):
-                if self._abort_current:
-                    self._abort_current = False
-                    break
-
-                # Guardar WAV si está abierto
-                if self._current_wav is not None:
-                    try:
-                        self._current_wav.writeframes(chunk.audio_int16_bytes)
-                    except Exception as e:
-                        logger.warning(f"Fallo al escribir WAV: {e}")
-
-                # Reproducir si corresponde
-                if self.output_mode == "play" and self.stream is not None:
-                    try:
-                        with self._stream_lock:
-                            if self._need_reopen:
-                                self._ensure_stream_open()
-                                self._need_reopen = False
-                            if self.stream is not None:
-                                self.stream.write(chunk.audio_int16_bytes)
-                    except Exception as e:
-                        logger.warning(f"Fallo al escribir en stream: {e}. Reabriremos el stream.")
-                        try:
-                            if self.stream is not None:
-                                self.stream.close()
-                        except Exception:
-                            pass
-                        self.stream = None
-                        self._need_reopen = True
-
+            texto, expresion, modo = self._oraciones_queue.get(timeout=0.1)
+        except Empty:
+            return None
+        o = Oracione(texto, expresion, modo, gen=self._gen, clave=self.clave_cache(texto))
+        if not self._esperar_cupo(o):
+            return None
+        self._audio_queue.put(o)  # la reproducción ya puede ir tomando sus chunks
+        return o
+
+    def _esperar_cupo(self, o: Oracione) -> bool:
+        """Espera a estar a menos de `lookahead` oraciones de la que suena."""
+        while not self._cupos.acquire(timeout=0.1):
+            if not self._running or o.gen != self._gen:
+                return False
+        if o.gen != self._gen:
+            self._cupos.release()
+            return False
+        return True
+
+    def synthesize(self, o: Oracione):
+        """
+        Sintetiza `o.texto` y deja los chunks en `o.chunks` (None al final),
+        cada uno con su tramo de la pista de labios ya calculado.
+        Si está en la caché no corre Piper: el audio sale entero de una vez
+        (sin tiempos de palabras: la caché guarda solo el PCM).
+        Corta si voice.stop cambió la generación; lo cortado no va a la caché.
+        """
+        o.labios = Labios(self.sr, o.texto)
+        try:
+            hit = self._cache.get(o.clave)
+            if hit is not None:
+                logger.info(f"TTS desde caché: {o.texto[:40]!r}")
+                o.desde_cache = True
+                o.labios.agregar(hit[0])
+                o.chunks.put(hit[0])
+                o.completa = True
+                return
+
+            t0 = time.perf_counter()
+            for chunk in self.voice.synthesize(o.texto, **self._kw_piper):
+                o.t_sintesis += time.perf_counter() - t0
+                if o.gen != self._gen:
+                    return
+                o.labios.agregar(chunk.audio_int16_bytes, alineaciones(chunk))
+                o.chunks.put(chunk.audio_int16_bytes)
+                t0 = time.perf_counter()
+            o.completa = True  # el sink 'cache' la guarda al recibir el fin
         except Exception as e:
             logger.info(f"Error en síntesis TTS: {e}")
+            o.completa = True  # lo que alcanzó a salir se reproduce igual
+        finally:
+            o.chunks.put(None)
+
+    # ---------- etapa 2: reparto ----------
+    def clave_cache(self, texto: str) -> str:
+        return self._cache.clave(texto, self._modelo_id, self._params)
+
+    def _consumir(self, o: Oracione, sinks) -> bool:
+        """Entrega los chunks de `o` a los sinks a medida que llegan. Devuelve False si se cortó."""
+        while True:
+            pcm = o.chunks.get()
+            if o.gen != self._gen:
+                return False
+            if pcm is None:
+                return o.completa
+            for s in sinks:
+                s.chunk(o, pcm)
 
     # ---------- bucle principal ----------
     def run(self):
-        logger.info("VoicePlater iniciado.")
+        logger.info(f"VoicePlater iniciado (lookahead {self.lookahead}, {self.workers} workers, "
+                    f"sinks {list(self.sinks)}).")
         self._running = True
-        fname = ""
+        for i in range(self.workers):
+            threading.Thread(target=self._sintetizador, name=f"tts-{i}", daemon=True).start()
         try:
             while self._running:
                 try:
-                    texto, expresion, modo = self._oraciones_queue.get(timeout=0.1)
+                    o = self._audio_queue.get(timeout=0.1)
                 except Empty:
                     continue
-
-                self._abort_current = False
-
-                # Enviar animación (ojo con typos en 'expresion')
-                try:
-                    if self.output_mode != "wav":
-                        event_bus.emit("sprite.play", expresion, modo)
-                except Exception as e:
-                    logger.warning(f"No se pudo emitir 'sprite.play': {e}")
-
-                # Abrir WAV si estamos en modo 'wav'
-                self._current_wav = None
-                if self.output_mode == "wav":
-                    try:
-                        fname = datetime.now().strftime("%Y%m%d_%H%M%S_%f") + ".wav"
-                        path = os.path.join(self._wav_dir, fname)
-                        wf = wave.open(path, "wb")
-                        wf.setnchannels(1)
-                        wf.setsampwidth(2)  # int16
-                        wf.setframerate(self.sr)
-                        self._current_wav = wf
-                        logger.info(f"Grabando WAV: {path}")
-                    except Exception as e:
-                        logger.warning(f"No se pudo abrir WAV: {e}")
-
                 try:
-                    self.synthesize(texto)
+                    if o.gen == self._gen:
+                        self._repartir(o)
                 finally:
-                    # Cerrar WAV al terminar
-                    if self._current_wav is not None:
-                        try:
-                            self._current_wav.close()
-                            logger.info("WAV cerrado.")
-                        except Exception as e:
-                            logger.warning(f"Al cerrar WAV: {e}")
-
-                        try:
-                            event_bus.emit("ui.speak", {
-                                "path": fname,   # ruta local → web_actions la convertirá a URL
-                                "expression": expresion,          # opcional
-                                "waitEnd": True                   # el front esperará a que termine
-                            })
-                        except Exception as e:
-                            logger.warning(f"No se pudo emitir 'ui.speak': {e}")
-                        
-                        self._current_wav = None
+                    self._cupos.release()
+
+                if self._cache.stats()["consultas"] % 50 == 0:
+                    logger.info(self._cache.resumen())
+                    if self.salida.stream is not None:
+                        logger.info(self.salida.resumen())
         except KeyboardInterrupt:
             logger.info("Interrumpido por teclado.")
         finally:
             self.close()
+            logger.info(self._cache.resumen())
+            logger.info(self.salida.resumen())
+            logger.info(f"Sinks: {self._stats_sinks()}")
             logger.info("VoicePlater finalizado.")
 
+    def _repartir(self, o: Oracione):
+        sinks = list(self.sinks.values())  # los que se agreguen ahora empiezan con la próxima
+        self._utt += 1
+        o.id = self._utt
+
+        # Enviar animación (ojo con typos en 'expresion'); con solo WAV la dispara el front al reproducir
+        try:
+            if "parlante" in self.sinks or "ws" in self.sinks:
+                event_bus.emit("sprite.play", o.expresion, o.modo)
+        except Exception as e:
+            logger.warning(f"No se pudo emitir 'sprite.play': {e}")
+
+        for s in sinks:
+            s.inicio(o)
+        completo = False
+        try:
+            completo = self._consumir(o, sinks)
+        finally:
+            for s in sinks:
+                s.fin(o, completo)
+
 vp = VoicePlater()
 
 def _voice_worker():
@@ -2,6 +2,7 @@
 import os
 import time
 import json
+import struct
 import asyncio
 import threading
 from typing import Set
@@ -22,11 +23,19 @@ else:
 WS_HOST = os.getenv("WS_HOST", "0.0.0.0")
 WS_PORT = int(os.getenv("WS_PORT", "8080"))
 
+# Frame binario de audio: id de oración y número de chunk (uint32 LE), luego PCM int16 LE mono
+AUDIO_HEADER = struct.Struct("<II")
+
 class WebActions:
     """
-    - Se suscribe a 'ui.speak'
+    - Se suscribe a 'ui.speak' y 'ui.stop'
+    - Se suscribe a 'ui.audio.inicio' / 'ui.audio.labios' / 'ui.audio.chunk' / 'ui.audio.fin'
+      (voz en streaming)
     - Imprime en logs lo que llega
-    - Publica por WebSocket (broadcast) a todos los clientes conectados
+    - Del front recibe "flag" y el ack de 'stopAll' ({"cmd":"stop.ack"}),
+      que se reemite como 'voice.silencio' para medir el barge-in
+    - Publica por WebSocket (broadcast) a todos los clientes conectados;
+      el audio en streaming y 'stopAll' salen por una cola en orden
     - Expone serve_forever() para correrse dentro de un hilo
     """
 
@@ -36,6 +45,7 @@ class WebActions:
         self._server: websockets.server.Serve | None = None
         self._clients: "Set[WebSocketServerProtocol]" = set()
         self._lock = threading.Lock()
+        self._salida: asyncio.Queue | None = None  # mensajes en orden (audio en streaming)
 
     # -------------------- Event Bus --------------------
     def _on_ui_speak(self, *args, **kwargs):
@@ -43,15 +53,16 @@ class WebActions:
         Callback del event_bus para 'ui.speak'.
         Loguea y envía por WS a todos los clientes.
         """
-        ts = int(time.time() * 1000)
-        logger.info(f"[web_actions] ui.speak @ {ts} args={args} kwargs={kwargs}")
-
         data = {}
         if args and isinstance(args[0], dict):
             data = dict(args[0])  # copia defensiva
         # Merge con kwargs por si mandan campos sueltos
         data |= kwargs
 
+        ts = int(time.time() * 1000)
+        # la pista de labios son cientos de valores: no va al log
+        logger.info(f"[web_actions] ui.speak @ {ts} {({k: v for k, v in data.items() if k != 'labios'})}")
+
         expr = data.get("expression")           # p.ej. "smile" o 4
         path = "/out_wav/"+data.get("path")
 
@@ -62,7 +73,8 @@ class WebActions:
                 "items": [
                     {"type": "expression", "name": expr},
                     {"type": "audio", "src": path,
-                     "crossOrigin": "anonymous", "waitEnd": True}
+                     "crossOrigin": "anonymous", "waitEnd": True,
+                     "labios": data.get("labios")}  # pista de boca (labios.py)
                 ]
             }
         }
@@ -78,15 +90,61 @@ class WebActions:
             except Exception as e:
                 logger.warning(f"[web_actions] fallo al programar broadcast: {e}")
 
+    def _on_ui_stop(self, *args, **kwargs):
+        """
+        Callback del event_bus para 'ui.stop' (barge-in): el front corta el
+        audio en curso y descarta su cola de acciones.
+        """
+        logger.info("[web_actions] ui.stop")
+        # por la cola: llega después de los chunks ya encolados y los corta
+        self._encolar({"kind": "action", "payload": {"type": "stopAll"}})
+
+    def _on_audio_inicio(self, data: dict):
+        """Inicio de una oración en streaming: id, sampleRate y expresión."""
+        logger.info(f"[web_actions] ui.audio.inicio {data}")
+        self._encolar({"kind": "audio", "event": "start", **data})
+
+    def _on_audio_labios(self, data: dict):
+        """Tramo de la pista de boca de un chunk; va justo antes del chunk."""
+        self._encolar({"kind": "audio", "event": "labios", **data})
+
+    def _on_audio_chunk(self, utt: int, seq: int, pcm: bytes):
+        """Un chunk de Piper, tal cual sale, como frame binario."""
+        self._encolar(AUDIO_HEADER.pack(utt, seq) + pcm)
+
+    def _on_audio_fin(self, data: dict):
+        logger.info(f"[web_actions] ui.audio.fin {data}")
+        self._encolar({"kind": "audio", "event": "end", **data})
+
+    def _encolar(self, msg):
+        """Agrega `msg` (dict o bytes) a la cola de salida en orden, desde cualquier hilo."""
+        if self._loop and self._salida is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._salida.put_nowait, msg)
+            except RuntimeError as e:  # loop cerrado
+                logger.warning(f"[web_actions] fallo al encolar mensaje: {e}")
+
+    async def _emisor(self):
+        """Manda la cola de salida de a un mensaje, así no se reordenan."""
+        while True:
+            msg = await self._salida.get()
+            await self._broadcast(msg)
+
     # -------------------- WebSocket --------------------
-    async def _broadcast(self, data: dict):
+    async def _broadcast(self, data: dict | bytes):
         """
-        Envía `data` (dict) a todos los clientes conectados (JSON).
-        Limpia clientes desconectados.
+        Envía `data` a todos los clientes conectados: dict como JSON,
+        bytes como frame binario. Limpia clientes desconectados.
         """
         if not self._clients:
             return
 
+        if isinstance(data, (bytes, bytearray)):
+            # binario: sin los logs de control, es un frame por chunk de audio
+            await asyncio.gather(*(self._safe_send(ws, data) for ws in list(self._clients)),
+                                 return_exceptions=True)
+            return
+
         message = json.dumps(data, ensure_ascii=False)
         stale: Set[WebSocketServerProtocol] = set()
 
@@ -114,10 +172,11 @@ class WebActions:
                 for ws in stale:
                     self._clients.discard(ws)
 
-    async def _safe_send(self, ws: WebSocketServerProtocol, msg: str):
+    async def _safe_send(self, ws: WebSocketServerProtocol, msg: str | bytes):
         try:
             await ws.send(msg)
-            print(f"[web_actions] enviando a un cliente")
+            if isinstance(msg, str):
+                print(f"[web_actions] enviando a un cliente")
         except Exception as e:
             logger.info(f"[web_actions] fallo enviando a un cliente: {e}")
             # marcará como stale en el próximo broadcast al ver ws.closed
@@ -146,6 +205,7 @@ class WebActions:
                 #  2) JSON {"cmd":"flag"}  o  {"flag": true}
                 try:
                     should_flag = False
+                    obj = None
 
                     if isinstance(incoming, (bytes, bytearray)):
                         # opcional: si llega binario, ignora
@@ -164,6 +224,13 @@ class WebActions:
                             # No es JSON; simplemente ignoramos si no es "flag"
                             pass
 
+                    if isinstance(obj, dict) and obj.get("cmd") == "stop.ack":
+                        # el front cortó tras 'stopAll': se oye el silencio tras su latencia de
+                        # salida; medido al recibir el ack incluye la vuelta (cota superior)
+                        salida_ms = float(obj.get("salidaMs") or 0.0)
+                        event_bus.emit("voice.silencio", "navegador", time.monotonic() + salida_ms / 1000)
+                        continue
+
                     if should_flag:
                         event_bus.emit("speak.flag")
                         try:
@@ -198,6 +265,7 @@ class WebActions:
             ping_interval=20,
             ping_timeout=20,
             max_queue=32,
+            compression=None,  # el PCM casi no comprime; deflate solo suma CPU y latencia
         )
         logger.info(f"[web_actions] WS server escuchando en ws://{WS_HOST}:{WS_PORT}")
 
@@ -206,12 +274,15 @@ class WebActions:
         Tarea principal asíncrona: inicia WS y espera hasta que self._running sea False.
         """
         await self._start_ws()
+        self._salida = asyncio.Queue()
+        emisor = asyncio.create_task(self._emisor())
         logger.info("[web_actions] callback + WS activos.")
 
         # Loop de vida controlado por _running
         while self._running:
             # Si quieres, aquí puedes hacer housekeeping periódico
             await asyncio.sleep(0.25)
+        emisor.cancel()
 
     # -------------------- Ciclo de vida --------------------
     def serve_forever(self):
@@ -227,9 +298,14 @@ class WebActions:
 
         try:
             event_bus.subscribe("ui.speak", self._on_ui_speak)
-            logger.info("web_actions: suscrito a 'ui.speak'.")
+            event_bus.subscribe("ui.stop", self._on_ui_stop)
+            event_bus.subscribe("ui.audio.inicio", self._on_audio_inicio)
+            event_bus.subscribe("ui.audio.labios", self._on_audio_labios)
+            event_bus.subscribe("ui.audio.chunk", self._on_audio_chunk)
+            event_bus.subscribe("ui.audio.fin", self._on_audio_fin)
+            logger.info("web_actions: suscrito a 'ui.speak', 'ui.stop' y 'ui.audio.*'.")
         except Exception as e:
-            logger.warning(f"web_actions: no se pudo suscribir a 'ui.speak': {e}")
+            logger.warning(f"web_actions: no se pudo suscribir a 'ui.speak'/'ui.stop': {e}")
 
         # Crear y fijar loop propio para este hilo
         self._loop = asyncio.new_event_loop()
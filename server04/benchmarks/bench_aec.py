@@ -0,0 +1,183 @@
+"""
+Benchmark del cancelador de eco (agente/stt_aec.py): costo en un núcleo y ERLE.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_aec [--segundos 20] [--piper 6] [--cercano voz.wav]
+        [--retardo-ms 180] [--rt60-ms 250] [--ganancia 0.5] [--json aec.json]
+
+Velocidad: procesa bloques de 100 ms (como llegan del micrófono) con el
+proceso fijado a un núcleo y reporta µs por bloque de NLMS, costo de cada
+estimación GCC-PHAT y RTF total (tiene que quedar muy por debajo de 1).
+
+ERLE: arma una mezcla offline
+    mic = eco(lejano) + cercano + ruido
+con `lejano` = voz de Piper (--piper N frases del benchmark STT) o ruido
+modulado si no hay Piper, y `cercano` = un WAV grabado (--cercano) o ruido
+modulado. El eco es el lejano con retardo, una respuesta de sala sintética
+(ruido con decaimiento RT60) y ganancia. El cercano entra en la segunda
+mitad (doble habla). Se reporta:
+  - ERLE (dB) en la primera mitad, solo eco, tras 1 s de convergencia
+  - SDR del cercano (dB) en doble habla, sin AEC y con AEC
+  - retardo estimado por GCC-PHAT frente al real
+"""
+import argparse, json, os, time, wave
+
+import numpy as np
+
+from agente.stt_aec import EchoCanceller, GccPhat
+from agente.audio_resample import remuestrear
+
+SAMPLERATE = 16000
+CHUNK = 1600  # 100 ms, como BLOCKSIZE de Microfono
+
+
+# ---------- señales ----------
+def _modulado(segundos: float, semilla: int) -> np.ndarray:
+    """Ruido coloreado con envolvente silábica (~4 Hz): sustituto de voz."""
+    rng = np.random.default_rng(semilla)
+    n = int(segundos * SAMPLERATE)
+    t = np.arange(n) / SAMPLERATE
+    x = np.convolve(rng.standard_normal(n), np.ones(4) / 4, "same")
+    return 0.2 * x * (0.2 + 0.8 * np.abs(np.sin(2 * np.pi * 2 * t)))
+
+
+def _leer_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wf:
+        sr, ch = wf.getframerate(), wf.getnchannels()
+        x = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16).astype(np.float32) / 32768
+    if ch > 1:
+        x = x.reshape(-1, ch).mean(axis=1)
+    return remuestrear(x, sr, SAMPLERATE).astype(np.float64)
+
+
+def _piper(n: int) -> np.ndarray:
+    from piper.voice import PiperVoice
+    from benchmarks.bench_stt_offline import FRASES, PIPER_MODEL
+    voz = PiperVoice.load(PIPER_MODEL)
+    partes = []
+    for texto in FRASES[:n]:
+        pcm = b"".join(c.audio_int16_bytes for c in voz.synthesize(texto))
+        x = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+        partes.append(remuestrear(x, voz.config.sample_rate, SAMPLERATE))
+    return np.concatenate(partes).astype(np.float64)
+
+
+def _ajustar(x: np.ndarray, n: int) -> np.ndarray:
+    return np.resize(x, n) if len(x) < n else x[:n]
+
+
+def _sala(rt60_ms: float, semilla: int = 7) -> np.ndarray:
+    """Respuesta al impulso sintética: camino directo + cola exponencial."""
+    n = int(SAMPLERATE * rt60_ms / 1000)
+    rng = np.random.default_rng(semilla)
+    h = rng.standard_normal(n) * np.exp(-6.9 * np.arange(n) / max(n, 1)) * 0.3
+    h[0] = 1.0
+    return h / np.linalg.norm(h)
+
+
+def _db(a: np.ndarray, b: np.ndarray) -> float:
+    return round(10 * np.log10(np.dot(a, a) / max(np.dot(b, b), 1e-20)), 1)
+
+
+# ---------- mediciones ----------
+def _velocidad(segundos: float) -> dict:
+    try:
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+    except (AttributeError, OSError):
+        pass
+    lejano = _modulado(segundos, 1)
+    mic = np.convolve(lejano, _sala(200))[:len(lejano)] * 0.5
+    aec = EchoCanceller(SAMPLERATE)
+    tiempos = []
+    for i in range(0, len(mic) - CHUNK + 1, CHUNK):
+        t0 = time.perf_counter()
+        aec.procesar(mic[i:i + CHUNK], lejano[i:i + CHUNK])
+        tiempos.append(time.perf_counter() - t0)
+    gcc = GccPhat(aec.ventana, aec.lag_max)
+    t0 = time.perf_counter()
+    for _ in range(20):
+        gcc.estimar(mic[aec.lag_max:aec.lag_max + aec.ventana], lejano[:aec.lag_max + aec.ventana])
+    gcc_ms = (time.perf_counter() - t0) / 20 * 1000
+    tiempos.sort()
+    bloques_nlms = CHUNK // aec.bloque
+    return {
+        "segundos": segundos,
+        "bloque_nlms": aec.bloque,
+        "particiones": aec.nlms.particiones,
+        "us_por_bloque_nlms": round(1e6 * sum(tiempos) / len(tiempos) / bloques_nlms, 1),
+        "ms_por_chunk_p50": round(1000 * tiempos[len(tiempos) // 2], 3),
+        "ms_por_chunk_max": round(1000 * tiempos[-1], 3),
+        "gcc_phat_ms": round(gcc_ms, 3),
+        "rtf": round(sum(tiempos) / segundos, 4),
+    }
+
+
+def _erle(lejano: np.ndarray, cercano: np.ndarray, retardo_ms: float, rt60_ms: float,
+          ganancia: float, ruido: float) -> dict:
+    n = len(lejano)
+    mitad = n // 2
+    d = int(SAMPLERATE * retardo_ms / 1000)
+    eco = np.zeros(n)
+    eco[d:] = np.convolve(lejano, _sala(rt60_ms))[:n - d] * ganancia
+    cerca = np.zeros(n)
+    cerca[mitad:] = _ajustar(cercano, n - mitad)
+    mic = eco + cerca + ruido * np.random.default_rng(3).standard_normal(n)
+
+    aec = EchoCanceller(SAMPLERATE)
+    out = np.zeros(n)
+    for i in range(0, n - CHUNK + 1, CHUNK):
+        out[i:i + CHUNK] = aec.procesar(mic[i:i + CHUNK], lejano[i:i + CHUNK])
+
+    s = SAMPLERATE  # 1 s de convergencia
+    solo_eco = slice(s, mitad)
+    doble = slice(mitad, n - n % CHUNK)
+    return {
+        "retardo_real_ms": retardo_ms,
+        "retardo_estimado_ms": round(aec.retardo_ms, 1),
+        "reinicios_filtro": aec.reinicios,
+        "erle_db": _db(mic[solo_eco], out[solo_eco]),
+        "sdr_cercano_sin_aec_db": _db(cerca[doble], (mic - cerca)[doble]),
+        "sdr_cercano_con_aec_db": _db(cerca[doble], (out - cerca)[doble]),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segundos", type=float, default=20, help="audio para medir velocidad")
+    ap.add_argument("--piper", type=int, default=0, help="frases de Piper como señal lejana (0 = sintética)")
+    ap.add_argument("--lejano", default=None, help="WAV como señal lejana (en lugar de Piper)")
+    ap.add_argument("--cercano", default=None, help="WAV grabado del usuario")
+    ap.add_argument("--retardo-ms", type=float, default=180)
+    ap.add_argument("--rt60-ms", type=float, default=250)
+    ap.add_argument("--ganancia", type=float, default=0.5, help="ganancia parlante→micrófono")
+    ap.add_argument("--ruido", type=float, default=1e-3)
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    vel = _velocidad(args.segundos)
+    print(f"\nVelocidad (1 núcleo): {vel['us_por_bloque_nlms']} µs por bloque NLMS de "
+          f"{vel['bloque_nlms']} muestras, chunk de 100 ms p50={vel['ms_por_chunk_p50']}ms "
+          f"max={vel['ms_por_chunk_max']}ms, GCC-PHAT {vel['gcc_phat_ms']}ms, RTF={vel['rtf']}")
+
+    if args.lejano:
+        lejano = _leer_wav(args.lejano)
+    elif args.piper:
+        lejano = _piper(args.piper)
+    else:
+        lejano = _modulado(12, 1)
+    cercano = _leer_wav(args.cercano) if args.cercano else _modulado(6, 2)
+    cercano *= 0.5 * np.std(lejano) / max(np.std(cercano), 1e-9)  # mismo nivel relativo en todos los casos
+    erle = _erle(lejano, cercano, args.retardo_ms, args.rt60_ms, args.ganancia, args.ruido)
+
+    print(f"\n{'retardo real':>13} {'estimado':>9} {'ERLE':>7} {'SDR sin AEC':>12} {'SDR con AEC':>12}")
+    print(f"{erle['retardo_real_ms']:>11.0f}ms {erle['retardo_estimado_ms']:>7.0f}ms "
+          f"{erle['erle_db']:>5.1f}dB {erle['sdr_cercano_sin_aec_db']:>10.1f}dB "
+          f"{erle['sdr_cercano_con_aec_db']:>10.1f}dB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"velocidad": vel, "erle": erle}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Benchmark del barge-in: inicio de voz del usuario -> silencio de Luci.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_barge_in [--ensayos 8] [--vad webrtc|energia]
+        [--retardo-ms 180] [--latencia-ms 20] [--json barge.json]
+
+Corre en tiempo real la misma cadena que Microfono con Luci hablando:
+bloques de 50 ms (BLOCKSIZE) llegan a su hora, pasan por EchoGate con el
+AEC contra la referencia publicada en `referencia`, y lo que deja pasar
+el filtro alimenta el Endpointer de barge-in (start_ms=60); su "inicio"
+emite "stt.voz_usuario" y BargeIn emite "voice.stop". El micrófono es
+eco de la voz de Luci (retardo + sala sintética) y, desde un instante
+conocido, la voz del usuario encima.
+
+La salida es la de producción sin dispositivo: "voice.stop" corta el
+ParlanteSink y su SalidaAudio, cuyo callback corre en un hilo cada
+BLOQUE_S con `--latencia-ms` de latencia de dispositivo; el silencio es
+el "voice.silencio" que reporta al aplicar el corte.
+
+Por ensayo se mide inicio de voz -> silencio y se reporta p50/p95/max
+contra el objetivo de BargeIn (150 ms), junto con el p95 hasta
+"voice.stop" y los disparos en falso (antes del inicio, solo con eco). `--vad energia` usa un VAD por energía del propio
+benchmark para correr sin webrtcvad instalado.
+"""
+import argparse, asyncio, json, threading, time
+
+import numpy as np
+
+from agente.audio_salida import SalidaAudio
+from agente.event_bus import event_bus
+from agente.barge_in import BARGE_IN_OBJETIVO_MS, barge
+from agente.stt_aec import EchoCanceller
+from agente.stt_echo import EchoGate, referencia
+from agente.stt_vad import Endpointer, crear_vad
+from agente.tts_sinks import ParlanteSink
+
+SAMPLERATE = 16000
+BLOCKSIZE = 800           # 50 ms, como Microfono
+MIN_VOZ_MS = 60           # BARGE_IN_MIN_VOZ_MS
+OBJETIVO_MS = BARGE_IN_OBJETIVO_MS
+CONVERGENCIA_S = 3.0      # eco solo antes de que hable el usuario (el AEC tiene que converger)
+
+
+class _VadEnergia:
+    """VAD por energía (frames de 30 ms), sustituto de WebRTC para el benchmark."""
+
+    def __init__(self, sample_rate: int = SAMPLERATE, umbral_db: float = -30.0):
+        self.frame_samples = sample_rate * 30 // 1000
+        self.umbral = 10 ** (umbral_db / 10) * 32768.0 ** 2
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        x = frame.astype(np.float64)
+        return float(np.dot(x, x)) / len(x) >= self.umbral
+
+
+def _modulado(n: int, semilla: int) -> np.ndarray:
+    """Ruido coloreado con envolvente silábica: sustituto de voz."""
+    rng = np.random.default_rng(semilla)
+    t = np.arange(n) / SAMPLERATE
+    x = np.convolve(rng.standard_normal(n), np.ones(4) / 4, "same")
+    return 0.2 * x * (0.2 + 0.8 * np.abs(np.sin(2 * np.pi * 2 * t + semilla)))
+
+
+class _Dispositivo:
+    """Hilo que hace de callback de sounddevice: salida.llenar() cada bloque, a su hora."""
+
+    def __init__(self, salida: SalidaAudio):
+        self.salida = salida
+        self._activo = True
+        self._hilo = threading.Thread(target=self._run, daemon=True)
+        self._hilo.start()
+
+    def _run(self):
+        out = np.zeros(self.salida.bloque, dtype=np.int16)
+        dt = self.salida.bloque / self.salida.sr
+        t = time.monotonic()
+        while self._activo:
+            t += dt
+            espera = t - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self.salida.llenar(out)
+
+    def cerrar(self):
+        self._activo = False
+        self._hilo.join()
+
+
+def _sala(rt60_ms: float) -> np.ndarray:
+    n = int(SAMPLERATE * rt60_ms / 1000)
+    h = np.random.default_rng(7).standard_normal(n) * np.exp(-6.9 * np.arange(n) / n) * 0.3
+    h[0] = 1.0
+    return h / np.linalg.norm(h)
+
+
+async def _ensayo(i: int, vad_backend: str, retardo_ms: float, ganancia: float, parlante: ParlanteSink) -> dict:
+    rng = np.random.default_rng(100 + i)
+    inicio_s = CONVERGENCIA_S + float(rng.uniform(0, 0.05))  # onset no alineado a bloques
+    total = int(SAMPLERATE * (inicio_s + 1.0))
+    lejano = _modulado(total, i)
+    d = int(SAMPLERATE * retardo_ms / 1000)
+    mic = np.zeros(total)
+    mic[d:] = np.convolve(lejano, _sala(250))[:total - d] * ganancia
+    onset = int(SAMPLERATE * inicio_s)
+    mic[onset:] += 0.5 * _modulado(total - onset, 50 + i)
+    mic += 1e-3 * rng.standard_normal(total)
+    mic_pcm = np.clip(mic * 32767, -32768, 32767).astype(np.int16)
+
+    vad = _VadEnergia() if vad_backend == "energia" else crear_vad(vad_backend, SAMPLERATE)
+    if vad is None:
+        raise SystemExit(f"VAD '{vad_backend}' no disponible; probá --vad energia")
+    ep = Endpointer(vad, SAMPLERATE, preroll_ms=0, hangover_ms=600, start_ms=MIN_VOZ_MS)
+    gate = EchoGate(referencia, aec=EchoCanceller(SAMPLERATE))
+
+    paradas, silencios = [], []
+
+    def _on_stop(*_):
+        paradas.append(time.monotonic())
+        referencia.cortar()  # lo que hace VoicePlater
+        parlante.cortar(len(paradas))
+
+    def _on_silencio(salida, t):
+        silencios.append(t)
+
+    desuscribir = event_bus.subscribe("voice.stop", _on_stop)
+    desuscribir_silencio = event_bus.subscribe("voice.silencio", _on_silencio)
+    try:
+        t0 = time.monotonic()
+        referencia.publicar(lejano.astype(np.float32), SAMPLERATE, t0)
+        for k in range(0, total - BLOCKSIZE + 1, BLOCKSIZE):
+            t_fin = t0 + (k + BLOCKSIZE) / SAMPLERATE
+            espera = t_fin - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            estado, pcm = gate.procesar(mic_pcm[k:k + BLOCKSIZE], t_fin)
+            # igual que Microfono._detectar_barge_in
+            if estado in ("limpio", "eco") or not gate.aec.nlms.convergido:
+                ep.reset()
+                continue
+            for tipo, _ in ep.feed(pcm):
+                if tipo == "inicio":
+                    event_bus.emit("stt.voz_usuario", t_fin - MIN_VOZ_MS / 1000, "eco")
+            if paradas and paradas[-1] >= t0 + inicio_s:
+                break
+        await asyncio.sleep(0.1)  # el corte se aplica en el próximo bloque del dispositivo
+    finally:
+        desuscribir()
+        desuscribir_silencio()
+        referencia.cortar()
+
+    t_onset = t0 + inicio_s
+    falsos = sum(1 for t in paradas if t < t_onset)
+    validas = [t for t in paradas if t >= t_onset]
+    silencio = [t for t in silencios if t >= t_onset]
+    return {
+        "latencia_ms": round((silencio[0] - t_onset) * 1000, 1) if silencio else None,
+        "stop_ms": round((validas[0] - t_onset) * 1000, 1) if validas else None,
+        "falsos": falsos,
+        "erle_db": round(gate.aec.erle_db, 1),
+    }
+
+
+def _pct(xs, q):
+    return xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+
+
+async def _correr(args) -> dict:
+    salida = SalidaAudio(sr=SAMPLERATE, log=lambda _: None)
+    salida.latencia = args.latencia_ms / 1000
+    dispositivo = _Dispositivo(salida)
+    parlante = ParlanteSink(SAMPLERATE, salida)  # sin iniciar(): solo se usa su corte
+    ensayos = []
+    try:
+        for i in range(args.ensayos):
+            r = await _ensayo(i, args.vad, args.retardo_ms, args.ganancia, parlante)
+            ensayos.append(r)
+            lat = f"{r['latencia_ms']:.0f}ms" if r["latencia_ms"] is not None else "sin disparo"
+            stop = f"(stop {r['stop_ms']:.0f}ms)" if r["stop_ms"] is not None else ""
+            print(f"  ensayo {i + 1:>2}: {lat:>12} {stop:>14}  falsos={r['falsos']}  ERLE={r['erle_db']}dB")
+            barge._ultimo = 0.0  # el período refractario no cruza ensayos
+    finally:
+        dispositivo.cerrar()
+    lats = sorted(r["latencia_ms"] for r in ensayos if r["latencia_ms"] is not None)
+    stops = sorted(r["stop_ms"] for r in ensayos if r["stop_ms"] is not None)
+    res = {"ensayos": ensayos, "objetivo_ms": OBJETIVO_MS, "vad": args.vad, "latencia_disp_ms": args.latencia_ms,
+           "perdidos": sum(r["latencia_ms"] is None for r in ensayos),
+           "falsos": sum(r["falsos"] for r in ensayos)}
+    if lats:
+        res |= {"p50_ms": _pct(lats, 0.5), "p95_ms": _pct(lats, 0.95), "max_ms": lats[-1],
+                "stop_p95_ms": _pct(stops, 0.95), "cumple": _pct(lats, 0.95) <= OBJETIVO_MS}
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ensayos", type=int, default=8)
+    ap.add_argument("--vad", default="webrtc", help="'webrtc' | 'silero' | 'energia'")
+    ap.add_argument("--retardo-ms", type=float, default=180)
+    ap.add_argument("--ganancia", type=float, default=0.5, help="ganancia parlante→micrófono")
+    ap.add_argument("--latencia-ms", type=float, default=20, help="latencia del dispositivo de salida")
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    print(f"\nBarge-in: {args.ensayos} ensayos, bloques de {1000 * BLOCKSIZE // SAMPLERATE} ms, VAD {args.vad}")
+    res = asyncio.run(_correr(args))
+
+    print(f"\ninicio de voz -> silencio (latencia de salida {args.latencia_ms:.0f} ms)")
+    print(f"{'p50':>8} {'p95':>8} {'max':>8} {'objetivo':>9} {'stop p95':>9} {'perdidos':>9} {'falsos':>7}")
+    if "p50_ms" in res:
+        print(f"{res['p50_ms']:>6.0f}ms {res['p95_ms']:>6.0f}ms {res['max_ms']:>6.0f}ms "
+              f"{OBJETIVO_MS:>7}ms {res['stop_p95_ms']:>7.0f}ms {res['perdidos']:>9} {res['falsos']:>7}")
+        print(f"p95 {'dentro' if res['cumple'] else 'FUERA'} del objetivo")
+    else:
+        print(f"{'-':>8} {'-':>8} {'-':>8} {OBJETIVO_MS:>7}ms {'-':>9} {res['perdidos']:>9} {res['falsos']:>7}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
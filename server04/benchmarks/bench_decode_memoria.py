@@ -0,0 +1,102 @@
+"""
+Benchmark: latencia por parcial con WAV temporal vs decodificación en memoria.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_decode_memoria [audio.wav] [--iter 30] [--model tiny]
+
+Sin archivo se usa 1 s de ruido rosa (el texto no importa, solo el tiempo).
+Mide dos cosas por ventana de WINDOW_SEC:
+  - preparación: WAV temporal + decode_audio  vs  pcm16_to_float32
+  - parcial completo: preparación + WhisperModel.transcribe
+"""
+import argparse, os, tempfile, time, statistics
+
+import numpy as np
+import soundfile as sf
+from faster_whisper import WhisperModel, decode_audio
+
+from agente.stt_audio import pcm16_to_float32
+
+SAMPLERATE = 16000
+WINDOW_SEC = 1.0
+
+
+def _ventana_pcm(path: str | None) -> bytes:
+    n = int(SAMPLERATE * WINDOW_SEC)
+    if path:
+        audio = decode_audio(path, sampling_rate=SAMPLERATE)[:n]
+    else:
+        rng = np.random.default_rng(0)
+        audio = np.cumsum(rng.standard_normal(n)).astype(np.float32)
+        audio = 0.3 * audio / (np.abs(audio).max() + 1e-9)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes()
+
+
+def _prep_wav(raw: bytes) -> np.ndarray:
+    """Camino anterior: escribir WAV temporal y que faster-whisper lo relea."""
+    audio_np = np.frombuffer(raw, dtype=np.int16)
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+        wav_path = tmp.name
+    try:
+        sf.write(wav_path, audio_np, SAMPLERATE, format="WAV")
+        return decode_audio(wav_path, sampling_rate=SAMPLERATE)
+    finally:
+        os.unlink(wav_path)
+
+
+def _prep_memoria(raw: bytes, scratch: np.ndarray) -> np.ndarray:
+    return pcm16_to_float32(raw, out=scratch)
+
+
+def _medir(fn, n: int) -> list[float]:
+    fn()  # calentamiento
+    tiempos = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos
+
+
+def _fila(nombre: str, ms: list[float]):
+    ms = sorted(ms)
+    p95 = ms[int(0.95 * (len(ms) - 1))]
+    print(f"{nombre:<28} media={statistics.mean(ms):8.2f} ms  p50={statistics.median(ms):8.2f} ms  p95={p95:8.2f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("audio", nargs="?", default=None)
+    ap.add_argument("--iter", type=int, default=30)
+    ap.add_argument("--model", default="tiny")
+    args = ap.parse_args()
+
+    raw = _ventana_pcm(args.audio)
+    scratch = np.empty(len(raw) // 2, dtype=np.float32)
+
+    print(f"Ventana: {WINDOW_SEC:.1f}s | iteraciones: {args.iter}\n")
+    print("== Preparación del audio ==")
+    prep_wav = _medir(lambda: _prep_wav(raw), args.iter)
+    prep_mem = _medir(lambda: _prep_memoria(raw, scratch), args.iter)
+    _fila("WAV temporal + decode", prep_wav)
+    _fila("en memoria (float32)", prep_mem)
+
+    model = WhisperModel(args.model, device="cpu", compute_type="int8")
+
+    def _parcial(audio_fn):
+        segments, _ = model.transcribe(audio_fn(), language="es", vad_filter=False)
+        return " ".join(s.text for s in segments)
+
+    print(f"\n== Parcial completo (modelo '{args.model}') ==")
+    full_wav = _medir(lambda: _parcial(lambda: _prep_wav(raw)), args.iter)
+    full_mem = _medir(lambda: _parcial(lambda: _prep_memoria(raw, scratch)), args.iter)
+    _fila("WAV temporal", full_wav)
+    _fila("en memoria", full_mem)
+
+    ahorro = statistics.mean(full_wav) - statistics.mean(full_mem)
+    print(f"\nAhorro medio por parcial: {ahorro:.2f} ms "
+          f"({100 * ahorro / statistics.mean(full_wav):.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: jitter de ingesta de audio mientras corre un decode Whisper.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_jitter_ingesta [--segundos 10] [--model tiny]
+
+Simula el _stt_worker de Microfono: cada 100 ms llega un chunk al loop,
+se escribe en el AudioRing y cada PARTIAL_EVAL_INTERVAL se pide un parcial.
+  - inline: el parcial llama a model.transcribe dentro del loop (antes)
+  - worker: el parcial va al InferenceScheduler (ahora)
+Se reporta el retraso de cada chunk respecto a su hora teórica.
+"""
+import argparse, asyncio, time, statistics
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+from agente.stt_audio import AudioRing
+from agente.stt_worker import InferenceScheduler
+
+SAMPLERATE = 16000
+CHUNK_SEC = 0.1
+PARTIAL_EVAL_INTERVAL = 0.2
+WINDOW_SEC = 1
+
+
+async def _simular(model, ring: AudioRing, segundos: float, usar_worker: bool):
+    worker = InferenceScheduler("bench") if usar_worker else None
+    rng = np.random.default_rng(0)
+    chunk = (rng.standard_normal(int(SAMPLERATE * CHUNK_SEC)) * 3000).astype(np.int16)
+
+    def parcial() -> str:
+        audio = ring.to_float32(ring.tail(SAMPLERATE * WINDOW_SEC))
+        segments, _ = model.transcribe(audio, language="es", vad_filter=False)
+        return " ".join(s.text for s in segments)
+
+    async def run_partial():
+        if worker is None:
+            parcial()
+            return
+        try:
+            await asyncio.wrap_future(worker.submit_partial(parcial))
+        except asyncio.CancelledError:
+            pass
+
+    retrasos = []
+    t0 = time.perf_counter()
+    ultimo_parcial = t0
+    n = int(segundos / CHUNK_SEC)
+    for i in range(n):
+        objetivo = t0 + i * CHUNK_SEC
+        espera = objetivo - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        retrasos.append((time.perf_counter() - objetivo) * 1000)
+        ring.write(chunk)
+        if time.perf_counter() - ultimo_parcial >= PARTIAL_EVAL_INTERVAL:
+            ultimo_parcial = time.perf_counter()
+            asyncio.create_task(run_partial())
+        await asyncio.sleep(0)
+
+    dropped = worker.dropped_partials if worker else 0
+    if worker:
+        worker.close()
+    return retrasos, dropped
+
+
+def _fila(nombre: str, ms: list[float], dropped: int):
+    ms = sorted(ms)
+    p95 = ms[int(0.95 * (len(ms) - 1))]
+    print(f"{nombre:<8} media={statistics.mean(ms):7.2f} ms  p95={p95:7.2f} ms  "
+          f"max={ms[-1]:7.2f} ms  parciales descartados={dropped}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segundos", type=float, default=10)
+    ap.add_argument("--model", default="tiny")
+    args = ap.parse_args()
+
+    model = WhisperModel(args.model, device="cpu", compute_type="int8")
+    print(f"Retraso de ingesta por chunk de {CHUNK_SEC * 1000:.0f} ms ({args.segundos:.0f}s simulados)\n")
+    for nombre, usar_worker in (("inline", False), ("worker", True)):
+        ring = AudioRing(SAMPLERATE * 30)
+        retrasos, dropped = asyncio.run(_simular(model, ring, args.segundos, usar_worker))
+        _fila(nombre, retrasos, dropped)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark de la pista de labios (agente/labios.py).
+
+Uso (desde server04/):
+    python -m benchmarks.bench_labios [--segundos 10] [--chunk-ms 50 300 2000] [--json labios.json]
+
+1. Forma: una "u" (300 Hz), una "i" (300 Hz + 2.8 kHz) y silencio, para
+   verificar que la apertura sigue la energía y la forma el timbre.
+2. Costo: `--segundos` de voz sintética (vocales alternadas con pausas)
+   pasados en chunks de `--chunk-ms`, como salen de Piper; reporta µs por
+   segundo de audio (lo que se le suma a cada worker de síntesis) y el
+   tamaño en JSON de la pista por segundo (lo que viaja en 'ui.speak' /
+   'ui.audio.labios').
+"""
+import argparse, json, time
+
+import numpy as np
+
+from agente.labios import Labios
+
+SR = 22050
+
+
+def _tono(seg: float, *parciales) -> np.ndarray:
+    t = np.arange(int(SR * seg)) / SR
+    x = sum(a * np.sin(2 * np.pi * f * t) for f, a in parciales)
+    return (np.asarray(x) * 32767).astype(np.int16)
+
+
+def _voz(segundos: float, rnd: np.random.Generator) -> np.ndarray:
+    partes, total = [], 0.0
+    while total < segundos:
+        d = rnd.uniform(0.08, 0.3)
+        if rnd.random() < 0.2:
+            partes.append(np.zeros(int(SR * d), dtype=np.int16))
+        elif rnd.random() < 0.5:
+            partes.append(_tono(d, (300, 0.3)))
+        else:
+            partes.append(_tono(d, (300, 0.1), (2800, 0.3)))
+        total += d
+    return np.concatenate(partes)
+
+
+def _forma():
+    casos = [("u", _tono(0.3, (300, 0.3))), ("i", _tono(0.3, (300, 0.1), (2800, 0.3))),
+             ("silencio", np.zeros(int(SR * 0.3), dtype=np.int16))]
+    filas = []
+    for nombre, pcm in casos:
+        lab = Labios(SR)
+        lab.agregar(pcm)
+        filas.append({"caso": nombre, "boca": round(float(np.mean(lab.boca)), 1),
+                      "forma": round(float(np.mean(lab.forma)), 1)})
+        print(f"  {nombre:>9}: boca {filas[-1]['boca']:>6}  forma {filas[-1]['forma']:>7}")
+    return filas
+
+
+def _costo(segundos: float, chunk_ms: float) -> dict:
+    pcm = _voz(segundos, np.random.default_rng(0))
+    paso = int(SR * chunk_ms / 1000)
+    lab = Labios(SR, "")
+    t0 = time.perf_counter()
+    for i in range(0, len(pcm), paso):
+        lab.agregar(pcm[i:i + paso])
+    dt = time.perf_counter() - t0
+    seg = len(pcm) / SR
+    return {"chunk_ms": chunk_ms, "us_por_s": round(1e6 * dt / seg, 1),
+            "frames": len(lab.boca), "json_bytes_por_s": round(len(json.dumps(lab.pista())) / seg)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segundos", type=float, default=10.0)
+    ap.add_argument("--chunk-ms", type=float, nargs="+", default=[50, 300, 2000])
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    print("\n== Forma ==")
+    forma = _forma()
+
+    print(f"\n== Costo ({args.segundos:.0f} s de voz) ==")
+    print(f"{'chunk':>8} {'µs / s audio':>13} {'frames':>7} {'JSON / s':>9}")
+    costos = []
+    for c in args.chunk_ms:
+        r = _costo(args.segundos, c)
+        costos.append(r)
+        print(f"{r['chunk_ms']:>6.0f}ms {r['us_por_s']:>13} {r['frames']:>7} {r['json_bytes_por_s']:>7} B")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"forma": forma, "costo": costos}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
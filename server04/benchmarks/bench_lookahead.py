@@ -0,0 +1,120 @@
+"""
+Benchmark del lookahead de VoicePlater: silencio entre oraciones.
+
+Uso (desde server04/):
+    PYTHONPATH=agente python -m benchmarks.bench_lookahead [--lookahead 0 1 2] [--json lookahead.json]
+
+Usa el texto largo de demo de server02/backend/agente/main.py::controller,
+partido como lo parte Answer (split_text), y el VoicePlater real con el
+sink 'parlante' reemplazado por uno virtual: consume el audio en tiempo real
+y bloquea como un dispositivo con BUFFER_S de buffer. Para cada lookahead
+(0 = una oración a la vez, como antes) reporta el silencio entre el final
+de una oración y el inicio de la siguiente (p50/p95/max/total) y los huecos
+dentro de una oración. La caché de TTS va a un directorio temporal nuevo en
+cada corrida para que todo pase por Piper.
+"""
+import argparse, ast, json, os, tempfile, threading, time
+
+from agente.answer import split_text
+from agente.event_bus import event_bus
+from agente.tts_cache import TtsCache
+from agente.tts_sinks import Sink
+from agente.voice import vp
+
+BUFFER_S = 0.1
+MAIN_SERVER02 = os.path.join(os.path.dirname(__file__), "..", "..", "server02", "backend", "agente", "main.py")
+
+
+def _texto_controller() -> str:
+    """El `texto = (...)` de controller() en el main de server02, sin importarlo."""
+    arbol = ast.parse(open(MAIN_SERVER02, encoding="utf-8").read())
+    for nodo in ast.walk(arbol):
+        if isinstance(nodo, ast.FunctionDef) and nodo.name == "controller":
+            for st in nodo.body:
+                if isinstance(st, ast.Assign) and getattr(st.targets[0], "id", "") == "texto":
+                    return ast.literal_eval(st.value)
+    raise SystemExit(f"no se encontró el texto de controller() en {MAIN_SERVER02}")
+
+
+class _Parlante(Sink):
+    """Parlante virtual: mide silencios entre oraciones y huecos dentro de una."""
+
+    nombre = "parlante"
+    ritmo = True
+
+    def __init__(self, sr: int):
+        super().__init__(sr, capacidad=1)  # el buffer es BUFFER_S, como el dispositivo
+        self.fin = None          # monotonic en que termina lo escrito
+        self.nueva = False       # el próximo chunk empieza oración
+        self.oraciones = 0
+        self.silencios = []
+        self.huecos = []
+
+    def _al_inicio(self, o):
+        self.nueva = True
+        self.oraciones += 1
+
+    def _al_chunk(self, o, pcm: bytes):
+        ahora = time.monotonic()
+        if self.fin is not None:
+            if self.nueva:
+                self.silencios.append(max(0.0, ahora - self.fin))
+            elif ahora > self.fin:
+                self.huecos.append(ahora - self.fin)
+        self.nueva = False
+        self.fin = max(ahora, self.fin or 0.0) + len(pcm) / 2 / self.sr
+        espera = self.fin - BUFFER_S - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return round(1000 * xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))], 1) if xs else None
+
+
+def _correr(lookahead: int, oraciones) -> dict:
+    vp.lookahead = lookahead
+    vp._cupos = threading.Semaphore(lookahead + 1)
+    vp._cache = TtsCache(tempfile.mkdtemp(prefix="tts_lookahead_"))
+    vp.agregar_sink("cache")  # que guarde en la caché nueva
+    parlante = _Parlante(vp.sr)
+    vp.agregar_sink(parlante)
+    for texto in oraciones:
+        event_bus.emit("voice.speak", texto, "triste", "normal")
+    while parlante.oraciones < len(oraciones) or parlante.fin is None or time.monotonic() < parlante.fin + 0.3:
+        time.sleep(0.05)
+    s = parlante.silencios
+    res = {
+        "lookahead": lookahead, "oraciones": len(oraciones),
+        "silencio_p50_ms": _pct(s, 0.5), "silencio_p95_ms": _pct(s, 0.95), "silencio_max_ms": _pct(s, 1.0),
+        "silencio_total_ms": round(1000 * sum(s), 1),
+        "huecos": len(parlante.huecos), "huecos_total_ms": round(1000 * sum(parlante.huecos), 1),
+    }
+    print(f"  lookahead {lookahead}: silencio p50 {res['silencio_p50_ms']}ms, total {res['silencio_total_ms']}ms")
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lookahead", type=int, nargs="+", default=[0, 1, 2])
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    oraciones = split_text(_texto_controller())
+    print(f"\n{len(oraciones)} oraciones del texto de controller()")
+    threading.Thread(target=vp.run, daemon=True).start()
+
+    filas = [_correr(k, oraciones) for k in args.lookahead]
+    print(f"\n{'lookahead':>10} {'silencio p50':>13} {'p95':>8} {'max':>8} {'total':>9} {'huecos':>7}")
+    for r in filas:
+        print(f"{r['lookahead']:>10} {r['silencio_p50_ms']!s:>11}ms {r['silencio_p95_ms']!s:>6}ms "
+              f"{r['silencio_max_ms']!s:>6}ms {r['silencio_total_ms']:>7}ms {r['huecos']:>7}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(filas, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: combinaciones de modelo/beam para parciales y finales en CPU.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_niveles_stt DIR [--n 20] [--parciales tiny:1,base:1]
+                                               [--finales tiny:5,base:5,small:5] [--cola-sec 2]
+
+DIR contiene WAVs y un line_index.tsv ("archivo<TAB>texto"), el mismo formato
+que usan los evaluadores de server02/backend/STT/old.
+  - parciales: RTF medio decodificando ventanas de WINDOW_SEC (como el parcial real)
+  - finales:   WER y latencia decodificando la locución completa (la pasada
+               completa, FINAL_FULL_PASS) y latencia decodificando solo los
+               últimos --cola-sec (el final de streaming, que solo ve la cola
+               sin confirmar: no crece con la locución)
+Cada modelo se carga una vez; también se informa su RAM estimada.
+"""
+import argparse, os, re, time, statistics, unicodedata
+
+import numpy as np
+from faster_whisper import WhisperModel, decode_audio
+
+from agente.stt_models import TierConfig, estimar_mb
+
+SAMPLERATE = 16000
+WINDOW_SEC = 1.0
+COMPUTE_TYPE = "int8"
+
+
+def _norm(texto: str) -> list[str]:
+    texto = unicodedata.normalize("NFD", texto.lower())
+    return re.sub(r"[^\w\s]|[\u0300-\u036f]", "", texto).split()
+
+
+def _wer(ref: str, hyp: str) -> float:
+    r, h = _norm(ref), _norm(hyp)
+    if not r:
+        return 0.0 if not h else 1.0
+    d = list(range(len(h) + 1))
+    for i in range(1, len(r) + 1):
+        prev, d[0] = d[0], i
+        for j in range(1, len(h) + 1):
+            cur = min(d[j] + 1, d[j - 1] + 1, prev + (r[i - 1] != h[j - 1]))
+            prev, d[j] = d[j], cur
+    return d[len(h)] / len(r)
+
+
+def _corpus(dir_: str, n: int) -> list[tuple[np.ndarray, str]]:
+    items = []
+    with open(os.path.join(dir_, "line_index.tsv"), encoding="utf-8") as f:
+        for linea in f:
+            partes = linea.rstrip("\n").split("\t")
+            if len(partes) < 2:
+                continue
+            nombre = partes[0] if partes[0].endswith(".wav") else partes[0] + ".wav"
+            path = os.path.join(dir_, nombre)
+            if os.path.exists(path):
+                items.append((decode_audio(path, sampling_rate=SAMPLERATE), partes[-1]))
+            if len(items) >= n:
+                break
+    return items
+
+
+def _tiers(spec: str) -> list[TierConfig]:
+    out = []
+    for parte in spec.split(","):
+        modelo, _, beam = parte.partition(":")
+        out.append(TierConfig(modelo, "cpu", COMPUTE_TYPE, beam_size=int(beam or 5)))
+    return out
+
+
+def _texto(model, audio, beam: int) -> str:
+    segments, _ = model.transcribe(audio, language="es", vad_filter=False, beam_size=beam)
+    return " ".join(s.text for s in segments)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("dir")
+    ap.add_argument("--n", type=int, default=20)
+    ap.add_argument("--parciales", default="tiny:1,tiny:5,base:1")
+    ap.add_argument("--finales", default="tiny:5,base:5,small:5")
+    ap.add_argument("--cola-sec", type=float, default=2.0, help="cola sin confirmar típica al cerrar")
+    args = ap.parse_args()
+
+    corpus = _corpus(args.dir, args.n)
+    if not corpus:
+        raise SystemExit(f"Sin audios en {args.dir}")
+    segundos = sum(len(a) for a, _ in corpus) / SAMPLERATE
+    print(f"{len(corpus)} audios, {segundos:.1f}s en total, CPU {COMPUTE_TYPE}\n")
+
+    modelos: dict[str, WhisperModel] = {}
+
+    def cargar(cfg: TierConfig) -> WhisperModel:
+        if cfg.model not in modelos:
+            modelos[cfg.model] = WhisperModel(cfg.model, device="cpu", compute_type=COMPUTE_TYPE)
+        return modelos[cfg.model]
+
+    print(f"{'PARCIAL':<12} {'beam':>4} {'RAM~':>7} {'ms/ventana':>11} {'RTF':>6}")
+    n_win = int(SAMPLERATE * WINDOW_SEC)
+    for cfg in _tiers(args.parciales):
+        model = cargar(cfg)
+        _texto(model, corpus[0][0][:n_win], cfg.beam_size)  # calentamiento
+        tiempos = []
+        for audio, _ in corpus:
+            t0 = time.perf_counter()
+            _texto(model, audio[-n_win:], cfg.beam_size)
+            tiempos.append(time.perf_counter() - t0)
+        ms = statistics.mean(tiempos) * 1000
+        print(f"{cfg.model:<12} {cfg.beam_size:>4} {estimar_mb(cfg):>5}MB {ms:>9.0f}ms "
+              f"{ms / 1000 / WINDOW_SEC:>6.2f}")
+
+    print(f"\n{'FINAL':<12} {'beam':>4} {'RAM~':>7} {'WER':>7} {'lat p50':>9} {'lat p95':>9} {'RTF':>6} "
+          f"{'cola p50':>9} {'cola p95':>9}")
+    n_cola = int(SAMPLERATE * args.cola_sec)
+    for cfg in _tiers(args.finales):
+        model = cargar(cfg)
+        _texto(model, corpus[0][0], cfg.beam_size)  # calentamiento
+        wers, lat, lat_cola = [], [], []
+        for audio, ref in corpus:
+            t0 = time.perf_counter()
+            hyp = _texto(model, audio, cfg.beam_size)
+            lat.append(time.perf_counter() - t0)
+            wers.append(_wer(ref, hyp))
+            t0 = time.perf_counter()
+            _texto(model, audio[-n_cola:], cfg.beam_size)
+            lat_cola.append(time.perf_counter() - t0)
+        lat_ms = sorted(x * 1000 for x in lat)
+        cola_ms = sorted(x * 1000 for x in lat_cola)
+        p95 = lat_ms[int(0.95 * (len(lat_ms) - 1))]
+        print(f"{cfg.model:<12} {cfg.beam_size:>4} {estimar_mb(cfg):>5}MB "
+              f"{statistics.mean(wers):>6.1%} {statistics.median(lat_ms):>7.0f}ms {p95:>7.0f}ms "
+              f"{sum(lat) / segundos:>6.2f} {statistics.median(cola_ms):>7.0f}ms "
+              f"{cola_ms[int(0.95 * (len(cola_ms) - 1))]:>7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Benchmark del presupuesto de CPU (agente/presupuesto_cpu.py): latencia de
+turno completo con y sin reparto de núcleos.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_presupuesto [--nucleos 2] [--turnos 8] [--model tiny]
+        [--modo ambos|con|sin] [--json presupuesto.json]
+
+Con --nucleos N el proceso se limita a los primeros N núcleos (para
+reproducir una máquina de 2 núcleos en una más grande). Cada modo corre en
+un proceso aparte (los pools de CTranslate2/ONNX Runtime son del proceso):
+  sin: WhisperModel y Piper con sus hilos por defecto, sin afinidad
+  con: hilos, afinidad y nice del presupuesto; mic_abierto mientras el
+       usuario habla y mic_cerrado para la respuesta
+
+Por turno, con un bucle de "render" numpy a 60 FPS corriendo todo el tiempo:
+  1. escucha: la frase del usuario (Piper, 16 kHz) llega en tiempo real y
+     cada 0.3 s se decodifica un parcial de la última ventana de 1 s
+  2. fin de voz: decode final de toda la frase
+  3. respuesta: Piper sintetiza otra frase; se toma el primer chunk de audio
+Se reporta p50/p95 de parcial, final, primer audio, turno (fin de voz ->
+primer audio) y frames de render tarde (> 1.5 x 16.7 ms).
+"""
+import argparse, json, os, subprocess, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.bench_stt_offline import FRASES, PIPER_MODEL
+
+SAMPLERATE = 16000
+PARCIAL_CADA_S = 0.3
+VENTANA_S = 1.0
+FPS = 60
+
+
+def _percentiles(xs):
+    xs = sorted(xs)
+    if not xs:
+        return {"p50": None, "p95": None}
+    return {"p50": round(xs[len(xs) // 2], 1), "p95": round(xs[min(len(xs) - 1, int(0.95 * len(xs)))], 1)}
+
+
+class _Render:
+    """Carga de un bucle de render: un frame de 720p con un par de operaciones por tick."""
+
+    def __init__(self, presupuesto=None):
+        self.presupuesto = presupuesto
+        self.tarde = 0
+        self.frames = 0
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        if self.presupuesto is not None:
+            self.presupuesto.fijar_hilo("render")
+        img = np.random.default_rng(0).random((720, 1280, 3), dtype=np.float32)
+        periodo = 1 / FPS
+        siguiente = time.perf_counter()
+        while not self._parar.is_set():
+            out = np.clip(img * 1.01 + 0.001, 0, 1)
+            img = out[::-1] if self.frames % 2 else out
+            self.frames += 1
+            siguiente += periodo
+            espera = siguiente - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            elif -espera > 0.5 * periodo:
+                self.tarde += 1
+                siguiente = time.perf_counter()
+
+    def start(self):
+        self._hilo.start()
+
+    def stop(self):
+        self._parar.set()
+        self._hilo.join()
+
+
+def _correr(args) -> dict:
+    presupuesto = None
+    if args.modo == "con":
+        # antes de importar faster_whisper/onnxruntime (OMP_WAIT_POLICY)
+        from agente.presupuesto_cpu import PresupuestoCpu
+        presupuesto = PresupuestoCpu(sorted(os.sched_getaffinity(0)), modo="mic_abierto")
+    from faster_whisper import WhisperModel
+    from piper.voice import PiperVoice
+    from agente.audio_resample import remuestrear
+
+    stt = ThreadPoolExecutor(1)  # como el hilo de inferencia de Microfono
+
+    def cargar_whisper():
+        if presupuesto is None:
+            return WhisperModel(args.model, device="cpu", compute_type="int8")
+        presupuesto.fijar_hilo("stt")
+
+        def crear():
+            m = WhisperModel(args.model, device="cpu", compute_type="int8", cpu_threads=presupuesto.hilos("stt"))
+            list(m.transcribe(np.zeros(SAMPLERATE // 2, dtype=np.float32), language="es", beam_size=1)[0])
+            return m
+        return presupuesto.registrar("stt", crear)
+
+    def cargar_piper():
+        voz = PiperVoice.load(PIPER_MODEL)
+        if presupuesto is not None:
+            import onnxruntime as ort
+            voz.session = ort.InferenceSession(PIPER_MODEL, sess_options=presupuesto.opciones_onnx("tts"),
+                                               providers=["CPUExecutionProvider"])
+        for _ in voz.synthesize("Hola."):
+            pass
+        return voz
+
+    modelo = stt.submit(cargar_whisper).result()
+    voz = presupuesto.registrar("tts", cargar_piper) if presupuesto is not None else cargar_piper()
+    tts = ThreadPoolExecutor(1)  # como el hilo de VoicePlater
+    if presupuesto is not None:
+        tts.submit(presupuesto.fijar_hilo, "tts").result()
+
+    def sintetizar(texto: str) -> np.ndarray:
+        pcm = b"".join(c.audio_int16_bytes for c in voz.synthesize(texto))
+        return remuestrear(pcm, voz.config.sample_rate, SAMPLERATE)
+
+    def decodificar(audio: np.ndarray, beam: int) -> float:
+        t0 = time.perf_counter()
+        segs, _ = modelo.transcribe(audio, language="es", beam_size=beam, vad_filter=False)
+        " ".join(s.text for s in segs)
+        return 1000 * (time.perf_counter() - t0)
+
+    def primer_audio(texto: str) -> float:
+        t0 = time.perf_counter()
+        for _ in voz.synthesize(texto):
+            return time.perf_counter() - t0
+        return time.perf_counter() - t0
+
+    frases_usuario = [sintetizar(FRASES[i % len(FRASES)]) for i in range(args.turnos)]
+    render = _Render(presupuesto)
+    render.start()
+    parciales, finales, primeros, turnos = [], [], [], []
+    try:
+        for i, audio in enumerate(frases_usuario):
+            if presupuesto is not None:
+                presupuesto.modo("mic_abierto")
+            # 1) escucha en tiempo real con parciales
+            t0 = time.perf_counter()
+            pendiente = None
+            while True:
+                dt = time.perf_counter() - t0
+                if dt >= len(audio) / SAMPLERATE:
+                    break
+                if pendiente is None or pendiente.done():
+                    if pendiente is not None:
+                        parciales.append(pendiente.result())
+                        pendiente = None
+                    fin = int(dt * SAMPLERATE)
+                    ventana = audio[max(0, fin - int(VENTANA_S * SAMPLERATE)):fin]
+                    if len(ventana) > SAMPLERATE // 4:
+                        pendiente = stt.submit(decodificar, ventana, 1)
+                time.sleep(PARCIAL_CADA_S)
+            if pendiente is not None:
+                parciales.append(pendiente.result())
+            # 2) final
+            t_fin_voz = time.perf_counter()
+            stt.submit(decodificar, audio, 5).result()
+            t_final = time.perf_counter()
+            finales.append(1000 * (t_final - t_fin_voz))
+            # 3) respuesta
+            if presupuesto is not None:
+                presupuesto.modo("mic_cerrado")
+            primero = tts.submit(primer_audio, FRASES[(i + 7) % len(FRASES)]).result()
+            primeros.append(1000 * primero)
+            turnos.append(1000 * (time.perf_counter() - t_fin_voz))
+            print(f"  turno {i + 1:>2}: final {finales[-1]:.0f}ms, primer audio {primeros[-1]:.0f}ms, "
+                  f"turno {turnos[-1]:.0f}ms")
+    finally:
+        render.stop()
+        stt.shutdown()
+        tts.shutdown()
+
+    return {
+        "modo": args.modo,
+        "nucleos": sorted(os.sched_getaffinity(0)),
+        "presupuesto": presupuesto.snapshot() if presupuesto is not None else None,
+        "parcial_ms": _percentiles(parciales),
+        "final_ms": _percentiles(finales),
+        "primer_audio_ms": _percentiles(primeros),
+        "turno_ms": _percentiles(turnos),
+        "render_tarde_pct": round(100 * render.tarde / max(1, render.frames), 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--nucleos", type=int, default=2, help="limitar el proceso a N núcleos (0 = todos)")
+    ap.add_argument("--turnos", type=int, default=8)
+    ap.add_argument("--model", default="tiny")
+    ap.add_argument("--modo", default="ambos", choices=["ambos", "con", "sin"])
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    if args.nucleos:
+        os.sched_setaffinity(0, set(sorted(os.sched_getaffinity(0))[:args.nucleos]))
+
+    if args.modo != "ambos":
+        res = [_correr(args)]
+    else:
+        res = []
+        for modo in ("sin", "con"):
+            print(f"\n== {modo} presupuesto ==")
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                tmp = f.name
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_presupuesto", "--modo", modo,
+                            "--nucleos", str(args.nucleos), "--turnos", str(args.turnos),
+                            "--model", args.model, "--json", tmp], check=True)
+            with open(tmp, encoding="utf-8") as f:
+                res.extend(json.load(f))
+            os.unlink(tmp)
+
+    print(f"\n{'modo':>5} {'parcial p95':>12} {'final p50':>10} {'final p95':>10} "
+          f"{'1er audio p50':>14} {'turno p50':>10} {'turno p95':>10} {'render tarde':>13}")
+    for r in res:
+        print(f"{r['modo']:>5} {r['parcial_ms']['p95']!s:>10}ms {r['final_ms']['p50']!s:>8}ms "
+              f"{r['final_ms']['p95']!s:>8}ms {r['primer_audio_ms']['p50']!s:>12}ms "
+              f"{r['turno_ms']['p50']!s:>8}ms {r['turno_ms']['p95']!s:>8}ms {r['render_tarde_pct']:>12}%")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark del remuestreo (agente/audio_resample.py) en las tasas del proyecto.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_resample [--segundos 10] [--json resample.json]
+
+Para cada conversión (micrófono 44.1/48 kHz -> 16 kHz, Piper 22.05 kHz y
+Kokoro 24 kHz -> 16 kHz, 16 kHz -> 22.05 kHz) procesa la señal en chunks
+de 50 ms como llega en streaming y reporta:
+  - µs por chunk y RTF del Resampler polifásico
+  - SNR (dB) frente a la señal ideal para un barrido de tonos en banda
+  - rechazo de alias (dB) de un tono por encima del Nyquist de salida
+comparado con la interpolación lineal (np.interp) que se usaba antes.
+"""
+import argparse, json, time
+
+import numpy as np
+
+from agente.audio_resample import Resampler, remuestrear
+
+CONVERSIONES = [(44100, 16000), (48000, 16000), (22050, 16000), (24000, 16000), (16000, 22050)]
+CHUNK_S = 0.05
+
+
+def _tonos(sr: int, segundos: float, freqs) -> np.ndarray:
+    t = np.arange(int(sr * segundos)) / sr
+    return sum(np.sin(2 * np.pi * f * t) for f in freqs) / len(freqs)
+
+
+def _interp(x: np.ndarray, sr_in: int, sr_out: int) -> np.ndarray:
+    n = int(len(x) * sr_out / sr_in)
+    return np.interp(np.arange(n) * (sr_in / sr_out), np.arange(len(x)), x)
+
+
+def _db(a: float, b: float) -> float:
+    return round(10 * np.log10(a / max(b, 1e-20)), 1)
+
+
+def _medir(sr_in: int, sr_out: int, segundos: float) -> dict:
+    rs = Resampler(sr_in, sr_out)
+    chunk = int(sr_in * CHUNK_S)
+    x = (_tonos(sr_in, segundos, [300, 1100, 2900]) * 16000).astype(np.int16)
+    tiempos = []
+    for i in range(0, len(x) - chunk + 1, chunk):
+        t0 = time.perf_counter()
+        rs.procesar(x[i:i + chunk])
+        tiempos.append(time.perf_counter() - t0)
+
+    # calidad: tonos en banda (hasta 0.4 * tasa menor) y uno por encima del Nyquist de salida
+    nyq = min(sr_in, sr_out) / 2
+    freqs = [200, 0.2 * nyq, 0.5 * nyq, 0.8 * nyq]
+    x = _tonos(sr_in, 1.0, freqs)
+    ideal = _tonos(sr_out, 1.0, freqs)
+    borde = slice(200, -200)
+    res = {}
+    for nombre, f in (("polifasico", remuestrear), ("interp", _interp)):
+        y = f(x, sr_in, sr_out)
+        e = (y[:len(ideal)] - ideal[:len(y)])[borde]
+        res[f"snr_{nombre}_db"] = _db(np.mean(ideal[borde] ** 2), np.mean(e ** 2))
+    if sr_out < sr_in:
+        alto = np.sin(2 * np.pi * (1.3 * nyq) * np.arange(sr_in) / sr_in)
+        for nombre, f in (("polifasico", remuestrear), ("interp", _interp)):
+            y = f(alto, sr_in, sr_out)[borde]
+            res[f"alias_{nombre}_db"] = _db(0.5, np.mean(y ** 2))
+
+    return {
+        "sr_in": sr_in, "sr_out": sr_out, "taps": rs.taps, "fases": rs.L,
+        "us_por_chunk": round(1e6 * sum(tiempos) / len(tiempos), 1),
+        "rtf": round(sum(tiempos) / segundos, 5),
+        **res,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segundos", type=float, default=10)
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    filas = [_medir(a, b, args.segundos) for a, b in CONVERSIONES]
+    print(f"\n{'conversión':>15} {'taps':>5} {'µs/50ms':>8} {'RTF':>8} "
+          f"{'SNR poli':>9} {'SNR interp':>11} {'alias poli':>11} {'alias interp':>13}")
+    for r in filas:
+        alias = (f"{r['alias_polifasico_db']:>9.1f}dB {r['alias_interp_db']:>11.1f}dB"
+                 if "alias_interp_db" in r else f"{'-':>11} {'-':>13}")
+        print(f"{r['sr_in']:>6}->{r['sr_out']:<6} {r['taps']:>5} {r['us_por_chunk']:>8} {r['rtf']:>8} "
+              f"{r['snr_polifasico_db']:>7.1f}dB {r['snr_interp_db']:>9.1f}dB {alias}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(filas, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
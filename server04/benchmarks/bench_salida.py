@@ -0,0 +1,142 @@
+"""
+Benchmark del motor de salida de audio (agente/audio_salida.py).
+
+Uso (desde server04/):
+    python -m benchmarks.bench_salida [--jitter-ms 0 30 60 120] [--frases 8] [--rtf 0.7]
+        [--cortes 5] [--json salida.json]
+
+Sin dispositivo: un hilo hace de placa de audio y llama a `llenar()` cada
+bloque en tiempo real, como el callback de PortAudio. Un productor escribe
+frases a 22.05 kHz (Piper) en chunks de 0.15-0.5 s que llegan con ráfagas
+(cada chunk tarda su duración * `--rtf` * U(0.3, 2.5) en "sintetizarse"),
+sin esperar entre frases, como VoicePlater con lookahead. Al final se hacen
+`--cortes` cortes con audio encolado.
+
+Para cada colchón de jitter reporta underruns y su silencio, el arranque
+(primer escribir -> primer bloque con audio), la latencia de corte
+(cortar() -> bloque en silencio, p50/max), la ocupación media del anillo y
+el costo de `llenar()` por bloque (p50/p99, en µs).
+"""
+import argparse, json, random, threading, time
+
+import numpy as np
+
+from agente.audio_salida import SalidaAudio
+
+SR_TTS = 22050
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))], 1) if xs else None
+
+
+class _Placa:
+    """Hilo que consume un bloque por período, como el callback del dispositivo."""
+
+    def __init__(self, salida: SalidaAudio):
+        self.s = salida
+        self.costos_us = []
+        self.cortes_ms = []
+        self.t_audio = None      # primer bloque con audio
+        self._stop = threading.Event()
+        self._hilo = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._hilo.start()
+
+    def stop(self):
+        self._stop.set()
+        self._hilo.join()
+
+    def _run(self):
+        out = np.zeros(self.s.bloque, dtype=np.int16)
+        periodo = self.s.bloque / self.s.sr
+        prox = time.perf_counter()
+        cortes = 0
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            n = self.s.llenar(out)
+            self.costos_us.append(1e6 * (time.perf_counter() - t0))
+            if n and self.t_audio is None:
+                self.t_audio = time.monotonic()
+            if self.s.cortes != cortes:
+                cortes = self.s.cortes
+                self.cortes_ms.append(1000 * (time.monotonic() - self.s._t_corte))
+            prox += periodo
+            espera = prox - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+
+
+def _frase(rnd: random.Random):
+    """Chunks int16 de una frase (un tono, para no escribir ceros)."""
+    chunks = []
+    for _ in range(rnd.randint(2, 5)):
+        n = int(SR_TTS * rnd.uniform(0.15, 0.5))
+        chunks.append((rnd.random() * 8000 * np.sin(np.linspace(0, 40, n)) + 200).astype(np.int16))
+    return chunks
+
+
+def _correr(jitter_ms: float, frases: int, rtf: float, n_cortes: int) -> dict:
+    rnd = random.Random(0)
+    s = SalidaAudio(sr=48000, jitter_s=jitter_ms / 1000, log=lambda *_: None)
+    placa = _Placa(s)
+    placa.start()
+
+    t_inicio = None
+    for _ in range(frases):
+        for c in _frase(rnd):
+            time.sleep(len(c) / SR_TTS * rtf * rnd.uniform(0.3, 2.5))
+            t_inicio = t_inicio or time.monotonic()
+            s.escribir(c, SR_TTS)
+        s.terminar()
+    while s.activo():
+        time.sleep(0.05)
+    arranque_ms = 1000 * ((placa.t_audio or t_inicio) - t_inicio)
+    stats = s.stats()
+
+    for _ in range(n_cortes):
+        for c in _frase(rnd):
+            s.escribir(c, SR_TTS)
+        time.sleep(rnd.uniform(0.1, 0.3))
+        s.cortar()
+        time.sleep(0.05)
+    placa.stop()
+
+    res = {
+        "jitter_ms": jitter_ms,
+        "underruns": stats["salida_underruns"], "underrun_ms": stats["salida_underrun_ms"],
+        "arranque_ms": round(arranque_ms, 1),
+        "corte_p50_ms": _pct(placa.cortes_ms, 0.5), "corte_max_ms": _pct(placa.cortes_ms, 1.0),
+        "ocupacion_media_ms": stats["salida_ocupacion_media_ms"],
+        "llenar_p50_us": _pct(placa.costos_us, 0.5), "llenar_p99_us": _pct(placa.costos_us, 0.99),
+    }
+    print(f"  jitter {jitter_ms:.0f} ms: {res['underruns']} underruns, arranque {res['arranque_ms']} ms")
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jitter-ms", type=float, nargs="+", default=[0, 30, 60, 120])
+    ap.add_argument("--frases", type=int, default=8)
+    ap.add_argument("--rtf", type=float, default=0.7, help="RTF medio del sintetizador simulado")
+    ap.add_argument("--cortes", type=int, default=5)
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    filas = [_correr(j, args.frases, args.rtf, args.cortes) for j in args.jitter_ms]
+    print(f"\n{'jitter':>7} {'underruns':>10} {'silencio':>9} {'arranque':>9} {'corte p50':>10} "
+          f"{'max':>7} {'ocupación':>10} {'llenar p50':>11} {'p99':>7}")
+    for r in filas:
+        print(f"{r['jitter_ms']:>5.0f}ms {r['underruns']:>10} {r['underrun_ms']:>7}ms {r['arranque_ms']:>7}ms "
+              f"{r['corte_p50_ms']!s:>8}ms {r['corte_max_ms']!s:>5}ms {r['ocupacion_media_ms']:>8}ms "
+              f"{r['llenar_p50_us']!s:>9}µs {r['llenar_p99_us']!s:>5}µs")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(filas, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
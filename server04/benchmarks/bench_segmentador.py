@@ -0,0 +1,147 @@
+"""
+Benchmark del segmentador de oraciones (agente/segmentador.py) sobre el
+stream de la respuesta final.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_segmentador [--ttft 0.4] [--tps 40] [--tts-ms 150] [--json seg.json]
+
+1. Cortes: casos difíciles en español (¿…?, ¡…!, puntos suspensivos,
+   abreviaturas, números) contra la segmentación esperada, alimentando de a
+   un token; además verifica que token a token y de una vez den lo mismo.
+2. Latencia: reproduce respuestas típicas como un stream de LLM (primer
+   token a `--ttft` s, luego `--tps` tokens/s, tokens de ~4 caracteres) y
+   compara el fin de habla -> primer audio de antes (esperar la respuesta
+   entera) con el de ahora (primera oración cerrada), ambos más un chunk de
+   TTS de `--tts-ms`. También mide el costo de agregar() por token.
+"""
+import argparse, json, re, time
+
+from agente.segmentador import Segmentador, segmentar
+
+CASOS = [
+    ("Hola, ¿cómo estás? Me alegra verte.",
+     ["Hola, ¿cómo estás?", "Me alegra verte."]),
+    ("¿Sabes qué? ¡Qué sorpresa! Bueno... no sé qué decir. Pensé que… En fin.",
+     ["¿Sabes qué?", "¡Qué sorpresa!", "Bueno... no sé qué decir.", "Pensé que…", "En fin."]),
+    ("El Sr. Pérez llegó a las 10:30 con 3.5 kg de harina y 1.000 pesos. Después se fue.",
+     ["El Sr. Pérez llegó a las 10:30 con 3.5 kg de harina y 1.000 pesos.", "Después se fue."]),
+    ("La Dra. Gómez vive en EE. UU. desde 2019. Trabaja allá.",
+     ["La Dra. Gómez vive en EE. UU. desde 2019.", "Trabaja allá."]),
+    ("Lleva frutas, p. ej. manzanas, peras, etc. Y no olvides el agua.",
+     ["Lleva frutas, p. ej. manzanas,", "peras, etc.", "Y no olvides el agua."]),
+    ("Lo escribió J. R. Martínez. Es muy bueno.",
+     ["Lo escribió J. R. Martínez.", "Es muy bueno."]),
+    ("¿Querías saber si, dado que llueve, conviene salir o esperar?, le pregunté.",
+     ["¿Querías saber si, dado que llueve, conviene salir o esperar?,", "le pregunté."]),
+    ("Pasos:\n1. Abrir la app.\n2. Tocar el botón.",
+     ["Pasos:", "1. Abrir la app.", "2. Tocar el botón."]),
+    ("«¡Vamos!» dijo ella. Y salimos.",
+     ["«¡Vamos!» dijo ella.", "Y salimos."]),
+    ("¡Ay! qué susto me diste, de verdad. ¿Estás bien?",
+     ["¡Ay! qué susto me diste,", "de verdad.", "¿Estás bien?"]),
+    ("Mirá, la verdad es que esto depende de muchas cosas, entre ellas el clima y la gente.",
+     ["Mirá, la verdad es que esto depende de muchas cosas,", "entre ellas el clima y la gente."]),
+]
+
+RESPUESTAS = [
+    "Claro, te explico. La fotosíntesis es el proceso por el cual las plantas convierten la luz "
+    "en energía química. Ocurre en los cloroplastos, gracias a la clorofila. ¿Querés que te cuente "
+    "las fases en detalle?",
+    "Entiendo lo que decís, y tiene sentido que te preocupe. Lo mejor es ir paso a paso: primero "
+    "revisá el presupuesto, después hablá con tu equipo y, recién al final, tomá la decisión.",
+    "¡Qué buena noticia! Me alegra mucho que te haya ido bien en el examen. ¿Cuál fue la parte "
+    "que más te costó? Así la repasamos juntos para el próximo.",
+    "Mañana se espera un día nublado, con una máxima de 18 grados y 60 % de probabilidad de lluvia "
+    "por la tarde. Te conviene llevar paraguas. El fin de semana mejora bastante.",
+    "Sí. Para eso tenés dos opciones... la primera es más rápida pero menos precisa, y la segunda "
+    "lleva más tiempo. Yo empezaría por la primera y ajustaría después.",
+]
+
+_TOKEN = re.compile(r"\s*[^\s]{1,4}|\s+")
+
+
+def _tokens(texto: str):
+    """Aproximación de tokens de LLM: pedazos de hasta 4 caracteres con su espacio previo."""
+    return _TOKEN.findall(texto)
+
+
+def _alimentar(texto: str):
+    seg, salida, primera = Segmentador(), [], None
+    toks = _tokens(texto)
+    for n, tok in enumerate(toks, 1):
+        nuevos = seg.agregar(tok)
+        if nuevos and primera is None:
+            primera = n
+        salida += nuevos
+    salida += seg.cerrar()
+    return salida, primera or len(toks), len(toks)
+
+
+def _cortes():
+    ok = 0
+    for texto, esperado in CASOS:
+        obtenido, _, _ = _alimentar(texto)
+        bien = obtenido == esperado and obtenido == segmentar(texto)
+        ok += bien
+        if not bien:
+            print(f"  MAL: {texto!r}\n    esperado {esperado}\n    obtenido {obtenido}")
+    print(f"  cortes correctos: {ok}/{len(CASOS)}")
+    return ok
+
+
+def _latencias(ttft: float, tps: float, tts_ms: float):
+    filas = []
+    for texto in RESPUESTAS:
+        fragmentos, primera, total = _alimentar(texto)
+        antes = 1000 * (ttft + total / tps) + tts_ms
+        ahora = 1000 * (ttft + primera / tps) + tts_ms
+        filas.append({"tokens": total, "fragmentos": len(fragmentos), "tokens_primera": primera,
+                      "antes_ms": round(antes), "ahora_ms": round(ahora), "primera": fragmentos[0]})
+    return filas
+
+
+def _costo_us(repeticiones: int = 200) -> float:
+    toks = [_tokens(t) for t in RESPUESTAS]
+    n = sum(len(t) for t in toks) * repeticiones
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        for ts in toks:
+            seg = Segmentador()
+            for tok in ts:
+                seg.agregar(tok)
+            seg.cerrar()
+    return 1e6 * (time.perf_counter() - t0) / n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ttft", type=float, default=0.4, help="s hasta el primer token del LLM")
+    ap.add_argument("--tps", type=float, default=40.0, help="tokens por segundo del LLM")
+    ap.add_argument("--tts-ms", type=float, default=150.0, help="ms del primer chunk de TTS")
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    print("\n== Cortes ==")
+    ok = _cortes()
+
+    print(f"\n== Fin de habla -> primer audio (TTFT {args.ttft}s, {args.tps:.0f} tok/s, TTS {args.tts_ms:.0f}ms) ==")
+    filas = _latencias(args.ttft, args.tps, args.tts_ms)
+    print(f"{'tokens':>7} {'frag.':>6} {'tok. 1ra':>9} {'antes':>8} {'ahora':>8}  primera oración")
+    for f in filas:
+        print(f"{f['tokens']:>7} {f['fragmentos']:>6} {f['tokens_primera']:>9} {f['antes_ms']:>6}ms "
+              f"{f['ahora_ms']:>6}ms  {f['primera'][:50]}")
+    antes = sum(f["antes_ms"] for f in filas) / len(filas)
+    ahora = sum(f["ahora_ms"] for f in filas) / len(filas)
+    costo = _costo_us()
+    print(f"\n  promedio: antes {antes:.0f} ms, ahora {ahora:.0f} ms ({antes - ahora:.0f} ms menos)")
+    print(f"  agregar(): {costo:.1f} µs por token")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"cortes_ok": ok, "casos": len(CASOS), "latencias": filas,
+                       "antes_ms": round(antes), "ahora_ms": round(ahora),
+                       "agregar_us_por_token": round(costo, 2)}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark del reparto a sinks de VoicePlater (agente/tts_sinks.py): un sink
+lento no frena la síntesis ni a los demás.
+
+Uso (desde server04/):
+    PYTHONPATH=agente python -m benchmarks.bench_sinks [--locuciones 20] [--chunks 4] [--chunk-ms 400]
+        [--rtf 0.3] [--lento-ms 0 50 200] [--json sinks.json]
+
+Un productor simula Piper: `--locuciones` oraciones de `--chunks` chunks de
+`--chunk-ms` de audio, cada uno tarda `--chunk-ms` * `--rtf` en salir. Se
+reparten a dos sinks: 'rapido' (un cliente WS: solo anota cuándo le llega
+cada chunk) y 'lento' (un disco que tarda `--lento-ms` por chunk).
+Para cada lentitud compara:
+  en serie: un solo bucle escribe en los dos destinos, como el _salida de antes
+  sinks:    Sink.chunk() en cada uno, con su cola y su hilo
+Reporta cuánto tarda la síntesis, el retraso de cada chunk en llegar al
+sink rápido contra el ritmo de síntesis sin destinos (p50/p95/max; incluye
+la deriva del sleep) y las locuciones que perdió el lento.
+"""
+import argparse, json, time
+from types import SimpleNamespace
+
+from agente.tts_sinks import Sink
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return round(1000 * xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))], 1) if xs else None
+
+
+class _Rapido(Sink):
+    nombre = "rapido"
+
+    def __init__(self):
+        super().__init__(22050)
+        self.retrasos = []
+
+    def _al_chunk(self, o, pcm):
+        self.retrasos.append(time.perf_counter() - pcm)  # el "pcm" es cuándo debió salir
+
+
+class _Lento(Sink):
+    nombre = "lento"
+
+    def __init__(self, demora: float):
+        super().__init__(22050)
+        self.demora = demora
+        self.fines = 0
+
+    def _al_chunk(self, o, pcm):
+        time.sleep(self.demora)
+
+    def _al_fin(self, o, completo):
+        self.fines += 1
+
+
+def _producir(args, entregar):
+    """
+    Genera los chunks a ritmo de síntesis; devuelve los segundos que tardó.
+    A cada chunk lo acompaña el instante en que habría salido sin destinos
+    que frenen (el retraso se mide contra eso).
+    """
+    dt = args.chunk_ms / 1000 * args.rtf
+    t0 = time.perf_counter()
+    n = 0
+    for i in range(args.locuciones):
+        o = SimpleNamespace(id=i + 1, texto=f"oración {i}", gen=0)
+        entregar("inicio", o, None)
+        for _ in range(args.chunks):
+            time.sleep(dt)
+            n += 1
+            entregar("chunk", o, t0 + n * dt)
+        entregar("fin", o, True)
+    return time.perf_counter() - t0
+
+
+def _en_serie(args, demora: float) -> dict:
+    retrasos = []
+
+    def entregar(tipo, o, t):
+        if tipo == "chunk":
+            retrasos.append(time.perf_counter() - t)
+            time.sleep(demora)
+    total = _producir(args, entregar)
+    return {"sintesis_s": round(total, 2), "retrasos": retrasos, "perdidas": 0}
+
+
+def _sinks(args, demora: float) -> dict:
+    rapido, lento = _Rapido(), _Lento(demora)
+    sinks = (rapido, lento)
+    for s in sinks:
+        s.iniciar()
+
+    def entregar(tipo, o, dato):
+        for s in sinks:
+            if tipo == "inicio":
+                s.inicio(o)
+            else:
+                getattr(s, tipo)(o, dato)
+    total = _producir(args, entregar)
+    while lento.fines < args.locuciones or rapido.procesados < rapido.encolados:
+        time.sleep(0.01)
+    for s in sinks:
+        s.cerrar()
+    return {"sintesis_s": round(total, 2), "retrasos": rapido.retrasos, "perdidas": lento.perdidas}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--locuciones", type=int, default=20)
+    ap.add_argument("--chunks", type=int, default=4)
+    ap.add_argument("--chunk-ms", type=float, default=400.0)
+    ap.add_argument("--rtf", type=float, default=0.3, help="RTF del sintetizador simulado")
+    ap.add_argument("--lento-ms", type=float, nargs="+", default=[0, 50, 200])
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    filas = []
+    for lento_ms in args.lento_ms:
+        for modo, fn in (("en serie", _en_serie), ("sinks", _sinks)):
+            r = fn(args, lento_ms / 1000)
+            fila = {"lento_ms": lento_ms, "modo": modo, "sintesis_s": r["sintesis_s"],
+                    "retraso_p50_ms": _pct(r["retrasos"], 0.5), "retraso_p95_ms": _pct(r["retrasos"], 0.95),
+                    "retraso_max_ms": _pct(r["retrasos"], 1.0), "perdidas": r["perdidas"]}
+            filas.append(fila)
+            print(f"  lento {lento_ms:.0f} ms, {modo}: síntesis {fila['sintesis_s']} s")
+
+    ideal = args.locuciones * args.chunks * args.chunk_ms / 1000 * args.rtf
+    print(f"\nsíntesis sin destinos: {ideal:.2f} s")
+    print(f"{'lento':>7} {'modo':>9} {'síntesis':>9} {'retraso p50':>12} {'p95':>8} {'max':>8} {'perdidas':>9}")
+    for f in filas:
+        print(f"{f['lento_ms']:>5.0f}ms {f['modo']:>9} {f['sintesis_s']:>8}s {f['retraso_p50_ms']!s:>10}ms "
+              f"{f['retraso_p95_ms']!s:>6}ms {f['retraso_max_ms']!s:>6}ms {f['perdidas']:>9}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(filas, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Benchmark offline del STT: corre Microfono o AudioTransform en el mismo
+proceso, más rápido que tiempo real, sobre un directorio de WAVs.
+
+Uso (desde server04/):
+    python -m benchmarks.bench_stt_offline --dir corpus/ [--objetivo microfono|servidor]
+        [--sintetizar 20] [--json resultados.json]
+        [--baseline benchmarks/baseline_stt_microfono.json] [--guardar-baseline]
+
+  --sintetizar N  genera N frases en español con la voz Piper del repo en --dir
+                  (WAV + line_index.tsv) antes de medir
+  --dir           WAVs y line_index.tsv opcional ("archivo<TAB>texto", como los
+                  evaluadores de server02/backend/STT/old); sin textos no hay WER
+
+El audio se lleva a 16 kHz una sola vez y se cachea como .npy en DIR/.cache.
+Cada archivo se inyecta en chunks de CHUNK_SEC con reloj de audio (sin esperar):
+cada PARTIAL_EVAL_INTERVAL de audio se pide un parcial y al terminar el final,
+llamando a los mismos métodos que usa el objetivo en producción. Se reporta en
+JSON: latencia de parciales (percentiles), latencia del final, RTF, WER y RSS
+pico; con --baseline se compara y el proceso sale con 1 si algo empeoró más
+que --tolerancia.
+"""
+import argparse, json, os, resource, sys, time, statistics, wave
+
+import numpy as np
+from faster_whisper import decode_audio
+
+try:
+    import jiwer
+    HAS_JIWER = True
+except Exception:
+    HAS_JIWER = False
+
+SAMPLERATE = 16000
+CHUNK_SEC = 0.1
+PIPER_MODEL = "assets/es_MX-claude-14947-epoch-high.onnx"
+STT_SERVER_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "server02", "backend", "STT")
+
+FRASES = [
+    "Hola, ¿cómo estás hoy?",
+    "Quisiera saber qué tiempo va a hacer mañana en la ciudad.",
+    "Me gustaría aprender a cocinar un buen arroz con pollo.",
+    "¿Puedes recomendarme un libro interesante para el fin de semana?",
+    "Ayer fui al parque con mis amigos y jugamos fútbol toda la tarde.",
+    "Necesito ayuda para organizar mis tareas de la semana.",
+    "¿Cuál es la capital de Australia?",
+    "La reunión empieza a las tres y media, no llegues tarde.",
+    "Cuéntame un chiste corto, por favor.",
+    "Estoy un poco cansado porque dormí muy poco anoche.",
+    "¿Qué opinas de la inteligencia artificial en la educación?",
+    "Mi hermana se va a mudar a otra ciudad el próximo mes.",
+    "Recuérdame comprar leche, pan y huevos cuando salga.",
+    "El concierto de anoche estuvo increíble, la banda tocó dos horas.",
+    "¿Cuánto tiempo se tarda en llegar caminando a la estación?",
+    "Quiero cambiar de trabajo, pero todavía no sé a qué dedicarme.",
+    "Explícame por qué el cielo es azul de una forma sencilla.",
+    "Hace mucho calor, creo que voy a prender el ventilador.",
+    "¿Me ayudas a practicar mi pronunciación en inglés?",
+    "Gracias por escucharme, me siento mucho mejor ahora.",
+]
+
+METRICAS_MENOR_ES_MEJOR = [
+    "partial_ms.p50", "partial_ms.p95", "final_ms.p50", "final_ms.p95",
+    "rtf", "rtf_final", "wer", "peak_rss_mb",
+]
+
+
+# ---------- corpus ----------
+def _sintetizar(dir_: str, n: int, modelo: str = PIPER_MODEL):
+    from piper.voice import PiperVoice
+    os.makedirs(dir_, exist_ok=True)
+    voz = PiperVoice.load(modelo)
+    lineas = []
+    for i in range(n):
+        texto = FRASES[i % len(FRASES)]
+        nombre = f"piper_{i:03d}.wav"
+        with wave.open(os.path.join(dir_, nombre), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(voz.config.sample_rate)
+            for chunk in voz.synthesize(texto):
+                wf.writeframes(chunk.audio_int16_bytes)
+        lineas.append(f"{nombre}\t{texto}\n")
+    with open(os.path.join(dir_, "line_index.tsv"), "w", encoding="utf-8") as f:
+        f.writelines(lineas)
+    print(f"Corpus sintetizado: {n} frases en {dir_}")
+
+
+def _referencias(dir_: str) -> dict[str, str]:
+    refs = {}
+    path = os.path.join(dir_, "line_index.tsv")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for linea in f:
+                partes = linea.rstrip("\n").split("\t")
+                if len(partes) >= 2:
+                    nombre = partes[0] if partes[0].endswith(".wav") else partes[0] + ".wav"
+                    refs[nombre] = partes[-1]
+    return refs
+
+
+def _audio_16k(dir_: str, nombre: str) -> np.ndarray:
+    """PCM int16 a 16 kHz, cacheado como .npy (se invalida si cambia el WAV)."""
+    path = os.path.join(dir_, nombre)
+    st = os.stat(path)
+    cache = os.path.join(dir_, ".cache", f"{nombre}.{st.st_size}.{st.st_mtime_ns}.npy")
+    if os.path.exists(cache):
+        return np.load(cache)
+    audio = decode_audio(path, sampling_rate=SAMPLERATE)
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    os.makedirs(os.path.dirname(cache), exist_ok=True)
+    np.save(cache, pcm)
+    return pcm
+
+
+# ---------- objetivos ----------
+class _Microfono:
+    """Microfono de server04 sin sounddevice: ring + StreamingTranscriber + modelos."""
+
+    def __init__(self):
+        from agente import microfono
+        self.mod = microfono
+        self.m = microfono.Microfono()
+        self.m._tiers.load_partial()
+        if self.m._tiers.separados and not microfono.FINAL_TIER_LAZY:
+            self.m._tiers.final()
+        self.intervalo = microfono.PARTIAL_EVAL_INTERVAL
+        self.gate = self.m._gate
+        self.modelos = f"{microfono.PARTIAL_TIER.model}/{self.m._tiers.final_cfg.model}"
+
+    def reset(self):
+        self.m._reset_buffer()
+
+    def write(self, pcm: np.ndarray):
+        self.m._ring.write(pcm)
+
+    def partial(self) -> tuple:
+        return self.m._transcribe_partial()
+
+    def final(self) -> str:
+        return self.m._transcribe_final(self.m._ring.total)
+
+    def close(self):
+        self.m._infer.close()
+
+
+class _Servidor:
+    """Una SttSession del servidor WebSocket de server02, sin red."""
+
+    def __init__(self):
+        sys.path.insert(0, os.path.abspath(STT_SERVER_DIR))
+        import audio_transform_RealTime as srv
+        self.srv = srv.AudioTransform()
+        self.s = self.srv.new_session(send=None)
+        self.intervalo = srv.PARTIAL_EVAL_INTERVAL
+        self.gate = self.s.gate
+        self.modelos = f"{self.srv.tiers.partial_cfg.model}/{self.srv.tiers.final_cfg.model}"
+
+    def reset(self):
+        self.s.reset_buffer()
+
+    def write(self, pcm: np.ndarray):
+        self.s.audio_buffer.write(pcm)
+
+    def partial(self) -> tuple:
+        return self.s.transcribe_partial()
+
+    def final(self) -> str:
+        return self.s.transcribe_final(self.s.audio_buffer.total)
+
+    def close(self):
+        self.srv.close_session(self.s)
+        self.srv.infer.close()
+
+
+# ---------- medición ----------
+def _wer(refs: list[str], hyps: list[str]) -> float | None:
+    if not refs:
+        return None
+    if HAS_JIWER:
+        norm = jiwer.Compose([
+            jiwer.ToLowerCase(), jiwer.RemovePunctuation(), jiwer.Strip(), jiwer.RemoveMultipleSpaces()
+        ])
+        return jiwer.wer([norm(r) for r in refs], [norm(h) for h in hyps])
+    from benchmarks.bench_niveles_stt import _wer as wer_simple
+    return statistics.mean(wer_simple(r, h) for r, h in zip(refs, hyps))
+
+
+def _percentiles(ms: list[float]) -> dict:
+    if not ms:
+        return {}
+    ms = sorted(ms)
+    p = lambda q: round(ms[int(q * (len(ms) - 1))], 1)
+    return {"p50": p(0.5), "p90": p(0.9), "p95": p(0.95), "p99": p(0.99),
+            "max": round(ms[-1], 1), "media": round(statistics.mean(ms), 1)}
+
+
+def _correr(objetivo, corpus: list[tuple[str, np.ndarray, str | None]]) -> dict:
+    paso = int(SAMPLERATE * CHUNK_SEC)
+    parciales_ms, finales_ms, refs, hyps = [], [], [], []
+    computo = computo_final = 0.0
+    n_parciales = emitidos = 0
+    audio_seg = 0.0
+
+    for nombre, pcm, ref in corpus:
+        objetivo.reset()
+        ultimo = 0.0
+        for i in range(0, len(pcm), paso):
+            objetivo.write(pcm[i:i + paso])
+            t_audio = (i + paso) / SAMPLERATE
+            if t_audio - ultimo >= objetivo.intervalo:
+                ultimo = t_audio
+                t0 = time.perf_counter()
+                texto, calidad = objetivo.partial()
+                dt = time.perf_counter() - t0
+                computo += dt
+                parciales_ms.append(dt * 1000)
+                n_parciales += 1
+                if texto.strip() and (objetivo.gate is None or objetivo.gate.filtrar(texto, calidad)):
+                    emitidos += 1
+        t0 = time.perf_counter()
+        texto = objetivo.final()
+        dt = time.perf_counter() - t0
+        computo += dt
+        computo_final += dt
+        finales_ms.append(dt * 1000)
+        audio_seg += len(pcm) / SAMPLERATE
+        if ref is not None:
+            refs.append(ref)
+            hyps.append(texto)
+        print(f"  {nombre}: {dt * 1000:6.0f} ms  {texto.strip()[:60]}")
+
+    wer = _wer(refs, hyps)
+    return {
+        "modelos": objetivo.modelos,
+        "archivos": len(corpus),
+        "audio_seg": round(audio_seg, 1),
+        "partial_ms": _percentiles(parciales_ms),
+        "final_ms": _percentiles(finales_ms),
+        "rtf": round(computo / audio_seg, 3),
+        "rtf_final": round(computo_final / audio_seg, 3),
+        "wer": None if wer is None else round(wer, 4),
+        "parciales": {"pedidos": n_parciales, "emitidos": emitidos},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _valor(res: dict, clave: str):
+    for parte in clave.split("."):
+        res = res.get(parte) if isinstance(res, dict) else None
+    return res
+
+
+def _comparar(res: dict, base: dict, tolerancia: float) -> bool:
+    """Imprime la tabla contra la baseline; True si alguna métrica empeoró."""
+    print(f"\n{'métrica':<16} {'baseline':>10} {'actual':>10} {'cambio':>8}")
+    peor = False
+    for clave in METRICAS_MENOR_ES_MEJOR:
+        a, b = _valor(res, clave), _valor(base, clave)
+        if a is None or b is None:
+            continue
+        cambio = (a - b) / b if b else 0.0
+        marca = ""
+        if cambio > tolerancia:
+            marca, peor = "  ✗", True
+        elif cambio < -tolerancia:
+            marca = "  ✓"
+        print(f"{clave:<16} {b:>10} {a:>10} {cambio:>+7.1%}{marca}")
+    return peor
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", required=True)
+    ap.add_argument("--objetivo", choices=["microfono", "servidor"], default="microfono")
+    ap.add_argument("--sintetizar", type=int, default=0)
+    ap.add_argument("--voz", default=PIPER_MODEL)
+    ap.add_argument("--n", type=int, default=0, help="máximo de archivos (0 = todos)")
+    ap.add_argument("--json", default=None)
+    ap.add_argument("--baseline", default=None)
+    ap.add_argument("--guardar-baseline", action="store_true")
+    ap.add_argument("--tolerancia", type=float, default=0.10)
+    args = ap.parse_args()
+
+    if args.sintetizar:
+        _sintetizar(args.dir, args.sintetizar, args.voz)
+
+    refs = _referencias(args.dir)
+    nombres = sorted(f for f in os.listdir(args.dir) if f.endswith(".wav"))
+    if args.n:
+        nombres = nombres[:args.n]
+    if not nombres:
+        raise SystemExit(f"Sin WAVs en {args.dir}")
+    corpus = [(n, _audio_16k(args.dir, n), refs.get(n)) for n in nombres]
+
+    objetivo = _Microfono() if args.objetivo == "microfono" else _Servidor()
+    print(f"{args.objetivo} ({objetivo.modelos}): {len(corpus)} archivos")
+    try:
+        res = _correr(objetivo, corpus)
+    finally:
+        objetivo.close()
+    res["objetivo"] = args.objetivo
+
+    salida = json.dumps(res, indent=2, ensure_ascii=False)
+    print(salida)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(salida)
+
+    baseline = args.baseline or os.path.join(os.path.dirname(__file__), f"baseline_stt_{args.objetivo}.json")
+    if args.guardar_baseline:
+        with open(baseline, "w", encoding="utf-8") as f:
+            f.write(salida)
+        print(f"Baseline guardada en {baseline}")
+    elif os.path.exists(baseline):
+        with open(baseline, encoding="utf-8") as f:
+            if _comparar(res, json.load(f), args.tolerancia):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark del tiempo hasta el primer audio en el navegador: WAV + URL
+contra chunks de Piper por WebSocket.
+
+Uso (desde server04/):
+    PYTHONPATH=agente python -m benchmarks.bench_ttfa_ws [--frases 10] [--puerto 8765]
+        [--json ttfa.json]
+
+Levanta VoicePlater y WebActions reales (como main.py) y un cliente
+websockets en lugar del navegador. Por cada frase emite "voice.speak" y mide
+hasta que el cliente tiene audio para reproducir:
+  wav:    llega el 'ui.speak' con la ruta y se lee el WAV de out_wav/
+          (cota inferior: el navegador además lo baja por HTTP)
+  stream: llega el primer frame binario de la oración
+Reporta p50/p95 por modo, más la duración de la frase y el tamaño del
+primer chunk (lo que idealmente debería costar el modo stream).
+"""
+import argparse, asyncio, json, os, threading, time
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))], 1) if xs else None
+
+
+async def _cliente(url: str, vp, frases, modo: str) -> list:
+    import websockets
+    from agente.event_bus import event_bus
+    from agente.voice import FRONTEND_PUBLIC
+    from agente.web_actions import AUDIO_HEADER
+
+    vp.quitar_sink("ws" if modo == "wav" else "wav")
+    vp.agregar_sink("wav" if modo == "wav" else "ws")
+    filas = []
+    async with websockets.connect(url, compression=None, max_size=None) as ws:
+        await ws.recv()  # hello
+        for texto in frases:
+            t0 = time.perf_counter()
+            event_bus.emit("voice.speak", texto, "hablar", "normal")
+            primero, muestras, fin = None, 0, False
+            while not fin:
+                msg = await ws.recv()
+                if isinstance(msg, bytes):
+                    n = (len(msg) - AUDIO_HEADER.size) // 2
+                    if primero is None:
+                        primero = (time.perf_counter() - t0, n)
+                    muestras += n
+                    continue
+                data = json.loads(msg)
+                if data.get("kind") == "audio" and data.get("event") == "end":
+                    fin = True
+                elif data.get("kind") == "action" and modo == "wav":
+                    src = data["payload"]["items"][-1]["src"]
+                    with open(os.path.join(FRONTEND_PUBLIC, os.path.basename(src)), "rb") as f:
+                        muestras = (len(f.read()) - 44) // 2
+                    primero = (time.perf_counter() - t0, muestras)
+                    fin = True
+            filas.append({
+                "modo": modo, "texto": texto,
+                "ttfa_ms": 1000 * primero[0],
+                "primer_chunk_ms": 1000 * primero[1] / vp.sr,
+                "audio_ms": 1000 * muestras / vp.sr,
+            })
+            print(f"  {modo:>6}: {filas[-1]['ttfa_ms']:>6.0f}ms  ({filas[-1]['audio_ms']:.0f}ms de audio)  {texto[:40]}")
+    return filas
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frases", type=int, default=10)
+    ap.add_argument("--puerto", type=int, default=8765)
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    os.environ["WS_PORT"] = str(args.puerto)
+    from agente.voice import vp
+    from agente.web_actions import start_ws_server
+    from benchmarks.bench_stt_offline import FRASES
+
+    threading.Thread(target=start_ws_server, daemon=True).start()
+    threading.Thread(target=vp.run, daemon=True).start()
+    time.sleep(1.0)  # que el servidor WS esté escuchando
+
+    frases = [FRASES[i % len(FRASES)] for i in range(args.frases)]
+    url = f"ws://127.0.0.1:{args.puerto}"
+    filas = []
+    for modo in ("wav", "stream"):
+        filas += asyncio.run(_cliente(url, vp, frases, modo))
+
+    print(f"\n{'modo':>7} {'TTFA p50':>9} {'TTFA p95':>9} {'1er chunk p50':>14} {'audio p50':>10}")
+    res = {}
+    for modo in ("wav", "stream"):
+        f = [r for r in filas if r["modo"] == modo]
+        res[modo] = {k: _pct([r[k] for r in f], q) for k, q in
+                     (("ttfa_ms", 0.5), ("primer_chunk_ms", 0.5), ("audio_ms", 0.5))}
+        res[modo]["ttfa_p95_ms"] = _pct([r["ttfa_ms"] for r in f], 0.95)
+        print(f"{modo:>7} {res[modo]['ttfa_ms']:>7}ms {res[modo]['ttfa_p95_ms']:>7}ms "
+              f"{res[modo]['primer_chunk_ms']:>12}ms {res[modo]['audio_ms']:>8}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"resumen": res, "frases": filas}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
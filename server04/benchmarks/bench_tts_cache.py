@@ -0,0 +1,79 @@
+"""
+Benchmark de la caché de TTS (agente/tts_cache.py) en una conversación.
+
+Uso (desde server04/):
+    PYTHONPATH=agente python -m benchmarks.bench_tts_cache [--oraciones 200] [--repetidas 0.4]
+        [--json tts_cache.json]
+
+Arma una secuencia de oraciones como las de Luci: una fracción `--repetidas`
+sale de frases que se repiten (saludos, "Claro", "Entiendo", errores) y el
+resto son oraciones únicas. Cada oración se resuelve como VoicePlater:
+consulta a la caché y, si falla, Piper + put. Sobre un directorio temporal
+(caché fría al empezar), reporta:
+  - tasa de acierto (memoria / disco) y bytes y segundos de síntesis ahorrados
+  - tiempo hasta tener el audio: acierto contra síntesis (p50/p95)
+"""
+import argparse, json, random, tempfile, time
+
+from benchmarks.bench_stt_offline import FRASES, PIPER_MODEL
+from agente.tts_cache import TtsCache, id_modelo, parametros_piper
+
+REPETIDAS = [
+    "Hola, ¿cómo estás?", "Claro.", "Entiendo.", "Perfecto.", "Dame un momento.",
+    "No te escuché bien, ¿me lo repetís?", "Hubo un error, probemos de nuevo.",
+    "La prueba de micrófono ha terminado",
+]
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))], 1) if xs else None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--oraciones", type=int, default=200)
+    ap.add_argument("--repetidas", type=float, default=0.4, help="fracción de frases repetidas")
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    from piper.voice import PiperVoice
+    voz = PiperVoice.load(PIPER_MODEL)
+    cache = TtsCache(tempfile.mkdtemp(prefix="tts_cache_"))
+    modelo, params = id_modelo(PIPER_MODEL), parametros_piper(voz)
+
+    rnd = random.Random(0)
+    oraciones = [rnd.choice(REPETIDAS) if rnd.random() < args.repetidas
+                 else f"{FRASES[i % len(FRASES)]} ({i})" for i in range(args.oraciones)]
+
+    aciertos_ms, sintesis_ms = [], []
+    for texto in oraciones:
+        t0 = time.perf_counter()
+        clave = cache.clave(texto, modelo, params)
+        if cache.get(clave) is not None:
+            aciertos_ms.append(1000 * (time.perf_counter() - t0))
+            continue
+        pcm = b"".join(c.audio_int16_bytes for c in voz.synthesize(texto))
+        dt = time.perf_counter() - t0
+        cache.put(clave, pcm, voz.config.sample_rate, dt)
+        sintesis_ms.append(1000 * dt)
+
+    s = cache.stats()
+    res = {
+        **s,
+        "acierto_p50_ms": _pct(aciertos_ms, 0.5), "acierto_p95_ms": _pct(aciertos_ms, 0.95),
+        "sintesis_p50_ms": _pct(sintesis_ms, 0.5), "sintesis_p95_ms": _pct(sintesis_ms, 0.95),
+    }
+    print(f"\n{'oraciones':>10} {'aciertos':>9} {'memoria':>8} {'disco':>6} {'MB ahorr.':>10} "
+          f"{'s ahorr.':>9} {'acierto p50':>12} {'síntesis p50':>13}")
+    print(f"{s['consultas']:>10} {100 * s['tasa_acierto']:>8.0f}% {s['aciertos_memoria']:>8} "
+          f"{s['aciertos_disco']:>6} {s['bytes_ahorrados'] / 1e6:>10.2f} {s['segundos_ahorrados']:>9.2f} "
+          f"{res['acierto_p50_ms']!s:>10}ms {res['sintesis_p50_ms']!s:>11}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark de los workers de síntesis de VoicePlater: throughput de Piper.
+
+Uso (desde server04/):
+    PYTHONPATH=agente python -m benchmarks.bench_tts_workers [--workers 1 2] [--json workers.json]
+
+Sintetiza el texto largo de demo de server02/backend/agente/main.py::controller
+(partido con split_text, como Answer) con el VoicePlater real y un sink
+que solo cuenta muestras, así mide solo síntesis. Cada cantidad de workers corre en un
+proceso aparte (TTS_WORKERS fija los hilos de la sesión ONNX al cargar) con
+lookahead igual a la cantidad de oraciones y caché vacía.
+Reporta tiempo total, segundos de audio, RTF (síntesis / audio) y speedup
+contra el primero, además de verificar que el orden de salida es el de entrada.
+"""
+import argparse, json, os, subprocess, sys, tempfile, threading, time
+
+
+def _correr(workers: int) -> dict:
+    from agente.answer import split_text
+    from agente.event_bus import event_bus
+    from agente.tts_cache import TtsCache
+    from agente.tts_sinks import Sink
+    from agente.voice import vp
+    from benchmarks.bench_lookahead import _texto_controller
+
+    oraciones = split_text(_texto_controller())
+    vp.lookahead = len(oraciones)
+    vp._cupos = threading.Semaphore(len(oraciones) + 1)
+    vp._cache = TtsCache(tempfile.mkdtemp(prefix="tts_workers_"))
+    vp.agregar_sink("cache")  # que guarde en la caché nueva
+
+    muestras, orden, listo = [0], [], threading.Event()
+
+    class _Contador(Sink):
+        nombre = "contador"
+
+        def _al_chunk(self, o, pcm):
+            muestras[0] += len(pcm) // 2
+
+        def _al_fin(self, o, completo):
+            orden.append(o.texto)
+            if len(orden) == len(oraciones):
+                listo.set()
+    vp.agregar_sink(_Contador(vp.sr, capacidad=len(oraciones) * 8))
+    threading.Thread(target=vp.run, daemon=True).start()
+
+    t0 = time.perf_counter()
+    for texto in oraciones:
+        event_bus.emit("voice.speak", texto, "triste", "normal")
+    listo.wait()
+    total = time.perf_counter() - t0
+    audio = muestras[0] / vp.sr
+    return {
+        "workers": vp.workers, "oraciones": len(oraciones),
+        "total_s": round(total, 2), "audio_s": round(audio, 2), "rtf": round(total / audio, 3),
+        "en_orden": orden == oraciones,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    ap.add_argument("--uno", action="store_true", help=argparse.SUPPRESS)  # proceso hijo
+    ap.add_argument("--json", default=None)
+    args = ap.parse_args()
+
+    if args.uno:
+        res = [_correr(args.workers[0])]
+    else:
+        res = []
+        for w in args.workers:
+            print(f"\n== {w} workers ==")
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                tmp = f.name
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_tts_workers", "--uno",
+                            "--workers", str(w), "--json", tmp],
+                           env={**os.environ, "TTS_WORKERS": str(w)}, check=True)
+            with open(tmp, encoding="utf-8") as f:
+                res.extend(json.load(f))
+            os.unlink(tmp)
+
+        print(f"\n{'workers':>8} {'oraciones':>10} {'total':>8} {'audio':>8} {'RTF':>7} {'speedup':>8} {'orden':>6}")
+        base = res[0]["total_s"]
+        for r in res:
+            print(f"{r['workers']:>8} {r['oraciones']:>10} {r['total_s']:>7}s {r['audio_s']:>7}s "
+                  f"{r['rtf']:>7} {base / r['total_s']:>7.2f}x {'ok' if r['en_orden'] else 'MAL':>6}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,7 @@ const sleep = (ms: number) => new Promise((r) => setTimeout(r, ms))
 type QueueAction =
   | { type: 'expression'; index?: number; name?: string }
   | { type: 'motion'; group: string; index?: number; priority?: number }
-  | { type: 'audio'; src: string; crossOrigin?: string; waitEnd?: boolean }
+  | { type: 'audio'; src: string; crossOrigin?: string; waitEnd?: boolean; labios?: PistaLabios | null }
   | { type: 'stopAll' }
   | { type: 'clearQueue' }
   | { type: 'ping' }
@@ -32,6 +32,18 @@ type QueueAction =
 
 const isQueueAction = (a: any): a is QueueAction => a && typeof a.type === 'string'
 
+// —— Pista de labios que calcula el server junto con el audio (agente/labios.py) ——
+// boca 0..100 (apertura), forma -100..100 (redonda .. estirada), un valor por frame a `fps`;
+// palabras en ms desde el inicio de la oración (vacío si Piper no dio alineaciones)
+type Palabra = { texto: string; inicio: number; fin: number }
+type PistaLabios = { fps: number; boca: number[]; forma: number[]; palabras: Palabra[] }
+
+// —— Mensajes de control del audio en streaming (los chunks llegan como frames binarios) ——
+type AudioMsg =
+  | { kind: 'audio'; event: 'start'; id: number; sampleRate: number; expression?: string | number }
+  | ({ kind: 'audio'; event: 'labios'; id: number; seq: number; desde: number } & PistaLabios)
+  | { kind: 'audio'; event: 'end'; id: number; chunks: number; completo: boolean }
+
 // —— Cola FIFO ——
 class ActionQueue {
   private q: QueueAction[] = []
@@ -94,6 +106,15 @@ export default function Live2DCanvas() {
         app.stage.addChild(model)
         centerAndScale(app, model) // ⭐ centrado inicial
 
+        // Lip-sync con la pista del server (después de motions, antes de dibujar)
+        model.internalModel?.on?.('beforeModelUpdate', () => {
+          const b = audioStream.boca() ?? bocaWav()
+          if (!b) return
+          const core = model.internalModel.coreModel
+          core?.setParameterValueById?.('ParamMouthOpenY', b.abierta)
+          core?.setParameterValueById?.('ParamMouthForm', b.forma)
+        })
+
         // Expresiones
         const settings: any = model.internalModel?.settings
         const rawExpr: any[] = settings?.expressions || settings?.FileReferences?.Expressions || []
@@ -175,10 +196,29 @@ export default function Live2DCanvas() {
         setWsState('connected')
         ws?.send(JSON.stringify({ kind: 'hello', from: 'live2d-client' }))
       }
+      ws.binaryType = 'arraybuffer'
 
       ws.onmessage = (ev) => {
+        // voz en streaming: chunk PCM apenas sale de Piper
+        if (ev.data instanceof ArrayBuffer) return audioStream.chunk(ev.data)
         try {
           const msg = JSON.parse(String(ev.data))
+          if (msg?.kind === 'audio') {
+            const m = msg as AudioMsg
+            if (m.event === 'start') {
+              if (awaitingRef.current) {
+                setAwaiting(false)
+                awaitingRef.current = false
+              }
+              audioStream.start(m.id, m.sampleRate)
+              if (m.expression != null) doExpression(modelRef.current, { name: String(m.expression) }, expressionsRef.current)
+            } else if (m.event === 'labios') {
+              audioStream.labios(m)
+            } else if (m.event === 'end') {
+              audioStream.end(m.id, m.completo)
+            }
+            return
+          }
           if (msg?.kind === 'action' && isQueueAction(msg.payload)) {
             if (awaitingRef.current) {
               setAwaiting(false)
@@ -186,6 +226,17 @@ export default function Live2DCanvas() {
             }
             const a = msg.payload as QueueAction
             if (a.type === 'clearQueue') return queueRef.current?.clear()
+            if (a.type === 'stopAll') {
+              // barge-in: cortar ya el audio en curso y lo encolado
+              queueRef.current?.clear()
+              try { modelRef.current?.stopSpeaking?.() } catch {}
+              try { modelRef.current?.stopMotions?.() } catch {}
+              cortarAudio?.()
+              audioStream.cortar()
+              // el server mide el barge-in hasta que esto se oye (latencia de salida del dispositivo)
+              ws?.send(JSON.stringify({ cmd: 'stop.ack', salidaMs: audioStream.latenciaSalidaMs() }))
+              return
+            }
             queueRef.current?.enqueue(a.type === 'sequence' ? a.items : a)
           }
         } catch {}
@@ -223,11 +274,14 @@ export default function Live2DCanvas() {
       queueRef.current?.clear()
       try { modelRef.current?.stopSpeaking?.() } catch {}
       try { modelRef.current?.stopMotions?.() } catch {}
+      cortarAudio?.()
+      audioStream.cortar()
     }
 
     const onKeyDown = (e: KeyboardEvent) => {
       if ((e.code === 'Space' || e.key === ' ') && !e.repeat && !isEditable(e.target as Element)) {
         e.preventDefault()
+        audioStream.desbloquear() // el AudioContext necesita un gesto del usuario
         const ws = wsRef.current
         if (ws && ws.readyState === WebSocket.OPEN) {
           ws.send('flag')
@@ -411,12 +465,19 @@ async function doMotion(model: any, { group, index = 0, priority = 3 }: { group:
   } catch (e) { console.warn('motion', e) }
 }
 
+// stopSpeaking() no siempre dispara onFinish: se libera la espera a mano
+let cortarAudio: (() => void) | null = null
+
+// Pista de labios del WAV que está sonando (llega entera con la acción 'audio')
+let pistaWav: { t0: number; pista: PistaLabios } | null = null
+
 async function doAudio(model: any, {
   src, volume = 1, expression, resetExpression = true,
-  crossOrigin = 'anonymous', waitEnd = true,
+  crossOrigin = 'anonymous', waitEnd = true, labios,
 }: {
   src: string; volume?: number; expression?: number|string;
   resetExpression?: boolean; crossOrigin?: string; waitEnd?: boolean;
+  labios?: PistaLabios | null;
 }) {
   if (!model || !src) return
   const opts: any = { volume, crossOrigin }
@@ -428,12 +489,164 @@ async function doAudio(model: any, {
     done = new Promise<void>(res => {
       opts.onFinish = () => res()
       opts.onError  = () => res()
+      cortarAudio = () => res()
     })
   }
   model.speak(src, opts)
-  if (done) await done
+  const pista = labios ? { t0: performance.now() / 1000, pista: labios } : null
+  pistaWav = pista
+  if (done) {
+    await done  // terminó o se cortó: la boca deja de seguir la pista
+    if (pistaWav === pista) pistaWav = null
+  }
+  cortarAudio = null
+}
+
+/** Boca del WAV en curso según su pista, o null si no hay (o ya terminó). */
+function bocaWav(): Boca | null {
+  if (!pistaWav) return null
+  const t = performance.now() / 1000 - pistaWav.t0
+  if (t * pistaWav.pista.fps >= pistaWav.pista.boca.length) return null
+  return valorPista(pistaWav.pista, t)
+}
+
+type Boca = { abierta: number; forma: number }
+
+/** Valor de la pista `t` segundos después del inicio de la oración (boca cerrada al final). */
+function valorPista(p: PistaLabios, t: number): Boca {
+  const i = Math.floor(t * p.fps)
+  if (i < 0 || i >= p.boca.length) return { abierta: 0, forma: 0 }
+  return { abierta: p.boca[i] / 100, forma: (p.forma[i] ?? 0) / 100 }
+}
+
+// —— Audio en streaming (WebAudio) ——
+// Frame binario: id (uint32 LE), seq (uint32 LE), PCM int16 LE mono.
+// Cada chunk se agenda a continuación del anterior; al arrancar (o si la red
+// se atrasó) se deja JITTER_S de margen. Los chunks de oraciones cortadas o
+// viejas se descartan. Antes de cada chunk llega su tramo de la pista de
+// labios; la boca se lee de ahí según el instante en que suena cada chunk.
+// El AudioContext arranca con el primer gesto del usuario (cualquiera); hasta
+// que corre, los chunks se descartan: agendados sobre un reloj detenido
+// sonarían todos juntos y tarde al reanudarse.
+const AUDIO_HEADER_BYTES = 8
+const JITTER_S = 0.06
+const GESTOS = ['pointerdown', 'keydown', 'touchstart'] as const
+
+// Un chunk agendado: cuándo suena y desde qué muestra de su oración
+type Tramo = { t0: number; t1: number; muestra: number; sr: number; pista: PistaLabios }
+
+class AudioStream {
+  private ctx: AudioContext | null = null
+  private out: GainNode | null = null
+  private fin = 0        // ctx.currentTime en que termina lo agendado
+  private actual = -1    // id de la oración en curso
+  private cortadas = 0   // ids <= cortadas no se reproducen
+  private sr = 22050
+  private seq = 0
+  private fuentes = new Set<AudioBufferSourceNode>()
+  private pista: PistaLabios = { fps: 60, boca: [], forma: [], palabras: [] }  // de la oración en curso
+  private muestras = 0   // muestras agendadas de la oración en curso
+  private tramos: Tramo[] = []
+  private descartados = 0 // chunks que llegaron sin el AudioContext corriendo
+
+  constructor() {
+    if (typeof window === 'undefined') return
+    const gesto = () => {
+      this.desbloquear().then(() => {
+        if (this.ctx?.state !== 'running') return
+        for (const ev of GESTOS) window.removeEventListener(ev, gesto, true)
+      })
+    }
+    for (const ev of GESTOS) window.addEventListener(ev, gesto, true)
+  }
+
+  desbloquear(): Promise<void> {
+    if (!this.ctx) {
+      this.ctx = new AudioContext()
+      this.out = this.ctx.createGain()
+      this.out.connect(this.ctx.destination)
+    }
+    return this.ctx.state === 'suspended' ? this.ctx.resume().catch(() => {}) : Promise.resolve()
+  }
+
+  start(id: number, sampleRate: number) {
+    this.desbloquear()
+    this.actual = id
+    this.sr = sampleRate
+    this.seq = 0
+    // objeto nuevo: los tramos de la oración anterior que aún suenan siguen con la suya
+    this.pista = { fps: 60, boca: [], forma: [], palabras: [] }
+    this.muestras = 0
+  }
+
+  labios(m: { id: number } & PistaLabios) {
+    if (m.id !== this.actual || m.id <= this.cortadas) return
+    this.pista.fps = m.fps
+    this.pista.boca.push(...m.boca)
+    this.pista.forma.push(...m.forma)
+    this.pista.palabras.push(...m.palabras)
+  }
+
+  chunk(buf: ArrayBuffer) {
+    if (buf.byteLength <= AUDIO_HEADER_BYTES) return
+    const dv = new DataView(buf)
+    const id = dv.getUint32(0, true), seq = dv.getUint32(4, true)
+    if (id !== this.actual || id <= this.cortadas) return
+    if (seq !== this.seq) console.warn(`audio: chunk ${seq} de ${id}, se esperaba ${this.seq}`)
+    this.seq = seq + 1
+    if (!this.ctx || !this.out || this.ctx.state !== 'running') {
+      if (this.descartados++ === 0) console.warn('audio: AudioContext sin correr (falta un gesto), se descartan chunks')
+      return
+    }
+
+    const pcm = new Int16Array(buf, AUDIO_HEADER_BYTES, (buf.byteLength - AUDIO_HEADER_BYTES) >> 1)
+    const ab = this.ctx.createBuffer(1, pcm.length, this.sr)
+    const ch = ab.getChannelData(0)
+    for (let i = 0; i < pcm.length; i++) ch[i] = pcm[i] / 32768
+
+    const src = this.ctx.createBufferSource()
+    src.buffer = ab
+    src.connect(this.out)
+    this.fin = Math.max(this.fin, this.ctx.currentTime + JITTER_S)
+    src.start(this.fin)
+    this.tramos.push({ t0: this.fin, t1: this.fin + ab.duration, muestra: this.muestras, sr: this.sr, pista: this.pista })
+    this.muestras += pcm.length
+    this.fin += ab.duration
+    this.fuentes.add(src)
+    src.onended = () => this.fuentes.delete(src)
+  }
+
+  end(id: number, completo: boolean) {
+    if (!completo && id === this.actual) this.cortar()
+  }
+
+  cortar() {
+    this.cortadas = Math.max(this.cortadas, this.actual)
+    for (const src of this.fuentes) { try { src.stop() } catch {} }
+    this.fuentes.clear()
+    this.tramos = []
+    this.fin = 0
+  }
+
+  /** Lo que tarda en oírse un cambio en el grafo: latencia base + la del dispositivo. */
+  latenciaSalidaMs(): number {
+    if (!this.ctx) return 0
+    return ((this.ctx.baseLatency ?? 0) + (this.ctx.outputLatency ?? 0)) * 1000
+  }
+
+  /** Boca (apertura 0..1, forma -1..1) según la pista del chunk que suena, o null si no suena nada. */
+  boca(): Boca | null {
+    if (!this.ctx) return null
+    const ahora = this.ctx.currentTime
+    while (this.tramos.length && this.tramos[0].t1 <= ahora) this.tramos.shift()
+    const tr = this.tramos[0]
+    if (!tr || tr.t0 > ahora) return null
+    return valorPista(tr.pista, (tr.muestra + (ahora - tr.t0) * tr.sr) / tr.sr)
+  }
 }
 
+const audioStream = new AudioStream()
+
 // —— Control de vista ——
 async function doViewSet(model: any, app: PIXI.Application | null, a: { x?: number; y?: number; scale?: number; rotation?: number; anchorX?: number; anchorY?: number }) {
   if (!model) return
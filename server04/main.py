@@ -1,17 +1,48 @@
 
+from agente.presupuesto_cpu import presupuesto  # primero: fija OMP_WAIT_POLICY antes de cargar modelos
+from agente.logger import logger
+presupuesto.log = logger.info
 from agente.event_bus import event_bus
 from agente.voice import _voice_worker
 import threading, time, asyncio
 from agente.answer import _answer_worker
 from agente.microfono import _microfono_worker
 from agente.nucleo import Nucleo
+from agente.barge_in import barge  # noqa: F401  (se suscribe a stt.voz_usuario al importarse)
 from agente.web_actions import start_ws_server
+from agente.governor import Governor
+from agente.stt_metrics import metricas
+
+def _governor_worker():
+  # RTF del último parcial del STT local; el gobernador publica "governor.nivel"
+  stt = metricas("microfono")
+  visto = {"parciales": -1}
+
+  def rtf_reciente():
+    n = stt.contadores.get("parciales_pedidos", 0)
+    if n == visto["parciales"]:
+      return None  # sin parciales nuevos (silencio): solo cuenta la CPU
+    visto["parciales"] = n
+    return stt.gauges.get("rtf_parcial_ultimo")
+
+  governor = Governor(
+    event_bus.emit,
+    rtf_fn=rtf_reciente,
+    log=logger.info,
+    metrics=metricas("governor"),
+  )
+  governor.run()
+
+def _presupuesto_por_microfono(abierto: bool):
+  # micrófono cerrado: el TTS se queda con todos los núcleos
+  presupuesto.modo("mic_abierto" if abierto else "mic_cerrado")
 
 def _start_workers():
   threading.Thread(target=start_ws_server, daemon=True).start()
   threading.Thread(target=_answer_worker, daemon=True).start()
   threading.Thread(target=_voice_worker, daemon=True).start()
   threading.Thread(target=_microfono_worker, daemon=True).start()
+  threading.Thread(target=_governor_worker, daemon=True).start()
   
 
 
@@ -35,6 +66,8 @@ if __name__ == "__main__":
 
   nucleo = Nucleo()
 
+  event_bus.subscribe("microfono.estado", _presupuesto_por_microfono)
+
   _start_workers()
 
   #test_microfono_10s()
@@ -0,0 +1,8 @@
+# Los módulos de agente/ se importan como "agente.x" y, entre sí, algunos sin
+# prefijo (event_bus: "from logger import logger"), como al correr main.py.
+import os, sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (RAIZ, os.path.join(RAIZ, "agente")):
+    if p not in sys.path:
+        sys.path.insert(0, p)
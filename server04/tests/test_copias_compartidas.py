@@ -0,0 +1,35 @@
+"""
+Módulos que viven copiados en varios servidores (cada uno se despliega
+solo, sin paquete común): las copias de cada grupo tienen que ser iguales
+byte a byte. Al cambiar una, copiarla a las demás de su grupo.
+
+Uso (desde server04/):
+    python -m pytest tests/test_copias_compartidas.py
+"""
+import filecmp, os
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_AGENTE04, _AGENTE02, _STT02 = "server04/agente", "server02/backend/agente", "server02/backend/STT"
+
+GRUPOS = {
+    "audio_resample.py": ["server00", "server01/tts", _AGENTE02, _STT02, "server02/backend/TTS", _AGENTE04],
+    "audio_salida.py": ["server01/tts", _AGENTE02, "server02/backend/TTS", _AGENTE04],
+    "stt_frames.py": [_STT02, _AGENTE02, "server02/backend/old/view/services"],
+    **{m: [_AGENTE04, _AGENTE02] for m in (
+        "presupuesto_cpu.py", "tts_cache.py", "stt_aec.py", "stt_echo.py",
+        "labios.py", "segmentador.py", "governor.py")},
+    **{m: [_AGENTE04, _STT02] for m in (
+        "stt_models.py", "stt_worker.py", "stt_audio.py", "stt_metrics.py", "stt_streaming.py")},
+}
+
+
+@pytest.mark.parametrize("modulo", sorted(GRUPOS))
+def test_copias_iguales(modulo):
+    rutas = [os.path.join(REPO, d, modulo) for d in GRUPOS[modulo]]
+    faltan = [r for r in rutas if not os.path.isfile(r)]
+    assert not faltan, f"faltan copias: {faltan}"
+    distintas = [os.path.relpath(r, REPO) for r in rutas[1:] if not filecmp.cmp(rutas[0], r, shallow=False)]
+    assert not distintas, f"{modulo}: distintas de {os.path.relpath(rutas[0], REPO)}: {distintas}"
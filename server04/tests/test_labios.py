@@ -0,0 +1,85 @@
+"""
+Palabras de la pista de labios a partir de las alineaciones de Piper.
+
+datos/piper_alineaciones.json se grabó con PiperVoice.synthesize(...,
+include_alignments=True) de piper-tts 1.8 y la config del modelo del repo,
+con una sesión ONNX falsa (duraciones inventadas): la fonemización y el
+agrupado de ids en alineaciones son los de Piper. Con piper instalado,
+test_piper_en_vivo repite el camino en vez de leer lo grabado.
+
+Uso (desde server04/):
+    python -m pytest tests/test_labios.py
+"""
+import json, os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from agente.labios import Labios
+
+DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "piper_alineaciones.json")
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _palabras(texto: str, sr: int, chunks) -> list:
+    """Pasa cada chunk (lista de (fonema, muestras)) por Labios, con audio mudo del largo alineado."""
+    lab = Labios(sr, texto)
+    for alineacion in chunks:
+        al = [SimpleNamespace(phoneme=f, num_samples=n) for f, n in alineacion]
+        lab.agregar(np.zeros(sum(n for _, n in alineacion), dtype=np.int16), al)
+    return lab.palabras
+
+
+def _esperadas(sr: int, chunks) -> list:
+    """Intervalos (ms) de las corridas de fonemas entre pausas, puntuación y BOS/EOS."""
+    fuera = set(" ^$,.?¿")
+    grupos, t, actual = [], 0, None
+    for alineacion in chunks:
+        for f, n in alineacion:
+            if f in fuera:
+                actual = None
+            elif actual is None:
+                actual = [t, t + n]
+                grupos.append(actual)
+            else:
+                actual[1] = t + n
+            t += n
+    return [(int(a * 1000 / sr), int(b * 1000 / sr)) for a, b in grupos]
+
+
+def test_alineaciones_grabadas():
+    d = json.load(open(DATOS, encoding="utf-8"))
+    assert not any(f == "_" for c in d["chunks"] for f, _ in c)  # los pads vienen sumados
+    palabras = _palabras(d["texto"], d["sr"], d["chunks"])
+    assert [p["texto"] for p in palabras] == ["Hola", "cómo", "estás", "Bien"]
+    assert [(p["inicio"], p["fin"]) for p in palabras] == _esperadas(d["sr"], d["chunks"])
+
+
+def test_pad_intercalado_no_corta_la_palabra():
+    # el mismo chunk con el pad suelto después de cada fonema (otro formato de alineación)
+    d = json.load(open(DATOS, encoding="utf-8"))
+    intercalado = [[x for f, n in c for x in ([f, n - 256], ["_", 256])] for c in d["chunks"]]
+    palabras = _palabras(d["texto"], d["sr"], intercalado)
+    assert [p["texto"] for p in palabras] == ["Hola", "cómo", "estás", "Bien"]
+
+
+def test_piper_en_vivo():
+    voice = pytest.importorskip("piper.voice")
+    config = pytest.importorskip("piper.config")
+    with open(os.path.join(RAIZ, "assets", "es_MX-claude-14947-epoch-high.onnx.json"), encoding="utf-8") as f:
+        cfg = config.PiperConfig.from_dict(json.load(f))
+
+    class _Sesion:
+        def run(self, _, args):
+            ids = args["input"][0]
+            dur = (1 + (np.arange(len(ids)) * 7) % 5).astype(np.float32)
+            return [np.zeros((1, 1, int(dur.sum()) * cfg.hop_length), np.float32), dur[None, :]]
+
+    d = json.load(open(DATOS, encoding="utf-8"))
+    try:
+        chunks = [[[a.phoneme, int(a.num_samples)] for a in c.phoneme_alignments]
+                  for c in voice.PiperVoice(session=_Sesion(), config=cfg).synthesize(d["texto"], include_alignments=True)]
+    except Exception as e:  # sin espeak-ng utilizable
+        pytest.skip(f"Piper no fonemiza acá: {e}")
+    assert chunks == d["chunks"]
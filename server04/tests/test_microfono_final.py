@@ -0,0 +1,85 @@
+"""
+Un fin de voz que llega mientras el final anterior se decodifica no se
+pierde: su locución recibe su propio stt.final al terminar aquel.
+
+Uso (desde server04/):
+    python -m pytest tests/test_microfono_final.py
+"""
+import asyncio, sys, time, types
+
+import numpy as np
+
+try:
+    import sounddevice  # noqa: F401
+except (ImportError, OSError):  # sin PortAudio: el test no abre dispositivos
+    sys.modules["sounddevice"] = types.SimpleNamespace(InputStream=None, query_devices=None)
+
+from agente.event_bus import event_bus
+from agente.microfono import Microfono, SAMPLERATE
+
+DECODE_S = 0.3  # final lento (p.ej. pasada completa con un modelo grande)
+
+
+class _Endpointer:
+    """VAD guionado: todo bloque es voz; el marcado con `fin` cierra la locución."""
+
+    in_speech = True
+
+    def __init__(self):
+        self.cerrar = False
+
+    def feed(self, chunk: bytes):
+        eventos = [("voz", chunk)]
+        if self.cerrar:
+            self.cerrar = False
+            eventos.append(("fin", b""))
+        return eventos
+
+
+def _locucion(valor: int, segundos: float = 0.5) -> list:
+    """Bloques de 50 ms con la muestra constante `valor` (identifica la locución)."""
+    pcm = np.full(int(SAMPLERATE * segundos), valor, dtype=np.int16)
+    return [pcm[i:i + 800].tobytes() for i in range(0, len(pcm), 800)]
+
+
+def test_fin_durante_final_lento_no_se_pierde():
+    m = Microfono()
+    m._eco = m._barge = None
+    m._endpointer = _Endpointer()
+    decodes = []
+
+    def decode_lento(end=None):
+        audio = m._ring.since(0, end)
+        decodes.append((len(audio), sorted(set(audio.tolist()))))
+        time.sleep(DECODE_S)
+        return f"locución {audio[0]}"
+
+    m._transcribe_final = decode_lento
+    finales = []
+    desuscribir = event_bus.subscribe("stt.final", finales.append)
+
+    async def escenario():
+        m._reset_buffer()
+        for valor in (1, 2):
+            bloques = _locucion(valor)
+            for b in bloques[:-1]:
+                await m._feed_vad(b)
+            m._endpointer.cerrar = True
+            await m._feed_vad(bloques[-1])
+            await asyncio.sleep(DECODE_S / 3)  # la 2ª cierra con el 1er final en curso
+        t0 = time.monotonic()
+        while len(finales) < 2 and time.monotonic() - t0 < 5 * DECODE_S:
+            await asyncio.sleep(0.02)
+        while m._ending and time.monotonic() - t0 < 5 * DECODE_S:
+            await asyncio.sleep(0.02)
+
+    try:
+        asyncio.run(escenario())
+    finally:
+        desuscribir()
+        m._infer.close()
+
+    n = int(SAMPLERATE * 0.5)
+    assert finales == ["locución 1", "locución 2"]
+    assert decodes == [(n, [1]), (n, [2])]  # cada final ve solo su locución
+    assert m._fin_pendiente is None and not m._ending
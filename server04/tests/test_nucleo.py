@@ -0,0 +1,136 @@
+"""
+El stream del LLM no corre en el loop del micrófono: con un LLM lento
+respondiendo un stt.final, el loop sigue emitiendo "stt.voz_usuario" y el
+barge-in corta ese mismo stream. Las oraciones de la final salen a Answer
+durante el stream y ninguna después del barge-in. Los parciales no esperan
+al LLM y los que quedaron viejos en la cola no se generan.
+
+Uso (desde server04/):
+    python -m pytest tests/test_nucleo.py
+"""
+import asyncio, sys, time, types
+
+import numpy as np
+
+try:
+    import sounddevice  # noqa: F401
+except (ImportError, OSError):  # sin PortAudio: el test no abre dispositivos
+    sys.modules["sounddevice"] = types.SimpleNamespace(InputStream=None, query_devices=None)
+try:
+    import langchain_openai  # noqa: F401
+    import langchain.schema  # noqa: F401
+    import langchain.callbacks.base  # noqa: F401
+except ImportError:  # sin langchain: el test usa su propio LLM
+    for nombre, attrs in {
+        "langchain_openai": {"ChatOpenAI": None},
+        "langchain": {},
+        "langchain.schema": {"SystemMessage": lambda content: content, "HumanMessage": lambda content: content},
+        "langchain.callbacks": {},
+        "langchain.callbacks.base": {"BaseCallbackHandler": object},
+    }.items():
+        sys.modules[nombre] = types.SimpleNamespace(**attrs)
+
+from agente.barge_in import barge
+from agente.event_bus import event_bus
+from agente.microfono import Microfono, SAMPLERATE
+from agente.nucleo import Nucleo
+from agente.stt_echo import referencia
+
+TOKENS, TOKEN_S = 40, 0.05  # 2 s de stream
+
+
+class _LlmLento:
+    def __init__(self, oracion: int = 0):
+        self.tokens = []  # instante de cada token entregado
+        self.oracion = oracion  # cada cuántos tokens cierra una oración (0: nunca)
+        self.pedidos = []  # mensajes de cada stream
+
+    def stream(self, messages):
+        self.pedidos.append(messages)
+        for i in range(TOKENS):
+            time.sleep(TOKEN_S)
+            self.tokens.append(time.monotonic())
+            fin = self.oracion and (i + 1) % self.oracion == 0
+            yield types.SimpleNamespace(content=f"palabra{i}. P" if fin else f"palabra{i} ")
+
+
+def test_barge_in_corta_el_stream_de_la_final():
+    llm = _LlmLento()
+    nucleo = Nucleo(llm=llm)
+    m = Microfono()
+    m._eco = m._barge = m._endpointer = None
+    m._transcribe_final = lambda end=None: "contame algo largo"
+    voces, cortes = [], []
+    desuscribir = [event_bus.subscribe("stt.voz_usuario", lambda t, origen: voces.append(time.monotonic())),
+                   event_bus.subscribe("barge_in", lambda t: cortes.append(time.monotonic()))]
+
+    async def escenario():
+        m._reset_buffer()
+        m._ring.write(np.ones(SAMPLERATE // 2, dtype=np.int16).tobytes())
+        await m._flush_final()  # emite stt.final en este loop
+        while not llm.tokens:
+            await asyncio.sleep(0.01)
+        # Luci suena y el usuario habla encima: lo que emitiría _detectar_barge_in
+        referencia.publicar(np.zeros(SAMPLERATE, dtype=np.float32), SAMPLERATE)
+        barge._ultimo = 0.0
+        event_bus.emit("stt.voz_usuario", time.monotonic(), "eco")
+        await asyncio.sleep(0.3)
+
+    try:
+        t0 = time.monotonic()
+        asyncio.run(escenario())
+        assert time.monotonic() - t0 < TOKENS * TOKEN_S / 2  # el loop no esperó al stream
+    finally:
+        for d in desuscribir:
+            d()
+        m._infer.close()
+        referencia.cortar()
+
+    assert voces and cortes
+    assert voces[0] < llm.tokens[-1] + TOKEN_S  # disparó con el stream en curso
+    assert len(llm.tokens) < TOKENS  # y lo cortó
+    assert nucleo.respuesta_final == ""
+
+
+def test_no_salen_oraciones_despues_del_barge_in():
+    llm = _LlmLento(oracion=5)
+    nucleo = Nucleo(llm=llm)
+    fragmentos, cortes = [], []
+
+    def al_fragmento(expresion, texto, turno=None, seq=None):
+        if turno == nucleo.turno:
+            fragmentos.append((time.monotonic(), seq))
+
+    desuscribir = [event_bus.subscribe("answer.generate", al_fragmento),
+                   event_bus.subscribe("barge_in", lambda t: cortes.append(time.monotonic()))]
+    try:
+        event_bus.emit("stt.final", "contame algo largo")
+        while len(fragmentos) < 2:  # ya salieron oraciones con el stream en curso
+            time.sleep(0.01)
+        event_bus.emit("barge_in", time.monotonic())
+        time.sleep(0.3)
+    finally:
+        for d in desuscribir:
+            d()
+
+    assert cortes and fragmentos[0][0] < llm.tokens[-1]
+    assert len(llm.tokens) < TOKENS
+    assert all(t < cortes[0] for t, _ in fragmentos)
+    assert [seq for _, seq in fragmentos] == list(range(len(fragmentos)))
+
+
+def test_parciales_viejos_no_se_generan():
+    llm = _LlmLento()
+    nucleo = Nucleo(llm=llm)
+    t0 = time.monotonic()
+    for i in range(5):
+        nucleo._handle_partial(f"fragmento {i}")
+    assert time.monotonic() - t0 < TOKEN_S  # quien emite no espera al LLM
+    while len(llm.pedidos) < 2:
+        time.sleep(0.01)
+    nucleo.stop_current_generation()
+    time.sleep(0.1)
+    # el primero arrancó y lo cortó el segundo; del segundo al cuarto quedaron viejos en la cola
+    assert len(llm.pedidos) == 2 and "fragmento 4" in str(llm.pedidos[1][-1])
+    assert nucleo.parciales_salteados == 3
+    assert len(nucleo.preliminar_historial) == 5
@@ -0,0 +1,43 @@
+"""
+registrar() atribuye a cada componente solo los hilos que creó su carga,
+aunque otro componente se registre o arranque hilos al mismo tiempo.
+
+Uso (desde server04/):
+    python -m pytest tests/test_presupuesto_cpu.py
+"""
+import threading, time
+
+import pytest
+
+from agente.presupuesto_cpu import HAS_AFINIDAD, PresupuestoCpu
+
+ort = pytest.importorskip("onnxruntime")
+datasets = pytest.importorskip("onnxruntime.datasets")
+pytestmark = pytest.mark.skipif(not HAS_AFINIDAD, reason="sin sched_setaffinity")
+
+
+def test_registros_concurrentes_no_se_reparten_hilos():
+    p = PresupuestoCpu([0], log=lambda _: None)
+    modelo = datasets.get_example("sigmoid.onnx")
+    sesiones, creando = [], threading.Event()
+
+    def crear_tts():
+        creando.set()
+        time.sleep(0.1)  # el otro registro llega mientras tanto
+        sesiones.append(ort.InferenceSession(modelo, sess_options=p.opciones_onnx("tts", 3),
+                                             providers=["CPUExecutionProvider"]))
+
+    def crear_stt():
+        # un hilo de Python de otro componente que arranca durante la carga del TTS
+        threading.Thread(target=time.sleep, args=(0.3,), daemon=True).start()
+
+    tts = threading.Thread(target=p.registrar, args=("tts", crear_tts))
+    tts.start()
+    creando.wait()
+    stt = threading.Thread(target=p.registrar, args=("stt", crear_stt))
+    stt.start()
+    tts.join()
+    stt.join()
+
+    assert len(p._hilos["tts"]) == 2  # pool intra-op de 3: el que llama no es del pool
+    assert not p._hilos["stt"]
@@ -0,0 +1,87 @@
+"""
+WavSink publica cada WAV entero (temporal + os.replace) y no reescribe uno
+que ya existe; el reparto a un sink con ritmo se despierta por aviso.
+
+Uso (desde server04/):
+    python -m pytest tests/test_tts_sinks.py
+"""
+import os, threading, time, wave
+from types import SimpleNamespace
+
+from agente.event_bus import event_bus
+from agente.tts_sinks import Sink, WavSink
+
+SR = 22050
+PCM = b"\x01\x00" * 2205
+
+
+def _oracion(i: int, clave: str = "abc"):
+    return SimpleNamespace(id=i, gen=0, clave=clave, texto="hola", expresion=None, labios=None)
+
+
+def _locucion(sink, o, completo=True):
+    sink.inicio(o)
+    sink.chunk(o, PCM)
+    sink.fin(o, completo)
+
+
+def _esperar(sink):
+    while sink.procesados < sink.encolados or not sink._cola.empty():
+        time.sleep(0.005)
+    time.sleep(0.02)
+
+
+def test_wav_completo_cortado_y_existente(tmp_path):
+    hablados = []
+    desuscribir = event_bus.subscribe("ui.speak", hablados.append)
+    sink = WavSink(SR, str(tmp_path))
+    sink.iniciar()
+    try:
+        _locucion(sink, _oracion(1, "cortada"), completo=False)
+        _locucion(sink, _oracion(2))
+        _esperar(sink)
+        assert sorted(os.listdir(tmp_path)) == ["abc.wav"]  # ni la cortada ni temporales
+        with wave.open(str(tmp_path / "abc.wav")) as wf:
+            assert wf.getnframes() == len(PCM) // 2
+
+        os.utime(tmp_path / "abc.wav", (0, 0))
+        antes = (tmp_path / "abc.wav").read_bytes()
+        _locucion(sink, _oracion(3))
+        _esperar(sink)
+        assert (tmp_path / "abc.wav").read_bytes() == antes
+        assert os.path.getmtime(tmp_path / "abc.wav") > 0  # renovado para la poda
+        assert [h["path"] for h in hablados] == ["abc.wav", "abc.wav"]
+    finally:
+        sink.cerrar()
+        desuscribir()
+
+
+class _Lento(Sink):
+    nombre = "lento"
+    ritmo = True
+
+    def __init__(self):
+        super().__init__(SR, capacidad=1)
+        self.seguir = threading.Event()
+
+    def _al_chunk(self, o, pcm):
+        self.seguir.wait()
+
+
+def test_ritmo_se_despierta_al_procesar():
+    sink = _Lento()
+    sink.iniciar()
+    o = _oracion(1)
+    sink.inicio(o)
+    sink.chunk(o, PCM)  # el hilo lo saca y queda en _al_chunk
+    sink.chunk(o, PCM)  # cola llena: el siguiente espera
+    t = threading.Thread(target=sink.chunk, args=(o, PCM))
+    t.start()
+    time.sleep(0.05)
+    assert t.is_alive()
+    t0 = time.monotonic()
+    sink.seguir.set()
+    t.join(1.0)
+    assert not t.is_alive() and time.monotonic() - t0 < 0.05
+    assert sink.perdidas == 0
+    sink.cerrar()